@@ -35,11 +35,11 @@ import config
 class AppConfig(QConfig):
     """应用级用户偏好配置"""
 
-    # 默认采集周期（秒）：新建监控任务时采集周期输入框的初始值；用户仍可在
-    # 监控页为单次任务临时改动，不影响本配置项
+    # 默认采集周期（秒，支持 0.1 秒粒度的亚秒周期）：新建监控任务时采集周期输入框的
+    # 初始值；用户仍可在监控页为单次任务临时改动，不影响本配置项
     default_interval = RangeConfigItem(
         "Monitor", "DefaultInterval",
-        int(config.DEFAULT_INTERVAL), RangeValidator(1, 3600))
+        config.DEFAULT_INTERVAL, RangeValidator(config.MIN_INTERVAL, config.MAX_INTERVAL))
 
     # 历史数据保留天数：0 = 永久保留（不自动清理），>0 时启动清理已停止且超期的
     # 任务数据（语义与 config.DATA_RETENTION_DAYS 一致，见该常量注释）
@@ -47,13 +47,28 @@ class AppConfig(QConfig):
         "Data", "RetentionDays",
         config.DATA_RETENTION_DAYS, OptionsValidator([0, 7, 30, 90, 180]))
 
+    # 分级保留：原始采样 / 1 分钟降采样汇总的保留天数，0 = 永久保留（语义见
+    # config.RAW_RETENTION_DAYS 注释）。超期部分由后台降采样线程裁剪，只留更粗的汇总
+    raw_retention_days = OptionsConfigItem(
+        "Data", "RawRetentionDays",
+        config.RAW_RETENTION_DAYS, OptionsValidator([0, 1, 7, 30]))
+    minute_retention_days = OptionsConfigItem(
+        "Data", "MinuteRetentionDays",
+        config.MINUTE_ROLLUP_RETENTION_DAYS, OptionsValidator([0, 30, 90, 365]))
+
+    # 数据库大小上限（MB）：0 = 不限；超出前由后台治理线程按时间从旧到新降采样、
+    # 删除（语义见 config.DB_SIZE_BUDGET_MB 注释）
+    size_budget_mb = OptionsConfigItem(
+        "Data", "SizeBudgetMB",
+        config.DB_SIZE_BUDGET_MB, OptionsValidator([0, 256, 512, 1024, 2048, 5120]))
+
     # 关闭窗口时是否最小化到系统托盘（批1 暂未接入设置页 UI 与主窗口逻辑，
     # 批4 托盘驻留功能会用到；本批先随配置基础设施一并声明，默认关闭=原有行为）
     close_to_tray = ConfigItem("Behavior", "CloseToTray", False, BoolValidator())
 
 
 # 全局单例：进程内所有代码统一通过该实例读写配置（不要自行 AppConfig() 构造新实例
-# 用于生产代码路径——三个自定义 ConfigItem 是类属性，天然全进程共享同一份值，
+# 用于生产代码路径——自定义 ConfigItem 是类属性，天然全进程共享同一份值，
 # 但只有这一个实例会被 qconfig.load() 接管、参与自动落盘）
 cfg = AppConfig()
 
@@ -0,0 +1,146 @@
+"""
+采集器单周期耗时微基准
+
+对比同一个27指标任务在两种采集方式下的单周期耗时：
+    - 逐指标分派（旧实现语义）：每个指标各自调用一次psutil访问器，
+      memory_info()/io_counters() 等在一个周期内被重复调用
+    - 编译采集计划（ProcessCollector.collect_metrics）：每个访问器每周期只调用一次
+
+另在 Linux 上启动一个持有大量内存映射（默认 4000 个，模拟 JVM/浏览器）的子进程，
+对比 USS/PSS/Swap 三个指标的单周期耗时：
+    - 逐条解析 /proc/<pid>/smaps（不支持 smaps_rollup 的旧内核/旧 psutil 的做法）
+    - psutil 后端（ProcessCollector，memory_full_info()）
+    - /proc 直读后端（ProcFsCollector，常驻打开 smaps_rollup）
+
+用法：
+    python benchmarks\\bench_collector.py [--pid PID] [--ticks N] [--mappings N]
+默认采集当前 Python 进程，结果输出到 stdout（每周期平均耗时，单位微秒）。
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# 允许直接以脚本方式运行：把项目根目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil  # noqa: E402
+
+from core.process_collector import ProcessCollector  # noqa: E402
+from core.procfs_collector import ProcFsCollector  # noqa: E402
+from utils.metrics import AVAILABLE_METRICS, MetricType  # noqa: E402
+
+ALL_METRICS = [m for group in AVAILABLE_METRICS.values() for m in group]
+
+
+def collect_per_metric(collector: ProcessCollector, metric_types):
+    """逐指标分派采集一个周期（旧实现语义，异常处理与旧版一致）"""
+    values = {}
+    with collector._process.oneshot():
+        for metric_type in metric_types:
+            try:
+                value = collector._collect_one(metric_type)
+            except psutil.NoSuchProcess:
+                return None
+            except Exception:
+                value = 0.0
+            if value is not None:
+                values[metric_type] = value
+    return values
+
+
+# 子进程：交替以只读/读写权限映射匿名页，相邻映射权限不同不会被内核合并
+_MAPPINGS_CHILD = """
+import mmap, sys
+maps = []
+for i in range(int(sys.argv[1])):
+    prot = mmap.PROT_READ | (mmap.PROT_WRITE if i % 2 else 0)
+    m = mmap.mmap(-1, mmap.PAGESIZE, prot=prot)
+    if i % 2:
+        m[0] = 1
+    maps.append(m)
+print('ready', flush=True)
+sys.stdin.read()
+"""
+
+SMAPS_METRICS = [MetricType.MEMORY_USS, MetricType.MEMORY_PSS, MetricType.MEMORY_SWAP]
+_PRIVATE_RE = re.compile(rb"\nPrivate.*:\s+(\d+)")
+_PSS_RE = re.compile(rb"\nPss:\s+(\d+)")
+_SWAP_RE = re.compile(rb"\nSwap:\s+(\d+)")
+
+
+def collect_full_smaps(pid: int):
+    """逐条解析 smaps 取 USS/PSS/Swap（KB），与 psutil 无 smaps_rollup 时的做法一致"""
+    with open(f'/proc/{pid}/smaps', 'rb') as f:
+        data = f.read()
+    return {
+        MetricType.MEMORY_USS: float(sum(map(int, _PRIVATE_RE.findall(data)))),
+        MetricType.MEMORY_PSS: float(sum(map(int, _PSS_RE.findall(data)))),
+        MetricType.MEMORY_SWAP: float(sum(map(int, _SWAP_RE.findall(data)))),
+    }
+
+
+def bench_many_mappings(mappings: int, ticks: int):
+    """对持有大量映射的子进程对比 USS/PSS/Swap 的采集耗时"""
+    child = subprocess.Popen([sys.executable, '-c', _MAPPINGS_CHILD, str(mappings)],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        child.stdout.readline()
+        with open(f'/proc/{child.pid}/maps', 'rb') as f:
+            vmas = sum(1 for _ in f)
+        psutil_backend = ProcessCollector(child.pid)
+        procfs_backend = ProcFsCollector(child.pid)
+        psutil_backend.collect_metrics(SMAPS_METRICS)
+        procfs_backend.collect_metrics(SMAPS_METRICS)
+
+        smaps = bench(lambda: collect_full_smaps(child.pid), ticks)
+        via_psutil = bench(lambda: psutil_backend.collect_metrics(SMAPS_METRICS), ticks)
+        via_rollup = bench(lambda: procfs_backend.collect_metrics(SMAPS_METRICS), ticks)
+        procfs_backend.close()
+    finally:
+        child.stdin.close()
+        child.wait()
+
+    print(f"\n多映射子进程 映射数={vmas} 指标=USS/PSS/Swap 周期数={ticks}")
+    print(f"逐条解析 smaps:        {smaps:10.1f} us/周期")
+    print(f"psutil 后端:           {via_psutil:10.1f} us/周期  ({smaps / via_psutil:.2f}x)")
+    print(f"/proc 后端 smaps_rollup: {via_rollup:8.1f} us/周期  ({smaps / via_rollup:.2f}x)")
+
+
+def bench(fn, ticks: int) -> float:
+    """执行 ticks 个周期，返回每周期平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+    return (time.perf_counter() - start) / ticks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pid', type=int, default=os.getpid(), help='被采集进程PID（默认当前进程）')
+    parser.add_argument('--ticks', type=int, default=2000, help='采集周期数')
+    parser.add_argument('--mappings', type=int, default=4000,
+                        help='多映射子进程的映射数（仅 Linux，0 表示跳过）')
+    args = parser.parse_args()
+
+    collector = ProcessCollector(args.pid)
+    collector.prime_cpu()
+    # 预热：编译计划、填充 psutil 内部缓存
+    collector.collect_metrics(ALL_METRICS)
+    collect_per_metric(collector, ALL_METRICS)
+
+    before = bench(lambda: collect_per_metric(collector, ALL_METRICS), args.ticks)
+    after = bench(lambda: collector.collect_metrics(ALL_METRICS), args.ticks)
+
+    print(f"PID={args.pid} 指标数={len(ALL_METRICS)} 周期数={args.ticks}")
+    print(f"逐指标分派:   {before:8.1f} us/周期")
+    print(f"编译采集计划: {after:8.1f} us/周期  ({before / after:.2f}x)")
+
+    if args.mappings and ProcFsCollector.is_available():
+        bench_many_mappings(args.mappings, max(args.ticks // 10, 50))
+
+
+if __name__ == '__main__':
+    main()
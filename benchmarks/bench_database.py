@@ -0,0 +1,145 @@
+"""
+数据库连接管理基准
+
+对比两种连接方式下的写入吞吐与历史页查询延迟：
+    - 每次调用新建连接（旧实现：sqlite3.connect + 3 条 PRAGMA + close）
+    - 每线程持久连接（Database._get_connection，含预编译语句缓存）
+
+写入：模拟 SAVE_BATCH_SIZE=1 的采集路径，每周期一次 save_data_points（一批 N 个指标）。
+查询：模拟历史页一次交互（get_task + 最近 N 条明细 + 分桶降采样 + 统计摘要）。
+组提交：M 个任务同时采集时，每任务每周期各提交一次事务 vs 每周期全部任务合并为一个事务
+（core/writer.py 的组提交写入线程在延迟窗口内做的就是后者）。
+
+用法：
+    python benchmarks/bench_database.py [--ticks N] [--metrics N] [--queries N] [--tasks M]
+在临时目录建库，不触碰项目 data/monitor.db。
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# 允许直接以脚本方式运行：把项目根目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database  # noqa: E402
+from data.models import DataPoint, MonitorTask  # noqa: E402
+from utils.metrics import AVAILABLE_METRICS  # noqa: E402
+
+ALL_METRICS = [m for group in AVAILABLE_METRICS.values() for m in group]
+
+
+class ConnectPerCallDatabase(Database):
+    """旧实现语义：每次 _get_connection 新建连接并重跑 PRAGMA，用完即关"""
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+
+def _make_task(db: Database, metrics) -> MonitorTask:
+    task = MonitorTask(task_id='bench', pid=1, process_name='bench.exe', metric_types=metrics,
+                       interval=1.0, start_time=datetime(2026, 1, 1), end_time=None,
+                       status='running')
+    db.save_task(task)
+    return task
+
+
+def bench_inserts(db: Database, metrics, ticks: int) -> float:
+    """每周期一批写入，返回每秒写入周期数"""
+    task = _make_task(db, metrics)
+    start_ts = task.start_time
+    start = time.perf_counter()
+    for i in range(ticks):
+        ts = start_ts + timedelta(seconds=i)
+        db.save_data_points([DataPoint(task.task_id, ts, float(i), m) for m in metrics])
+    return ticks / (time.perf_counter() - start)
+
+
+def bench_history(db: Database, metric: str, queries: int) -> float:
+    """历史页一次交互的平均延迟（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(queries):
+        db.get_task('bench')
+        db.get_task_data_points('bench', metric_type=metric, limit=1000)
+        db.get_task_data_points_bucketed('bench', metric_type=metric, max_buckets=500)
+        db.get_metric_stats('bench', metric)
+    return (time.perf_counter() - start) / queries * 1000
+
+
+def bench_group_commit(db: Database, metrics, tasks: int, ticks: int):
+    """M 个任务同时采集，返回 (每任务各自提交, 合并提交) 两种方式的每秒周期数"""
+    task_ids = []
+    for i in range(tasks):
+        task = _make_task(db, metrics)
+        task.task_id = f'bench-{i}'
+        db.save_task(task)
+        task_ids.append(task.task_id)
+    start_ts = datetime(2026, 1, 1)
+
+    def _batch(task_id, i):
+        ts = start_ts + timedelta(seconds=i)
+        return [DataPoint(task_id, ts, float(i), m) for m in metrics]
+
+    start = time.perf_counter()
+    for i in range(ticks):
+        for task_id in task_ids:
+            db.save_data_points(_batch(task_id, i))
+    per_task = ticks / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ticks, 2 * ticks):
+        db.save_data_points([p for task_id in task_ids for p in _batch(task_id, i)])
+    grouped = ticks / (time.perf_counter() - start)
+    return per_task, grouped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=3000, help='写入周期数')
+    parser.add_argument('--metrics', type=int, default=8, help='每周期指标数')
+    parser.add_argument('--queries', type=int, default=50, help='历史页交互次数')
+    parser.add_argument('--tasks', type=int, default=20, help='组提交场景的并发任务数')
+    args = parser.parse_args()
+
+    metrics = ALL_METRICS[:args.metrics]
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, cls in (("每次新建连接", ConnectPerCallDatabase), ("每线程持久连接", Database)):
+            db = cls(os.path.join(tmp, f'{cls.__name__}.db'))
+            inserts = bench_inserts(db, metrics, args.ticks)
+            latency = bench_history(db, metrics[0], args.queries)
+            db.close()
+            results[label] = (inserts, latency)
+
+        db = Database(os.path.join(tmp, 'group_commit.db'))
+        per_task, grouped = bench_group_commit(db, metrics, args.tasks, args.ticks // 10)
+        db.close()
+
+    print(f"写入周期数={args.ticks} 每周期指标数={len(metrics)} 历史页交互次数={args.queries}")
+    base_inserts, base_latency = results["每次新建连接"]
+    for label, (inserts, latency) in results.items():
+        print(f"{label}: 写入 {inserts:8.0f} 周期/秒 ({inserts / base_inserts:.2f}x)  "
+              f"历史页 {latency:7.2f} ms/次 ({base_latency / latency:.2f}x)")
+    print(f"{args.tasks} 个任务同时采集：每任务各自提交 {per_task:8.0f} 周期/秒  "
+          f"合并提交 {grouped:8.0f} 周期/秒 ({grouped / per_task:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
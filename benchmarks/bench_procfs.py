@@ -0,0 +1,66 @@
+"""
+采集后端吞吐基准（仅 Linux）
+
+对比 psutil 后端（ProcessCollector）与 /proc 直读后端（ProcFsCollector）
+每消耗 1 个 CPU 核·秒能完成的采集周期数（samples/s/core），分两组指标：
+    - /proc 直读组：全部可由 stat/statm/status/io 直接取得的指标
+    - 全部指标：其余指标由 /proc 后端回退 psutil 采集
+
+计时使用 time.process_time()（本进程 CPU 时间），不受调度等待影响。
+
+用法：
+    python benchmarks/bench_procfs.py [--pid PID] [--ticks N]
+"""
+import argparse
+import os
+import sys
+import time
+
+# 允许直接以脚本方式运行：把项目根目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.process_collector import ProcessCollector  # noqa: E402
+from core.procfs_collector import ProcFsCollector, _DERIVED_FILES, _PROC_SOURCES  # noqa: E402
+from utils.metrics import AVAILABLE_METRICS  # noqa: E402
+
+ALL_METRICS = [m for group in AVAILABLE_METRICS.values() for m in group]
+PROC_METRICS = [m for m in ALL_METRICS if m in _PROC_SOURCES or m in _DERIVED_FILES]
+
+
+def samples_per_core_second(collector: ProcessCollector, metric_types, ticks: int) -> float:
+    """执行 ticks 个采集周期，返回每 CPU 核·秒的周期数"""
+    collector.collect_metrics(metric_types)  # 预热：编译计划、打开文件
+    start = time.process_time()
+    for _ in range(ticks):
+        collector.collect_metrics(metric_types)
+    return ticks / (time.process_time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pid', type=int, default=os.getpid(), help='被采集进程PID（默认当前进程）')
+    parser.add_argument('--ticks', type=int, default=5000, help='采集周期数')
+    args = parser.parse_args()
+
+    if not ProcFsCollector.is_available():
+        print("当前系统不支持 /proc 直读后端")
+        return
+
+    print(f"PID={args.pid} 周期数={args.ticks}")
+    for label, metrics in (("/proc 直读组", PROC_METRICS), ("全部指标", ALL_METRICS)):
+        psutil_backend = ProcessCollector(args.pid)
+        procfs_backend = ProcFsCollector(args.pid)
+        psutil_backend.prime_cpu()
+        procfs_backend.prime_cpu()
+
+        before = samples_per_core_second(psutil_backend, metrics, args.ticks)
+        after = samples_per_core_second(procfs_backend, metrics, args.ticks)
+        procfs_backend.close()
+
+        print(f"{label}（{len(metrics)} 指标）")
+        print(f"  psutil 后端:   {before:10.0f} 次/核·秒")
+        print(f"  /proc 直读后端: {after:10.0f} 次/核·秒  ({after / before:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+采样表结构基准
+
+对比两种表结构下同样数据的库文件大小与写入耗时：
+    - 旧结构 data_points：每个指标每个周期一行（task_id/timestamp 按指标数重复存储），
+      三个二级索引（task_id、timestamp、(task_id, metric_type)）
+    - 现结构 samples：每个周期一行、每个指标一列，(task_id, timestamp) 唯一索引
+
+写入均为每周期一个事务（SAVE_BATCH_SIZE=1 的采集路径），大小为写完后 VACUUM 的主库文件。
+
+用法：
+    python benchmarks/bench_schema.py [--ticks N] [--metrics N]
+在临时目录建库，不触碰项目 data/monitor.db。
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 允许直接以脚本方式运行：把项目根目录加入 sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import Database  # noqa: E402
+from data.models import DataPoint, MonitorTask  # noqa: E402
+from utils.metrics import AVAILABLE_METRICS  # noqa: E402
+
+ALL_METRICS = [m for group in AVAILABLE_METRICS.values() for m in group]
+TASK_ID = '6f1c2d3e-0000-4000-8000-000000000001'
+
+LEGACY_DDL = [
+    '''
+    CREATE TABLE data_points (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        value REAL NOT NULL,
+        metric_type TEXT
+    )
+    ''',
+    'CREATE INDEX idx_data_points_task_id ON data_points(task_id)',
+    'CREATE INDEX idx_data_points_timestamp ON data_points(timestamp)',
+    'CREATE INDEX idx_data_points_task_metric ON data_points(task_id, metric_type)',
+]
+
+
+def _ticks(metrics, ticks: int):
+    start_ts = datetime(2026, 1, 1)
+    for i in range(ticks):
+        ts = start_ts + timedelta(seconds=i)
+        yield [DataPoint(TASK_ID, ts, float(i), m) for m in metrics]
+
+
+def _vacuumed_size(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    return os.path.getsize(path)
+
+
+def bench_legacy(path: str, metrics, ticks: int):
+    """旧结构：返回 (每秒写入周期数, 库文件字节数)"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    for ddl in LEGACY_DDL:
+        conn.execute(ddl)
+    conn.commit()
+
+    start = time.perf_counter()
+    for points in _ticks(metrics, ticks):
+        conn.executemany('''
+            INSERT INTO data_points (task_id, timestamp, value, metric_type)
+            VALUES (?, ?, ?, ?)
+        ''', [(dp.task_id, dp.timestamp.isoformat(), dp.value, dp.metric_type) for dp in points])
+        conn.commit()
+    rate = ticks / (time.perf_counter() - start)
+    conn.close()
+    return rate, _vacuumed_size(path)
+
+
+def bench_samples(path: str, metrics, ticks: int):
+    """现结构（Database.save_data_points）：返回 (每秒写入周期数, 库文件字节数)"""
+    db = Database(path)
+    db.save_task(MonitorTask(task_id=TASK_ID, pid=1, process_name='bench.exe',
+                             metric_types=list(metrics), interval=1.0,
+                             start_time=datetime(2026, 1, 1), end_time=None, status='running'))
+
+    start = time.perf_counter()
+    for points in _ticks(metrics, ticks):
+        db.save_data_points(points)
+    rate = ticks / (time.perf_counter() - start)
+    db.close()
+    return rate, _vacuumed_size(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=20000, help='写入周期数')
+    parser.add_argument('--metrics', type=int, default=8, help='每周期指标数')
+    args = parser.parse_args()
+
+    metrics = ALL_METRICS[:args.metrics]
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "旧结构 data_points": bench_legacy(os.path.join(tmp, 'legacy.db'), metrics, args.ticks),
+            "现结构 samples": bench_samples(os.path.join(tmp, 'samples.db'), metrics, args.ticks),
+        }
+
+    print(f"写入周期数={args.ticks} 每周期指标数={len(metrics)}")
+    base_rate, base_size = results["旧结构 data_points"]
+    for label, (rate, size) in results.items():
+        print(f"{label}: 写入 {rate:8.0f} 周期/秒 ({rate / base_rate:.2f}x)  "
+              f"库文件 {size / 1024:9.1f} KiB = {size / args.ticks:6.1f} 字节/周期 "
+              f"({size / base_size:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -87,15 +87,96 @@ UPDATE_PREFS_PATH = os.path.join(DATA_DIR, "update_prefs.json")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # 监控配置
-MAX_MONITOR_TASKS = 5  # 最多同时监控5个进程
+# 最多同时监控的进程数：全部任务由同一个共享采样线程按截止时间调度（core/sampler.py），
+# 不再是"每任务一个线程"，上限只为约束实时监控页的任务卡数量
+MAX_MONITOR_TASKS = 100
 DEFAULT_INTERVAL = 1.0  # 默认采集间隔（秒）；缺省值，运行时以设置页（app_config.cfg）为准
+# 采集间隔取值范围（秒）：采样按绝对截止时间调度（core/schedule.py），亚秒周期下时间戳
+# 也不会漂移，最小 0.1 秒以便捕捉短时尖峰
+MIN_INTERVAL = 0.1
+MAX_INTERVAL = 3600.0
+# 进程指标采集后端：'auto'（Linux 用 /proc 直读，其他系统用 psutil）/ 'psutil' / 'procfs'
+# /proc 直读后端见 core/procfs_collector.py，取值口径与 psutil 后端一致
+COLLECTOR_BACKEND = 'auto'
+
+# 采样存储方式：'rows'（每个采集周期一行存入 samples）/ 'chunks'（已关闭的小时窗口封为
+# 按任务、指标分列的压缩块 sample_chunks，时间戳二阶差分、值异或编码，见 data/chunks.py；
+# 最近一个窗口仍按行存储）。两种方式写入的库互相可读，切换不需要迁移
+SAMPLE_STORAGE = 'rows'
+# 只记变化：与同一小时窗口内该指标上一次写入的值相同的单元格不写值，只在行的 held 位图中
+# 标记"沿用前值"（读取时按阶梯序列还原，结果与逐周期写入完全一致）。优先级、线程数、
+# 峰值类内存等几乎不变的指标因此不再每周期占用一个值
+SAMPLE_CHANGE_ONLY = False
+# 只记变化时的每指标死区（绝对容差，指标原始单位）：与上次写入的值相差不超过容差的
+# 采样按上次的值记录（有损，读回为上次的值）。未列出的指标容差为 0，即无损
+SAMPLE_DEADBAND = {}  # 例：{"memory_vms": 4096}
+# 按任务分区：新建任务的采样行、压缩块与降采样汇总存入独立的分区库文件
+# （monitor.db.parts\<任务ID>.db），读写时按需 ATTACH 到主库连接。删除任务即删除其分区
+# 文件，不再逐行 DELETE、也不留下需要 VACUUM 回收的空闲页；历史查询只读该任务的文件。
+# 任务列表、汇总等仍在主库。切换后已有任务保持原位置，两种位置互相可读
+SAMPLE_PARTITIONS = False
 
 # 数据保存配置
-# 固化为1，勿调大：v1.2.0 架构评审裁决——每周期立即落库，配合 flush 失败重试与 1000
-# 条缓冲上限保证"停止时数据不丢"的语义简单可靠；调大会引入"崩溃时丢一批未落库
-# 数据"的新风险，且与当前"实时显示历史数据"的产品预期冲突
+# 任务缓冲达到该条数即登记待写，保持为1：大批量写库由下面的组提交窗口完成，
+# "崩溃时丢一批未落库数据"的风险由采样日志（data/journal.py，monitor.db.journal）
+# 兜底——数据进入缓冲前先追加到日志，下次启动回放补写
 SAVE_BATCH_SIZE = 1
 
+# 组提交延迟窗口（毫秒）：全部任务的待写数据由同一写入线程（core/writer.py）在该
+# 窗口内收集后合并为一个事务提交；任务停止时不等窗口、立即提交剩余数据。
+# 窗口内尚未落库的数据由采样日志保护，历史页最多滞后一个窗口
+WRITE_LATENCY_MS = 1000
+
+# 采样日志分段（data/journal.py）：当前段写满 JOURNAL_SEGMENT_MB 后换新段，记录全部落库
+# 确认的段即删除（100 个任务 × 每秒 10 次 × 5 个指标约 440 KB/秒，约 2 秒一段）；
+# 启动回放每批补写至多 JOURNAL_REPLAY_BATCH 条，每批一个事务
+JOURNAL_SEGMENT_MB = 1
+JOURNAL_REPLAY_BATCH = 5000
+
+# 空闲页后台回收（core/reclaimer.py）：删除任务、过期清理与封块释放的页留在库文件的空闲页
+# 链表上（auto_vacuum=INCREMENTAL），回收线程每隔 RECLAIM_INTERVAL_MS 检查一次，在写入线程
+# 空闲时每步截掉至多 RECLAIM_STEP_PAGES 页（4 KB 页时约 1 MB、实测约 2~3 毫秒的写事务），
+# 步间停顿 RECLAIM_PAUSE_MS，让采样写入随时插入，不需要整库 VACUUM 的独占锁
+RECLAIM_INTERVAL_MS = 10000
+RECLAIM_STEP_PAGES = 256
+RECLAIM_PAUSE_MS = 50
+
+# 任务删除（core/deleter.py）：删除与过期清理先把任务标记为排队删除（任务列表中立即消失），
+# 再由后台删除线程按主键每批删除至多 DELETE_BATCH_ROWS 行，每批一个短事务，批间停顿
+# DELETE_PAUSE_MS 且写入线程有待写数据时让出；中途退出后下次启动继续删除
+DELETE_BATCH_ROWS = 5000
+DELETE_PAUSE_MS = 20
+
+# 分级保留（core/downsampler.py）：原始采样保留 RAW_RETENTION_DAYS 天，之后只留 1 分钟与
+# 1 小时降采样汇总（rollups，写入时已增量维护）；1 分钟汇总再保留 MINUTE_ROLLUP_RETENTION_DAYS
+# 天，之后只留 1 小时汇总（随任务永久保留）。0 = 永久保留（默认，不裁剪）。降采样线程每隔
+# DOWNSAMPLE_INTERVAL_MS 检查一次，按 DELETE_BATCH_ROWS / DELETE_PAUSE_MS 分批裁剪。
+# 缺省值，运行时以设置页（app_config.cfg）为准
+RAW_RETENTION_DAYS = 0
+MINUTE_ROLLUP_RETENTION_DAYS = 0
+DOWNSAMPLE_INTERVAL_MS = 600000
+
+# 数据库大小上限（core/governor.py，MB）：0 = 不限（默认）。治理线程每隔 BUDGET_CHECK_INTERVAL_MS
+# 用 dbstat 统计各任务占用，按运行中任务的采集速率预测 BUDGET_HORIZON_S 秒后的大小；预计超出
+# 上限时按时间从旧到新释放空间到上限的 BUDGET_TARGET_RATIO：先把原始采样降采样为汇总、再
+# 裁剪 1 分钟汇总，仍不够才删除最旧的已停止任务。缺省值，运行时以设置页（app_config.cfg）为准
+DB_SIZE_BUDGET_MB = 0
+BUDGET_CHECK_INTERVAL_MS = 300000
+BUDGET_HORIZON_S = 3600
+BUDGET_TARGET_RATIO = 0.9
+
+# WAL 检查点（core/checkpointer.py）：历史页、导出线程的长读事务期间 SQLite 的自动 checkpoint
+# 只能回写到最老的读快照为止，持续写入时 -wal 会一直增长。检查点线程每隔 WAL_CHECKPOINT_INTERVAL_MS
+# 做一次 PASSIVE checkpoint（不等待任何连接）；-wal 中的内容超过 WAL_SIZE_LIMIT_MB 时升级为
+# RESTART（等待读事务结束，期间挡住写入），之后下一次写入从头重用 -wal 并把文件截回
+# WAL_SIZE_LIMIT_MB（各连接的 journal_size_limit）。RESTART 先至多等待 WAL_RESTART_BUSY_TIMEOUT_MS，
+# 读事务接连不断、等不到时每次加倍，至多 WAL_RESTART_BUSY_TIMEOUT_MAX_MS（写入线程的待写数据
+# 在这段时间内积压，随后一个事务提交）
+WAL_CHECKPOINT_INTERVAL_MS = 5000
+WAL_SIZE_LIMIT_MB = 16
+WAL_RESTART_BUSY_TIMEOUT_MS = 200
+WAL_RESTART_BUSY_TIMEOUT_MAX_MS = 2000
+
 # 数据保留天数（启动时自动清理已停止且过期的历史任务）
 # 默认 0 = 禁用自动清理（v1.2.0 架构评审裁决）：历史数据的删除应由用户在历史页显式点击
 # "删除此任务数据"完成，避免用户在不知情的情况下丢失数据；调大为正整数即可启用，
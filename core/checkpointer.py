@@ -0,0 +1,137 @@
+"""
+WAL 检查点线程
+多个任务每秒提交、同时历史页与导出线程持有长读事务时，SQLite 在提交时做的自动
+checkpoint 只能回写到最老的读快照为止，-wal 文件随持续写入一直增长，直到"清理并压缩
+数据库"做一次 TRUNCATE checkpoint。本线程定期做 PASSIVE checkpoint（不等待任何连接，
+读事务结束后即可追上）；-wal 中的内容超过 WAL_SIZE_LIMIT_MB 时升级为 RESTART，等待读
+事务结束后回写全部，下一次写入从头重用 -wal 并把文件截回上限（journal_size_limit）。
+
+RESTART 等待期间持有写锁，所以只在写入线程空闲时升级，先等待至多
+WAL_RESTART_BUSY_TIMEOUT_MS。读事务接连不断时（前一个未结束后一个已开始）短等待永远等
+不到空档，所以等不到时下次加倍，至多 WAL_RESTART_BUSY_TIMEOUT_MAX_MS，成功后恢复。
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from PyQt5.QtCore import QThread
+
+from core.writer import GroupCommitWriter
+from data.database import Database
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class WalCheckpointer(QThread):
+    """
+    WAL 检查点线程（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期与应用一致：主窗口启动完成后启动，退出时 stop() 并 join。每隔
+    WAL_CHECKPOINT_INTERVAL_MS 做一次检查点；最近一次的结果由 diagnostics() 提供给
+    设置页显示。
+    """
+
+    def __init__(self, db: Database, writer: Optional[GroupCommitWriter] = None,
+                 interval_ms: Optional[float] = None, limit_mb: Optional[float] = None,
+                 busy_timeout_ms: Optional[int] = None, max_busy_timeout_ms: Optional[int] = None,
+                 parent=None):
+        """
+        Args:
+            db: 数据库实例（检查点线程使用自己的持久连接）
+            writer: 组提交写入线程，有待写数据时不升级为 RESTART；None 表示不避让
+            interval_ms: 检查间隔（毫秒），默认取 config.WAL_CHECKPOINT_INTERVAL_MS
+            limit_mb: -wal 中的内容超过该值（MB）时升级为 RESTART，默认取 config.WAL_SIZE_LIMIT_MB
+            busy_timeout_ms: RESTART 等待读事务结束的初始上限（毫秒），默认取
+                config.WAL_RESTART_BUSY_TIMEOUT_MS
+            max_busy_timeout_ms: 等不到时逐次加倍的最大上限（毫秒），默认取
+                config.WAL_RESTART_BUSY_TIMEOUT_MAX_MS
+        """
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self.interval = (config.WAL_CHECKPOINT_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.limit_bytes = int((config.WAL_SIZE_LIMIT_MB if limit_mb is None else limit_mb) * 1024 * 1024)
+        self.busy_timeout_ms = (config.WAL_RESTART_BUSY_TIMEOUT_MS if busy_timeout_ms is None
+                                else busy_timeout_ms)
+        self.max_busy_timeout_ms = (config.WAL_RESTART_BUSY_TIMEOUT_MAX_MS
+                                    if max_busy_timeout_ms is None else max_busy_timeout_ms)
+        # 下一次 RESTART 的等待上限（等不到时加倍，成功后恢复初始值）
+        self._restart_timeout_ms = self.busy_timeout_ms
+        # 置位即退出；等待检查间隔时也用它，stop() 能立即唤醒
+        self._stop_event = threading.Event()
+        # 置位即提前开始下一次检查
+        self._wake_event = threading.Event()
+        # 最近一次 -wal 内容全部回写的时刻（time.monotonic），计算检查点滞后的时长
+        self._caught_up_at = time.monotonic()
+        # 最近一次检查点的结果（见 diagnostics），整体替换，界面线程读取无需加锁
+        self._diagnostics = {'wal_bytes': 0, 'lag_frames': 0, 'lag_seconds': 0.0,
+                             'passive_count': 0, 'restart_count': 0, 'restart_busy_count': 0}
+
+    def diagnostics(self) -> Dict[str, float]:
+        """
+        最近一次检查点的诊断数据（设置页显示；尚未检查时各项为 0）
+
+        Returns:
+            Dict[str, float]: wal_bytes（-wal 文件字节数合计）、lag_frames（尚未回写的帧数）、
+            lag_seconds（距上次全部回写的秒数，已全部回写时为 0）、passive_count /
+            restart_count（两种检查点的执行次数）、restart_busy_count（RESTART 等不到读事务
+            结束的次数）
+        """
+        return dict(self._diagnostics)
+
+    def wake(self):
+        """不等检查间隔，尽快做一次检查点"""
+        self._wake_event.set()
+
+    def stop(self):
+        """请求线程退出（当前一次检查点完成后退出）"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def run(self):
+        """检查点主循环：等待检查间隔（或唤醒）-> 做一次检查点"""
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.checkpoint_once()
+            except Exception:
+                # checkpoint_wal 已静默失败，这里只防御意外异常拖垮线程
+                logger.error("WAL 检查点失败", exc_info=True)
+
+    def checkpoint_once(self) -> Dict[str, int]:
+        """
+        做一次 PASSIVE checkpoint，-wal 中的内容超过上限且写入线程空闲时升级为 RESTART
+
+        Returns:
+            Dict[str, int]: 最后一次 Database.checkpoint_wal 的结果
+        """
+        diagnostics = dict(self._diagnostics)
+        result = self.db.checkpoint_wal('PASSIVE')
+        diagnostics['passive_count'] += 1
+        if result['log_frames'] * result['page_size'] > self.limit_bytes \
+                and (self.writer is None or self.writer.is_idle()):
+            result = self.db.checkpoint_wal('RESTART', busy_timeout_ms=self._restart_timeout_ms)
+            diagnostics['restart_count'] += 1
+            if result['busy']:
+                diagnostics['restart_busy_count'] += 1
+                logger.warning("WAL 检查点 %d 毫秒内未能等到读事务结束: -wal %d 字节, 未回写 %d 帧",
+                               self._restart_timeout_ms, result['wal_bytes'],
+                               result['log_frames'] - result['checkpointed_frames'])
+                self._restart_timeout_ms = min(self._restart_timeout_ms * 2,
+                                               self.max_busy_timeout_ms)
+            else:
+                self._restart_timeout_ms = self.busy_timeout_ms
+
+        lag_frames = result['log_frames'] - result['checkpointed_frames']
+        now = time.monotonic()
+        if lag_frames == 0:
+            self._caught_up_at = now
+        diagnostics.update(wal_bytes=result['wal_bytes'], lag_frames=lag_frames,
+                           lag_seconds=now - self._caught_up_at)
+        self._diagnostics = diagnostics
+        return result
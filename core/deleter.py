@@ -0,0 +1,155 @@
+"""
+后台任务删除线程
+删除任务（历史页单个/批量删除、过期清理）先把任务标记为排队删除（任务列表中立即
+消失），再由本线程按主键分批删除数据（Database.delete_task_batch）：每批一个短事务，
+批间停顿并在写入线程有待写数据时让出，取代"一个事务删除任务全部数据"——数据量大时
+后者长时间持有写锁，运行中任务的落库等满 busy_timeout 后进入重试。
+
+排队删除的标记持久化在库中（tasks.deleting），应用中途退出后，下次启动由 resume()
+取回继续删除。
+"""
+import logging
+import threading
+from typing import List, Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from core.writer import GroupCommitWriter
+from data.database import Database
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TaskDeleter(QThread):
+    """
+    后台任务删除线程（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期与写入线程一致：有任务排队时启动，队列删空后自行退出，之后再有任务
+    排队时重新启动。逐个任务删除，进度经信号交给界面（跨线程信号在界面线程执行）。
+    """
+
+    # 删除进度：(任务ID, 已删除行数, 开始删除时的总行数)
+    progress = pyqtSignal(str, int, int)
+    # 单个任务删除完毕：任务ID
+    task_deleted = pyqtSignal(str)
+    # 队列中的任务全部处理完毕（含失败留待下次启动的任务）
+    queue_finished = pyqtSignal()
+
+    def __init__(self, db: Database, writer: Optional[GroupCommitWriter] = None,
+                 batch_rows: Optional[int] = None, pause_ms: Optional[float] = None, parent=None):
+        """
+        Args:
+            db: 数据库实例（删除线程使用自己的持久连接）
+            writer: 组提交写入线程，有待写数据时让出；None 表示不避让
+            batch_rows: 每批最多删除的行数，默认取 config.DELETE_BATCH_ROWS
+            pause_ms: 两批之间的停顿（毫秒），默认取 config.DELETE_PAUSE_MS
+        """
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self.batch_rows = config.DELETE_BATCH_ROWS if batch_rows is None else batch_rows
+        self.pause = (config.DELETE_PAUSE_MS if pause_ms is None else pause_ms) / 1000
+        self._cond = threading.Condition()
+        # 待删除的任务（按排队顺序，队首为正在删除的任务）
+        self._queue: List[str] = []
+        # 线程是否处于（或即将进入）运行状态；只在持锁时读写
+        self._alive = False
+        # 置位即在当前一批完成后退出（应用退出），剩余任务下次启动继续
+        self._stop_event = threading.Event()
+
+    # ========== 对外接口（界面线程调用） ==========
+
+    def delete_tasks(self, task_ids: List[str]) -> bool:
+        """
+        排队删除任务：标记为排队删除（任务立即从任务列表中消失）后交给本线程分批删除
+
+        Args:
+            task_ids: 任务ID列表
+
+        Returns:
+            bool: 标记是否成功（失败时任务保持原样，未排队）
+        """
+        if not self.db.mark_tasks_deleting(task_ids):
+            return False
+        self._enqueue(task_ids)
+        return True
+
+    def resume(self) -> int:
+        """
+        继续删除库中已排队删除、数据尚未删完的任务（启动时调用：上次运行中途退出，
+        或启动清理只做了标记）
+
+        Returns:
+            int: 排队的任务数
+        """
+        task_ids = self.db.get_deleting_task_ids()
+        self._enqueue(task_ids)
+        return len(task_ids)
+
+    def pending_task_ids(self) -> List[str]:
+        """尚未删除完毕的任务（队首为正在删除的任务）"""
+        with self._cond:
+            return list(self._queue)
+
+    def stop(self):
+        """请求线程退出（当前一批删除完成后退出，不中断事务）"""
+        self._stop_event.set()
+
+    def wait_done(self):
+        """阻塞到队列处理完毕、线程退出（或被要求退出）为止；没有排队的任务时立即返回"""
+        with self._cond:
+            while self._alive:
+                self._cond.wait()
+
+    def _enqueue(self, task_ids: List[str]):
+        """把任务加入队列（已在队列中的忽略），需要时启动线程"""
+        with self._cond:
+            self._queue.extend(task_id for task_id in task_ids if task_id not in self._queue)
+            if not self._queue or self._alive:
+                return
+            self._alive = True
+        # 上一轮删空退出的线程可能尚未完全结束，先等它结束再重新启动
+        self.wait()
+        self._stop_event.clear()
+        self.start()
+
+    # ========== 删除线程 ==========
+
+    def run(self):
+        """删除主循环：逐个任务分批删除到完成，队列删空后退出"""
+        while True:
+            with self._cond:
+                if not self._queue or self._stop_event.is_set():
+                    self._alive = False
+                    self._cond.notify_all()
+                    break
+                task_id = self._queue[0]
+
+            self._delete_one(task_id)
+            if self._stop_event.is_set():
+                continue
+            with self._cond:
+                if self._queue and self._queue[0] == task_id:
+                    self._queue.pop(0)
+        self.queue_finished.emit()
+
+    def _delete_one(self, task_id: str):
+        """分批删除一个任务直到完成；失败或被要求退出时停下，任务保持排队删除状态"""
+        total = self.db.count_task_rows(task_id)
+        done = 0
+        self.progress.emit(task_id, done, total)
+        while not self._stop_event.is_set():
+            if self.writer is not None and not self.writer.is_idle():
+                self._stop_event.wait(self.pause)
+                continue
+            deleted = self.db.delete_task_batch(task_id, self.batch_rows)
+            if deleted is None:
+                # 已记日志；标记仍在库中，下次启动 resume() 时重试
+                return
+            if deleted == 0:
+                self.task_deleted.emit(task_id)
+                return
+            done += deleted
+            self.progress.emit(task_id, done, max(total, done))
+            self._stop_event.wait(self.pause)
@@ -0,0 +1,101 @@
+"""
+分级保留降采样线程
+原始采样超过保留期限后只留降采样汇总（1 分钟 / 1 小时，写入时已随采样增量维护），
+1 分钟汇总超过其保留期限后只留 1 小时汇总：本线程定期按 retention_cutoffs 算出的裁剪
+时刻，逐个任务分批删除（Database.downsample_task_batch）早于裁剪时刻的原始采样与 1 分钟
+汇总，数月的历史仍可在历史页查看图表与统计，占用只剩原来的一小部分。
+
+与后台删除线程一样每批一个短事务、批间停顿，写入线程有待写数据时让出；释放的页由
+空闲页回收线程归还文件系统。
+"""
+import logging
+import threading
+from typing import Optional
+
+from PyQt5.QtCore import QThread
+
+from core.writer import GroupCommitWriter
+from data.database import Database, retention_cutoffs
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionDownsampler(QThread):
+    """
+    分级保留降采样线程（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期与应用一致：主窗口启动完成后设置保留策略并启动，退出时 stop() 并 join。
+    每隔 DOWNSAMPLE_INTERVAL_MS 检查一次，有早于裁剪时刻的数据时逐个任务裁剪到完成；
+    保留策略在设置页修改后 set_policy() 立即唤醒检查。
+    """
+
+    def __init__(self, db: Database, writer: Optional[GroupCommitWriter] = None,
+                 interval_ms: Optional[float] = None, batch_rows: Optional[int] = None,
+                 pause_ms: Optional[float] = None, parent=None):
+        """
+        Args:
+            db: 数据库实例（降采样线程使用自己的持久连接）
+            writer: 组提交写入线程，有待写数据时让出；None 表示不避让
+            interval_ms: 检查间隔（毫秒），默认取 config.DOWNSAMPLE_INTERVAL_MS
+            batch_rows: 每批最多删除的行数，默认取 config.DELETE_BATCH_ROWS
+            pause_ms: 两批之间的停顿（毫秒），默认取 config.DELETE_PAUSE_MS
+        """
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self.interval = (config.DOWNSAMPLE_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.batch_rows = config.DELETE_BATCH_ROWS if batch_rows is None else batch_rows
+        self.pause = (config.DELETE_PAUSE_MS if pause_ms is None else pause_ms) / 1000
+        # 保留策略：(原始采样保留天数, 1 分钟汇总保留天数)，0 = 永久保留
+        self._policy = (config.RAW_RETENTION_DAYS, config.MINUTE_ROLLUP_RETENTION_DAYS)
+        # 置位即退出；等待检查间隔时也用它，stop() 能立即唤醒
+        self._stop_event = threading.Event()
+        # 置位即提前开始下一次检查（保留策略修改后）
+        self._wake_event = threading.Event()
+        # 已裁剪的行数（用例观测用）
+        self.downsampled_rows = 0
+
+    def set_policy(self, raw_days: int, minute_days: int):
+        """
+        设置保留策略并尽快检查（启动时与设置页修改后调用）
+
+        Args:
+            raw_days: 原始采样保留天数，0 = 永久保留
+            minute_days: 1 分钟汇总保留天数，0 = 永久保留
+        """
+        self._policy = (raw_days, minute_days)
+        self._wake_event.set()
+
+    def stop(self):
+        """请求线程退出（当前一批完成后退出，不中断事务）"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def run(self):
+        """降采样主循环：检查一次 -> 等待检查间隔（或唤醒），启动后先立即检查一次"""
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            try:
+                self._downsample_pass()
+            except Exception:
+                # Database 方法已静默失败，这里只防御意外异常拖垮线程
+                logger.error("分级保留降采样失败", exc_info=True)
+            self._wake_event.wait(self.interval)
+
+    def _downsample_pass(self):
+        """按当前保留策略把全部待裁剪的任务逐个裁剪到完成（失败的任务留待下次检查）"""
+        raw_before_ms, minute_before_ms = retention_cutoffs(*self._policy)
+        for task_id in self.db.get_downsample_candidates(raw_before_ms, minute_before_ms):
+            while not self._stop_event.is_set():
+                if self.writer is not None and not self.writer.is_idle():
+                    self._stop_event.wait(self.pause)
+                    continue
+                deleted = self.db.downsample_task_batch(
+                    task_id, raw_before_ms, minute_before_ms, self.batch_rows)
+                if not deleted:
+                    break
+                self.downsampled_rows += deleted
+                self._stop_event.wait(self.pause)
+            if self._stop_event.is_set():
+                return
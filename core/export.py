@@ -36,6 +36,8 @@ def pivot_rows(task: MonitorTask, data_point_iter: Iterable[DataPoint]) -> Itera
 
     维护当前 timestamp 分组，读到新 timestamp 才 flush 上一组产出一行，
     迭代结束 flush 最后一组。要求入参按 timestamp 升序排列（同组行相邻）。
+    降频采集的指标（task.metric_periods）在未到期的行没有数据点，对应单元格为空串；
+    不在 task.metric_types 中的数据点不占列。
 
     Args:
         task: 监控任务（读取 process_name / pid / metric_types）
@@ -45,7 +47,6 @@ def pivot_rows(task: MonitorTask, data_point_iter: Iterable[DataPoint]) -> Itera
         list: [时间字符串, 进程名称, PID, <各指标值或空串>...]
     """
     metrics = task.metric_types
-    first_metric = metrics[0] if metrics else ''
 
     current_timestamp = None
     current_values = {}
@@ -62,15 +63,12 @@ def pivot_rows(task: MonitorTask, data_point_iter: Iterable[DataPoint]) -> Itera
         return row
 
     for dp in data_point_iter:
-        # metric_type 为 NULL/空串的旧数据兜底归入首指标
-        metric = dp.metric_type or first_metric
-
         if current_timestamp is not None and dp.timestamp != current_timestamp:
             yield _flush()
             current_values = {}
 
         current_timestamp = dp.timestamp
-        current_values[metric] = dp.value
+        current_values[dp.metric_type] = dp.value
 
     if current_timestamp is not None:
         yield _flush()
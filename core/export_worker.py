@@ -1,24 +1,35 @@
 """
 导出工作线程
-在后台 QThread 内用游标 fetchmany 分批读取数据点，配合 core/export.py 的
-pivot_rows 生成器流式写 CSV（同一时间戳跨批次由生成器天然处理），避免大数据量
-导出时一次性 fetchall 占用大量内存、也避免长时间同步写文件阻塞 GUI 主线程。
+在后台 QThread 内按时间分页读取数据点（键集分页：每页从上一页结束的时刻继续，每页一个
+短读事务），配合 core/export.py 的 pivot_rows 生成器流式写 CSV（同一时间戳跨批次由
+生成器天然处理），避免大数据量导出时一次性 fetchall 占用大量内存、也避免长时间同步
+写文件阻塞 GUI 主线程。
+
+不在整个导出期间开着一个游标：那是一个持续数分钟的读事务，一直钉住 WAL 快照，监控仍
+在写入时 checkpoint 无法回写、-wal 持续增长。
 """
 import csv
+import heapq
 import logging
 import os
 import sqlite3
-from datetime import datetime
+from operator import itemgetter
+from typing import Optional, Tuple
 
 from PyQt5.QtCore import QThread, pyqtSignal
 
 from core.export import build_csv_header, pivot_rows
+from data.database import (SAMPLE_CHUNK_SPAN_MS, from_epoch_ms, iter_chunk_ticks,
+                           iter_held_rows, partition_path)
 from data.models import MonitorTask, DataPoint
 
 logger = logging.getLogger(__name__)
 
-# 游标 fetchmany 每批读取行数：足够大摊薄往返开销，又不至于一次性把大数据量全部载入内存
+# 每页至多读取的 samples 行数（另补齐到最后一行所在窗口的末尾）：足够大摊薄往返开销，
+# 又不至于一次性把大数据量全部载入内存
 FETCH_BATCH_SIZE = 5000
+# 每页至多读取的压缩块窗口数（每个窗口解码出一个 SAMPLE_CHUNK_SPAN_MS 的全部周期）
+CHUNK_PAGE_WINDOWS = 2
 
 
 class ExportWorker(QThread):
@@ -35,9 +46,9 @@ class ExportWorker(QThread):
                  metric_type: str = None, parent=None):
         """
         Args:
-            db_path: 数据库文件路径，用于 run() 内自建专用连接（跨批次存活，
-                     database.py 现为每操作独立连接，这里游标 fetchmany 需要一个
-                     贯穿整个导出过程的连接，故不复用 Database._get_connection）
+            db_path: 数据库文件路径，用于 run() 内自建专用连接（跨页存活，
+                     各页的读事务与附加的分区库都在这一个连接上，且导出不依赖
+                     Database 实例，故不复用 Database._get_connection）
             task: 待导出的任务（提供表头与透视所需的 process_name/pid/metric_types）
             save_path: CSV 保存路径
             metric_type: 指标类型过滤（None 表示导出任务全部指标，与现有一次性
@@ -57,43 +68,130 @@ class ExportWorker(QThread):
 
     def _iter_data_points(self, conn: sqlite3.Connection):
         """
-        用游标 fetchmany 流式读取数据点（避免一次性 fetchall 占用大量内存）。
-        按 timestamp 升序读取，与 pivot_rows 生成器要求的"同组行相邻"一致。
-        取消标志在每行/每批之间检查，保证取消请求能及时生效。
+        按时间升序分页读取 samples 行与压缩块 sample_chunks 中逐窗口解码出的采集周期，
+        按时间合并后每个周期按任务指标顺序展开为各指标的数据点（未采集的 NULL 列跳过；
+        只记变化的 held 单元格按阶梯序列还原为前值，见 iter_held_rows）。分区任务先把其
+        分区库附加到本连接再读取。按时间升序产出，与 pivot_rows 生成器要求的"同组行相邻"
+        一致。取消标志在每页/每行之间检查，保证取消请求能及时生效。
+
+        每页一个短读事务（见 _read_page），页与页之间不持有快照；页的起止总在窗口边界
+        上，运行中的任务在导出期间继续写入、封块也不会使数据重复或遗漏。
         """
         cursor = conn.cursor()
 
-        where = 'task_id = ?'
-        params: list = [self.task.task_id]
-        if self.metric_type is not None:
-            first_metric = self.task.metric_types[0] if self.task.metric_types else None
-            if self.metric_type == first_metric:
-                where += ' AND (metric_type = ? OR metric_type IS NULL)'
-            else:
-                where += ' AND metric_type = ?'
-            params.append(self.metric_type)
-
-        cursor.execute(f'''
-            SELECT task_id, timestamp, value, metric_type FROM data_points
-            WHERE {where}
-            ORDER BY timestamp ASC
-        ''', params)
-
-        while True:
-            if self._cancelled:
+        schema = 'main'
+        cursor.execute('SELECT partitioned FROM tasks WHERE task_id = ?', (self.task.task_id,))
+        row = cursor.fetchone()
+        if row is not None and row['partitioned']:
+            path = partition_path(self.db_path, self.task.task_id)
+            if not os.path.exists(path):
                 return
-            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
-            if not rows:
-                return
-            for row in rows:
+            schema = 'part'
+            cursor.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+
+        # 指标类型 -> 列名 m<id>（只取 samples 中实际存在的列）
+        cursor.execute(f'PRAGMA {schema}.table_info(samples)')
+        existing = {row['name'] for row in cursor.fetchall()}
+        cursor.execute('SELECT id, name FROM metrics')
+        columns = {row['name']: f"m{row['id']}" for row in cursor.fetchall()}
+        wanted = self.task.metric_types if self.metric_type is None else [self.metric_type]
+        metrics = [(m, columns[m]) for m in wanted if columns.get(m) in existing]
+        if not metrics:
+            return
+
+        start_ms = None
+        while not self._cancelled:
+            conn.execute('BEGIN')
+            try:
+                ticks, start_ms = self._read_page(cursor, schema, metrics, start_ms)
+            finally:
+                # 只读事务，提交即结束，释放本页的快照
+                conn.commit()
+            for ts_ms, values in ticks:
                 if self._cancelled:
                     return
-                yield DataPoint(
-                    task_id=row['task_id'],
-                    timestamp=datetime.fromisoformat(row['timestamp']),
-                    value=row['value'],
-                    metric_type=row['metric_type'] or '',
-                )
+                timestamp = from_epoch_ms(ts_ms)
+                for metric, column in metrics:
+                    if values.get(column) is not None:
+                        yield DataPoint(
+                            task_id=self.task.task_id,
+                            timestamp=timestamp,
+                            value=values[column],
+                            metric_type=metric,
+                        )
+            if start_ms is None:
+                return
+
+    def _read_page(self, cursor: sqlite3.Cursor, schema: str, metrics: list,
+                   start_ms: Optional[int]) -> Tuple[list, Optional[int]]:
+        """
+        在同一个读事务内读取一页：从 start_ms（窗口起点）起至多 FETCH_BATCH_SIZE 行 samples
+        （补齐到最后一行所在窗口的末尾）与至多 CHUNK_PAGE_WINDOWS 个压缩块窗口，本页止于
+        两者中先到的窗口边界。封块与写入已封块的窗口都在一个事务内整窗口搬移，同一快照里
+        每个周期只在其中一处，所以两者合并后本页不重复不遗漏；止于窗口边界也保证了下一页
+        的 held 单元格能在页内还原。samples 的主键为 (task_key, ts_ms)，时间戳在任务内唯一，
+        键集只需时间戳
+
+        Args:
+            cursor: 游标（调用方已开启读事务）
+            schema: 任务采样数据所在的库
+            metrics: [(指标类型, 列名)]
+            start_ms: 本页起点（epoch 毫秒，含；窗口起点），None 表示任务最早的数据
+
+        Returns:
+            Tuple[list, Optional[int]]: (按时间升序的 [(epoch 毫秒, {列名: 值})],
+            下一页起点；已读到最后时为 None)
+        """
+        task_id = self.task.task_id
+        metric_ids = [int(column[1:]) for _, column in metrics]
+        select = f'''
+            SELECT ts_ms, held, {', '.join(column for _, column in metrics)}
+            FROM {schema}.samples
+            WHERE task_key = (SELECT id FROM tasks WHERE task_id = ?)
+        '''
+        if self.metric_type is not None:
+            select += f' AND ({metrics[0][1]} IS NOT NULL OR held >> {metric_ids[0]} & 1)'
+
+        lower, lower_params = ('', ()) if start_ms is None else (' AND ts_ms >= ?', (start_ms,))
+        cursor.execute(select + lower + ' ORDER BY ts_ms LIMIT ?',
+                       (task_id, *lower_params, FETCH_BATCH_SIZE))
+        rows = cursor.fetchall()
+        end_ms = None
+        if len(rows) == FETCH_BATCH_SIZE:
+            last_ms = rows[-1][0]
+            end_ms = last_ms - last_ms % SAMPLE_CHUNK_SPAN_MS + SAMPLE_CHUNK_SPAN_MS
+            cursor.execute(select + ' AND ts_ms > ? AND ts_ms < ? ORDER BY ts_ms',
+                           (task_id, last_ms, end_ms))
+            rows += cursor.fetchall()
+
+        bounds, params = '', [task_id, *metric_ids]
+        if start_ms is not None:
+            bounds += ' AND chunk_ms >= ?'
+            params.append(start_ms)
+        if end_ms is not None:
+            bounds += ' AND chunk_ms < ?'
+            params.append(end_ms)
+        cursor.execute(f'''
+            SELECT DISTINCT chunk_ms FROM {schema}.sample_chunks
+            WHERE task_key = (SELECT id FROM tasks WHERE task_id = ?)
+              AND metric_id IN ({', '.join('?' * len(metric_ids))}){bounds}
+            ORDER BY chunk_ms LIMIT ?
+        ''', (*params, CHUNK_PAGE_WINDOWS))
+        windows = [row[0] for row in cursor.fetchall()]
+        if len(windows) == CHUNK_PAGE_WINDOWS:
+            end_ms = windows[-1] + SAMPLE_CHUNK_SPAN_MS
+            rows = [row for row in rows if row[0] < end_ms]
+
+        sample_rows = (
+            (ts_ms, dict(zip((column for _, column in metrics), values)))
+            for ts_ms, values in iter_held_rows(rows, metric_ids)
+        )
+        chunk_ticks = [
+            (ts_ms, {f'm{metric_id}': value for metric_id, value in values.items()})
+            for ts_ms, values in iter_chunk_ticks(cursor, task_id, metric_ids, schema,
+                                                  start_ms, end_ms)
+        ]
+        return list(heapq.merge(chunk_ticks, sample_rows, key=itemgetter(0))), end_ms
 
     def run(self):
         conn = None
@@ -0,0 +1,218 @@
+"""
+数据库大小上限治理线程
+get_db_size_bytes 只能事后报告占用。本线程按设置的上限主动治理：定期用 dbstat 统计各任务
+占用（Database.get_task_space_usage），按全部运行中任务的采集速率预测 BUDGET_HORIZON_S 秒
+后的大小；预计超出上限时，在超出之前按时间从旧到新释放空间——先把原始采样降采样为汇总
+（与分级保留同一裁剪，Database.downsample_task_batch），再裁剪 1 分钟汇总，仍不够才删除最旧
+的已停止任务（交给后台删除线程）。运行中的任务只裁剪到当前窗口之前，不会被删除。
+
+裁剪与后台删除线程一样每批一个短事务、批间停顿，写入线程有待写数据时让出；释放的页
+由空闲页回收线程归还文件系统。
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QThread
+
+from core.deleter import TaskDeleter
+from core.reclaimer import SpaceReclaimer
+from core.writer import GroupCommitWriter
+from data.database import SAMPLE_CHUNK_SPAN_MS, Database
+import config
+
+logger = logging.getLogger(__name__)
+
+# 释放动作：(种类 'raw' | 'minute' | 'delete', 任务ID, 裁剪时刻（epoch 毫秒，删除时为 None）,
+# 预计释放的字节数)
+ReclaimAction = Tuple[str, str, Optional[int], int]
+
+
+def ingest_rate(usage: Dict[str, Dict[str, int]]) -> float:
+    """
+    全部运行中任务的预计写入速率：每个任务每周期的字节数除以采集周期后求和。每周期字节数
+    取该任务自身的占用 / 采集次数；刚开始、尚无数据或原始采样已裁剪过（占用不再对应全部
+    采集次数）的任务取其余未裁剪任务的均值
+
+    Args:
+        usage: Database.get_task_space_usage 的结果
+
+    Returns:
+        float: 字节 / 秒
+    """
+    per_tick = {task_id: item['total'] / item['sample_count']
+                for task_id, item in usage.items()
+                if item['sample_count'] and not item['trimmed']}
+    average = sum(per_tick.values()) / len(per_tick) if per_tick else 0.0
+    return sum(per_tick.get(task_id, average) / item['interval']
+               for task_id, item in usage.items()
+               if item['running'] and item['interval'] > 0)
+
+
+def plan_reclaim(usage: Dict[str, Dict[str, int]], excess: int) -> List[ReclaimAction]:
+    """
+    按时间从旧到新（任务首个数据点）规划释放动作，预计释放量累计达到 excess 为止：
+    先逐个任务裁剪原始采样，再逐个任务裁剪 1 分钟汇总，最后逐个删除已停止的任务。
+    已停止的任务裁剪到最后一个数据点之后；运行中的任务只裁剪到当前窗口之前（裁剪时刻
+    与 retention_cutoffs 一样对齐到整窗口），预计释放量按时间比例折算
+
+    Args:
+        usage: Database.get_task_space_usage 的结果
+        excess: 需要释放的字节数
+
+    Returns:
+        List[ReclaimAction]: 依次执行的释放动作（全部执行仍不够时即全部可做的动作）
+    """
+    tasks = sorted((item['first_ts_ms'], task_id) for task_id, item in usage.items()
+                   if item['sample_count'])
+    actions: List[ReclaimAction] = []
+    freed = 0
+    released: Dict[str, int] = {}
+    for kind in ('raw', 'minute', 'delete'):
+        for first_ms, task_id in tasks:
+            if freed >= excess:
+                return actions
+            item = usage[task_id]
+            if kind == 'delete':
+                if item['running']:
+                    continue
+                estimate, before_ms = item['total'] - released.get(task_id, 0), None
+            else:
+                last_ms = item['last_ts_ms']
+                before_ms = last_ms - last_ms % SAMPLE_CHUNK_SPAN_MS
+                if not item['running']:
+                    before_ms += SAMPLE_CHUNK_SPAN_MS
+                if before_ms <= first_ms or not item[kind]:
+                    continue
+                fraction = min(1.0, (before_ms - first_ms) / max(1, last_ms - first_ms))
+                estimate = int(item[kind] * fraction)
+            actions.append((kind, task_id, before_ms, estimate))
+            released[task_id] = released.get(task_id, 0) + estimate
+            freed += estimate
+    return actions
+
+
+class SizeBudgetGovernor(QThread):
+    """
+    数据库大小上限治理线程（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期与应用一致：主窗口启动完成后设置上限并启动，退出时 stop() 并 join。
+    每隔 BUDGET_CHECK_INTERVAL_MS 检查一次（上限为 0 即不限时只等待）；上限在设置页
+    修改后 set_budget() 立即唤醒检查。
+    """
+
+    def __init__(self, db: Database, writer: Optional[GroupCommitWriter] = None,
+                 deleter: Optional[TaskDeleter] = None,
+                 reclaimer: Optional[SpaceReclaimer] = None,
+                 interval_ms: Optional[float] = None, horizon_s: Optional[float] = None,
+                 batch_rows: Optional[int] = None, pause_ms: Optional[float] = None,
+                 parent=None):
+        """
+        Args:
+            db: 数据库实例（治理线程使用自己的持久连接）
+            writer: 组提交写入线程，有待写数据时让出；None 表示不避让
+            deleter: 后台删除线程，删除任务交给它；None 时在本线程内同步删除
+            reclaimer: 空闲页回收线程，释放后唤醒它尽快归还文件系统；None 表示不唤醒
+            interval_ms: 检查间隔（毫秒），默认取 config.BUDGET_CHECK_INTERVAL_MS
+            horizon_s: 预测的时间跨度（秒），默认取 config.BUDGET_HORIZON_S
+            batch_rows: 每批最多删除的行数，默认取 config.DELETE_BATCH_ROWS
+            pause_ms: 两批之间的停顿（毫秒），默认取 config.DELETE_PAUSE_MS
+        """
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self.deleter = deleter
+        self.reclaimer = reclaimer
+        self.interval = (config.BUDGET_CHECK_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.horizon = config.BUDGET_HORIZON_S if horizon_s is None else horizon_s
+        self.batch_rows = config.DELETE_BATCH_ROWS if batch_rows is None else batch_rows
+        self.pause = (config.DELETE_PAUSE_MS if pause_ms is None else pause_ms) / 1000
+        self._budget_bytes = config.DB_SIZE_BUDGET_MB * 1024 * 1024
+        # 置位即退出；等待检查间隔时也用它，stop() 能立即唤醒
+        self._stop_event = threading.Event()
+        # 置位即提前开始下一次检查（上限修改后）
+        self._wake_event = threading.Event()
+        # 最近一次检查的已用字节数与预测字节数（设置页显示；尚未检查时为 0）
+        self.used_bytes = 0
+        self.projected_bytes = 0
+
+    @property
+    def budget_bytes(self) -> int:
+        """当前上限（字节），0 表示不限"""
+        return self._budget_bytes
+
+    def set_budget(self, budget_mb: float):
+        """
+        设置大小上限并尽快检查（启动时与设置页修改后调用）
+
+        Args:
+            budget_mb: 上限（MB），0 表示不限
+        """
+        self._budget_bytes = int(budget_mb * 1024 * 1024)
+        self._wake_event.set()
+
+    def stop(self):
+        """请求线程退出（当前一批完成后退出，不中断事务）"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def run(self):
+        """治理主循环：检查一次 -> 等待检查间隔（或唤醒），启动后先立即检查一次"""
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            if self._budget_bytes > 0:
+                try:
+                    self.enforce()
+                except Exception:
+                    # Database 方法已静默失败，这里只防御意外异常拖垮线程
+                    logger.error("数据库大小上限治理失败", exc_info=True)
+            self._wake_event.wait(self.interval)
+
+    def enforce(self) -> int:
+        """
+        检查一次：预计超出上限时释放空间到上限的 BUDGET_TARGET_RATIO
+
+        Returns:
+            int: 预计释放的字节数（未超出时为 0）
+        """
+        budget = self._budget_bytes
+        usage = self.db.get_task_space_usage()
+        self.used_bytes = self.db.get_db_size_bytes() - self.db.get_space_stats()['free_bytes']
+        self.projected_bytes = self.used_bytes + int(ingest_rate(usage) * self.horizon)
+        if budget <= 0 or self.projected_bytes <= budget:
+            return 0
+
+        excess = self.projected_bytes - int(budget * config.BUDGET_TARGET_RATIO)
+        actions = plan_reclaim(usage, excess)
+        freed = sum(action[3] for action in actions)
+        logger.warning("数据库预计超出大小上限: 已用 %d 字节, 预测 %d 字节, 上限 %d 字节, "
+                       "计划释放 %d 字节（%d 个动作）",
+                       self.used_bytes, self.projected_bytes, budget, freed, len(actions))
+        if freed < excess:
+            logger.warning("可释放的空间不足以回到上限以内（运行中任务的当前窗口不释放）")
+        for action in actions:
+            if self._stop_event.is_set():
+                break
+            self._apply(action)
+        if self.reclaimer is not None:
+            self.reclaimer.wake()
+        return freed
+
+    def _apply(self, action: ReclaimAction):
+        """执行一个释放动作：裁剪在本线程内分批完成，删除交给后台删除线程"""
+        kind, task_id, before_ms, _estimate = action
+        if kind == 'delete':
+            if self.deleter is not None:
+                self.deleter.delete_tasks([task_id])
+            else:
+                self.db.delete_task(task_id)
+            return
+        raw_before_ms, minute_before_ms = (before_ms, None) if kind == 'raw' else (None, before_ms)
+        while not self._stop_event.is_set():
+            if self.writer is not None and not self.writer.is_idle():
+                self._stop_event.wait(self.pause)
+                continue
+            if not self.db.downsample_task_batch(task_id, raw_before_ms, minute_before_ms,
+                                                 self.batch_rows):
+                return
+            self._stop_event.wait(self.pause)
@@ -1,14 +1,23 @@
 """
 监控管理器
 管理所有监控任务的创建、启动、停止等操作
-采用单例模式，确保全局唯一
+采用单例模式，确保全局唯一；全部任务由同一个共享采样引擎（core/sampler.py）
+在单一线程内驱动
 """
 import logging
 from typing import Dict, List, Optional
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from core.checkpointer import WalCheckpointer
+from core.deleter import TaskDeleter
+from core.downsampler import RetentionDownsampler
+from core.governor import SizeBudgetGovernor
 from core.monitor_task import MonitorTask
+from core.reclaimer import SpaceReclaimer
+from core.sampler import SamplerEngine
+from core.writer import GroupCommitWriter
 from data.database import Database
+from data.journal import SampleJournal, journal_path_for
 from data.models import MonitorTask as TaskModel
 import config
 
@@ -56,11 +65,39 @@ class MonitorManager(QObject):
         # 数据库（生产路径应由 MainWindow 注入，回退仅为兼容兜底）
         self.db = db if db is not None else Database()
 
+        # 共享采样引擎：全部任务在同一线程内按截止时间调度
+        self._sampler = SamplerEngine()
+
+        # 组提交写入线程：全部任务的采样数据在延迟窗口内合并为一个事务落库
+        self._writer = GroupCommitWriter(self.db)
+
+        # 空闲页回收线程：写入线程空闲时分小步回收删除释放的空间（MainWindow 启动时启动）
+        self._reclaimer = SpaceReclaimer(self.db, self._writer)
+
+        # WAL 检查点线程：定期 PASSIVE checkpoint，-wal 超过上限时升级为 RESTART
+        # （MainWindow 启动时启动）
+        self._checkpointer = WalCheckpointer(self.db, self._writer)
+
+        # 后台删除线程：排队删除的任务按主键分批删除，写入线程有待写数据时让出
+        self._deleter = TaskDeleter(self.db, self._writer)
+
+        # 分级保留降采样线程：超期的原始采样与 1 分钟汇总分批裁剪为更粗的汇总
+        # （MainWindow 启动时设置保留策略并启动）
+        self._downsampler = RetentionDownsampler(self.db, self._writer)
+
+        # 数据库大小上限治理线程：预计超出上限时先降采样、再删除最旧的已停止任务
+        # （MainWindow 启动时设置上限并启动）
+        self._governor = SizeBudgetGovernor(self.db, self._writer, self._deleter, self._reclaimer)
+
+        # 采样追加日志：未落库的数据崩溃后可在下次启动回放（MainWindow 启动时调用
+        # db.replay_journal，须在任何任务启动前）
+        self._journal = SampleJournal(journal_path_for(self.db.db_path))
+
         # 标记已初始化
         self._initialized = True
 
     def create_task(self, pid: int, process_name: str, metric_types: List[str],
-                   interval: float = None) -> Optional[str]:
+                   interval: float = None, metric_periods: Dict[str, int] = None) -> Optional[str]:
         """
         创建新的监控任务
 
@@ -69,6 +106,7 @@ class MonitorManager(QObject):
             process_name: 进程名称
             metric_types: 监控指标类型列表
             interval: 采集间隔（可选）
+            metric_periods: 指标采集周期倍数 {指标类型: 每 N 个周期采一次}（可选）
 
         Returns:
             Optional[str]: 任务ID，创建失败返回None
@@ -84,7 +122,10 @@ class MonitorManager(QObject):
             process_name=process_name,
             metric_types=metric_types,
             interval=interval,
-            db=self.db
+            db=self.db,
+            metric_periods=metric_periods,
+            writer=self._writer,
+            journal=self._journal,
         )
 
         # 连接任务信号
@@ -112,7 +153,7 @@ class MonitorManager(QObject):
         """
         task = self._tasks.get(task_id)
         if task and not task.is_running():
-            task.start()
+            self._sampler.add_task(task)
             logger.info("任务启动请求: task_id=%s pid=%s", task_id, task.pid)
             self.task_started.emit(task_id)
             return True
@@ -130,10 +171,9 @@ class MonitorManager(QObject):
         """
         task = self._tasks.get(task_id)
         if task and task.is_running():
-            task.stop()
-            # wait() 在 P2-5 归位后会阻塞到 run() 内部完成 flush/写状态/emit 的完整收尾流程，
+            # 阻塞到引擎线程完成 flush/写状态/emit 的完整收尾流程，
             # 而不仅仅是等待 _running 标志被检测到，因此这里返回时数据已落库
-            task.wait()
+            self._sampler.stop_task(task)
             logger.info("任务停止请求已完成: task_id=%s", task_id)
             return True
         return False
@@ -152,8 +192,7 @@ class MonitorManager(QObject):
         if task:
             # 如果正在运行，先停止
             if task.is_running():
-                task.stop()
-                task.wait()
+                self._sampler.stop_task(task)
 
             # 从字典中移除
             del self._tasks[task_id]
@@ -176,7 +215,7 @@ class MonitorManager(QObject):
         """
         task = self._tasks.get(task_id)
         if task and task.is_running() and not task.is_paused():
-            task.pause()
+            self._sampler.pause_task(task)
             return True
         return False
 
@@ -192,7 +231,7 @@ class MonitorManager(QObject):
         """
         task = self._tasks.get(task_id)
         if task and task.is_running() and task.is_paused():
-            task.resume()
+            self._sampler.resume_task(task)
             return True
         return False
 
@@ -245,9 +284,87 @@ class MonitorManager(QObject):
         return len(self._tasks) < config.MAX_MONITOR_TASKS
 
     def stop_all_tasks(self):
-        """停止所有任务"""
+        """停止所有任务，并等待空闲的采样引擎线程与写入线程退出"""
         for task_id in list(self._tasks.keys()):
             self.stop_task(task_id)
+        # 兜底：进程自然消亡的任务 is_running() 已为 False，但收尾（flush/写状态/emit）
+        # 可能仍在引擎线程中进行，stop_task 按 is_running() 会跳过它们，这里逐个等待收尾完成
+        for task in list(self._tasks.values()):
+            self._sampler.stop_task(task)
+        self._sampler.wait_idle()
+        self._writer.wait_idle()
+
+    def get_sampler(self) -> SamplerEngine:
+        """
+        获取共享采样引擎（主窗口退出时兜底 join 用）
+
+        Returns:
+            SamplerEngine: 采样引擎
+        """
+        return self._sampler
+
+    def get_writer(self) -> GroupCommitWriter:
+        """
+        获取组提交写入线程（主窗口退出时兜底 join 用）
+
+        Returns:
+            GroupCommitWriter: 写入线程
+        """
+        return self._writer
+
+    def get_reclaimer(self) -> SpaceReclaimer:
+        """
+        获取空闲页回收线程（主窗口启动与退出时使用）
+
+        Returns:
+            SpaceReclaimer: 回收线程
+        """
+        return self._reclaimer
+
+    def get_checkpointer(self) -> WalCheckpointer:
+        """
+        获取 WAL 检查点线程（主窗口启动与退出、设置页显示诊断数据时使用）
+
+        Returns:
+            WalCheckpointer: 检查点线程
+        """
+        return self._checkpointer
+
+    def get_deleter(self) -> TaskDeleter:
+        """
+        获取后台删除线程（历史页/设置页删除任务、启动时继续删除与退出时使用）
+
+        Returns:
+            TaskDeleter: 删除线程
+        """
+        return self._deleter
+
+    def get_downsampler(self) -> RetentionDownsampler:
+        """
+        获取分级保留降采样线程（主窗口启动与退出、设置页修改保留策略时使用）
+
+        Returns:
+            RetentionDownsampler: 降采样线程
+        """
+        return self._downsampler
+
+    def get_governor(self) -> SizeBudgetGovernor:
+        """
+        获取数据库大小上限治理线程（主窗口启动与退出、设置页修改上限时使用）
+
+        Returns:
+            SizeBudgetGovernor: 治理线程
+        """
+        return self._governor
+
+    def get_journal(self) -> SampleJournal:
+        """
+        获取采样追加日志（启动回放与退出关闭用）
+
+        Returns:
+            SampleJournal: 采样日志
+        """
+        return self._journal
 
     def get_task_info(self, task_id: str) -> Optional[TaskModel]:
         """
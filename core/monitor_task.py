@@ -1,17 +1,23 @@
 """
 监控任务模块
-单个监控任务的实现，继承QThread在后台运行
+单个监控任务的实现。任务既可继承QThread独立运行（run()），也可由
+core/sampler.py 的共享采样引擎在单一线程内驱动（begin/sample_once/teardown）
 """
 import logging
+import math
+import threading
+import time
 import uuid
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from PyQt5.QtCore import QThread, pyqtSignal
 
-from core.process_collector import ProcessCollector
+from core.process_collector import create_collector
+from core.schedule import TickSchedule
 from data.models import MonitorTask as TaskModel, DataPoint
 from data.database import Database
-from utils.metrics import MetricType
+from data.journal import SampleJournal
+from utils.metrics import MetricType, is_metric_supported
 import config
 
 logger = logging.getLogger(__name__)
@@ -34,7 +40,9 @@ class MonitorTask(QThread):
     error_occurred = pyqtSignal(str, str)   # 错误信号 (task_id, error_message)
 
     def __init__(self, pid: int, process_name: str, metric_types: List[str],
-                 interval: float = None, task_id: str = None, db: Database = None):
+                 interval: float = None, task_id: str = None, db: Database = None,
+                 metric_periods: Dict[str, int] = None, writer=None,
+                 journal: SampleJournal = None):
         """
         初始化监控任务
 
@@ -45,6 +53,12 @@ class MonitorTask(QThread):
             interval: 采集间隔（秒），默认使用配置文件中的值
             task_id: 任务ID，默认自动生成
             db: 数据库实例（可选，默认回退新建 Database()；生产路径由 MonitorManager 注入）
+            metric_periods: 指标采集周期倍数 {指标类型: 每 N 个周期采一次}（可选），
+                未列出的指标每周期采集；采集开销大的指标（如 USS）可降频以减少对被监控进程的干扰
+            writer: 组提交写入线程（可选，core/writer.py）；注入后 flush 交由写入线程与其他
+                任务合并提交，未注入时每次 flush 直接写库
+            journal: 采样追加日志（可选，data/journal.py）；注入后数据进入缓冲前先追加到日志，
+                落库确认后抵消，崩溃时未落库的数据在下次启动回放
         """
         super().__init__()
 
@@ -52,18 +66,32 @@ class MonitorTask(QThread):
         self.task_id = task_id or str(uuid.uuid4())
         self.pid = pid
         self.process_name = process_name
-        self.metric_types = list(metric_types)
+        # 本平台不支持的指标不进入任务（不采集、不在任务记录中留下无数据的指标）
+        self.metric_types = [m for m in metric_types if is_metric_supported(m)]
+        self.metric_periods = {
+            m: int(n) for m, n in (metric_periods or {}).items()
+            if m in self.metric_types and int(n) > 1
+        }
+        # 各降频指标下一次到期的周期序号（时间表重新锚定时清空，即恢复后全部指标立即采一次）
+        self._next_due: Dict[str, int] = {}
         self.interval = interval or config.DEFAULT_INTERVAL
 
         # 任务状态
         self._running = False
         self._paused = False
+        self._stop_reason = "用户停止"
+        self._rebase = False  # 暂停后恢复时，下一次采集前以当前时刻重新锚定时间表
+
+        # 绝对截止时间采样时间表（begin() 时以任务真正开始的时刻为锚点）
+        self.schedule = TickSchedule(self.interval)
 
         # 数据采集器
-        self.collector = ProcessCollector(pid)
+        self.collector = create_collector(pid)
 
         # 数据缓存（批量保存；SAVE_BATCH_SIZE 固化为1时语义为每周期一批）
         self._data_buffer: List[DataPoint] = []
+        # 缓冲锁：注入写入线程时，采集线程追加、写入线程确认/截断同一缓冲
+        self._buffer_lock = threading.Lock()
 
         # flush 失败重试状态
         self._flush_fail_count = 0   # 连续 flush 失败次数，成功后归零
@@ -71,6 +99,8 @@ class MonitorTask(QThread):
 
         # 数据库（生产路径应由 MonitorManager 注入，回退仅为兼容兜底）
         self.db = db if db is not None else Database()
+        self.writer = writer
+        self.journal = journal
 
         # 任务模型
         self.task_model = TaskModel(
@@ -82,6 +112,7 @@ class MonitorTask(QThread):
             start_time=None,  # 启动时设置
             end_time=None,
             status='pending',
+            metric_periods=dict(self.metric_periods),
         )
 
     def start(self, priority=QThread.InheritPriority):
@@ -89,11 +120,54 @@ class MonitorTask(QThread):
         启动线程（重写 QThread.start）：先置运行标志再调用 super().start()，
         避免线程尚未真正执行到 run() 内部置位语句前 stop() 被提前调用导致状态错乱。
         """
-        self._running = True
+        self.mark_running()
         super().start(priority)
 
+    def mark_running(self):
+        """
+        置运行标志。独立线程模式由 start() 调用；由共享采样引擎（core/sampler.py）
+        驱动时任务自身的 QThread 不启动，由引擎在接管任务时调用，语义相同。
+        """
+        self._running = True
+
     def run(self):
-        """线程运行函数（重写QThread.run）"""
+        """线程运行函数（重写QThread.run）：独立线程模式下的采集主循环"""
+        if not self.begin():
+            return
+
+        # 主循环：定时采集数据
+        while self._running:
+            # 如果暂停，等待
+            if self._paused:
+                self.msleep(100)
+                continue
+
+            if not self.sample_once():
+                break
+
+            # 等待到下一个周期的绝对截止时间，拆分为<=100ms短间隔以便快速响应停止
+            deadline = self.advance_schedule()
+            while self._running:
+                remaining_ms = math.ceil((deadline - time.monotonic()) * 1000)
+                if remaining_ms <= 0:
+                    break
+                self.msleep(min(remaining_ms, 100))
+
+        # 主循环退出后统一收尾（无论因用户停止还是进程消亡，只走这一条路径，且始终在
+        # 工作线程内执行，修复"task_stopped 先于落库完成"与"GUI线程跨线程写库"两个隐患）
+        self.teardown(self._stop_reason)
+
+    def begin(self) -> bool:
+        """
+        任务开始前的准备：写 running 状态、检查进程是否存在、预热CPU采集。
+        由采集线程（独立线程模式的 run() 或共享采样引擎）在首次采集前调用一次。
+
+        Returns:
+            bool: 是否可以开始采集；进程不存在时已发出错误并完成收尾，返回 False
+        """
+        if self.writer is not None:
+            self.writer.attach(self)
+
         # 更新任务状态
         self.task_model.start_time = datetime.now()
         self.task_model.status = 'running'
@@ -106,65 +180,114 @@ class MonitorTask(QThread):
             error_msg = f"进程 {self.process_name} (PID: {self.pid}) 不存在或无法访问"
             self.error_occurred.emit(self.task_id, error_msg)
             self._running = False
-            self._teardown("进程不存在")
-            return
+            self.teardown("进程不存在")
+            return False
 
         # 含CPU使用率指标时先预热，丢弃cpu_percent首次返回的无效0值
         if MetricType.CPU_PERCENT in self.metric_types:
             self.collector.prime_cpu()
 
-        stop_reason = "用户停止"
+        self._restart_schedule()
+        return True
 
-        # 主循环：定时采集数据
-        while self._running:
-            # 如果暂停，等待
-            if self._paused:
-                self.msleep(100)
-                continue
+    def _restart_schedule(self):
+        """以当前时刻重新锚定时间表，降频指标的到期周期随之重置"""
+        self.schedule.restart()
+        self._next_due.clear()
 
-            # 采集数据
-            try:
-                values = self.collector.collect_metrics(self.metric_types)
-
-                if values is not None:
-                    # 同一采集周期的多个指标共用同一时间戳
-                    timestamp = datetime.now()
-                    for metric_type, value in values.items():
-                        self._data_buffer.append(DataPoint(
-                            task_id=self.task_id,
-                            timestamp=timestamp,
-                            value=value,
-                            metric_type=metric_type,
-                        ))
-
-                    # 发送更新信号（新建dict，避免emit后被修改）
-                    self.data_updated.emit(self.task_id, dict(values))
-
-                    # 批量保存（SAVE_BATCH_SIZE=1时语义为每周期一批）
-                    if len(self._data_buffer) >= config.SAVE_BATCH_SIZE:
-                        self._flush_buffer()
-
-                else:
-                    # 进程已终止
-                    stop_reason = "进程已终止"
-                    self._running = False
-                    break
+    def due_metrics(self) -> List[str]:
+        """
+        当前周期到期需要采集的指标（按 metric_types 顺序）。降频指标在周期序号为
+        其倍数的整数倍时到期；落后跳过周期导致错过整数倍时，在之后第一个周期补采一次
+
+        Returns:
+            List[str]: 到期指标列表；未配置降频时即全部指标
+        """
+        if not self.metric_periods:
+            return self.metric_types
+        tick = self.schedule.tick
+        due = []
+        for metric_type in self.metric_types:
+            period = self.metric_periods.get(metric_type)
+            if period is None:
+                due.append(metric_type)
+            elif self._next_due.get(metric_type, 0) <= tick:
+                due.append(metric_type)
+                self._next_due[metric_type] = (tick // period + 1) * period
+        return due
+
+    def sample_once(self) -> bool:
+        """
+        执行一次采集：采集全部指标、写入缓冲、发出 data_updated、按批落库。
 
-            except Exception as e:
-                error_msg = f"采集数据时发生错误: {str(e)}"
-                logger.error(error_msg, exc_info=True)
-                self.error_occurred.emit(self.task_id, error_msg)
+        Returns:
+            bool: 进程仍存在返回 True；进程已终止返回 False（已置停止原因与运行标志，
+                  调用方随后应调用 teardown(stop_reason) 收尾）
+        """
+        if self._rebase:
+            self._rebase = False
+            self._restart_schedule()
+
+        due = self.due_metrics()
+        if not due:
+            # 本周期没有到期指标（全部指标都已降频），不触碰被监控进程
+            return True
+
+        try:
+            # 只采集本周期到期的指标：采集计划按指标组合缓存，降频指标不到期时
+            # 其访问器（如 memory_full_info）本周期根本不会被调用
+            values = self.collector.collect_metrics(due)
+
+            if values is not None:
+                # 同一采集周期的多个指标共用同一时间戳：取本周期的计划采样时刻
+                # （锚点 + 周期序号 * interval），采集耗时不会让时间戳逐渐漂移
+                timestamp = self.schedule.timestamp()
+                points = [DataPoint(task_id=self.task_id, timestamp=timestamp,
+                                    value=value, metric_type=metric_type)
+                          for metric_type, value in values.items()]
+                # 先写日志再进缓冲：落库确认抵消的记录必然已在日志中
+                if self.journal is not None:
+                    self.journal.append(points)
+                with self._buffer_lock:
+                    self._data_buffer.extend(points)
+
+                # 发送更新信号（新建dict，避免emit后被修改）
+                self.data_updated.emit(self.task_id, dict(values))
+
+                # 批量保存（SAVE_BATCH_SIZE=1时语义为每周期一批）
+                if len(self._data_buffer) >= config.SAVE_BATCH_SIZE:
+                    self._flush_buffer()
+
+            else:
+                # 进程已终止
+                self._stop_reason = "进程已终止"
+                self._running = False
+                return False
+
+        except Exception as e:
+            error_msg = f"采集数据时发生错误: {str(e)}"
+            logger.error(error_msg, exc_info=True)
+            self.error_occurred.emit(self.task_id, error_msg)
 
-            # 等待下一个采集周期，拆分为短间隔以便快速响应停止
-            remaining = int(self.interval * 1000)
-            while remaining > 0 and self._running:
-                sleep_time = min(remaining, 100)
-                self.msleep(sleep_time)
-                remaining -= sleep_time
+        return True
 
-        # 主循环退出后统一收尾（无论因用户停止还是进程消亡，只走这一条路径，且始终在
-        # 工作线程内执行，修复"task_stopped 先于落库完成"与"GUI线程跨线程写库"两个隐患）
-        self._teardown(stop_reason)
+    def advance_schedule(self) -> float:
+        """
+        本周期采集完成后推进时间表，落后一个完整周期以上时跳过错过的周期并记日志
+
+        Returns:
+            float: 下一次采集的截止时间（time.monotonic() 口径）
+        """
+        skipped = self.schedule.advance()
+        if skipped:
+            logger.info("task_id=%s 采集落后，跳过 %d 个周期（累计跳过 %d 个）",
+                        self.task_id, skipped, self.schedule.skipped_ticks)
+        return self.schedule.deadline
+
+    @property
+    def stop_reason(self) -> str:
+        """当前停止原因（默认"用户停止"，进程消亡时由 sample_once 改写）"""
+        return self._stop_reason
 
     def stop(self):
         """
@@ -175,8 +298,9 @@ class MonitorTask(QThread):
         self._running = False
 
     def pause(self):
-        """暂停监控"""
+        """暂停监控（恢复后以恢复时刻重新锚定时间表，暂停期间不计为跳过的周期）"""
         self._paused = True
+        self._rebase = True
 
     def resume(self):
         """恢复监控"""
@@ -195,16 +319,17 @@ class MonitorTask(QThread):
         """获取任务信息"""
         return self.task_model
 
-    def _teardown(self, reason: str):
+    def teardown(self, reason: str):
         """
-        收尾（在 run() 主循环退出后于工作线程内调用且仅调用一次）：
-        最后一次 flush -> 写 stopped 状态 -> emit task_stopped
+        收尾（采集主循环退出后于采集线程内调用且仅调用一次——独立线程模式为 run()，
+        共享采样引擎模式为引擎线程）：最后一次 flush -> 写 stopped 状态 -> emit task_stopped
 
         Args:
             reason: 停止原因
         """
         # 收尾 flush 没有下一轮重试机会，失败也要继续走完收尾流程
         self._flush_buffer(is_teardown=True)
+        self.collector.close()
 
         self.task_model.end_time = datetime.now()
         self.task_model.status = 'stopped'
@@ -218,23 +343,62 @@ class MonitorTask(QThread):
         """
         将缓冲区数据保存到数据库。
 
-        失败时保留缓冲，交给下一采集周期（或下一次显式调用）重试，不丢数据；
-        缓冲超过 MAX_BUFFER_SIZE 时丢弃最旧的数据并记日志；连续失败达到阈值
-        经 error_occurred 通知 UI 一次（_notified 锁存，成功后复位）。
+        注入了写入线程时只登记待写，由写入线程在延迟窗口内与其他任务合并为一个事务
+        提交（收尾阶段则阻塞到提交完成）；否则直接写库。两种方式的提交结果都经
+        apply_flush_result 按同一语义处理。
 
         Args:
             is_teardown: 是否为收尾阶段的最后一次 flush（无重试机会，失败需明确记日志）
         """
-        if not self._data_buffer:
+        if self.writer is not None and self.writer.is_attached(self):
+            if is_teardown:
+                self.writer.flush_final(self)
+            elif self._data_buffer:
+                self.writer.submit(self)
             return
 
-        success = self.db.save_data_points(self._data_buffer)
+        points = self.pending_points()
+        if points:
+            success = self.db.save_data_points(points)
+            self.apply_flush_result(len(points), success, is_teardown)
+
+    def pending_points(self) -> List[DataPoint]:
+        """缓冲区当前全部待写数据的快照（最旧在前）"""
+        with self._buffer_lock:
+            return list(self._data_buffer)
+
+    def apply_flush_result(self, count: int, success: bool, is_teardown: bool = False):
+        """
+        处理一次写库结果（count 为提交时取出的缓冲前 count 条）。
+
+        成功时从缓冲中移除这 count 条；失败时保留缓冲，交给下一采集周期（或下一次
+        显式调用）重试，不丢数据；缓冲超过 MAX_BUFFER_SIZE 时丢弃最旧的数据并记日志；
+        连续失败达到阈值经 error_occurred 通知 UI 一次（_notified 锁存，成功后复位）。
+
+        Args:
+            count: 本次提交的条数
+            success: 是否提交成功
+            is_teardown: 是否为收尾阶段的最后一次 flush
+        """
+        if not count:
+            return
+
+        dropped = 0
+        with self._buffer_lock:
+            if success:
+                del self._data_buffer[:count]
+            elif len(self._data_buffer) > MAX_BUFFER_SIZE:
+                dropped = len(self._data_buffer) - MAX_BUFFER_SIZE
+                del self._data_buffer[:dropped]
+            remaining = len(self._data_buffer)
+
+        # 已落库或已按上限丢弃的数据不再需要日志保护
+        if self.journal is not None:
+            self.journal.resolve(self.task_id, count if success else dropped)
 
         if success:
             if self._flush_fail_count:
-                logger.info("task_id=%s flush 重试成功，落库 %d 条",
-                            self.task_id, len(self._data_buffer))
-            self._data_buffer.clear()
+                logger.info("task_id=%s flush 重试成功，落库 %d 条", self.task_id, count)
             self._flush_fail_count = 0
             self._notified = False
             return
@@ -242,11 +406,9 @@ class MonitorTask(QThread):
         # 失败：缓冲保留，等待下一轮重试
         self._flush_fail_count += 1
         logger.error("task_id=%s flush 失败（连续第%d次），缓冲保留待重试，当前缓冲 %d 条",
-                      self.task_id, self._flush_fail_count, len(self._data_buffer))
+                      self.task_id, self._flush_fail_count, remaining + dropped)
 
-        if len(self._data_buffer) > MAX_BUFFER_SIZE:
-            dropped = len(self._data_buffer) - MAX_BUFFER_SIZE
-            del self._data_buffer[:dropped]
+        if dropped:
             logger.error("task_id=%s flush 缓冲超过上限 %d 条，丢弃最旧 %d 条数据",
                          self.task_id, MAX_BUFFER_SIZE, dropped)
 
@@ -262,7 +424,7 @@ class MonitorTask(QThread):
         if is_teardown:
             # 收尾阶段失败没有下一轮重试机会，明确记录未落库条数
             logger.error("task_id=%s 任务收尾 flush 失败，%d 条数据未落库",
-                         self.task_id, len(self._data_buffer))
+                         self.task_id, remaining)
 
 
 # 单元测试
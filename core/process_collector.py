@@ -2,9 +2,95 @@
 进程信息采集器
 负责从系统中采集进程的各项性能指标
 """
+import logging
 import psutil
-from typing import Optional, Dict, List, Tuple
-from utils.metrics import MetricType
+from typing import Callable, Optional, Dict, List, Tuple
+from utils.metrics import MetricType, is_metric_supported, mark_unsupported
+import config
+
+logger = logging.getLogger(__name__)
+
+
+# psutil访问器表：名称 -> 以Process为参数的调用函数
+# 句柄数仅Windows提供num_handles，其他系统以文件描述符数量代替（编译期一次性决定）
+_ACCESSORS: Dict[str, Callable] = {
+    'memory_info': lambda p: p.memory_info(),
+    'memory_full_info': lambda p: p.memory_full_info(),
+    'memory_percent': lambda p: p.memory_percent(),
+    # interval=None非阻塞，基于上次调用以来的增量计算；首次调用返回0，需先调用prime_cpu()预热
+    'cpu_percent': lambda p: p.cpu_percent(interval=None),
+    'cpu_times': lambda p: p.cpu_times(),
+    'nice': lambda p: p.nice(),
+    'num_threads': lambda p: p.num_threads(),
+    'num_handles': (lambda p: p.num_handles()) if hasattr(psutil.Process, 'num_handles')
+                   else (lambda p: p.num_fds()),
+    'num_ctx_switches': lambda p: p.num_ctx_switches(),
+    'io_counters': lambda p: p.io_counters(),
+}
+
+# 指标来源表：指标 -> (访问器名, 从访问器结果中取值的函数)
+# 内存/IO字节类统一转换为KB，计数类统一转换为float
+_METRIC_SOURCES: Dict[str, Tuple[str, Callable]] = {
+    MetricType.MEMORY_RSS: ('memory_info', lambda r: r.rss / 1024),
+    MetricType.MEMORY_VMS: ('memory_info', lambda r: r.vms / 1024),
+    MetricType.MEMORY_PERCENT: ('memory_percent', lambda r: r),
+    MetricType.CPU_PERCENT: ('cpu_percent', lambda r: r),
+    MetricType.NUM_THREADS: ('num_threads', float),
+    MetricType.NUM_HANDLES: ('num_handles', float),
+    MetricType.IO_READ_BYTES: ('io_counters', lambda r: r.read_bytes / 1024),
+    MetricType.IO_WRITE_BYTES: ('io_counters', lambda r: r.write_bytes / 1024),
+    MetricType.IO_READ_COUNT: ('io_counters', lambda r: float(r.read_count)),
+    MetricType.IO_WRITE_COUNT: ('io_counters', lambda r: float(r.write_count)),
+    MetricType.IO_OTHER_COUNT: ('io_counters', lambda r: float(r.other_count)),
+    MetricType.IO_OTHER_BYTES: ('io_counters', lambda r: r.other_bytes / 1024),
+    # ========== 扩展内存指标 ==========
+    MetricType.MEMORY_PEAK_WSET: ('memory_info', lambda r: r.peak_wset / 1024),
+    MetricType.MEMORY_PRIVATE: ('memory_info', lambda r: r.private / 1024),
+    MetricType.MEMORY_PAGEFILE: ('memory_info', lambda r: r.pagefile / 1024),
+    MetricType.MEMORY_PEAK_PAGEFILE: ('memory_info', lambda r: r.peak_pagefile / 1024),
+    MetricType.MEMORY_PAGED_POOL: ('memory_info', lambda r: r.paged_pool / 1024),
+    MetricType.MEMORY_PEAK_PAGED_POOL: ('memory_info', lambda r: r.peak_paged_pool / 1024),
+    MetricType.MEMORY_NONPAGED_POOL: ('memory_info', lambda r: r.nonpaged_pool / 1024),
+    MetricType.MEMORY_PEAK_NONPAGED_POOL: ('memory_info', lambda r: r.peak_nonpaged_pool / 1024),
+    MetricType.MEMORY_NUM_PAGE_FAULTS: ('memory_info', lambda r: float(r.num_page_faults)),
+    MetricType.MEMORY_USS: ('memory_full_info', lambda r: r.uss / 1024),
+    MetricType.MEMORY_SHARED: ('memory_info', lambda r: r.shared / 1024),
+    MetricType.MEMORY_TEXT: ('memory_info', lambda r: r.text / 1024),
+    MetricType.MEMORY_DATA: ('memory_info', lambda r: r.data / 1024),
+    MetricType.MEMORY_SWAP: ('memory_full_info', lambda r: r.swap / 1024),
+    MetricType.MEMORY_PSS: ('memory_full_info', lambda r: r.pss / 1024),
+    # ========== CPU扩展指标 ==========
+    MetricType.CPU_USER_TIME: ('cpu_times', lambda r: r.user),
+    MetricType.CPU_SYSTEM_TIME: ('cpu_times', lambda r: r.system),
+    MetricType.CPU_PRIORITY: ('nice', float),
+    # ========== 上下文切换 ==========
+    MetricType.NUM_CTX_SWITCHES_VOL: ('num_ctx_switches', lambda r: float(r.voluntary)),
+    MetricType.NUM_CTX_SWITCHES_INVOL: ('num_ctx_switches', lambda r: float(r.involuntary)),
+}
+
+
+def compile_plan(metric_types: List[str]) -> List[Tuple[str, List[Tuple[str, Callable]]]]:
+    """
+    把指标列表编译为采集计划：按psutil访问器分组，每组列出需要取值的指标
+
+    旧实现每个指标各走一次if/elif分派并各自调用访问器（27指标任务每周期
+    memory_info()最多调用11次、io_counters()最多6次）；编译后每个访问器每周期
+    只调用一次。分组顺序按各访问器在指标列表中首次出现的顺序，未知指标剔除。
+
+    Args:
+        metric_types: 指标类型列表（来自MetricType）
+
+    Returns:
+        List[Tuple[str, List[Tuple[str, Callable]]]]: [(访问器名, [(指标类型, 取值函数), ...]), ...]
+    """
+    groups: Dict[str, List[Tuple[str, Callable]]] = {}
+    for metric_type in metric_types:
+        source = _METRIC_SOURCES.get(metric_type)
+        if source is None:
+            continue
+        accessor, extract = source
+        groups.setdefault(accessor, []).append((metric_type, extract))
+    return list(groups.items())
 
 
 class ProcessCollector:
@@ -20,6 +106,10 @@ class ProcessCollector:
         self.pid = pid
         self._process: Optional[psutil.Process] = None
         self._last_io_counters = None  # 用于计算IO增量
+        # 采集计划缓存 {指标元组: 计划}，见 compile_plan
+        self._plans: Dict[Tuple[str, ...], list] = {}
+        # 能力探测发现的本平台不支持的指标（从计划中剔除，不再采集、不写0）
+        self.unsupported_metrics = set()
 
     def is_process_running(self) -> bool:
         """
@@ -49,6 +139,40 @@ class ProcessCollector:
         except (psutil.NoSuchProcess, psutil.AccessDenied):
             return None
 
+    def _get_plan(self, metric_types: List[str]) -> List[Tuple[str, List[Tuple[str, Callable]]]]:
+        """
+        取指标列表对应的采集计划（按指标列表缓存，任务的指标列表固定，故每任务只编译一次）
+
+        Args:
+            metric_types: 指标类型列表（来自MetricType）
+
+        Returns:
+            List: 采集计划，见 compile_plan
+        """
+        key = tuple(metric_types)
+        plan = self._plans.get(key)
+        if plan is None:
+            supported = []
+            for metric_type in metric_types:
+                if metric_type not in self.unsupported_metrics and is_metric_supported(metric_type):
+                    supported.append(metric_type)
+                else:
+                    self.unsupported_metrics.add(metric_type)
+            plan = compile_plan(supported)
+            self._plans[key] = plan
+        return plan
+
+    def _drop_unsupported(self, metric_types: List[str]):
+        """
+        能力探测：首个周期实际调用访问器时发现字段/访问器在本平台不存在，
+        登记为不支持并清空计划缓存，下个周期起重新编译的计划不再包含这些指标
+        （平台支持表已排除的指标不会走到这里，这里兜底 psutil 版本差异等情况）
+        """
+        self.unsupported_metrics.update(metric_types)
+        self._plans.clear()
+        mark_unsupported(metric_types)
+        logger.info("PID %s 平台不支持以下指标，已停止采集: %s", self.pid, ", ".join(metric_types))
+
     def _collect_one(self, metric_type: str) -> Optional[float]:
         """
         采集单个性能指标（内部方法，不捕获psutil异常，由调用方统一处理）
@@ -62,132 +186,12 @@ class ProcessCollector:
         if self._process is None:
             self._process = psutil.Process(self.pid)
 
-        # 根据不同类型采集数据
-        if metric_type == MetricType.MEMORY_RSS:
-            # 工作集内存（RSS），转换为KB
-            return self._process.memory_info().rss / 1024
-
-        elif metric_type == MetricType.MEMORY_VMS:
-            # 虚拟内存大小，转换为KB
-            return self._process.memory_info().vms / 1024
-
-        elif metric_type == MetricType.MEMORY_PERCENT:
-            # 内存使用百分比
-            return self._process.memory_percent()
-
-        elif metric_type == MetricType.CPU_PERCENT:
-            # CPU使用率（interval=None非阻塞，基于上次调用以来的增量计算）
-            # 首次调用返回0，需先调用prime_cpu()预热
-            return self._process.cpu_percent(interval=None)
-
-        elif metric_type == MetricType.NUM_THREADS:
-            # 线程数
-            return float(self._process.num_threads())
-
-        elif metric_type == MetricType.NUM_HANDLES:
-            # 句柄数（仅Windows）
-            try:
-                return float(self._process.num_handles())
-            except AttributeError:
-                # 非Windows系统返回文件描述符数量
-                return float(self._process.num_fds())
-
-        elif metric_type == MetricType.IO_READ_BYTES:
-            # IO读取字节数，转换为KB
-            io_counters = self._process.io_counters()
-            return io_counters.read_bytes / 1024
-
-        elif metric_type == MetricType.IO_WRITE_BYTES:
-            # IO写入字节数，转换为KB
-            io_counters = self._process.io_counters()
-            return io_counters.write_bytes / 1024
-
-        elif metric_type == MetricType.IO_READ_COUNT:
-            # IO读取次数
-            io_counters = self._process.io_counters()
-            return float(io_counters.read_count)
-
-        elif metric_type == MetricType.IO_WRITE_COUNT:
-            # IO写入次数
-            io_counters = self._process.io_counters()
-            return float(io_counters.write_count)
-
-        elif metric_type == MetricType.IO_OTHER_COUNT:
-            # IO其他次数
-            io_counters = self._process.io_counters()
-            return float(io_counters.other_count)
-
-        elif metric_type == MetricType.IO_OTHER_BYTES:
-            # IO其他字节数，转换为KB
-            io_counters = self._process.io_counters()
-            return io_counters.other_bytes / 1024
-
-        # ========== 扩展内存指标 ==========
-        elif metric_type == MetricType.MEMORY_PEAK_WSET:
-            # 工作集峰值，转换为KB
-            return self._process.memory_info().peak_wset / 1024
-
-        elif metric_type == MetricType.MEMORY_PRIVATE:
-            # 专用工作集，转换为KB
-            return self._process.memory_info().private / 1024
-
-        elif metric_type == MetricType.MEMORY_PAGEFILE:
-            # 提交大小，转换为KB
-            return self._process.memory_info().pagefile / 1024
-
-        elif metric_type == MetricType.MEMORY_PEAK_PAGEFILE:
-            # 提交大小峰值，转换为KB
-            return self._process.memory_info().peak_pagefile / 1024
-
-        elif metric_type == MetricType.MEMORY_PAGED_POOL:
-            # 分页池，转换为KB
-            return self._process.memory_info().paged_pool / 1024
-
-        elif metric_type == MetricType.MEMORY_PEAK_PAGED_POOL:
-            # 分页池峰值，转换为KB
-            return self._process.memory_info().peak_paged_pool / 1024
-
-        elif metric_type == MetricType.MEMORY_NONPAGED_POOL:
-            # 非分页池，转换为KB
-            return self._process.memory_info().nonpaged_pool / 1024
-
-        elif metric_type == MetricType.MEMORY_PEAK_NONPAGED_POOL:
-            # 非分页池峰值，转换为KB
-            return self._process.memory_info().peak_nonpaged_pool / 1024
-
-        elif metric_type == MetricType.MEMORY_NUM_PAGE_FAULTS:
-            # 页面错误次数
-            return float(self._process.memory_info().num_page_faults)
-
-        elif metric_type == MetricType.MEMORY_USS:
-            # 唯一集大小，转换为KB
-            return self._process.memory_full_info().uss / 1024
-
-        # ========== CPU扩展指标 ==========
-        elif metric_type == MetricType.CPU_USER_TIME:
-            # CPU用户时间（秒）
-            return self._process.cpu_times().user
-
-        elif metric_type == MetricType.CPU_SYSTEM_TIME:
-            # CPU系统时间（秒）
-            return self._process.cpu_times().system
-
-        elif metric_type == MetricType.CPU_PRIORITY:
-            # 进程优先级
-            return float(self._process.nice())
-
-        # ========== 上下文切换 ==========
-        elif metric_type == MetricType.NUM_CTX_SWITCHES_VOL:
-            # 自愿上下文切换
-            return float(self._process.num_ctx_switches().voluntary)
-
-        elif metric_type == MetricType.NUM_CTX_SWITCHES_INVOL:
-            # 非自愿上下文切换
-            return float(self._process.num_ctx_switches().involuntary)
-
-        else:
+        source = _METRIC_SOURCES.get(metric_type)
+        if source is None:
             # 未知指标类型
             return None
+        accessor, extract = source
+        return extract(_ACCESSORS[accessor](self._process))
 
     def prime_cpu(self):
         """
@@ -207,6 +211,11 @@ class ProcessCollector:
         """
         批量采集多个性能指标（同一周期共用oneshot缓存）
 
+        指标列表首次采集时编译为采集计划并缓存：同一psutil访问器（如memory_info、
+        io_counters）每周期只调用一次，再从返回结果中取出全部所需字段；未知指标
+        与本平台不支持的指标（见 utils.metrics.METRIC_PLATFORMS 与首周期能力探测）
+        被剔除，不写入结果
+
         Args:
             metric_types: 指标类型列表（来自MetricType）
 
@@ -218,33 +227,57 @@ class ProcessCollector:
             if self._process is None:
                 self._process = psutil.Process(self.pid)
 
+            plan = self._get_plan(metric_types)
+            process = self._process
+
             values: Dict[str, float] = {}
-            with self._process.oneshot():
-                for metric_type in metric_types:
+            unsupported: List[str] = []
+            with process.oneshot():
+                for accessor, fields in plan:
+                    # 每个访问器每周期只调用一次，其结果供同组全部指标取字段
                     try:
-                        value = self._collect_one(metric_type)
+                        raw = _ACCESSORS[accessor](process)
+                    except (AttributeError, NotImplementedError):
+                        # 本平台没有该访问器：整组指标不支持
+                        unsupported.extend(metric_type for metric_type, _ in fields)
+                        continue
                     except (psutil.AccessDenied, psutil.ZombieProcess):
                         # 访问被拒绝或僵尸进程，进程可能仍存在但暂时无法访问
-                        # 单指标记0而不中断，避免误判为进程终止
+                        # 同组指标记0而不中断，避免误判为进程终止
                         # 注意：ZombieProcess是NoSuchProcess的子类，必须先于父类捕获
-                        value = 0.0
+                        raw = None
                     except psutil.NoSuchProcess:
                         # 进程确实不存在，整体返回None停止任务
                         return None
                     except Exception:
-                        # 其他异常，进程可能仍存在，单指标记0继续
-                        value = 0.0
-
-                    if value is not None:
-                        values[metric_type] = value
-                    # 未知指标（value为None）跳过，不写入结果
-
+                        # 其他异常，进程可能仍存在，同组指标记0继续
+                        raw = None
+
+                    for metric_type, extract in fields:
+                        if raw is None:
+                            values[metric_type] = 0.0
+                            continue
+                        try:
+                            values[metric_type] = extract(raw)
+                        except AttributeError:
+                            # 字段在当前平台不存在：不写假0，登记为不支持
+                            unsupported.append(metric_type)
+                        except Exception:
+                            # 其他取值异常，单指标记0继续
+                            values[metric_type] = 0.0
+
+            if unsupported:
+                self._drop_unsupported(unsupported)
             return values
 
         except psutil.NoSuchProcess:
             # 创建Process对象时进程已不存在
             return None
 
+    def close(self):
+        """释放采集器持有的资源（任务收尾时调用；psutil 后端无需释放）"""
+        pass
+
     def collect_metric(self, metric_type: str) -> Optional[float]:
         """
         采集指定的性能指标（单指标兼容接口，语义与旧版一致）
@@ -345,6 +378,28 @@ class ProcessCollector:
         return processes
 
 
+def create_collector(pid: int, backend: Optional[str] = None) -> ProcessCollector:
+    """
+    按配置的采集后端创建采集器
+
+    Args:
+        pid: 进程ID
+        backend: 'auto' / 'psutil' / 'procfs'，默认取 config.COLLECTOR_BACKEND；
+            auto 在 Linux 上使用 /proc 直读后端，其他系统使用 psutil 后端
+
+    Returns:
+        ProcessCollector: 采集器实例（/proc 后端为其子类，接口一致）
+    """
+    backend = backend or config.COLLECTOR_BACKEND
+    if backend in ('auto', 'procfs'):
+        from core.procfs_collector import ProcFsCollector
+        if ProcFsCollector.is_available():
+            return ProcFsCollector(pid)
+        if backend == 'procfs':
+            logger.warning("当前系统不支持 /proc 直读采集后端，回退到 psutil 后端")
+    return ProcessCollector(pid)
+
+
 # 单元测试代码（可选）
 if __name__ == "__main__":
     import os
@@ -0,0 +1,347 @@
+"""
+Linux /proc 直读采集后端
+在 ProcessCollector 接口之后直接读取 /proc/<pid>/{stat,statm,status,io,smaps_rollup}：
+文件描述符在任务生命周期内保持打开，每周期用 os.preadv 从偏移 0 重读到复用的
+缓冲区，只解析本任务指标需要的字段；/proc 无法直接提供的指标回退给 psutil
+后端（父类）采集。
+
+USS/PSS/Swap 读取内核汇总好的 smaps_rollup（Linux 4.14+），不逐条遍历 smaps：
+映射数以千计的进程（JVM、浏览器）上后者每周期可达数十毫秒。内核不提供
+smaps_rollup、或个别进程读取 smaps_rollup 失败时，这三个指标回退 psutil。
+
+与 psutil 后端的取值口径保持一致（单位、cpu_percent 的计算方式与取整均对齐
+psutil 的 Linux 实现），任务可以在两种后端之间切换而不影响历史数据的可比性。
+"""
+import os
+import re
+import sys
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+from core.process_collector import ProcessCollector
+from utils.metrics import MetricType, is_metric_supported
+
+# 缓冲区初始大小：status 文件通常约 1.5KB，读满时自动扩容重读
+_BUFFER_SIZE = 8192
+
+if sys.platform.startswith('linux'):
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+    _CLK_TCK = os.sysconf('SC_CLK_TCK')
+else:
+    _PAGE_SIZE = _CLK_TCK = 1
+HAS_SMAPS_ROLLUP = os.path.exists('/proc/self/smaps_rollup')
+
+# stat 文件按")"之后切分的字段下标（= proc(5) 中的字段序号 - 3，跳过 pid 与 comm）
+_STAT_UTIME = 11
+_STAT_STIME = 12
+_STAT_NICE = 16
+_STAT_NUM_THREADS = 17
+
+# 指标来源表：指标 -> (文件名, 字段键, 换算函数)
+# stat/statm 的字段键为切分后的下标；status/io 的字段键为带前导换行的行首标签
+# （避免 "voluntary_ctxt_switches" 误匹配 "nonvoluntary_..."、"write_bytes"
+# 误匹配 "cancelled_write_bytes"）
+_PROC_SOURCES: Dict[str, Tuple[str, object, Callable]] = {
+    MetricType.MEMORY_RSS: ('statm', 1, lambda v: v * _PAGE_SIZE / 1024),
+    MetricType.MEMORY_VMS: ('statm', 0, lambda v: v * _PAGE_SIZE / 1024),
+    MetricType.MEMORY_SHARED: ('statm', 2, lambda v: v * _PAGE_SIZE / 1024),
+    MetricType.MEMORY_TEXT: ('statm', 3, lambda v: v * _PAGE_SIZE / 1024),
+    MetricType.MEMORY_DATA: ('statm', 5, lambda v: v * _PAGE_SIZE / 1024),
+    MetricType.NUM_THREADS: ('stat', _STAT_NUM_THREADS, float),
+    MetricType.CPU_USER_TIME: ('stat', _STAT_UTIME, lambda v: v / _CLK_TCK),
+    MetricType.CPU_SYSTEM_TIME: ('stat', _STAT_STIME, lambda v: v / _CLK_TCK),
+    MetricType.CPU_PRIORITY: ('stat', _STAT_NICE, float),
+    MetricType.NUM_CTX_SWITCHES_VOL: ('status', b'\nvoluntary_ctxt_switches:', float),
+    MetricType.NUM_CTX_SWITCHES_INVOL: ('status', b'\nnonvoluntary_ctxt_switches:', float),
+    MetricType.IO_READ_BYTES: ('io', b'\nread_bytes:', lambda v: v / 1024),
+    MetricType.IO_WRITE_BYTES: ('io', b'\nwrite_bytes:', lambda v: v / 1024),
+    MetricType.IO_READ_COUNT: ('io', b'\nsyscr:', float),
+    MetricType.IO_WRITE_COUNT: ('io', b'\nsyscw:', float),
+}
+
+# smaps_rollup 来源（单位已是 KB；字段键为标签元组时取各标签之和，与 psutil 的
+# uss = Private_Clean + Private_Dirty + Private_Hugetlb 同口径）
+_SMAPS_ROLLUP_SOURCES: Dict[str, Tuple[str, object, Callable]] = {
+    MetricType.MEMORY_USS: ('smaps_rollup',
+                            (b'\nPrivate_Clean:', b'\nPrivate_Dirty:', b'\nPrivate_Hugetlb:'), float),
+    MetricType.MEMORY_PSS: ('smaps_rollup', b'\nPss:', float),
+    MetricType.MEMORY_SWAP: ('smaps_rollup', b'\nSwap:', float),
+}
+if HAS_SMAPS_ROLLUP:
+    _PROC_SOURCES.update(_SMAPS_ROLLUP_SOURCES)
+
+# 需要额外状态/换算的派生指标：内存使用率（statm 的 resident / 物理内存总量）与
+# CPU 使用率（stat 的 utime+stime 增量 / 墙钟增量）；句柄数也归入派生指标，
+# 不读取这四个文件
+_DERIVED_FILES = {
+    MetricType.MEMORY_PERCENT: 'statm',
+    MetricType.CPU_PERCENT: 'stat',
+}
+
+
+# 文件内容只以复用缓冲区的 memoryview 交给解析函数（re 可直接在缓冲区上匹配），
+# 每周期不拷贝文件内容，只为取出的字段生成小对象
+_FIELD_RE = re.compile(rb'\S+')
+# stat 中 comm 的结束位置：comm 本身可能含空格与括号，取最后一个 ") "
+_STAT_COMM_END_RE = re.compile(rb'.*\) ', re.S)
+
+
+def _parse_indexed(data: memoryview, name: str) -> List[bytes]:
+    """把 stat/statm 文件内容切分为字段列表（stat 从 comm 的右括号之后开始切，
+    comm 本身可能含空格与括号）"""
+    start = 0
+    if name == 'stat':
+        match = _STAT_COMM_END_RE.match(data)
+        if match is None:
+            raise ValueError("stat 内容不完整")
+        start = match.end()
+    return _FIELD_RE.findall(data, start)
+
+
+@lru_cache(maxsize=None)
+def _label_pattern(label: bytes) -> re.Pattern:
+    """"标签: 数值"行的匹配模式（按标签缓存）"""
+    return re.compile(re.escape(label) + rb'[ \t]*(\S+)')
+
+
+def _parse_labeled(data: memoryview, label) -> int:
+    """在 status/io/smaps_rollup 文件内容中取"标签: 数值"行的数值；
+    label 为元组时取各标签之和（个别标签在旧内核上缺失时按 0 计，全部缺失抛 ValueError）"""
+    if isinstance(label, tuple):
+        found = False
+        total = 0
+        for item in label:
+            try:
+                total += _parse_labeled(data, item)
+                found = True
+            except ValueError:
+                pass
+        if not found:
+            raise ValueError(f"缺少字段: {label}")
+        return total
+    match = _label_pattern(label).search(data)
+    if match is None:
+        raise ValueError(f"缺少字段: {label}")
+    return int(match.group(1))
+
+
+class ProcFsCollector(ProcessCollector):
+    """Linux /proc 直读采集器（接口与 ProcessCollector 一致）"""
+
+    def __init__(self, pid: int):
+        """
+        初始化采集器（不在构造时打开任何文件，首次采集时按需打开）
+
+        Args:
+            pid: 进程ID
+        """
+        super().__init__(pid)
+        self._fds: Dict[str, int] = {}
+        # 文件打开时权限不足（如他人进程的 io）：该文件对应的指标按 psutil 后端
+        # AccessDenied 的语义记 0
+        self._denied = set()
+        self._buffer = bytearray(_BUFFER_SIZE)
+        # /proc 计划缓存 {指标元组: (按文件分组的字段表, 派生指标列表, 回退 psutil 的指标列表)}
+        self._proc_plans: Dict[Tuple[str, ...], tuple] = {}
+        self._total_memory = psutil.virtual_memory().total
+        # cpu_percent 增量基线：(utime+stime 秒, monotonic 秒)
+        self._cpu_last: Optional[Tuple[float, float]] = None
+        # 该进程读取 smaps_rollup 失败过（部分存活进程也会报 ESRCH/ENOENT），此后 USS/PSS/Swap 走 psutil
+        self._no_rollup = False
+
+    @staticmethod
+    def is_available() -> bool:
+        """当前系统是否可用 /proc 直读（Linux 且 /proc 已挂载）"""
+        return sys.platform.startswith('linux') and os.path.exists('/proc/self/stat')
+
+    def _get_proc_plan(self, metric_types: List[str]) -> tuple:
+        """编译并缓存 /proc 采集计划：按文件分组需要解析的字段，其余指标回退 psutil"""
+        key = tuple(metric_types)
+        plan = self._proc_plans.get(key)
+        if plan is None:
+            files: Dict[str, List[Tuple[str, object, Callable]]] = {}
+            derived: List[str] = []
+            fallback: List[str] = []
+            for metric_type in metric_types:
+                source = _PROC_SOURCES.get(metric_type)
+                if self._no_rollup and metric_type in _SMAPS_ROLLUP_SOURCES:
+                    source = None
+                if metric_type in self.unsupported_metrics or not is_metric_supported(metric_type):
+                    # 本平台不支持的指标不采集（不写假0），见 utils.metrics.METRIC_PLATFORMS
+                    self.unsupported_metrics.add(metric_type)
+                elif metric_type == MetricType.NUM_HANDLES:
+                    derived.append(metric_type)
+                elif source is not None:
+                    name, field, convert = source
+                    files.setdefault(name, []).append((metric_type, field, convert))
+                elif metric_type in _DERIVED_FILES:
+                    files.setdefault(_DERIVED_FILES[metric_type], [])
+                    derived.append(metric_type)
+                else:
+                    fallback.append(metric_type)
+            plan = (files, derived, fallback)
+            self._proc_plans[key] = plan
+        return plan
+
+    def _read(self, name: str) -> Optional[memoryview]:
+        """
+        从偏移 0 重读 /proc/<pid>/<name> 到复用缓冲区
+
+        Returns:
+            Optional[memoryview]: 缓冲区中文件内容的视图（不拷贝，下次读取即被覆盖，
+            须在下次 _read 之前解析完）；权限不足返回 None
+        Raises:
+            ProcessLookupError/FileNotFoundError: 进程已不存在
+        """
+        if name in self._denied:
+            return None
+        fd = self._fds.get(name)
+        if fd is None:
+            try:
+                fd = os.open(f'/proc/{self.pid}/{name}', os.O_RDONLY)
+            except PermissionError:
+                self._denied.add(name)
+                return None
+            self._fds[name] = fd
+        while True:
+            size = os.preadv(fd, [self._buffer], 0)
+            if size < len(self._buffer):
+                return memoryview(self._buffer)[:size]
+            # 读满说明缓冲区不够大，扩容后重读
+            self._buffer = bytearray(len(self._buffer) * 2)
+
+    def prime_cpu(self):
+        """预热CPU采集：记录 utime+stime 基线，首个 cpu_percent 与 psutil 一样基于此增量"""
+        try:
+            fields = _parse_indexed(self._read('stat'), 'stat')
+            self._cpu_last = (self._cpu_seconds(fields), time.monotonic())
+        except (OSError, ValueError):
+            # 预热失败不影响主流程，采集时会再次处理异常
+            pass
+
+    @staticmethod
+    def _cpu_seconds(stat_fields: List[bytes]) -> float:
+        """stat 字段中的 utime+stime（秒）"""
+        return (int(stat_fields[_STAT_UTIME]) + int(stat_fields[_STAT_STIME])) / _CLK_TCK
+
+    def _cpu_percent(self, stat_fields: List[bytes]) -> float:
+        """与 psutil cpu_percent(interval=None) 同口径：进程CPU时间增量 / 墙钟增量 * 100，
+        首次调用（无基线）返回 0，保留 1 位小数"""
+        now = time.monotonic()
+        cpu = self._cpu_seconds(stat_fields)
+        last = self._cpu_last
+        self._cpu_last = (cpu, now)
+        if last is None or now <= last[1]:
+            return 0.0
+        return round((cpu - last[0]) / (now - last[1]) * 100, 1)
+
+    def _read_rollup(self) -> Optional[memoryview]:
+        """
+        读取 smaps_rollup；进程仍存活但 smaps_rollup 读取失败时（内核对部分进程报
+        ESRCH/ENOENT）记为该进程不可用，返回 None，本周期及以后相关指标改走 psutil
+
+        Raises:
+            ProcessLookupError/FileNotFoundError: 进程已不存在
+        """
+        try:
+            return self._read('smaps_rollup')
+        except (ProcessLookupError, FileNotFoundError):
+            self._read('stat')  # 进程确已退出时这里同样抛出，交由调用方返回 None
+            fd = self._fds.pop('smaps_rollup', None)
+            if fd is not None:
+                os.close(fd)
+            self._no_rollup = True
+            self._proc_plans.clear()
+            return None
+
+    def _drop_unsupported(self, metric_types: List[str]):
+        """
+        能力探测（见 ProcessCollector._drop_unsupported）：同时清空 /proc 计划缓存，
+        下个周期起重新编译的计划不再包含这些指标（_get_proc_plan 按平台支持表剔除）
+        """
+        super()._drop_unsupported(metric_types)
+        self._proc_plans.clear()
+
+    def _num_fds(self) -> float:
+        """打开的文件描述符数（他人进程无权限时记 0，与 psutil 后端 AccessDenied 语义一致）"""
+        try:
+            return float(len(os.listdir(f'/proc/{self.pid}/fd')))
+        except PermissionError:
+            return 0.0
+
+    def collect_metrics(self, metric_types: List[str]) -> Optional[Dict[str, float]]:
+        """
+        批量采集多个性能指标（语义与 ProcessCollector.collect_metrics 一致）
+
+        Args:
+            metric_types: 指标类型列表（来自MetricType）
+
+        Returns:
+            Optional[Dict[str, float]]: {指标类型: 指标值}；进程不存在时返回None
+        """
+        files, derived, fallback = self._get_proc_plan(metric_types)
+        values: Dict[str, float] = {}
+        unsupported: List[str] = []
+
+        try:
+            for name, fields in files.items():
+                if name == 'smaps_rollup':
+                    data = self._read_rollup()
+                    if data is None:
+                        fallback = fallback + [metric_type for metric_type, _, _ in fields]
+                        continue
+                else:
+                    data = self._read(name)
+                if data is None:
+                    for metric_type, _field, _convert in fields:
+                        values[metric_type] = 0.0
+                    continue
+
+                if name in ('stat', 'statm'):
+                    parts = _parse_indexed(data, name)
+                    for metric_type, index, convert in fields:
+                        values[metric_type] = convert(int(parts[index]))
+                    if name == 'stat' and MetricType.CPU_PERCENT in derived:
+                        values[MetricType.CPU_PERCENT] = self._cpu_percent(parts)
+                    if name == 'statm' and MetricType.MEMORY_PERCENT in derived:
+                        values[MetricType.MEMORY_PERCENT] = (
+                            int(parts[1]) * _PAGE_SIZE / self._total_memory * 100)
+                else:
+                    for metric_type, label, convert in fields:
+                        try:
+                            values[metric_type] = convert(_parse_labeled(data, label))
+                        except ValueError:
+                            # 内核未提供该字段（旧内核、smaps_rollup 缺少标签）：不写假0，登记为不支持
+                            unsupported.append(metric_type)
+            for metric_type in derived:
+                if metric_type == MetricType.NUM_HANDLES:
+                    # 与 psutil num_fds() 同口径：/proc/<pid>/fd 目录项数
+                    values[metric_type] = self._num_fds()
+        except (ProcessLookupError, FileNotFoundError):
+            # 进程已不存在（已打开的 /proc 文件在进程退出后读取报 ESRCH）
+            return None
+
+        if unsupported:
+            self._drop_unsupported(unsupported)
+        if fallback:
+            fallback_values = super().collect_metrics(fallback)
+            if fallback_values is None:
+                return None
+            values.update(fallback_values)
+
+        return values
+
+    def close(self):
+        """关闭保持打开的 /proc 文件描述符（任务收尾时调用）"""
+        for fd in self._fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._fds.clear()
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,86 @@
+"""
+空闲页后台回收线程
+删除任务、过期清理与封块释放的页留在库文件的空闲页链表上（auto_vacuum=INCREMENTAL），
+由本线程在写入线程空闲时分小步截掉（Database.reclaim_free_pages），取代"整库 VACUUM
+重写文件、期间独占写锁"的唯一回收方式：每步只是一个约毫秒级的短写事务，步间停顿让
+采样写入随时插入，监控运行中也可以回收。
+
+未启用增量回收的旧库（auto_vacuum=NONE）在设置页"清理并压缩数据库"执行一次 VACUUM
+时转换，之前本线程只检查、不回收。
+"""
+import logging
+import threading
+from typing import Optional
+
+from PyQt5.QtCore import QThread
+
+from core.writer import GroupCommitWriter
+from data.database import Database
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceReclaimer(QThread):
+    """
+    空闲页回收线程（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期与应用一致：主窗口启动完成后启动，退出时 stop() 并 join。每隔
+    RECLAIM_INTERVAL_MS 检查一次空闲页，有空闲页时连续回收到清空，期间写入线程
+    一旦有待写数据即让出，等它提交完再继续。
+    """
+
+    def __init__(self, db: Database, writer: Optional[GroupCommitWriter] = None,
+                 interval_ms: Optional[float] = None, step_pages: Optional[int] = None,
+                 pause_ms: Optional[float] = None, parent=None):
+        """
+        Args:
+            db: 数据库实例（回收线程使用自己的持久连接）
+            writer: 组提交写入线程，据其是否空闲决定能否回收；None 表示不避让
+            interval_ms: 检查间隔（毫秒），默认取 config.RECLAIM_INTERVAL_MS
+            step_pages: 每步最多回收的页数，默认取 config.RECLAIM_STEP_PAGES
+            pause_ms: 两步之间的停顿（毫秒），默认取 config.RECLAIM_PAUSE_MS
+        """
+        super().__init__(parent)
+        self.db = db
+        self.writer = writer
+        self.interval = (config.RECLAIM_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.step_pages = config.RECLAIM_STEP_PAGES if step_pages is None else step_pages
+        self.pause = (config.RECLAIM_PAUSE_MS if pause_ms is None else pause_ms) / 1000
+        # 置位即退出；等待检查间隔时也用它，stop() 能立即唤醒
+        self._stop_event = threading.Event()
+        # 置位即提前开始下一次检查（如删除任务之后）
+        self._wake_event = threading.Event()
+        # 已执行的回收步数与回收页数（用例观测用）
+        self.step_count = 0
+        self.reclaimed_pages = 0
+
+    def wake(self):
+        """不等检查间隔，尽快检查并回收空闲页"""
+        self._wake_event.set()
+
+    def stop(self):
+        """请求线程退出（当前一步回收完成后退出，不中断事务）"""
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def run(self):
+        """回收主循环：等待检查间隔（或唤醒）-> 写入线程空闲时逐步回收到没有空闲页"""
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+            while not self._stop_event.is_set():
+                if self.writer is not None and not self.writer.is_idle():
+                    self._stop_event.wait(self.pause)
+                    continue
+                try:
+                    freed = self.db.reclaim_free_pages(self.step_pages)
+                except Exception:
+                    # reclaim_free_pages 已静默失败，这里只防御意外异常拖垮线程
+                    logger.error("后台回收空闲页失败", exc_info=True)
+                    freed = 0
+                if freed <= 0:
+                    break
+                self.step_count += 1
+                self.reclaimed_pages += freed
+                self._stop_event.wait(self.pause)
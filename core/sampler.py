@@ -0,0 +1,237 @@
+"""
+共享采样引擎
+单个 QThread 按截止时间小根堆（单调时钟）驱动全部监控任务，取代"每任务一个
+QThread、各自每 100ms 醒来轮询一次"的旧模型：引擎线程只在最近一个任务到期、
+或有启动/停止/恢复请求时才被唤醒，任务数增加不再带来额外线程与空转唤醒。
+
+任务本身仍是 core/monitor_task.py 的 MonitorTask（信号、缓冲、flush 重试、收尾
+逻辑全部复用），引擎只负责"何时在哪个线程调用它的 begin/sample_once/teardown"。
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from PyQt5.QtCore import QThread
+
+from core.monitor_task import MonitorTask
+
+logger = logging.getLogger(__name__)
+
+# 堆条目种类：周期采集 / 停止收尾
+_KIND_SAMPLE = 0
+_KIND_STOP = 1
+
+
+class SamplerEngine(QThread):
+    """
+    共享采样引擎（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期：首个任务加入时启动，最后一个任务收尾完成后自行退出（空闲时
+    不占线程、零唤醒），之后再有任务加入时重新启动。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._cond = threading.Condition()
+        # 小根堆条目：(截止时间 monotonic 秒, 序号, 种类, task_id, 代次)
+        # 序号保证同一截止时间按入堆顺序出堆，且避免比较到后续字段
+        self._heap: List[Tuple[float, int, int, str, int]] = []
+        self._seq = itertools.count()
+        # 引擎正在驱动的任务 {task_id: MonitorTask}
+        self._tasks: Dict[str, MonitorTask] = {}
+        # 任务代次：暂停后恢复时 +1，使恢复前残留在堆里的旧条目出堆时失效，避免重复采集
+        self._generations: Dict[str, int] = {}
+        # 已出堆但因暂停而搁置的任务（不在堆中，不产生任何唤醒），恢复时重新入堆
+        self._parked: Dict[str, MonitorTask] = {}
+        # 任务收尾完成事件 {task_id: Event}，stop_task 据此阻塞到数据已落库
+        self._finished: Dict[str, threading.Event] = {}
+        # 已执行过 begin() 的任务（只在引擎线程内读写）
+        self._begun = set()
+        # 线程是否处于（或即将进入）运行状态；只在持锁时读写
+        self._alive = False
+
+    # ========== 对外接口（GUI 线程调用） ==========
+
+    def add_task(self, task: MonitorTask):
+        """
+        接管一个任务：置运行标志并安排立即执行首次准备与采集
+
+        Args:
+            task: 待驱动的监控任务（其自身 QThread 不启动）
+        """
+        task.mark_running()
+        with self._cond:
+            self._tasks[task.task_id] = task
+            self._generations[task.task_id] = 0
+            self._finished[task.task_id] = threading.Event()
+            self._push(time.monotonic(), _KIND_SAMPLE, task.task_id, 0)
+            need_start = not self._alive
+            self._alive = True
+            self._cond.notify()
+
+        if need_start:
+            # 上一轮空闲退出的线程可能尚未完全结束，先等它结束再重新启动
+            self.wait()
+            self.start()
+
+    def stop_task(self, task: MonitorTask, wait: bool = True) -> bool:
+        """
+        停止任务：置停止标志并唤醒引擎立即收尾
+
+        Args:
+            task: 监控任务
+            wait: 是否阻塞到收尾（最后一次 flush/写状态/emit task_stopped）完成
+
+        Returns:
+            bool: 任务是否由本引擎驱动
+        """
+        task.stop()
+        with self._cond:
+            finished = self._finished.get(task.task_id)
+            if finished is None:
+                return False
+            self._push(0.0, _KIND_STOP, task.task_id, self._generations.get(task.task_id, 0))
+            self._cond.notify()
+
+        if wait:
+            finished.wait()
+        return True
+
+    def pause_task(self, task: MonitorTask):
+        """暂停任务：到期出堆时搁置，不再唤醒引擎"""
+        task.pause()
+
+    def resume_task(self, task: MonitorTask):
+        """恢复任务：若已被搁置则立即重新入堆"""
+        task.resume()
+        with self._cond:
+            if self._parked.pop(task.task_id, None) is not None:
+                generation = self._generations[task.task_id] + 1
+                self._generations[task.task_id] = generation
+                self._push(time.monotonic(), _KIND_SAMPLE, task.task_id, generation)
+                self._cond.notify()
+
+    def wait_idle(self, timeout_ms: int = 3000) -> bool:
+        """
+        所有任务都已收尾时等待引擎线程退出（供管理器 stop_all_tasks 兜底 join，
+        避免线程对象被回收时仍在运行）
+
+        Returns:
+            bool: 线程已结束返回 True；仍有任务在驱动或超时返回 False
+        """
+        with self._cond:
+            if self._tasks:
+                return False
+        return self.wait(timeout_ms)
+
+    def task_count(self) -> int:
+        """引擎当前驱动的任务数（含暂停中的任务）"""
+        with self._cond:
+            return len(self._tasks)
+
+    # ========== 引擎线程 ==========
+
+    def _push(self, deadline: float, kind: int, task_id: str, generation: int):
+        """入堆（调用方须持锁）"""
+        heapq.heappush(self._heap, (deadline, next(self._seq), kind, task_id, generation))
+
+    def _next_entry(self):
+        """
+        阻塞取出下一个到期条目；没有任何任务时返回 None（线程随即退出）
+
+        Returns:
+            Optional[Tuple]: (截止时间, 种类, task)
+        """
+        with self._cond:
+            while True:
+                if not self._tasks:
+                    self._alive = False
+                    return None
+                if not self._heap:
+                    # 只剩暂停中的任务：无限期等待恢复/停止请求，不产生任何唤醒
+                    self._cond.wait()
+                    continue
+                deadline = self._heap[0][0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                _, _, kind, task_id, generation = heapq.heappop(self._heap)
+                task = self._tasks.get(task_id)
+                if task is None:
+                    continue  # 任务已收尾，残留条目丢弃
+                if kind != _KIND_STOP and generation != self._generations[task_id]:
+                    continue  # 暂停/恢复前的旧条目
+                return deadline, kind, task
+
+    def _finish(self, task: MonitorTask):
+        """任务收尾完成：移出引擎并唤醒等待者"""
+        self._begun.discard(task.task_id)
+        with self._cond:
+            self._tasks.pop(task.task_id, None)
+            self._generations.pop(task.task_id, None)
+            self._parked.pop(task.task_id, None)
+            finished = self._finished.pop(task.task_id, None)
+        if finished is not None:
+            finished.set()
+
+    def _reschedule(self, task: MonitorTask):
+        """按任务时间表的绝对截止时间安排下一次采集（采集耗时不累积为漂移）"""
+        deadline = task.advance_schedule()
+        with self._cond:
+            self._push(deadline, _KIND_SAMPLE, task.task_id, self._generations[task.task_id])
+
+    def _park(self, task: MonitorTask):
+        """搁置暂停中的任务；若搁置前已被恢复则直接重新入堆"""
+        with self._cond:
+            if task.is_paused():
+                self._parked[task.task_id] = task
+                return
+        self._reschedule(task)
+
+    def run(self):
+        """引擎主循环：取到期条目 -> 在本线程执行任务的对应步骤 -> 重新入堆"""
+        while True:
+            entry = self._next_entry()
+            if entry is None:
+                return
+            _deadline, kind, task = entry
+            try:
+                self._step(kind, task)
+            except Exception:
+                # 单个任务的意外异常不得拖垮引擎线程与其他任务
+                logger.error("采样引擎执行任务步骤失败: task_id=%s", task.task_id, exc_info=True)
+                if not task.is_running():
+                    self._finish(task)
+                else:
+                    self._reschedule(task)
+
+    def _step(self, kind: int, task: MonitorTask):
+        """执行任务的一个步骤（引擎线程内）"""
+        if task.task_id not in self._begun:
+            # 首个步骤先做准备（即使是停止请求，也与独立线程模式一样先写 running
+            # 状态再收尾，保证任务记录完整）
+            self._begun.add(task.task_id)
+            if not task.begin():
+                # 进程不存在：begin 内部已完成收尾
+                self._finish(task)
+                return
+
+        if kind == _KIND_STOP or not task.is_running():
+            task.teardown(task.stop_reason)
+            self._finish(task)
+            return
+
+        if task.is_paused():
+            self._park(task)
+            return
+
+        if not task.sample_once():
+            task.teardown(task.stop_reason)
+            self._finish(task)
+            return
+
+        self._reschedule(task)
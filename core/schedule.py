@@ -0,0 +1,70 @@
+"""
+采样时间表
+按绝对截止时间（锚点 + 第 k 个周期 * interval）排定采样时刻，取代"采集完成后
+再睡满一个 interval"的相对睡眠：采集本身的耗时不再累积为漂移，第 k 次采样的
+时间戳恒为锚点 + k * interval，不随运行时长游走。
+"""
+import time
+from datetime import datetime
+
+
+class TickSchedule:
+    """
+    单个任务的绝对截止时间采样时间表
+
+    截止时间基于单调时钟（不受系统时间调整影响），时间戳基于锚定时刻的墙钟时间；
+    落后超过一个完整周期时跳过已错过的周期（不补采、不连发），并累计跳过次数。
+    """
+
+    def __init__(self, interval: float):
+        """
+        Args:
+            interval: 采样周期（秒），可小于 1 秒
+        """
+        self.interval = interval
+        self.skipped_ticks = 0  # 累计跳过的周期数（整个任务生命周期内）
+        self.restart()
+
+    def restart(self):
+        """以当前时刻为锚点重新开始计周期（任务开始与暂停后恢复时调用）"""
+        self._anchor_mono = time.monotonic()
+        self._anchor_wall = time.time()
+        self._tick = 0
+
+    @property
+    def tick(self) -> int:
+        """当前周期序号（自锚点起从 0 计，含已跳过的周期）"""
+        return self._tick
+
+    @property
+    def deadline(self) -> float:
+        """当前周期的截止时间（time.monotonic() 口径）"""
+        return self._anchor_mono + self._tick * self.interval
+
+    def timestamp(self) -> datetime:
+        """
+        当前周期的采样时间戳（锚点墙钟时间 + 周期序号 * interval），取整到毫秒，
+        与库内 epoch 毫秒整数时间戳的精度一致（落库后读回与原值相等）
+        """
+        return datetime.fromtimestamp(round(self._anchor_wall + self._tick * self.interval, 3))
+
+    def advance(self, now: float = None) -> int:
+        """
+        当前周期采集完成后推进到下一个周期；若此时已落后一个完整周期以上，
+        跳到最近一个已到期的周期（其间错过的周期记为跳过）
+
+        Args:
+            now: 当前单调时钟读数（默认取 time.monotonic()，测试可注入）
+
+        Returns:
+            int: 本次推进跳过的周期数
+        """
+        if now is None:
+            now = time.monotonic()
+        self._tick += 1
+        behind = now - self.deadline
+        skipped = int(behind // self.interval) if behind >= self.interval else 0
+        if skipped:
+            self._tick += skipped
+            self.skipped_ticks += skipped
+        return skipped
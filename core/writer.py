@@ -0,0 +1,190 @@
+"""
+组提交写入线程
+全部监控任务的采样数据经同一个写入线程落库：任务每周期只把自己登记为"有待写
+数据"，写入线程在一个可配置的延迟窗口（config.WRITE_LATENCY_MS）内收集所有已
+登记任务的待写数据，合并为一个事务提交，取代"每任务每周期各自提交一次事务"
+（N 个任务每秒 N 次提交争抢 WAL 写锁）。
+
+待写数据仍保存在各任务自己的缓冲区中，写入线程只负责"何时、与谁合并提交"；
+提交结果交回任务按原有语义处理（失败保留缓冲待下一轮重试、MAX_BUFFER_SIZE
+上限、连续失败通知），见 MonitorTask.apply_flush_result。
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from PyQt5.QtCore import QThread
+
+from core.monitor_task import MonitorTask
+from data.database import Database
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter(QThread):
+    """
+    组提交写入线程（由 MonitorManager 持有，进程内一个实例）
+
+    线程生命周期与共享采样引擎一致：首个任务挂接时启动，最后一个任务收尾提交
+    完成后自行退出，之后再有任务挂接时重新启动。
+    """
+
+    def __init__(self, db: Database, latency_ms: Optional[float] = None, parent=None):
+        """
+        Args:
+            db: 数据库实例（写入线程使用自己的持久连接）
+            latency_ms: 组提交延迟窗口（毫秒），默认取 config.WRITE_LATENCY_MS
+        """
+        super().__init__(parent)
+        self.db = db
+        self.latency = (config.WRITE_LATENCY_MS if latency_ms is None else latency_ms) / 1000
+        self._cond = threading.Condition()
+        # 已挂接（由本线程落库）的任务 {task_id: MonitorTask}
+        self._attached: Dict[str, MonitorTask] = {}
+        # 本窗口内登记了待写数据的任务（按登记顺序提交）
+        self._dirty: Dict[str, MonitorTask] = {}
+        # 本窗口首次登记的时刻（monotonic 秒），窗口从这里开始计时
+        self._window_start: Optional[float] = None
+        # 收尾提交请求 {task_id: Event}：不等待窗口立即提交，完成后解除挂接并唤醒收尾方
+        self._final: Dict[str, threading.Event] = {}
+        # 线程是否处于（或即将进入）运行状态；只在持锁时读写
+        self._alive = False
+        # 是否正在执行组提交（已取出待写数据、事务尚未结束）；只在持锁时读写
+        self._committing = False
+        # 已执行的组提交事务数（基准与用例观测用）
+        self.commit_count = 0
+
+    # ========== 对外接口（采集线程调用） ==========
+
+    def attach(self, task: MonitorTask):
+        """
+        挂接任务：此后该任务的 flush 交由本线程合并提交
+
+        Args:
+            task: 监控任务
+        """
+        with self._cond:
+            self._attached[task.task_id] = task
+            need_start = not self._alive
+            self._alive = True
+
+        if need_start:
+            # 上一轮空闲退出的线程可能尚未完全结束，先等它结束再重新启动
+            self.wait()
+            self.start()
+
+    def is_attached(self, task: MonitorTask) -> bool:
+        """任务是否已挂接"""
+        with self._cond:
+            return task.task_id in self._attached
+
+    def submit(self, task: MonitorTask):
+        """
+        登记任务有待写数据：在当前延迟窗口结束时与其他任务的数据一并提交
+
+        Args:
+            task: 监控任务
+        """
+        with self._cond:
+            if task.task_id in self._dirty:
+                return
+            self._dirty[task.task_id] = task
+            if self._window_start is None:
+                self._window_start = time.monotonic()
+                self._cond.notify()
+
+    def flush_final(self, task: MonitorTask):
+        """
+        任务收尾：立即提交该任务剩余的缓冲（连同其他任务已登记的数据），阻塞到
+        提交完成，随后解除挂接
+
+        Args:
+            task: 监控任务
+        """
+        event = threading.Event()
+        with self._cond:
+            self._final[task.task_id] = event
+            self._dirty[task.task_id] = task
+            if self._window_start is None:
+                self._window_start = time.monotonic()
+            self._cond.notify()
+        event.wait()
+
+    def is_idle(self) -> bool:
+        """
+        写入线程当前是否空闲：没有登记待写的数据、也不在提交中（后台回收空闲页等维护
+        操作据此避开写入）
+
+        Returns:
+            bool: 空闲返回 True
+        """
+        with self._cond:
+            return not self._dirty and not self._committing
+
+    def wait_idle(self, timeout_ms: int = 3000) -> bool:
+        """
+        所有任务都已收尾时等待写入线程退出
+
+        Returns:
+            bool: 线程已结束返回 True；仍有任务挂接或超时返回 False
+        """
+        with self._cond:
+            if self._attached:
+                return False
+        return self.wait(timeout_ms)
+
+    # ========== 写入线程 ==========
+
+    def run(self):
+        """写入主循环：等待窗口结束（或收尾请求）-> 合并提交 -> 结果交回各任务"""
+        while True:
+            with self._cond:
+                while True:
+                    if not self._dirty:
+                        if not self._attached:
+                            self._alive = False
+                            return
+                        self._cond.wait()
+                        continue
+                    if self._final:
+                        break  # 收尾请求不等窗口，stop_task 正阻塞等待
+                    remaining = self._window_start + self.latency - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                tasks = list(self._dirty.values())
+                finals = self._final
+                self._dirty = {}
+                self._final = {}
+                self._window_start = None
+                self._committing = True
+
+            try:
+                self._commit(tasks, finals)
+            except Exception:
+                # 单次提交的意外异常不得拖垮写入线程；各任务缓冲未被清空，下一轮重试
+                logger.error("组提交失败: 任务数=%d", len(tasks), exc_info=True)
+            finally:
+                with self._cond:
+                    self._committing = False
+                    for task_id in finals:
+                        self._attached.pop(task_id, None)
+                for event in finals.values():
+                    event.set()
+
+    def _commit(self, tasks, finals: Dict[str, threading.Event]):
+        """
+        把各任务缓冲中已有的数据合并为一个事务提交，并把结果交回各任务
+
+        提交期间采集线程可继续向缓冲追加数据：每个任务只确认提交前取出的前 n 条。
+        """
+        batches = [(task, task.pending_points()) for task in tasks]
+        points = [point for _task, pending in batches for point in pending]
+        success = True
+        if points:
+            success = self.db.save_data_points(points)
+            self.commit_count += 1
+        for task, pending in batches:
+            task.apply_flush_result(len(pending), success, is_teardown=task.task_id in finals)
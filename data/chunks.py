@@ -0,0 +1,109 @@
+"""
+采样压缩块编解码
+按列存储的采样压缩块（sample_chunks 表的 data 列）：一个块保存一个任务一个指标在一个
+时间窗口内的全部数据点。时间戳按二阶差分（delta-of-delta）、值按与前一个值的 IEEE 754
+位模式异或（Gorilla 式 XOR）编码——固定周期采样的二阶差分几乎全为 0，变化缓慢或不变的
+指标异或结果的高位字节几乎全为 0。两列各自按字节转置（同一字节位置的字节排在一起，使
+成片的 0 字节连续出现）后一并 zlib 压缩。
+
+编码逐位打包（原版 Gorilla）在纯 Python 下解码太慢；这里只用按字节对齐的整数数组，
+解码时的两次前缀和与异或前缀均由 itertools.accumulate 在 C 层完成，批量解码一个块
+与数据点数成线性、几乎不占 Python 字节码开销。
+
+块格式：5 字节头（格式版本、数据点数）+ zlib(转置(zigzag 二阶差分 uint64[]) + 转置(异或 uint64[]))，
+整数一律按小端序存储
+"""
+import operator
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate, repeat
+from typing import List, Sequence, Tuple
+
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<BI')          # 格式版本, 数据点数
+# zlib 压缩级别：封块在写入事务内进行，取速度与压缩率的折中
+_COMPRESS_LEVEL = 6
+
+_WORD = 8   # int64/uint64/double 的字节数
+
+
+def _to_le(values: array) -> bytes:
+    """数组按小端序取字节"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode: str, data: bytes) -> array:
+    """小端序字节还原为数组"""
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _shuffle(data: bytes) -> bytes:
+    """按字节转置：把各 8 字节字中同一位置的字节排在一起"""
+    return b''.join(data[i::_WORD] for i in range(_WORD))
+
+
+def _unshuffle(data: bytes, count: int) -> bytes:
+    """_shuffle 的逆变换"""
+    out = bytearray(count * _WORD)
+    for i in range(_WORD):
+        out[i::_WORD] = data[i * count:(i + 1) * count]
+    return bytes(out)
+
+
+def encode_chunk(base_ms: int, timestamps: Sequence[int], values: Sequence[float]) -> bytes:
+    """
+    编码一个块
+
+    Args:
+        base_ms: 块的时间窗口起点（epoch 毫秒），首个时间戳的差分以它为前值
+        timestamps: 严格升序的 epoch 毫秒时间戳
+        values: 与时间戳一一对应的值
+
+    Returns:
+        bytes: 块数据
+    """
+    count = len(timestamps)
+    if count != len(values):
+        raise ValueError(f"时间戳与值的个数不一致: {count} != {len(values)}")
+    deltas = list(map(operator.sub, timestamps, [base_ms, *timestamps[:-1]]))
+    dods = map(operator.sub, deltas, [0, *deltas[:-1]])
+    # zigzag：小的负数（时间戳抖动）映射为小的正数，高位字节同样为 0
+    zigzag = array('Q', ((d << 1) ^ (d >> 63) for d in dods))
+    bits = _from_le('Q', _to_le(array('d', values)))
+    xors = array('Q', map(operator.xor, bits, [0, *bits[:-1]]))
+    payload = _shuffle(_to_le(zigzag)) + _shuffle(_to_le(xors))
+    return _HEADER.pack(_FORMAT_VERSION, count) + zlib.compress(payload, _COMPRESS_LEVEL)
+
+
+def decode_chunk(base_ms: int, data: bytes) -> Tuple[List[int], array]:
+    """
+    解码一个块
+
+    Args:
+        base_ms: 块的时间窗口起点（与编码时一致）
+        data: 块数据
+
+    Returns:
+        Tuple[List[int], array]: (epoch 毫秒时间戳列表, 值数组 array('d'))，按时间升序
+    """
+    version, count = _HEADER.unpack_from(data)
+    if version != _FORMAT_VERSION:
+        raise ValueError(f"不支持的块格式版本: {version}")
+    payload = zlib.decompress(data[_HEADER.size:])
+    half = count * _WORD
+    zigzag = _from_le('Q', _unshuffle(payload[:half], count))
+    xors = _from_le('Q', _unshuffle(payload[half:], count))
+    dods = map(operator.xor, map(operator.rshift, zigzag, repeat(1)),
+               map(operator.neg, map(operator.and_, zigzag, repeat(1))))
+    timestamps = list(accumulate(accumulate(dods), initial=base_ms))[1:]
+    values = _from_le('d', _to_le(array('Q', accumulate(xors, operator.xor))))
+    return timestamps, values
@@ -4,19 +4,250 @@
 """
 import json
 import logging
+import math
 import os
+import re
 import shutil
 import sqlite3
+import threading
+import weakref
 from datetime import datetime, timedelta
-from typing import List, Optional
+from itertools import chain, groupby, repeat
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from contextlib import contextmanager
+from data.chunks import decode_chunk, encode_chunk
+from data.journal import SampleJournal
 from data.models import MonitorTask, DataPoint
+from utils.metrics import AVAILABLE_METRICS
 import config
 
 logger = logging.getLogger(__name__)
 
-# 数据库 Schema 版本（v1：多指标支持，tasks.metric_type 存 JSON 数组，data_points 新增 metric_type 列）
-SCHEMA_VERSION = 1
+# 数据库 Schema 版本
+# - v1：多指标支持，tasks.metric_type 存 JSON 数组，data_points 新增 metric_type 列
+# - v2：tasks 新增 metric_periods 列（JSON 对象 {指标: 每 N 个周期采一次}，NULL 表示全部每周期采集）
+# - v3：data_points（每指标每周期一行）改为 samples（每任务每周期一行、每指标一列）
+# - v4：tasks 增加整数代理键 id；指标类型经 metrics 查找表映射为整数 id（samples 指标列
+#   名为 m<id>）；samples 以 (task_key, ts_ms) 定位一行——任务整数键 + epoch 毫秒整数时间戳
+# - v5：samples 改为以 (task_key, ts_ms) 为主键的 WITHOUT ROWID 表（按主键聚簇存储），
+#   去掉单独的唯一索引：按任务 + 时间范围的查询与取最新时间戳都只走主键 B 树
+# - v6：新增 task_summary（每任务采集次数、首末时间戳）与 task_metric_summary（每任务每指标
+#   数据点数、最小/最大值、求和），随采样写入/删除在同一事务内增量维护
+# - v7：新增 rollups（每任务每指标按 1 分钟 / 1 小时分桶的点数、最小/最大值及其时间、求和、
+#   首末值），同样随采样写入增量维护，供历史页长时间范围的图表直接读取
+# - v8：新增 sample_chunks（每任务每指标每小时窗口一个压缩块，见 data/chunks.py）；
+#   sample_storage='chunks' 时已关闭窗口的 samples 行封为压缩块，读取时与 samples 合并
+# - v9：samples 新增 held 位图列（第 i 位表示指标 m<i> 本周期已采集、值与前值相同未写入），
+#   tasks 新增 change_only 标记（该任务存在 held 单元格，读取时需按阶梯序列还原）
+# - v10：tasks 新增 partitioned 标记（该任务的 samples/sample_chunks/rollups 存放在独立的
+#   分区库文件中，见 partition_path）
+# - v11：tasks 新增 deleting 标记（任务已排队删除、数据正分批删除中；任务列表不再显示，
+#   启动后继续删除）
+# - v12：tasks 新增 raw_kept_from_ms / minute_kept_from_ms（分级保留：早于该时刻的原始采样 /
+#   1 分钟降采样汇总已裁剪，只保留更粗的汇总；NULL 表示未裁剪）
+SCHEMA_VERSION = 12
+
+# 迁移链：(迁移后的版本号, Database 上的迁移方法名)，按版本升序；旧库从当前版本起
+# 依次执行后续全部步骤（同一事务内）。按方法名在运行时取用，便于测试替换单个步骤
+_MIGRATIONS = [
+    (1, '_migrate_v0_to_v1'),
+    (2, '_migrate_v1_to_v2'),
+    (3, '_migrate_v2_to_v3'),
+    (4, '_migrate_v3_to_v4'),
+    (5, '_migrate_v4_to_v5'),
+    (6, '_migrate_v5_to_v6'),
+    (7, '_migrate_v6_to_v7'),
+    (8, '_migrate_v7_to_v8'),
+    (9, '_migrate_v8_to_v9'),
+    (10, '_migrate_v9_to_v10'),
+    (11, '_migrate_v10_to_v11'),
+    (12, '_migrate_v11_to_v12'),
+]
+
+# samples 表的指标列：每个指标类型一列（REAL，本周期未采集为 NULL）。启动时为缺失的
+# 指标登记 metrics.id 并补齐列，新增指标类型无需单独的迁移步骤
+SAMPLE_METRIC_COLUMNS = [m for group in AVAILABLE_METRICS.values() for m in group]
+
+# 指标列名白名单格式：v3 的指标列名即指标类型、需拼进 SQL，只接受小写标识符（指标类型
+# 常量均满足）；v4 起列名为 m<id>，与指标类型文本无关
+_COLUMN_NAME_RE = re.compile(r'^[a-z][a-z0-9_]*$')
+
+# 降采样汇总（rollups）的分桶粒度（毫秒），由细到粗：1 分钟、1 小时。桶按 epoch 毫秒
+# 对齐（bucket_ms = ts_ms - ts_ms % 粒度）
+ROLLUP_RESOLUTIONS_MS = (60_000, 3_600_000)
+
+# 压缩块（sample_chunks）的时间窗口（毫秒），按 epoch 毫秒对齐。与最粗的降采样汇总粒度
+# 相同：封块与展开都以整个窗口为单位，任何汇总桶的数据要么全在块里、要么全在 samples 里
+SAMPLE_CHUNK_SPAN_MS = ROLLUP_RESOLUTIONS_MS[-1]
+
+# held 位图可表示的最大指标 id（SQLite 整数为有符号 64 位，不用符号位）；id 更大的指标
+# 总是写入值
+HELD_MAX_METRIC_ID = 62
+
+# 每个连接同时附加的分区库上限（SQLite 默认编译上限为 10 个附加库）：超出时按最近使用
+# 顺序分离最久未用的分区；一批写入涉及更多分区任务时拆为多个事务
+PARTITION_ATTACH_LIMIT = 8
+
+# 分批删除任务数据时依次清理的表及其主键列（按主键取一批、按主键删除）。任务汇总行
+# 每指标一行，随最后一步与任务行一起删除
+_DELETE_BATCH_TABLES = (
+    ('samples', 'task_key, ts_ms'),
+    ('sample_chunks', 'task_key, chunk_ms, metric_id'),
+    ('rollups', 'task_key, metric_id, resolution_ms, bucket_ms'),
+)
+
+# 迁移中逐批改写旧数据的每批行数：单条 UPDATE 只动一批行，避免一次改写整表时
+# 语句级的临时结果集随数据量增长
+MIGRATION_BATCH_SIZE = 5000
+
+# 旧版 ISO 文本时间戳（本地时间）换算 epoch 毫秒的 SQL 表达式（迁移用，{} 处填列名）。
+# julianday 的 'utc' 修饰符按系统时区换算，与 datetime.timestamp() 对 naive 时间的口径一致
+_ISO_TO_EPOCH_MS_SQL = "CAST(ROUND((julianday({}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def to_epoch_ms(dt: datetime) -> int:
+    """本地时间（naive datetime，与 DataPoint.timestamp 一致）换算为库内的 epoch 毫秒整数"""
+    return round(dt.timestamp() * 1000)
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    """库内的 epoch 毫秒整数换算为本地时间（naive datetime）"""
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def partition_path(db_path: str, task_id: str) -> str:
+    """任务分区库的文件路径：主库旁的 <主库文件名>.parts 目录下，按任务ID命名"""
+    return os.path.join(db_path + '.parts', f'{task_id}.db')
+
+
+def retention_cutoffs(raw_days: int, minute_days: int,
+                      now_ms: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
+    """
+    分级保留的裁剪时刻：原始采样与 1 分钟降采样汇总分别保留到"当前时间 - 天数"，向下
+    对齐到 SAMPLE_CHUNK_SPAN_MS 窗口（与压缩块、held 位图的窗口一致，裁剪总以整个窗口
+    为单位）。天数 <= 0 表示永久保留，对应时刻为 None
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: (原始采样裁剪时刻, 1 分钟汇总裁剪时刻)，epoch 毫秒
+    """
+    if now_ms is None:
+        now_ms = to_epoch_ms(datetime.now())
+    cutoffs = []
+    for days in (raw_days, minute_days):
+        if days > 0:
+            cutoff = now_ms - days * 86_400_000
+            cutoffs.append(cutoff - cutoff % SAMPLE_CHUNK_SPAN_MS)
+        else:
+            cutoffs.append(None)
+    return cutoffs[0], cutoffs[1]
+
+
+def iter_chunk_ticks(cursor: sqlite3.Cursor, task_id: str, metric_ids: List[int],
+                     schema: str = 'main', start_ms: Optional[int] = None,
+                     end_ms: Optional[int] = None) -> Iterator[Tuple[int, Dict[int, float]]]:
+    """
+    按时间升序逐个采集周期产出任务压缩块中的数据（供导出等流式读取与 samples 行合并）。
+    逐窗口读取并解码，内存中只保留一个窗口
+
+    Args:
+        cursor: 游标（生成器迭代期间独占）
+        task_id: 任务ID
+        metric_ids: 要读取的指标 id
+        schema: 任务采样数据所在的库（分区任务为其分区库的附加名）
+        start_ms: 只读取窗口起点 >= 该值的块（epoch 毫秒），None 表示不限
+        end_ms: 只读取窗口起点 < 该值的块（epoch 毫秒），None 表示不限
+
+    Yields:
+        Tuple[int, Dict[int, float]]: (epoch 毫秒, {指标 id: 值})，只含有值的指标
+    """
+    bounds, params = '', [task_id, *metric_ids]
+    if start_ms is not None:
+        bounds += ' AND chunk_ms >= ?'
+        params.append(start_ms)
+    if end_ms is not None:
+        bounds += ' AND chunk_ms < ?'
+        params.append(end_ms)
+    cursor.execute(f'''
+        SELECT chunk_ms, metric_id, data FROM {schema}.sample_chunks
+        WHERE task_key = (SELECT id FROM tasks WHERE task_id = ?)
+          AND metric_id IN ({', '.join('?' * len(metric_ids))}){bounds}
+        ORDER BY chunk_ms, metric_id
+    ''', params)
+    for chunk_ms, group in groupby(cursor, key=itemgetter(0)):
+        ticks: Dict[int, Dict[int, float]] = {}
+        for _, metric_id, data in group:
+            for ts_ms, value in zip(*decode_chunk(chunk_ms, data)):
+                ticks.setdefault(ts_ms, {})[metric_id] = value
+        for ts_ms in sorted(ticks):
+            yield ts_ms, ticks[ts_ms]
+
+
+def iter_held_rows(rows: Iterable[tuple],
+                   metric_ids: List[int]) -> Iterator[Tuple[int, List[Optional[float]]]]:
+    """
+    按阶梯序列还原只记变化的采样行：held 位图中标记的单元格取同一窗口内该指标上一次
+    写入的值。写入时每个指标在每个 SAMPLE_CHUNK_SPAN_MS 窗口内首次采集总是写值，故只需
+    从窗口起点开始顺序读取，不必回看更早的行
+
+    Args:
+        rows: 按时间升序的 (ts_ms, held, 各指标值...) 行，从某个窗口的起点开始
+        metric_ids: 各指标值对应的指标 id
+
+    Yields:
+        Tuple[int, List[Optional[float]]]: (epoch 毫秒, 还原后的各指标值)，未采集为 None
+    """
+    window = None
+    last: List[Optional[float]] = []
+    for row in rows:
+        ts_ms, held = row[0], row[1]
+        values = list(row[2:])
+        if ts_ms - ts_ms % SAMPLE_CHUNK_SPAN_MS != window:
+            window = ts_ms - ts_ms % SAMPLE_CHUNK_SPAN_MS
+            last = [None] * len(values)
+        if held:
+            for i, metric_id in enumerate(metric_ids):
+                if values[i] is None and held >> metric_id & 1:
+                    values[i] = last[i]
+        for i, value in enumerate(values):
+            if value is not None:
+                last[i] = value
+        yield ts_ms, values
+
+
+# 每个连接的预编译语句缓存容量（sqlite3 默认 128）：采集写入、历史页查询等语句
+# 文本固定，持久连接下缓存命中后不再重复解析 SQL
+STATEMENT_CACHE_SIZE = 256
+
+
+class _ThreadConnection:
+    """
+    单个线程独占的持久连接及其嵌套深度
+
+    存放在 Database 实例的 threading.local 中：线程结束、线程局部存储被回收时
+    随之关闭连接，不会因采样引擎线程空闲退出后重启而累积连接
+    """
+
+    __slots__ = ('conn', 'depth', 'generation', 'attached', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection, generation: int):
+        self.conn = conn
+        self.depth = 0          # _get_connection 嵌套深度，只在最外层提交/回滚
+        self.generation = generation
+        # 已附加的分区库 {任务整数键: (任务ID, 附加名)}，按最近使用排列（最久未用在前）
+        self.attached: Dict[int, Tuple[str, str]] = {}
+
+    def close(self):
+        """关闭连接（幂等）"""
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                logger.error("关闭数据库连接失败", exc_info=True)
+
+    def __del__(self):
+        self.close()
 
 
 class Database:
@@ -32,14 +263,35 @@ class Database:
         'backup_aborted': False,
     }
 
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, sample_storage: str = None,
+                 change_only: Optional[bool] = None, deadband: Optional[Dict[str, float]] = None,
+                 partitioned: Optional[bool] = None):
         """
         初始化数据库
 
         Args:
             db_path: 数据库文件路径，默认使用config中的配置
+            sample_storage: 采样存储方式 'rows'/'chunks'，默认使用config中的配置
+                            （config.SAMPLE_STORAGE）
+            change_only: 是否只记变化，默认使用config中的配置（config.SAMPLE_CHANGE_ONLY）
+            deadband: 只记变化时的每指标死区 {指标类型: 绝对容差}，默认使用config中的配置
+                      （config.SAMPLE_DEADBAND）
+            partitioned: 新建任务是否存入独立的分区库文件，默认使用config中的配置
+                         （config.SAMPLE_PARTITIONS）
         """
         self.db_path = db_path or config.DB_PATH
+        # 是否把已关闭窗口的采样封为压缩块；读取总是同时读 samples 与 sample_chunks
+        self.chunked = (sample_storage or config.SAMPLE_STORAGE) == 'chunks'
+        # 是否只记变化；读取总是按 tasks.change_only 还原，与本实例的写入方式无关
+        self.change_only = config.SAMPLE_CHANGE_ONLY if change_only is None else change_only
+        self._deadband_metrics = dict(config.SAMPLE_DEADBAND if deadband is None else deadband)
+        # 只记变化的判定状态 {任务整数键: {列名: (时间戳, 上次写入的值)}}：只在事务提交后
+        # 更新，补写/改写已有范围时丢弃（随后各指标重新写一次值）
+        self._held_state: Dict[int, Dict[str, Tuple[int, float]]] = {}
+        # 新建任务是否分区；读写总是按 tasks.partitioned 定位，与本实例的设置无关
+        self.partitioned = config.SAMPLE_PARTITIONS if partitioned is None else partitioned
+        # 本次运行已回收归还文件系统的字节数（增量回收与 vacuum 之和，设置页展示）
+        self.reclaimed_bytes = 0
         # 迁移三态标志（互斥，含义见 _migrate_if_needed 与 MainWindow 对应提示文案）：
         # - migration_failed: 迁移两次尝试均失败，已还原旧数据，本次运行新数据无法保存
         # - data_reset: 还原备份也失败，损坏库已改名保留，应用以新建的空库运行
@@ -47,23 +299,72 @@ class Database:
         self.migration_failed: bool = False
         self.data_reset: bool = False
         self.backup_aborted: bool = False
+
+        # 每线程一个持久连接（替代每次调用新建连接并重跑 PRAGMA）
+        self._local = threading.local()
+        # 全部已打开连接的弱引用集合，供 close() 统一关闭
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        # 连接代次：close() 后 +1，各线程持有的旧代次连接在下次使用时重新打开
+        self._generation = 0
+
         self._init_database()
 
-    @contextmanager
-    def _get_connection(self):
-        """获取数据库连接的上下文管理器"""
-        conn = sqlite3.connect(self.db_path)
+    def _open_connection(self) -> _ThreadConnection:
+        """为当前线程打开持久连接并执行一次性 PRAGMA"""
+        # check_same_thread=False：连接只在所属线程内使用，但 close() 可能由其他线程
+        # （如主窗口退出流程）调用
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
         conn.row_factory = sqlite3.Row  # 使结果可以按列名访问
 
-        # 每个新连接在其他语句之前设置的 PRAGMA（均在 autocommit 状态下执行）：
+        # 每个新连接在其他语句之前设置一次的 PRAGMA（均在 autocommit 状态下执行）：
+        # - auto_vacuum=INCREMENTAL：删除释放的页留在空闲页链表上，由 reclaim_free_pages
+        #   分小步归还文件系统（后台回收线程 core/reclaimer.py），不必整库 VACUUM。只对尚未
+        #   建表的新库生效；已有库在下一次 vacuum() 重建文件时一并转换
         # - journal_mode=WAL：写日志模式，读写并发更稳定；设置持久化在库文件里，重复设置幂等
         # - busy_timeout=5000：其他连接持有写锁时最多等待 5 秒再抛 OperationalError，而非立即失败
         # - synchronous=NORMAL：WAL 模式下的推荐权衡——牺牲操作系统崩溃/掉电那一瞬间的极端持久性，
         #   换取相对 FULL 明显更好的写入性能；本应用属崩溃非频发的桌面工具，应用自身崩溃时
         #   WAL 机制仍保证已提交事务不丢，可接受的权衡
+        # - journal_size_limit：-wal 全部回写后下一次写入从头重用文件时，把文件截回
+        #   WAL_SIZE_LIMIT_MB，长读事务期间涨大的 -wal 不会一直占着磁盘
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
         conn.execute('PRAGMA journal_mode=WAL')
         conn.execute('PRAGMA busy_timeout=5000')
         conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA journal_size_limit={config.WAL_SIZE_LIMIT_MB * 1024 * 1024}')
+
+        with self._connections_lock:
+            holder = _ThreadConnection(conn, self._generation)
+            self._connections.add(holder)
+        self._local.holder = holder
+        return holder
+
+    @contextmanager
+    def _get_connection(self):
+        """
+        获取当前线程持久连接的上下文管理器
+
+        每个线程首次使用时打开连接，之后复用（PRAGMA 只执行一次，预编译语句缓存
+        跨调用命中）。最外层退出时提交、异常时回滚；嵌套使用时共享外层事务，
+        由最外层统一提交/回滚。
+        """
+        holder = getattr(self._local, 'holder', None)
+        if holder is None or holder.conn is None or holder.generation != self._generation:
+            holder = self._open_connection()
+
+        if holder.depth > 0:
+            # 嵌套：复用外层事务，不单独提交
+            holder.depth += 1
+            try:
+                yield holder.conn
+            finally:
+                holder.depth -= 1
+            return
+
+        conn = holder.conn
+        holder.depth = 1
         try:
             yield conn
             conn.commit()
@@ -71,10 +372,146 @@ class Database:
             conn.rollback()
             raise e
         finally:
-            conn.close()
+            holder.depth = 0
+
+    def close(self):
+        """
+        关闭本实例在所有线程上打开的持久连接（应用退出、以及迁移还原等需要
+        替换库文件之前调用）。最后一个连接关闭时 SQLite 会把 -wal 合并回主文件。
+
+        调用方须保证此时没有其他线程正在使用本实例；之后再使用本实例时各线程
+        会自动重新打开连接。
+        """
+        with self._connections_lock:
+            self._generation += 1
+            holders = list(self._connections)
+            self._connections.clear()
+        for holder in holders:
+            holder.close()
+
+    # ========== 分区库 ==========
+
+    def _attach_partition(self, cursor: sqlite3.Cursor, task_key: int, task_id: str) -> str:
+        """
+        把任务的分区库附加到当前线程的持久连接上（已附加则只更新最近使用顺序）。分区库
+        文件不存在时随 ATTACH 新建，并按当前结构建 samples/sample_chunks/rollups 表；已有的
+        分区库补齐之后新增的指标列。附加数达到 PARTITION_ATTACH_LIMIT 时先分离最久未用的
+        分区（事务进行中不分离：本事务可能正在使用它们）
+
+        Args:
+            cursor: 当前线程持久连接的游标
+            task_key: 任务整数键（附加名 p<整数键>，语句文本固定、预编译缓存可命中）
+            task_id: 任务ID（分区库按它命名：整数键在任务删除后可能被新任务复用）
+
+        Returns:
+            str: 附加名，拼在表名前使用（如 p12.samples）
+        """
+        holder = self._local.holder
+        entry = holder.attached.pop(task_key, None)
+        if entry is not None:
+            if entry[0] == task_id:
+                holder.attached[task_key] = entry
+                return entry[1]
+            # 整数键已被新任务复用，先分离已删除任务的分区
+            cursor.execute(f'DETACH DATABASE {entry[1]}')
+        while len(holder.attached) >= PARTITION_ATTACH_LIMIT and not cursor.connection.in_transaction:
+            _, alias = holder.attached.pop(next(iter(holder.attached)))
+            cursor.execute(f'DETACH DATABASE {alias}')
+
+        path = partition_path(self.db_path, task_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        alias = f'p{task_key}'
+        cursor.execute(f'ATTACH DATABASE ? AS {alias}', (path,))
+        holder.attached[task_key] = (task_id, alias)
+        cursor.execute(f'PRAGMA {alias}.journal_size_limit={config.WAL_SIZE_LIMIT_MB * 1024 * 1024}')
+        cursor.execute(f'PRAGMA {alias}.user_version')
+        if cursor.fetchone()[0] == 0:
+            # 新分区库：与主库相同的空闲页回收方式、日志模式与表结构
+            cursor.execute(f'PRAGMA {alias}.auto_vacuum=INCREMENTAL')
+            cursor.execute(f'PRAGMA {alias}.journal_mode=WAL')
+            self._create_samples_table(cursor, f'{alias}.samples',
+                                       [int(c[1:]) for c in self._sample_columns.values()])
+            self._create_chunks_table(cursor, f'{alias}.sample_chunks')
+            self._create_rollups_table(cursor, f'{alias}.rollups')
+            cursor.execute(f'PRAGMA {alias}.user_version = {SCHEMA_VERSION}')
+        else:
+            columns = set(self._table_columns(cursor, 'samples', alias))
+            for column in self._sample_columns.values():
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE {alias}.samples ADD COLUMN {column} REAL')
+        return alias
+
+    def _schema(self, task_key: int) -> str:
+        """任务采样数据所在的库：分区任务为已附加的分区库附加名（须先 _attach_partition），其余为 main"""
+        entry = self._local.holder.attached.get(task_key)
+        return entry[1] if entry is not None else 'main'
+
+    def _task_storage(self, cursor: sqlite3.Cursor, task_id: str) -> Tuple[str, bool]:
+        """
+        读取任务的存储位置：分区任务附加其分区库。返回 (采样数据所在的库, 是否有 held
+        单元格——读取时需按阶梯序列还原)；任务不存在时为 ('main', False)
+        """
+        cursor.execute('SELECT id, change_only, partitioned FROM tasks WHERE task_id = ?',
+                       (task_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return 'main', False
+        schema = self._attach_partition(cursor, row[0], task_id) if row[2] else 'main'
+        return schema, bool(row[1])
+
+    def _drop_partitions(self, partitions: Dict[int, str]):
+        """
+        删除任务的分区库文件（须在删除任务的事务提交之后调用）。先从当前线程的连接分离；
+        其他线程的连接在整数键被复用时分离。删除失败（如 Windows 下文件仍被其他连接占用）
+        只记日志，文件留待下次启动时由 _purge_orphan_partitions 清理
+
+        Args:
+            partitions: {任务整数键: 任务ID}
+        """
+        holder = getattr(self._local, 'holder', None)
+        for task_key, task_id in partitions.items():
+            if holder is not None and holder.conn is not None:
+                entry = holder.attached.pop(task_key, None)
+                if entry is not None:
+                    holder.conn.execute(f'DETACH DATABASE {entry[1]}')
+            self._remove_partition_files(partition_path(self.db_path, task_id))
+
+    @staticmethod
+    def _remove_partition_files(path: str):
+        """删除分区库文件及其 -wal/-shm 边车文件（不存在的跳过）"""
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.warning("删除分区库文件失败，下次启动时清理: %s", path + suffix,
+                               exc_info=True)
+
+    def _purge_orphan_partitions(self):
+        """
+        启动时删除任务已不存在的分区库文件（删除任务后文件删除失败、或删除中途崩溃遗留的）。
+        库未能迁移到当前版本时不清理；损坏后以空库运行（data_reset）时也不清理：改名保留的
+        旧库仍引用这些文件
+        """
+        directory = self.db_path + '.parts'
+        if (self.migration_failed or self.backup_aborted or self.data_reset
+                or not os.path.isdir(directory)):
+            return
+        try:
+            with self._get_connection() as conn:
+                task_ids = {row[0] for row in
+                            conn.execute('SELECT task_id FROM tasks WHERE partitioned = 1')}
+            for name in os.listdir(directory):
+                task_id, ext, suffix = name.partition('.db')
+                if ext and not suffix and task_id not in task_ids:
+                    logger.warning("清理孤儿分区库: %s", name)
+                    self._remove_partition_files(os.path.join(directory, name))
+        except Exception:
+            logger.error("清理孤儿分区库失败", exc_info=True)
 
     def _init_database(self):
-        """初始化数据库表结构（新库直接建 v1 结构并置 user_version=1，旧库走迁移）"""
+        """初始化数据库表结构（新库直接建当前版本结构并置 user_version，旧库走迁移）"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
@@ -85,58 +522,328 @@ class Database:
             is_new_db = cursor.fetchone() is None
 
             if is_new_db:
-                self._create_schema_v1(cursor)
+                self._create_schema(cursor)
 
         # 旧库按需迁移到当前版本
         self._migrate_if_needed()
+        self._load_sample_columns()
+        self._purge_orphan_partitions()
 
     @staticmethod
-    def _create_schema_v1(cursor: sqlite3.Cursor):
-        """创建 v1 版本的表结构与索引，并置 user_version=1"""
-        # 创建任务表（metric_type 列存 JSON 数组文本，如 ["memory_rss","cpu_percent"]）
+    def _create_schema(cursor: sqlite3.Cursor):
+        """创建当前版本（SCHEMA_VERSION）的表结构与索引，并置 user_version"""
+        Database._create_tasks_table(cursor, 'tasks')
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                task_id TEXT PRIMARY KEY,
+            CREATE TABLE IF NOT EXISTS metrics (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.executemany('INSERT OR IGNORE INTO metrics (name) VALUES (?)',
+                           [(m,) for m in SAMPLE_METRIC_COLUMNS])
+        cursor.execute('SELECT id FROM metrics ORDER BY id')
+        Database._create_samples_table(cursor, 'samples', [row[0] for row in cursor.fetchall()])
+        Database._create_summary_tables(cursor)
+        Database._create_rollups_table(cursor)
+        Database._create_chunks_table(cursor)
+
+        # 新库直接标记为当前版本（PRAGMA 不能参数化，使用常量拼接）
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    @staticmethod
+    def _create_tasks_table(cursor: sqlite3.Cursor, table: str):
+        """
+        创建任务表：id 为整数代理键（samples 以它引用任务），task_id 为对外的 UUID 文本。
+        metric_type 列存 JSON 数组文本，如 ["memory_rss","cpu_percent"]；metric_periods 列存
+        JSON 对象，如 {"memory_uss": 60}，NULL 表示全部指标每周期采集；change_only 为 1 表示
+        该任务的采样行中有 held 单元格；partitioned 为 1 表示该任务的采样数据在分区库中；
+        deleting 为 1 表示任务已排队删除（不再出现在任务列表中，数据分批删除）；
+        raw_kept_from_ms / minute_kept_from_ms 为分级保留裁剪到的时刻（之前只剩更粗的汇总）
+        """
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                task_id TEXT NOT NULL UNIQUE,
                 pid INTEGER NOT NULL,
                 process_name TEXT NOT NULL,
                 metric_type TEXT NOT NULL,
                 interval REAL NOT NULL,
                 start_time TEXT NOT NULL,
                 end_time TEXT,
-                status TEXT NOT NULL
+                status TEXT NOT NULL,
+                metric_periods TEXT,
+                change_only INTEGER NOT NULL DEFAULT 0,
+                partitioned INTEGER NOT NULL DEFAULT 0,
+                deleting INTEGER NOT NULL DEFAULT 0,
+                raw_kept_from_ms INTEGER,
+                minute_kept_from_ms INTEGER
             )
         ''')
 
-        # 创建数据点表（metric_type 允许 NULL，兼容旧数据）
+    @staticmethod
+    def _create_samples_table(cursor: sqlite3.Cursor, table: str, metric_ids: List[int]):
+        """
+        创建采样表（当前结构）：每个任务每个采集周期一行，每个指标一列 m<metrics.id>（本周期
+        未采集的指标为 NULL，NULL 列在 SQLite 记录中只占 1 字节头）；ts_ms 为 epoch 毫秒整数。
+
+        (task_key, ts_ms) 为主键、WITHOUT ROWID：行按主键聚簇存储在唯一一棵 B 树里，按任务 +
+        时间范围读取任意指标列都不需要回表，也不再另建二级索引（写入只维护一棵树）。写入为
+        upsert。held 为只记变化的位图（第 i 位表示 m<i> 沿用前值），没有沿用时为 NULL
+        """
+        metric_columns = ''.join(f'\n                m{i} REAL,' for i in metric_ids)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                task_key INTEGER NOT NULL,
+                ts_ms INTEGER NOT NULL,{metric_columns}
+                held INTEGER,
+                PRIMARY KEY(task_key, ts_ms),
+                FOREIGN KEY(task_key) REFERENCES tasks(id)
+            ) WITHOUT ROWID
+        ''')
+
+    @staticmethod
+    def _create_summary_tables(cursor: sqlite3.Cursor):
+        """
+        创建任务汇总表：task_summary 每任务一行（采集次数、首末采样时间戳），
+        task_metric_summary 每任务每指标一行（数据点数、最小/最大值、求和，均值 = 求和 / 点数）。
+        由 save_data_points / 删除任务在同一事务内增量维护，任务列表、统计摘要与取最新
+        时间戳只按主键读一行，不再扫描 samples
+        """
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS data_points (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task_id TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                value REAL NOT NULL,
-                metric_type TEXT,
-                FOREIGN KEY(task_id) REFERENCES tasks(task_id)
+            CREATE TABLE IF NOT EXISTS task_summary (
+                task_key INTEGER PRIMARY KEY,
+                sample_count INTEGER NOT NULL,
+                first_ts_ms INTEGER NOT NULL,
+                last_ts_ms INTEGER NOT NULL,
+                FOREIGN KEY(task_key) REFERENCES tasks(id)
             )
         ''')
-
-        # 创建索引以提高查询性能
         cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_data_points_task_id
-            ON data_points(task_id)
+            CREATE TABLE IF NOT EXISTS task_metric_summary (
+                task_key INTEGER NOT NULL,
+                metric_id INTEGER NOT NULL,
+                point_count INTEGER NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                sum_value REAL,
+                PRIMARY KEY(task_key, metric_id),
+                FOREIGN KEY(task_key) REFERENCES tasks(id)
+            ) WITHOUT ROWID
         ''')
 
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_data_points_timestamp
-            ON data_points(timestamp)
+    @staticmethod
+    def _rebuild_summaries(cursor: sqlite3.Cursor, task_key: Optional[int] = None):
+        """
+        从 samples 重新聚合任务汇总（迁移建表时；此时尚无压缩块）
+
+        Args:
+            cursor: 游标
+            task_key: 任务整数键，None 表示全部任务
+        """
+        where, params = ('', ()) if task_key is None else ('WHERE task_key = ?', (task_key,))
+        cursor.execute(f'DELETE FROM task_summary {where}', params)
+        cursor.execute(f'DELETE FROM task_metric_summary {where}', params)
+        cursor.execute(f'''
+            INSERT INTO task_summary (task_key, sample_count, first_ts_ms, last_ts_ms)
+            SELECT task_key, COUNT(*), MIN(ts_ms), MAX(ts_ms) FROM samples {where}
+            GROUP BY task_key
+        ''', params)
+        for column in Database._table_columns(cursor, 'samples'):
+            if column in ('task_key', 'ts_ms', 'held'):
+                continue
+            condition = f'{where} AND' if where else 'WHERE'
+            cursor.execute(f'''
+                INSERT INTO task_metric_summary
+                    (task_key, metric_id, point_count, min_value, max_value, sum_value)
+                SELECT task_key, {column[1:]}, COUNT({column}), MIN({column}), MAX({column}),
+                       SUM({column})
+                FROM samples {condition} {column} IS NOT NULL
+                GROUP BY task_key
+            ''', params)
+
+    @staticmethod
+    def _create_rollups_table(cursor: sqlite3.Cursor, table: str = 'rollups'):
+        """
+        创建降采样汇总表：每任务每指标每个分桶粒度（ROLLUP_RESOLUTIONS_MS）每个桶一行，
+        记点数、最小/最大值及其出现时间（并列取最早）、求和与桶内首末值。主键以
+        (task_key, metric_id, resolution_ms) 打头、bucket_ms 收尾，按任务 + 指标 + 粒度 +
+        时间范围读取即一段主键区间
+        """
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                task_key INTEGER NOT NULL,
+                metric_id INTEGER NOT NULL,
+                resolution_ms INTEGER NOT NULL,
+                bucket_ms INTEGER NOT NULL,
+                point_count INTEGER NOT NULL,
+                min_value REAL,
+                min_ts_ms INTEGER,
+                max_value REAL,
+                max_ts_ms INTEGER,
+                sum_value REAL,
+                first_ts_ms INTEGER,
+                first_value REAL,
+                last_ts_ms INTEGER,
+                last_value REAL,
+                PRIMARY KEY(task_key, metric_id, resolution_ms, bucket_ms),
+                FOREIGN KEY(task_key) REFERENCES tasks(id)
+            ) WITHOUT ROWID
         ''')
 
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_data_points_task_metric
-            ON data_points(task_id, metric_type)
+    @staticmethod
+    def _rebuild_rollups(cursor: sqlite3.Cursor, task_key: Optional[int] = None,
+                         windows: Optional[Set[int]] = None, schema: str = 'main'):
+        """
+        从 samples 重新聚合降采样汇总（迁移建表时全量；采样值被改写时只重算该任务本批写入
+        涉及的窗口——窗口与最粗粒度的桶对齐，写入前已展开回 samples，其余窗口可能在压缩块中）。
+        先按桶聚合点数/极值/求和/首末时间，再按主键回查首末值与极值出现的时间
+
+        Args:
+            cursor: 游标
+            task_key: 任务整数键，None 表示全部任务
+            windows: 只重算这些窗口（SAMPLE_CHUNK_SPAN_MS 对齐的起点，须同时给出 task_key），
+                     None 表示不限
+            schema: 采样数据与降采样汇总所在的库（分区任务为其分区库的附加名）
+        """
+        span = SAMPLE_CHUNK_SPAN_MS
+        sample_filter, rollup_filter, params = [], [], []
+        if task_key is not None:
+            sample_filter.append('task_key = ?')
+            rollup_filter.append('r.task_key = ?')
+            params.append(task_key)
+        if windows:
+            in_windows = ', '.join(str(int(w)) for w in sorted(windows))
+            # 前一个条件让 samples 走主键区间，后一个只保留涉及的窗口
+            sample_filter.append(f'ts_ms BETWEEN {min(windows)} AND {max(windows) + span - 1} '
+                                 f'AND ts_ms - ts_ms % {span} IN ({in_windows})')
+            rollup_filter.append(f'r.bucket_ms - r.bucket_ms % {span} IN ({in_windows})')
+        where = ' AND '.join(sample_filter)
+        cursor.execute(f'DELETE FROM {schema}.rollups AS r {"WHERE " if rollup_filter else ""}'
+                       f'{" AND ".join(rollup_filter)}', params)
+        for column in Database._table_columns(cursor, 'samples', schema):
+            if column in ('task_key', 'ts_ms', 'held'):
+                continue
+            condition = f'WHERE {where} AND' if where else 'WHERE'
+            for resolution in ROLLUP_RESOLUTIONS_MS:
+                cursor.execute(f'''
+                    INSERT INTO {schema}.rollups (task_key, metric_id, resolution_ms, bucket_ms,
+                                                  point_count, min_value, max_value, sum_value,
+                                                  first_ts_ms, last_ts_ms)
+                    SELECT task_key, {column[1:]}, {resolution}, ts_ms - ts_ms % {resolution},
+                           COUNT({column}), MIN({column}), MAX({column}), SUM({column}),
+                           MIN(ts_ms), MAX(ts_ms)
+                    FROM {schema}.samples {condition} {column} IS NOT NULL
+                    GROUP BY task_key, ts_ms - ts_ms % {resolution}
+                ''', params)
+            bucket = 's.task_key = r.task_key AND s.ts_ms BETWEEN r.bucket_ms AND r.last_ts_ms'
+            cursor.execute(f'''
+                UPDATE {schema}.rollups AS r SET
+                    first_value = (SELECT {column} FROM {schema}.samples s
+                                   WHERE s.task_key = r.task_key AND s.ts_ms = r.first_ts_ms),
+                    last_value = (SELECT {column} FROM {schema}.samples s
+                                  WHERE s.task_key = r.task_key AND s.ts_ms = r.last_ts_ms),
+                    min_ts_ms = (SELECT MIN(s.ts_ms) FROM {schema}.samples s
+                                 WHERE {bucket} AND s.{column} = r.min_value),
+                    max_ts_ms = (SELECT MIN(s.ts_ms) FROM {schema}.samples s
+                                 WHERE {bucket} AND s.{column} = r.max_value)
+                WHERE {' AND '.join([f'r.metric_id = {column[1:]}', *rollup_filter])}
+            ''', params)
+
+    @staticmethod
+    def _rebuild_metric_summaries(cursor: sqlite3.Cursor, task_key: int, schema: str = 'main'):
+        """
+        重新聚合单个任务的每指标汇总（采样值被改写、极值无法增量回退时）：由该任务的
+        小时粒度降采样汇总合并而来——须在 _rebuild_rollups 重算涉及的窗口之后调用。降采样
+        汇总覆盖 samples 行、held 单元格与压缩块中的全部数据点，不必读取或解码原始数据
+
+        Args:
+            cursor: 游标
+            task_key: 任务整数键
+            schema: 降采样汇总所在的库（分区任务为其分区库的附加名）
+        """
+        cursor.execute('DELETE FROM task_metric_summary WHERE task_key = ?', (task_key,))
+        cursor.execute(f'''
+            INSERT INTO task_metric_summary
+                (task_key, metric_id, point_count, min_value, max_value, sum_value)
+            SELECT task_key, metric_id, SUM(point_count), MIN(min_value), MAX(max_value),
+                   SUM(sum_value)
+            FROM {schema}.rollups WHERE task_key = ? AND resolution_ms = ?
+            GROUP BY metric_id
+            HAVING SUM(point_count) > 0
+        ''', (task_key, ROLLUP_RESOLUTIONS_MS[-1]))
+
+    @staticmethod
+    def _create_chunks_table(cursor: sqlite3.Cursor, table: str = 'sample_chunks'):
+        """
+        创建采样压缩块表：每任务每个 SAMPLE_CHUNK_SPAN_MS 窗口每个指标一行，data 为
+        data/chunks.py 编码的时间戳与值，另记点数、最小/最大值与求和（统计与汇总重算时
+        不必解码）。主键以 (task_key, chunk_ms) 打头：按任务 + 时间范围读取、取已封块的
+        最新窗口都是一段索引区间。块数据通常为数百字节到数 KB，远大于 WITHOUT ROWID 表
+        适合的行长，故用普通 rowid 表
+        """
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                task_key INTEGER NOT NULL,
+                chunk_ms INTEGER NOT NULL,
+                metric_id INTEGER NOT NULL,
+                point_count INTEGER NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                sum_value REAL,
+                data BLOB NOT NULL,
+                PRIMARY KEY(task_key, chunk_ms, metric_id),
+                FOREIGN KEY(task_key) REFERENCES tasks(id)
+            )
         ''')
 
-        # 新库直接标记为当前版本（PRAGMA 不能参数化，使用常量拼接）
-        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    @staticmethod
+    def _delete_summaries(cursor: sqlite3.Cursor, task_key: int):
+        """删除任务的汇总行与降采样汇总（随任务的采样数据一并删除）"""
+        cursor.execute('DELETE FROM task_summary WHERE task_key = ?', (task_key,))
+        cursor.execute('DELETE FROM task_metric_summary WHERE task_key = ?', (task_key,))
+        cursor.execute('DELETE FROM rollups WHERE task_key = ?', (task_key,))
+
+    @staticmethod
+    def _table_columns(cursor: sqlite3.Cursor, table: str, schema: str = 'main') -> List[str]:
+        """表的全部列名（按定义顺序）"""
+        cursor.execute(f'PRAGMA {schema}.table_info({table})')
+        return [row[1] for row in cursor.fetchall()]
+
+    def _load_sample_columns(self):
+        """
+        读取指标查找表与 samples 现有的指标列，并为代码中新增、库里尚缺的指标登记 id、
+        补齐列（迁移失败/中止时库仍是旧结构，指标列为空，数据读写均返回空）
+        """
+        # {指标类型: 列名 m<id>}，按 metrics.id 升序（同一时间戳内数据点按此顺序排列）
+        self._sample_columns: Dict[str, str] = {}
+        # {metrics.id: 指标类型}，读取时把数据点的指标 id 还原为指标类型
+        self._metric_names: Dict[int, str] = {}
+        self._held_bits: Dict[str, int] = {}
+        self._deadband: Dict[str, float] = {}
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                columns = set(self._table_columns(cursor, 'samples'))
+                if 'ts_ms' not in columns:
+                    return
+                cursor.executemany('INSERT OR IGNORE INTO metrics (name) VALUES (?)',
+                                   [(m,) for m in SAMPLE_METRIC_COLUMNS])
+                cursor.execute('SELECT id, name FROM metrics ORDER BY id')
+                metrics = cursor.fetchall()
+                for metric_id, name in metrics:
+                    if f'm{metric_id}' not in columns:
+                        cursor.execute(f'ALTER TABLE samples ADD COLUMN m{metric_id} REAL')
+            self._sample_columns = {name: f'm{metric_id}' for metric_id, name in metrics}
+            self._metric_names = {metric_id: name for metric_id, name in metrics}
+            # {列名: held 位}（id 超出位图的指标不在其中，总是写值）
+            self._held_bits = {f'm{metric_id}': 1 << metric_id for metric_id, _ in metrics
+                               if metric_id <= HELD_MAX_METRIC_ID}
+            # {列名: 死区容差}（只记变化时使用）
+            self._deadband = {self._sample_columns[m]: float(tolerance)
+                              for m, tolerance in self._deadband_metrics.items()
+                              if m in self._sample_columns and tolerance > 0}
+        except Exception:
+            logger.error("读取采样表结构失败", exc_info=True)
 
     # ========== 迁移相关 ==========
 
@@ -168,7 +875,8 @@ class Database:
 
         Database._migration_attempted = True
 
-        backup_path = self.db_path + '.bak_v0'
+        # 备份文件按迁移前的版本号命名（v0 库为 .bak_v0，v1 库为 .bak_v1）
+        backup_path = self.db_path + f'.bak_v{version}'
         if not self._backup_before_migration(backup_path):
             # 备份失败：中止迁移，旧库原样保留，不做任何写入
             self.backup_aborted = True
@@ -176,13 +884,26 @@ class Database:
             self._save_migration_state()
             return
 
+        if 1 <= version < 3:
+            # 旧数据的指标类型回填在迁移事务之外分批提交（见 _backfill_null_metric_types）；
+            # 失败时已提交的批次无需还原，本次运行按迁移失败处理，下次启动从剩余行继续
+            try:
+                self._backfill_null_metric_types()
+            except Exception:
+                logger.error("迁移前回填旧数据的指标类型失败，下次启动继续", exc_info=True)
+                self.migration_failed = True
+                self._save_migration_state()
+                return
+
         # 首次失败从备份还原后立即重试一次
         for attempt in (1, 2):
             try:
-                # 单事务执行迁移，失败自动回滚
+                # 单事务依次执行迁移链中的后续全部步骤，任一步失败整体回滚
                 with self._get_connection() as conn:
                     cursor = conn.cursor()
-                    self._migrate_v0_to_v1(cursor)
+                    for target, method in _MIGRATIONS:
+                        if target > version:
+                            getattr(self, method)(cursor)
                 logger.info("数据库迁移完成: v%s -> v%s", version, SCHEMA_VERSION)
                 self._save_migration_state()
                 return
@@ -263,11 +984,300 @@ class Database:
             ON data_points(task_id, metric_type)
         ''')
 
-        # 步骤5: 更新版本号（PRAGMA 不能参数化，使用常量拼接）
-        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        # 步骤5: 更新版本号
+        cursor.execute('PRAGMA user_version = 1')
+
+    @staticmethod
+    def _migrate_v1_to_v2(cursor: sqlite3.Cursor):
+        """
+        v1 -> v2 迁移：tasks 增加 metric_periods 列（幂等检查；旧任务保持 NULL，
+        即全部指标每周期采集，与迁移前语义一致）
+        """
+        cursor.execute('PRAGMA table_info(tasks)')
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'metric_periods' not in columns:
+            cursor.execute('ALTER TABLE tasks ADD COLUMN metric_periods TEXT')
+
+        cursor.execute('PRAGMA user_version = 2')
+
+    @staticmethod
+    def _null_metric_type_tasks(cursor: sqlite3.Cursor) -> List[Tuple[str, str]]:
+        """
+        data_points 中仍有 metric_type 为 NULL/空串的旧数据（单指标时代写入）的任务及其
+        首指标（所属任务不存在的行不计入，保持原样）
+
+        Returns:
+            List[Tuple[str, str]]: [(任务ID, 首指标)]
+        """
+        cursor.execute('''
+            SELECT DISTINCT d.task_id, t.metric_type FROM data_points d
+            JOIN tasks t ON t.task_id = d.task_id
+            WHERE d.metric_type IS NULL OR d.metric_type = ''
+        ''')
+        return [(task_id, Database._parse_metric_types(task_metrics)[0])
+                for task_id, task_metrics in cursor.fetchall()]
+
+    @staticmethod
+    def _backfill_metric_type_batch(cursor: sqlite3.Cursor, task_id: str, first_metric: str,
+                                    batch_size: int) -> int:
+        """
+        把一个任务至多 batch_size 行 NULL/空串 metric_type 回填为其首指标（与旧版查询
+        "OR metric_type IS NULL" 的兜底语义一致），经 (task_id, metric_type) 索引定位
+
+        Returns:
+            int: 本批回填的行数，小于 batch_size 即该任务已回填完毕
+        """
+        cursor.execute('''
+            UPDATE data_points SET metric_type = ?
+            WHERE rowid IN (
+                SELECT rowid FROM data_points
+                WHERE task_id = ? AND (metric_type IS NULL OR metric_type = '')
+                LIMIT ?
+            )
+        ''', (first_metric, task_id, batch_size))
+        return cursor.rowcount
+
+    def _backfill_null_metric_types(self, batch_size: Optional[int] = None) -> int:
+        """
+        v1/v2 库迁移前的独立步骤：把 NULL/空串 metric_type 的旧数据按任务逐批回填为首指标，
+        每批一个短事务提交，不进入迁移的单一事务（写锁只持有一批的时长）。
+
+        回填前后旧版读取的语义相同，已提交的批次是合法的 v2 数据，所以失败或进程中断时
+        不需要还原：只改写仍为 NULL/空串的行，下次启动重跑即从剩余行继续
+
+        Args:
+            batch_size: 每批最多回填的行数，默认取 MIGRATION_BATCH_SIZE
+
+        Returns:
+            int: 回填的行数
+        """
+        batch_size = MIGRATION_BATCH_SIZE if batch_size is None else batch_size
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'data_points'")
+            pending = Database._null_metric_type_tasks(cursor) if cursor.fetchone() else []
+        total = 0
+        for task_id, first_metric in pending:
+            while True:
+                with self._get_connection() as conn:
+                    count = Database._backfill_metric_type_batch(conn.cursor(), task_id,
+                                                                 first_metric, batch_size)
+                total += count
+                if count < batch_size:
+                    break
+        if total:
+            logger.info("迁移前回填旧数据的指标类型: 行数=%d 任务数=%d", total, len(pending))
+        return total
+
+    @staticmethod
+    def _migrate_v2_to_v3(cursor: sqlite3.Cursor):
+        """
+        v2 -> v3 迁移：data_points（每指标每周期一行）按 (task_id, timestamp) 透视为
+        samples（每周期一行、每指标一列），随后删除 data_points 及其索引
+
+        透视前 metric_type 为 NULL/空串的旧数据已回填为所属任务的首指标（见
+        _backfill_null_metric_types），透视只按指标名精确匹配；库里出现、但代码中已不存在
+        的指标类型同样建列保留，列名不合法的跳过并记日志。
+        """
+        # v3 结构的 samples（列名即指标类型），由 v3 -> v4 再转为当前结构
+        metric_columns = ''.join(f'\n                "{m}" REAL,' for m in SAMPLE_METRIC_COLUMNS)
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS samples (
+                task_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,{metric_columns}
+                FOREIGN KEY(task_id) REFERENCES tasks(task_id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_samples_task_time
+            ON samples(task_id, timestamp)
+        ''')
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'data_points'")
+        if cursor.fetchone() is not None:
+            # v1/v2 库已由迁移前的 _backfill_null_metric_types 分批回填，这里只剩 v0 库
+            # （v0 -> v1 已按任务回填，个别残留）在迁移事务内一次处理（LIMIT -1 即不限行数）
+            for task_id, first_metric in Database._null_metric_type_tasks(cursor):
+                Database._backfill_metric_type_batch(cursor, task_id, first_metric, -1)
+
+            columns = set(Database._table_columns(cursor, 'samples'))
+            cursor.execute('SELECT DISTINCT task_id FROM data_points')
+            task_ids = [row[0] for row in cursor.fetchall()]
+            for task_id in task_ids:
+                # 所属任务缺失的 NULL 行未被回填，无法归入任何指标，随 data_points 一并删除
+                cursor.execute('SELECT DISTINCT metric_type FROM data_points '
+                               'WHERE task_id = ? AND metric_type IS NOT NULL', (task_id,))
+                metrics = []
+                for (metric,) in cursor.fetchall():
+                    if not _COLUMN_NAME_RE.match(metric):
+                        logger.warning("迁移跳过无法建列的指标: task_id=%s metric=%r", task_id, metric)
+                        continue
+                    if metric not in columns:
+                        cursor.execute(f'ALTER TABLE samples ADD COLUMN "{metric}" REAL')
+                        columns.add(metric)
+                    metrics.append(metric)
+                if not metrics:
+                    continue
+
+                # 同一时间戳同一指标出现多行（旧版重复写入）时取最大值
+                selects = ', '.join('MAX(CASE WHEN metric_type = ? THEN value END)' for _ in metrics)
+                names = ', '.join(f'"{m}"' for m in metrics)
+                cursor.execute(f'''
+                    INSERT INTO samples (task_id, timestamp, {names})
+                    SELECT task_id, timestamp, {selects}
+                    FROM data_points WHERE task_id = ?
+                    GROUP BY timestamp
+                ''', (*metrics, task_id))
+
+            cursor.execute('DROP TABLE data_points')
+
+        cursor.execute('PRAGMA user_version = 3')
+
+    @staticmethod
+    def _migrate_v3_to_v4(cursor: sqlite3.Cursor):
+        """
+        v3 -> v4 迁移：整数键与整数时间戳
+
+        1. tasks 重建为带整数代理键 id 的结构（按 start_time 顺序编号）
+        2. 新建 metrics 查找表，为 v3 samples 的每个指标列登记 id
+        3. samples 重建为 (task_key, ts_ms, m<id>...)：task_id 换成任务整数键，ISO 文本时间戳
+           换算为 epoch 毫秒；不属于任何任务的孤儿行、时间戳无法解析的行，以及换算到
+           同一毫秒的重复行（只保留先出现的一行）被丢弃并记日志
+        """
+        Database._create_tasks_table(cursor, 'tasks_v4')
+        cursor.execute('''
+            INSERT INTO tasks_v4 (task_id, pid, process_name, metric_type, interval,
+                                  start_time, end_time, status, metric_periods)
+            SELECT task_id, pid, process_name, metric_type, interval,
+                   start_time, end_time, status, metric_periods
+            FROM tasks ORDER BY start_time, rowid
+        ''')
+        cursor.execute('DROP TABLE tasks')
+        cursor.execute('ALTER TABLE tasks_v4 RENAME TO tasks')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS metrics (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        metrics = [c for c in Database._table_columns(cursor, 'samples')
+                   if c not in ('task_id', 'timestamp')]
+        cursor.executemany('INSERT OR IGNORE INTO metrics (name) VALUES (?)',
+                           [(m,) for m in metrics])
+        cursor.execute('SELECT id, name FROM metrics')
+        metric_ids = {name: metric_id for metric_id, name in cursor.fetchall()}
+
+        ids = [metric_ids[m] for m in metrics]
+        Database._create_samples_table(cursor, 'samples_v4', ids)
+        if metrics:
+            targets = ', '.join(f'm{i}' for i in ids)
+            sources = ', '.join(f's."{m}"' for m in metrics)
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO samples_v4 (task_key, ts_ms, {targets})
+                SELECT t.id, {_ISO_TO_EPOCH_MS_SQL.format('s.timestamp')}, {sources}
+                FROM samples s JOIN tasks t ON t.task_id = s.task_id
+                ORDER BY s.rowid
+            ''')
+        cursor.execute('SELECT (SELECT COUNT(*) FROM samples) - (SELECT COUNT(*) FROM samples_v4)')
+        dropped = cursor.fetchone()[0]
+        if dropped:
+            logger.warning("迁移丢弃无法转换的采样行 %d 行（孤儿任务/时间戳无效/毫秒内重复）", dropped)
+        cursor.execute('DROP TABLE samples')
+        cursor.execute('ALTER TABLE samples_v4 RENAME TO samples')
+
+        cursor.execute('PRAGMA user_version = 4')
+
+    @staticmethod
+    def _migrate_v4_to_v5(cursor: sqlite3.Cursor):
+        """
+        v4 -> v5 迁移：samples 由"rowid 表 + (task_key, ts_ms) 唯一索引"重建为以
+        (task_key, ts_ms) 为主键的 WITHOUT ROWID 表（幂等检查：v3 -> v4 在同一迁移链内
+        已按当前结构建表时跳过）
+        """
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'samples'")
+        if 'WITHOUT ROWID' not in cursor.fetchone()[0].upper():
+            columns = Database._table_columns(cursor, 'samples')
+            Database._create_samples_table(
+                cursor, 'samples_v5', [int(c[1:]) for c in columns if c not in ('task_key', 'ts_ms', 'held')])
+            names = ', '.join(columns)
+            cursor.execute(f'''
+                INSERT INTO samples_v5 ({names})
+                SELECT {names} FROM samples ORDER BY task_key, ts_ms
+            ''')
+            cursor.execute('DROP TABLE samples')
+            cursor.execute('ALTER TABLE samples_v5 RENAME TO samples')
+
+        cursor.execute('PRAGMA user_version = 5')
+
+    @staticmethod
+    def _migrate_v5_to_v6(cursor: sqlite3.Cursor):
+        """v5 -> v6 迁移：新建任务汇总表，并从已有采样数据聚合初值"""
+        Database._create_summary_tables(cursor)
+        Database._rebuild_summaries(cursor)
+
+        cursor.execute('PRAGMA user_version = 6')
+
+    @staticmethod
+    def _migrate_v6_to_v7(cursor: sqlite3.Cursor):
+        """v6 -> v7 迁移：新建降采样汇总表，并从已有采样数据按各分桶粒度聚合"""
+        Database._create_rollups_table(cursor)
+        Database._rebuild_rollups(cursor)
+
+        cursor.execute('PRAGMA user_version = 7')
+
+    @staticmethod
+    def _migrate_v7_to_v8(cursor: sqlite3.Cursor):
+        """v7 -> v8 迁移：新建采样压缩块表（已有采样保持行存储，按需由封块转入）"""
+        Database._create_chunks_table(cursor)
+
+        cursor.execute('PRAGMA user_version = 8')
+
+    @staticmethod
+    def _migrate_v8_to_v9(cursor: sqlite3.Cursor):
+        """
+        v8 -> v9 迁移：samples 新增 held 位图列、tasks 新增 change_only 标记（已有数据均为
+        逐周期写值，无需改写；幂等检查：v3 -> v4 在同一迁移链内已按当前结构建表时跳过）
+        """
+        if 'held' not in Database._table_columns(cursor, 'samples'):
+            cursor.execute('ALTER TABLE samples ADD COLUMN held INTEGER')
+        if 'change_only' not in Database._table_columns(cursor, 'tasks'):
+            cursor.execute('ALTER TABLE tasks ADD COLUMN change_only INTEGER NOT NULL DEFAULT 0')
+
+        cursor.execute('PRAGMA user_version = 9')
+
+    @staticmethod
+    def _migrate_v9_to_v10(cursor: sqlite3.Cursor):
+        """
+        v9 -> v10 迁移：tasks 新增 partitioned 标记（已有任务的数据留在主库；幂等检查同
+        v8 -> v9）
+        """
+        if 'partitioned' not in Database._table_columns(cursor, 'tasks'):
+            cursor.execute('ALTER TABLE tasks ADD COLUMN partitioned INTEGER NOT NULL DEFAULT 0')
+
+        cursor.execute('PRAGMA user_version = 10')
+
+    @staticmethod
+    def _migrate_v10_to_v11(cursor: sqlite3.Cursor):
+        """v10 -> v11 迁移：tasks 新增 deleting 标记（幂等检查同 v8 -> v9）"""
+        if 'deleting' not in Database._table_columns(cursor, 'tasks'):
+            cursor.execute('ALTER TABLE tasks ADD COLUMN deleting INTEGER NOT NULL DEFAULT 0')
+
+        cursor.execute('PRAGMA user_version = 11')
+
+    @staticmethod
+    def _migrate_v11_to_v12(cursor: sqlite3.Cursor):
+        """v11 -> v12 迁移：tasks 新增分级保留的裁剪时刻（幂等检查同 v8 -> v9）"""
+        columns = Database._table_columns(cursor, 'tasks')
+        for column in ('raw_kept_from_ms', 'minute_kept_from_ms'):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE tasks ADD COLUMN {column} INTEGER')
+
+        cursor.execute('PRAGMA user_version = 12')
 
     def _restore_from_backup(self, backup_path: str):
         """迁移失败后从备份还原；还原也失败则将损坏库改名并新建空库（置 data_reset）"""
+        # 先关闭持久连接：覆盖/改名库文件时不能有打开的连接（及其 -wal 边车文件）
+        self.close()
         try:
             shutil.copy2(backup_path, self.db_path)
             logger.warning("已从备份还原数据库: %s", backup_path)
@@ -279,11 +1289,69 @@ class Database:
                 logger.warning("损坏的数据库已改名保留: %s", broken_path)
             except Exception:
                 logger.error("保留损坏数据库失败", exc_info=True)
-            # 新建空库（v1 结构）
+            # 新建空库（当前版本结构）
             with self._get_connection() as conn:
-                self._create_schema_v1(conn.cursor())
+                self._create_schema(conn.cursor())
             self.data_reset = True
 
+    # ========== 采样日志回放 ==========
+
+    def replay_journal(self, journal: SampleJournal) -> int:
+        """
+        崩溃恢复：把采样日志（data/journal.py）中未落库的数据补写进数据库，随后清空日志。
+
+        与 reconcile_orphan_tasks 一样由调用方在任何新任务启动前显式调用一次（且应在
+        其之前）。日志中残留的段也含已落库的记录（同一段里仍有未确认的记录，或崩溃在
+        提交之后、确认之前），它们不能重写：重写会把已封块的窗口展开再封块，分级保留已
+        裁剪的窗口更会被写回原始行、在汇总中再计一次。每个任务的记录按采集顺序整周期
+        提交，已落库的恰是不晚于该任务汇总最新时间戳的记录，只补写其后的记录。
+
+        按 JOURNAL_REPLAY_BATCH 条一批、每批一个事务补写（同一周期的记录不拆到两批）；
+        某批失败时之前的批次已落库，日志保留，下次启动按同一规则只补写剩余的记录。
+
+        Args:
+            journal: 采样日志
+
+        Returns:
+            int: 补写的数据点条数；失败时返回已补写的条数（日志保留，下次启动再试）
+        """
+        try:
+            with self._get_connection() as conn:
+                # {任务ID: 已落库的最新周期（epoch 毫秒）}，尚无数据的任务不在其中
+                last_ms = dict(conn.execute('''
+                    SELECT t.task_id, s.last_ts_ms FROM tasks t
+                    JOIN task_summary s ON s.task_key = t.id
+                ''').fetchall())
+        except Exception:
+            logger.error("采样日志回放失败，日志保留待下次启动重试", exc_info=True)
+            return 0
+
+        batch: List[DataPoint] = []
+        replayed = skipped = 0
+        for point in journal.iter_records():
+            last = last_ms.get(point.task_id)
+            if last is not None and to_epoch_ms(point.timestamp) <= last:
+                skipped += 1
+                continue
+            if (len(batch) >= config.JOURNAL_REPLAY_BATCH
+                    and (point.task_id, point.timestamp) != (batch[-1].task_id, batch[-1].timestamp)):
+                if not self.save_data_points(batch):
+                    logger.error("采样日志回放失败，日志保留待下次启动重试")
+                    return replayed
+                replayed += len(batch)
+                batch = []
+            batch.append(point)
+        if batch and not self.save_data_points(batch):
+            logger.error("采样日志回放失败，日志保留待下次启动重试")
+            return replayed
+        replayed += len(batch)
+
+        journal.reset()
+        if replayed or skipped:
+            logger.warning("采样日志回放: 补写上次运行未确认落库的数据 %d 条，跳过已落库的 %d 条",
+                           replayed, skipped)
+        return replayed
+
     # ========== 孤儿任务校正 ==========
 
     def reconcile_orphan_tasks(self) -> int:
@@ -336,6 +1404,27 @@ class Database:
                 pass  # 解析失败回退为单值
         return [text]
 
+    @staticmethod
+    def _parse_metric_periods(text: Optional[str]) -> Dict[str, int]:
+        """
+        解析 tasks.metric_periods 列内容（NULL/解析失败均视为全部指标每周期采集）
+
+        Args:
+            text: 列内容，JSON 对象文本或 None
+
+        Returns:
+            Dict[str, int]: {指标类型: 每 N 个周期采一次}，只含 N > 1 的指标
+        """
+        if not text:
+            return {}
+        try:
+            parsed = json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+        if not isinstance(parsed, dict):
+            return {}
+        return {str(m): int(n) for m, n in parsed.items() if int(n) > 1}
+
     def _row_to_task(self, row: sqlite3.Row) -> MonitorTask:
         """将数据库行转换为 MonitorTask 对象"""
         return MonitorTask(
@@ -347,13 +1436,15 @@ class Database:
             start_time=datetime.fromisoformat(row['start_time']),
             end_time=datetime.fromisoformat(row['end_time']) if row['end_time'] else None,
             status=row['status'],
+            metric_periods=self._parse_metric_periods(row['metric_periods']),
         )
 
     # ========== 任务相关操作 ==========
 
     def save_task(self, task: MonitorTask) -> bool:
         """
-        保存任务到数据库
+        保存任务到数据库（已存在则按 task_id 更新，保留其整数键 id 与存储位置不变；新建的
+        任务在启用分区时标记为分区任务，分区库在首次读写时创建）
 
         Args:
             task: 监控任务对象
@@ -365,9 +1456,15 @@ class Database:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT OR REPLACE INTO tasks
-                    (task_id, pid, process_name, metric_type, interval, start_time, end_time, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO tasks
+                    (task_id, pid, process_name, metric_type, interval, start_time, end_time, status,
+                     metric_periods, partitioned)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(task_id) DO UPDATE SET
+                        pid = excluded.pid, process_name = excluded.process_name,
+                        metric_type = excluded.metric_type, interval = excluded.interval,
+                        start_time = excluded.start_time, end_time = excluded.end_time,
+                        status = excluded.status, metric_periods = excluded.metric_periods
                 ''', (
                     task.task_id,
                     task.pid,
@@ -377,6 +1474,8 @@ class Database:
                     task.start_time.isoformat() if task.start_time else None,
                     task.end_time.isoformat() if task.end_time else None,
                     task.status,
+                    json.dumps(task.metric_periods) if task.metric_periods else None,
+                    int(self.partitioned),
                 ))
             return True
         except Exception:
@@ -391,12 +1490,13 @@ class Database:
             task_id: 任务ID
 
         Returns:
-            Optional[MonitorTask]: 任务对象，不存在返回None
+            Optional[MonitorTask]: 任务对象，不存在或已排队删除返回None
         """
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM tasks WHERE task_id = ?', (task_id,))
+                cursor.execute('SELECT * FROM tasks WHERE task_id = ? AND deleting = 0',
+                               (task_id,))
                 row = cursor.fetchone()
 
                 if row:
@@ -408,7 +1508,7 @@ class Database:
 
     def get_all_tasks(self) -> List[MonitorTask]:
         """
-        获取所有任务
+        获取所有任务（不含已排队删除的任务）
 
         Returns:
             List[MonitorTask]: 任务列表
@@ -416,7 +1516,7 @@ class Database:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM tasks ORDER BY start_time DESC')
+                cursor.execute('SELECT * FROM tasks WHERE deleting = 0 ORDER BY start_time DESC')
                 rows = cursor.fetchall()
 
                 return [self._row_to_task(row) for row in rows]
@@ -458,160 +1558,894 @@ class Database:
 
     def delete_task(self, task_id: str) -> bool:
         """
-        删除任务及其所有数据点
+        删除任务及其所有数据点：先标记为排队删除（任务随即从任务列表中消失），再在
+        当前线程内逐批删除直到完成（delete_task_batch，每批一个短事务，批与批之间采样
+        写入可以插入）。界面上的删除交给后台删除线程（core/deleter.py），不走本方法
 
         Args:
             task_id: 任务ID
 
         Returns:
-            bool: 删除是否成功
+            bool: 删除是否成功（失败时任务保持排队删除状态，下次启动继续删除）
+        """
+        if not self.mark_tasks_deleting([task_id]):
+            return False
+        return self._purge_task(task_id)
+
+    def _purge_task(self, task_id: str) -> bool:
+        """逐批删除已标记的任务直到完成；某一批失败返回 False"""
+        while True:
+            deleted = self.delete_task_batch(task_id, config.DELETE_BATCH_ROWS)
+            if deleted is None:
+                return False
+            if deleted == 0:
+                return True
+
+    def mark_tasks_deleting(self, task_ids: List[str]) -> bool:
+        """
+        把任务标记为排队删除（tasks.deleting = 1）：任务立即从任务列表、数据点计数与
+        get_task 中消失，数据随后由 delete_task_batch 分批删除。标记持久化在库中，应用
+        中途退出后由 get_deleting_task_ids 取回继续删除。任务行保留到数据删完为止：
+        任务整数键在任务行删除后可能被新任务复用
+
+        Args:
+            task_ids: 任务ID列表（不存在的忽略）
+
+        Returns:
+            bool: 标记是否成功
         """
+        if not task_ids:
+            return True
+        placeholders = ', '.join('?' * len(task_ids))
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                # 删除数据点
-                cursor.execute('DELETE FROM data_points WHERE task_id = ?', (task_id,))
-                # 删除任务
-                cursor.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+                cursor.execute(f'SELECT id FROM tasks WHERE task_id IN ({placeholders})',
+                               list(task_ids))
+                for row in cursor.fetchall():
+                    self._held_state.pop(row['id'], None)
+                cursor.execute(f'UPDATE tasks SET deleting = 1 WHERE task_id IN ({placeholders})',
+                               list(task_ids))
             return True
         except Exception:
-            logger.error("删除任务失败: task_id=%s", task_id, exc_info=True)
+            logger.error("标记删除任务失败: task_ids=%s", task_ids, exc_info=True)
             return False
 
-    # ========== 数据点相关操作 ==========
-
-    def save_data_point(self, data_point: DataPoint) -> bool:
+    def get_deleting_task_ids(self) -> List[str]:
         """
-        保存单个数据点
-
-        Args:
-            data_point: 数据点对象
+        获取已排队删除、数据尚未删完的任务（启动时交给后台删除线程继续删除）
 
         Returns:
-            bool: 保存是否成功
+            List[str]: 任务ID列表，按任务整数键升序
         """
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO data_points (task_id, timestamp, value, metric_type)
-                    VALUES (?, ?, ?, ?)
-                ''', (
-                    data_point.task_id,
-                    data_point.timestamp.isoformat(),
-                    data_point.value,
-                    data_point.metric_type,
-                ))
-            return True
+                cursor.execute('SELECT task_id FROM tasks WHERE deleting = 1 ORDER BY id')
+                return [row['task_id'] for row in cursor.fetchall()]
         except Exception:
-            logger.error("保存数据点失败: task_id=%s", data_point.task_id, exc_info=True)
-            return False
+            logger.error("获取待删除任务失败", exc_info=True)
+            return []
 
-    def save_data_points(self, data_points: List[DataPoint]) -> bool:
+    def count_task_rows(self, task_id: str) -> int:
         """
-        批量保存数据点
+        任务在主库中待删除的行数（采样行、压缩块与降采样汇总之和，后台删除据此计算
+        进度），按主键前缀计数。分区任务的数据随分区库文件一并删除，计为 0
 
         Args:
-            data_points: 数据点列表
+            task_id: 任务ID
 
         Returns:
-            bool: 保存是否成功
+            int: 行数；任务不存在或查询失败时为 0
         """
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.executemany('''
-                    INSERT INTO data_points (task_id, timestamp, value, metric_type)
-                    VALUES (?, ?, ?, ?)
-                ''', [
-                    (dp.task_id, dp.timestamp.isoformat(), dp.value, dp.metric_type)
-                    for dp in data_points
-                ])
+                cursor.execute('SELECT id, partitioned FROM tasks WHERE task_id = ?', (task_id,))
+                row = cursor.fetchone()
+                if row is None or row['partitioned']:
+                    return 0
+                total = 0
+                for table, _key in _DELETE_BATCH_TABLES:
+                    cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE task_key = ?',
+                                   (row['id'],))
+                    total += cursor.fetchone()[0]
+                return total
+        except Exception:
+            logger.error("统计任务行数失败: task_id=%s", task_id, exc_info=True)
+            return 0
+
+    def delete_task_batch(self, task_id: str, max_rows: int) -> Optional[int]:
+        """
+        删除已标记任务（mark_tasks_deleting）的一批数据：在一个短事务内按主键顺序依次从
+        samples、sample_chunks、rollups 删除至多 max_rows 行（按主键取一批、再按主键删除，
+        写锁只持有这一批的时间）。三张表都已删空时，在同一事务内删除汇总行与任务行；
+        分区任务没有需要逐行删除的数据，第一批即删除任务行，提交后删除其分区库文件。
+
+        每一批与最后删除任务行都是幂等的：中途失败或应用退出后再次调用，从剩余数据继续
+
+        Args:
+            task_id: 任务ID（未标记删除的任务不做任何事）
+            max_rows: 本批最多删除的行数
+
+        Returns:
+            Optional[int]: 本批删除的行数，0 表示任务已删除完毕（或不存在）；失败返回 None
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT id, partitioned FROM tasks WHERE task_id = ? AND deleting = 1',
+                               (task_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return 0
+                task_key = row['id']
+                deleted = 0
+                if not row['partitioned']:
+                    for table, key in _DELETE_BATCH_TABLES:
+                        if deleted >= max_rows:
+                            break
+                        cursor.execute(f'''
+                            DELETE FROM {table} WHERE ({key}) IN (
+                                SELECT {key} FROM {table} WHERE task_key = ? LIMIT ?)
+                        ''', (task_key, max_rows - deleted))
+                        deleted += cursor.rowcount
+                if deleted:
+                    return deleted
+                self._delete_summaries(cursor, task_key)
+                self._held_state.pop(task_key, None)
+                cursor.execute('DELETE FROM tasks WHERE id = ?', (task_key,))
+            if row['partitioned']:
+                self._drop_partitions({task_key: task_id})
+            return 0
+        except Exception:
+            logger.error("分批删除任务数据失败: task_id=%s", task_id, exc_info=True)
+            return None
+
+    # ========== 数据点相关操作 ==========
+
+    def save_data_point(self, data_point: DataPoint) -> bool:
+        """
+        保存单个数据点
+
+        Args:
+            data_point: 数据点对象
+
+        Returns:
+            bool: 保存是否成功
+        """
+        return self.save_data_points([data_point])
+
+    def save_data_points(self, data_points: List[DataPoint]) -> bool:
+        """
+        批量保存数据点：按 (任务, 时间戳) 合并为采样行写入 samples。写入为 upsert，
+        同一周期的指标分批写入或重复写入时按列覆盖，不产生重复行。同一事务内增量更新
+        任务汇总与降采样汇总（_update_summaries）；写入已封块的窗口（日志回放等）时先把
+        这些窗口展开回 samples，写入后重新封块（_unseal_for_writes / _seal_chunks）。
+        只记变化时与前值相同的单元格不写值、只记 held 位（_mark_held）。早于任务原始采样
+        保留起点（tasks.raw_kept_from_ms）的数据点跳过并记日志：该范围已裁剪为汇总，写回
+        原始行会被 _update_summaries 当作新周期在汇总中再计一次。
+
+        分区任务的采样写入各自附加的分区库，汇总写入主库；一批涉及的分区任务超过
+        PARTITION_ATTACH_LIMIT 时按任务拆为多个事务依次写入。主库为 WAL 模式时跨库事务
+        只在各库内原子
+
+        Args:
+            data_points: 数据点列表（metric_type 须为已登记的指标，时间戳按毫秒存储）
+
+        Returns:
+            bool: 保存是否成功
+        """
+        if not self._sample_columns:
+            logger.error("采样表不可用（数据库未能迁移到当前版本），数据无法保存: 条数=%d",
+                         len(data_points))
+            return False
+        groups = self._partition_groups(data_points)
+        if len(groups) > 1:
+            results = [self.save_data_points([dp for dp in data_points if dp.task_id in group])
+                       for group in groups]
+            return all(results)
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+
+                # {(任务整数键, epoch 毫秒): {列名: 值}}，保持首次出现的顺序
+                rows: Dict[Tuple[int, int], Dict[str, float]] = {}
+                task_keys: Dict[str, Optional[int]] = {}
+                # {分区任务的整数键: 附加名}
+                schemas: Dict[int, str] = {}
+                # {任务ID: 原始采样保留起点}（只含已裁剪过的任务）与早于起点而跳过的点数
+                kept_from: Dict[str, int] = {}
+                trimmed: Dict[str, int] = {}
+                for dp in data_points:
+                    if dp.task_id not in task_keys:
+                        cursor.execute('SELECT id, partitioned, raw_kept_from_ms FROM tasks '
+                                       'WHERE task_id = ?', (dp.task_id,))
+                        row = cursor.fetchone()
+                        task_keys[dp.task_id] = row[0] if row else None
+                        if row is None:
+                            logger.error("任务不存在，其数据点无法保存，已跳过: task_id=%s",
+                                         dp.task_id)
+                        else:
+                            if row[1]:
+                                schemas[row[0]] = self._attach_partition(cursor, row[0], dp.task_id)
+                            if row[2] is not None:
+                                kept_from[dp.task_id] = row[2]
+                    task_key = task_keys[dp.task_id]
+                    if task_key is None:
+                        continue
+                    column = self._sample_columns.get(dp.metric_type)
+                    if column is None:
+                        logger.error("未知指标无法保存，已跳过: task_id=%s metric=%r",
+                                     dp.task_id, dp.metric_type)
+                        continue
+                    ts_ms = to_epoch_ms(dp.timestamp)
+                    if ts_ms < kept_from.get(dp.task_id, ts_ms):
+                        # 已裁剪的范围只剩汇总：写回原始行会在汇总中再计一次
+                        trimmed[dp.task_id] = trimmed.get(dp.task_id, 0) + 1
+                        continue
+                    rows.setdefault((task_key, ts_ms), {})[column] = dp.value
+                for task_id, count in trimmed.items():
+                    logger.warning("数据点早于原始采样保留起点（已裁剪为汇总），已跳过: "
+                                   "task_id=%s 条数=%d", task_id, count)
+
+                # 汇总的增量取决于这些周期/单元格此前是否已有值，须在写入前读取
+                seal_before = self._unseal_for_writes(cursor, rows)
+                held, held_state = self._mark_held(cursor, rows)
+                stale = self._update_summaries(cursor, rows)
+                # 指标组合相同的行共用一条语句（降频指标与 held 单元格使各周期的组合不同）
+                statements: Dict[Tuple[str, ...], list] = {}
+                for key, values in rows.items():
+                    bits = held.get(key)
+                    if bits:
+                        values = {c: v for c, v in values.items()
+                                  if not bits & self._held_bits.get(c, 0)}
+                        values['held'] = bits
+                    statements.setdefault((schemas.get(key[0], 'main'), tuple(values)), []).append(
+                        (*key, *values.values()))
+                for (schema, columns), params in statements.items():
+                    updates = ', '.join(f'{c} = excluded.{c}' for c in columns)
+                    cursor.executemany(f'''
+                        INSERT INTO {schema}.samples (task_key, ts_ms, {', '.join(columns)})
+                        VALUES (?, ?{', ?' * len(columns)})
+                        ON CONFLICT(task_key, ts_ms) DO UPDATE SET {updates}
+                    ''', params)
+                for task_key, windows in stale.items():
+                    schema = schemas.get(task_key, 'main')
+                    self._rebuild_rollups(cursor, task_key, windows, schema)
+                    self._rebuild_metric_summaries(cursor, task_key, schema)
+                if self.chunked:
+                    for task_key, before_ms in seal_before.items():
+                        self._seal_chunks(cursor, task_key, before_ms)
+            self._held_state.update(held_state)
             return True
         except Exception:
             logger.error("批量保存数据点失败: 条数=%d", len(data_points), exc_info=True)
             return False
 
+    def _partition_groups(self, data_points: List[DataPoint]) -> List[Set[str]]:
+        """
+        把一批数据点涉及的任务分组，使每组的分区任务不超过 PARTITION_ATTACH_LIMIT 个（未分区
+        的任务都在第一组）。涉及的任务不多于上限时不查询，直接返回一组
+
+        Returns:
+            List[Set[str]]: 各组的任务ID
+        """
+        task_ids = set(dp.task_id for dp in data_points)
+        if len(task_ids) <= PARTITION_ATTACH_LIMIT:
+            return [task_ids]
+        with self._get_connection() as conn:
+            partitioned = sorted(row[0] for row in conn.execute(
+                f'SELECT task_id FROM tasks WHERE partitioned = 1 '
+                f'AND task_id IN ({", ".join("?" * len(task_ids))})', tuple(task_ids)))
+        limit = PARTITION_ATTACH_LIMIT
+        groups = [task_ids.difference(partitioned[limit:])]
+        groups.extend(set(partitioned[i:i + limit]) for i in range(limit, len(partitioned), limit))
+        return groups
+
+    def _unseal_for_writes(self, cursor: sqlite3.Cursor,
+                           rows: Dict[Tuple[int, int], Dict[str, float]]) -> Dict[int, int]:
+        """
+        把本批写入落在已封块窗口内的任务窗口展开回 samples（须在 _update_summaries 之前
+        调用：汇总增量按 samples 中已有的单元格判断）。正常采集只写最新窗口，每任务只多
+        一次取已封块最新窗口的索引查找
+
+        Args:
+            cursor: 游标（与写入 samples 同一事务）
+            rows: {(任务整数键, epoch 毫秒): {列名: 值}}
+
+        Returns:
+            Dict[int, int]: {任务整数键: 写入后可封块的时间上界}——最新写入所在窗口的起点，
+                            且不早于展开前已封块的范围
+        """
+        span = SAMPLE_CHUNK_SPAN_MS
+        by_task: Dict[int, List[int]] = {}
+        for task_key, ts_ms in rows:
+            by_task.setdefault(task_key, []).append(ts_ms)
+
+        seal_before = {}
+        for task_key, ticks in by_task.items():
+            latest = max(ticks)
+            seal_before[task_key] = latest - latest % span
+            cursor.execute(f'SELECT MAX(chunk_ms) FROM {self._schema(task_key)}.sample_chunks '
+                           'WHERE task_key = ?', (task_key,))
+            sealed = cursor.fetchone()[0]
+            if sealed is None:
+                continue
+            seal_before[task_key] = max(seal_before[task_key], sealed + span)
+            windows = {ts - ts % span for ts in ticks if ts < sealed + span}
+            if windows:
+                self._unseal_windows(cursor, task_key, windows)
+        return seal_before
+
+    def _mark_held(self, cursor: sqlite3.Cursor, rows: Dict[Tuple[int, int], Dict[str, float]]
+                   ) -> Tuple[Dict[Tuple[int, int], int], Dict[int, Dict[str, Tuple[int, float]]]]:
+        """
+        只记变化：按时间顺序判定本批各单元格是否与同一窗口内该指标上一次写入的值相同
+        （死区内视为相同，单元格的值改为上次的值，汇总按改后的值计入）。须在
+        _update_summaries 之前调用
+
+        只对追加的周期（晚于该任务已有的最新周期）判定；补写/改写已有范围的周期总是写值，
+        并先把涉及窗口内已有的 held 单元格写成值（_materialize_held）——改写某个周期的值
+        不会连带改变其后沿用它的周期，汇总判断已有单元格时也不会把 held 当作空
+
+        Args:
+            cursor: 游标（与写入 samples 同一事务）
+            rows: {(任务整数键, epoch 毫秒): {列名: 值}}，死区内的值被就地改写
+
+        Returns:
+            Tuple[Dict[Tuple[int, int], int], Dict[int, Dict[str, Tuple[int, float]]]]:
+                ({(任务整数键, epoch 毫秒): held 位图}, 事务提交后采用的判定状态)
+        """
+        span = SAMPLE_CHUNK_SPAN_MS
+        by_task: Dict[int, List[int]] = {}
+        for task_key, ts_ms in rows:
+            by_task.setdefault(task_key, []).append(ts_ms)
+
+        held: Dict[Tuple[int, int], int] = {}
+        states: Dict[int, Dict[str, Tuple[int, float]]] = {}
+        for task_key, ticks in by_task.items():
+            ticks.sort()
+            cursor.execute('''
+                SELECT t.change_only, s.last_ts_ms
+                FROM tasks t LEFT JOIN task_summary s ON s.task_key = t.id
+                WHERE t.id = ?
+            ''', (task_key,))
+            flagged, last_ts_ms = cursor.fetchone()
+            if last_ts_ms is None:
+                last_ts_ms = -1
+            if flagged and ticks[0] <= last_ts_ms:
+                self._materialize_held(cursor, task_key,
+                                       {ts - ts % span for ts in ticks if ts <= last_ts_ms})
+            if not self.change_only:
+                continue
+
+            state = dict(self._held_state.get(task_key, {}))
+            deadband, held_bits = self._deadband, self._held_bits
+            marked = False
+            for ts_ms in ticks:
+                values = rows[(task_key, ts_ms)]
+                if ts_ms <= last_ts_ms:
+                    # 已有范围：写值；只在没有更晚的已知值时更新判定状态
+                    for column, value in values.items():
+                        previous = state.get(column)
+                        if (previous[0] <= ts_ms) if previous else ts_ms == last_ts_ms:
+                            state[column] = (ts_ms, value)
+                    continue
+                window = ts_ms - ts_ms % span
+                bits = 0
+                for column, value in values.items():
+                    previous = state.get(column)
+                    if previous is not None and previous[0] >= window:
+                        last = previous[1]
+                        tolerance = deadband.get(column) if deadband else None
+                        # 无死区时按位相同：区分 0.0 与 -0.0，NaN 与任何值都不相等、总是写值
+                        if (abs(value - last) <= tolerance if tolerance else value == last and (
+                                value or math.copysign(1.0, value) == math.copysign(1.0, last))):
+                            bit = held_bits.get(column)
+                            if bit:
+                                # 判定状态保留窗口内上次写值的周期
+                                values[column] = last
+                                bits |= bit
+                                continue
+                    state[column] = (ts_ms, value)
+                if bits:
+                    held[(task_key, ts_ms)] = bits
+                    marked = True
+            states[task_key] = state
+            if marked and not flagged:
+                cursor.execute('UPDATE tasks SET change_only = 1 WHERE id = ?', (task_key,))
+        return held, states
+
+    def _materialize_held(self, cursor: sqlite3.Cursor, task_key: int, windows: Set[int]):
+        """把任务这些窗口内的 held 单元格按还原后的值写回，清除 held 位图"""
+        schema = self._schema(task_key)
+        columns = list(self._sample_columns.values())
+        metric_ids = [int(c[1:]) for c in columns]
+        updates = []
+        for window in sorted(windows):
+            cursor.execute(f'''
+                SELECT ts_ms, held, {', '.join(columns)} FROM {schema}.samples
+                WHERE task_key = ? AND ts_ms BETWEEN ? AND ? ORDER BY ts_ms
+            ''', (task_key, window, window + SAMPLE_CHUNK_SPAN_MS - 1))
+            rows = cursor.fetchall()
+            if not any(row[1] for row in rows):
+                continue
+            flags = {row[0]: row[1] for row in rows}
+            updates.extend((*values, task_key, ts_ms)
+                           for ts_ms, values in iter_held_rows(rows, metric_ids) if flags[ts_ms])
+        cursor.executemany(f'''
+            UPDATE {schema}.samples SET {', '.join(f'{c} = ?' for c in columns)}, held = NULL
+            WHERE task_key = ? AND ts_ms = ?
+        ''', updates)
+
+    def _unseal_windows(self, cursor: sqlite3.Cursor, task_key: int, windows: Set[int]):
+        """把任务这些窗口的压缩块解码写回 samples（与已有行按列合并）并删除这些块"""
+        schema = self._schema(task_key)
+        in_windows = ', '.join(str(int(w)) for w in sorted(windows))
+        cursor.execute(f'''
+            SELECT chunk_ms, metric_id, data FROM {schema}.sample_chunks
+            WHERE task_key = ? AND chunk_ms IN ({in_windows})
+        ''', (task_key,))
+        chunks = cursor.fetchall()
+        for chunk_ms, metric_id, data in chunks:
+            column = f'm{metric_id}'
+            timestamps, values = decode_chunk(chunk_ms, data)
+            cursor.executemany(f'''
+                INSERT INTO {schema}.samples (task_key, ts_ms, {column}) VALUES (?, ?, ?)
+                ON CONFLICT(task_key, ts_ms) DO UPDATE SET {column} = excluded.{column}
+            ''', zip(repeat(task_key), timestamps, values))
+        cursor.execute(f'DELETE FROM {schema}.sample_chunks '
+                       f'WHERE task_key = ? AND chunk_ms IN ({in_windows})', (task_key,))
+        if chunks:
+            logger.info("写入已封块的窗口，已展开回行存储: task_key=%d 窗口数=%d",
+                        task_key, len(windows))
+
+    def _seal_chunks(self, cursor: sqlite3.Cursor, task_key: int, before_ms: int) -> int:
+        """
+        把任务 before_ms 之前的 samples 行按 SAMPLE_CHUNK_SPAN_MS 窗口、指标编码为压缩块，
+        随后删除这些行。窗口内若已有块（行存储与压缩块混写过）先展开合并再整体封块
+
+        Args:
+            cursor: 游标
+            task_key: 任务整数键
+            before_ms: 封块上界（epoch 毫秒，不含）；正常为窗口起点，已停止的任务可取最新
+                       时间戳之后以封入最后一个不完整的窗口
+
+        Returns:
+            int: 写入的压缩块数
+        """
+        span = SAMPLE_CHUNK_SPAN_MS
+        schema = self._schema(task_key)
+        cursor.execute(f'SELECT MIN(ts_ms) FROM {schema}.samples WHERE task_key = ?', (task_key,))
+        oldest = cursor.fetchone()[0]
+        if oldest is None or oldest >= before_ms:
+            return 0
+        columns = list(self._sample_columns.values())
+        query = f'''
+            SELECT ts_ms, held, {', '.join(columns)} FROM {schema}.samples
+            WHERE task_key = ? AND ts_ms < ? ORDER BY ts_ms
+        '''
+        rows = cursor.execute(query, (task_key, before_ms)).fetchall()
+        windows = {row[0] - row[0] % span for row in rows}
+        in_windows = ', '.join(str(w) for w in sorted(windows))
+        cursor.execute(f'''
+            SELECT 1 FROM {schema}.sample_chunks
+            WHERE task_key = ? AND chunk_ms IN ({in_windows}) LIMIT 1
+        ''', (task_key,))
+        if cursor.fetchone() is not None:
+            self._unseal_windows(cursor, task_key, windows)
+            rows = cursor.execute(query, (task_key, before_ms)).fetchall()
+
+        # {(窗口起点, 列名): ([时间戳], [值])}
+        cells: Dict[Tuple[int, str], Tuple[List[int], List[float]]] = {}
+        for ts_ms, values in iter_held_rows(rows, [int(c[1:]) for c in columns]):
+            window = ts_ms - ts_ms % span
+            for column, value in zip(columns, values):
+                if value is not None:
+                    timestamps, values = cells.setdefault((window, column), ([], []))
+                    timestamps.append(ts_ms)
+                    values.append(value)
+        cursor.executemany(f'''
+            INSERT INTO {schema}.sample_chunks (task_key, chunk_ms, metric_id, point_count,
+                                                min_value, max_value, sum_value, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (task_key, window, int(column[1:]), len(values), min(values), max(values), sum(values),
+             encode_chunk(window, timestamps, values))
+            for (window, column), (timestamps, values) in cells.items()
+        ])
+        cursor.execute(f'DELETE FROM {schema}.samples WHERE task_key = ? AND ts_ms < ?',
+                       (task_key, before_ms))
+        return len(cells)
+
+    def _update_summaries(self, cursor: sqlite3.Cursor,
+                          rows: Dict[Tuple[int, int], Dict[str, float]]) -> Dict[int, Set[int]]:
+        """
+        按本批待写入的采样行增量更新任务汇总与降采样汇总（须在写入 samples 之前调用）
+
+        先按任务读出本批时间范围内已存在的采样行（主键范围查找，正常采集时为空）：新周期
+        计入采集次数，新单元格计入点数与求和（任务汇总及其所在的各粒度分桶），首末时间戳、
+        首末值与极值取并；已有单元格被改写为不同的值时（同一周期重复写入且值变化，极少见）
+        极值与首末值无法增量回退，该任务不计增量，写入后重新聚合每指标汇总、并从 samples
+        重算本批涉及窗口的降采样汇总
+
+        Args:
+            cursor: 游标（与写入 samples 同一事务）
+            rows: {(任务整数键, epoch 毫秒): {列名: 值}}
+
+        Returns:
+            Dict[int, Set[int]]: {需重新聚合的任务整数键: 本批涉及的窗口起点}
+        """
+        by_task: Dict[int, Dict[int, Dict[str, float]]] = {}
+        for (task_key, ts_ms), values in rows.items():
+            by_task.setdefault(task_key, {})[ts_ms] = values
+
+        task_params, metric_params = [], []
+        # {库: 降采样汇总增量}：分区任务的降采样汇总在各自的分区库中
+        rollup_params: Dict[str, list] = {}
+        stale: Dict[int, Set[int]] = {}
+        for task_key, ticks in by_task.items():
+            schema = self._schema(task_key)
+            columns = sorted({c for values in ticks.values() for c in values})
+            cursor.execute(f'''
+                SELECT ts_ms, {', '.join(columns)} FROM {schema}.samples
+                WHERE task_key = ? AND ts_ms BETWEEN ? AND ?
+            ''', (task_key, min(ticks), max(ticks)))
+            existing = {row['ts_ms']: row for row in cursor.fetchall() if row['ts_ms'] in ticks}
+
+            new_ticks = [ts for ts in ticks if ts not in existing]
+            if new_ticks:
+                task_params.append((task_key, len(new_ticks), min(new_ticks), max(new_ticks)))
+
+            # {列名: [(时间戳, 值)]}：本批新增的单元格
+            cells: Dict[str, List[Tuple[int, float]]] = {}
+            for ts_ms, values in ticks.items():
+                old_row = existing.get(ts_ms)
+                for column, value in values.items():
+                    old = old_row[column] if old_row is not None else None
+                    if old is None:
+                        cells.setdefault(column, []).append((ts_ms, value))
+                    elif old != value:
+                        stale[task_key] = {ts - ts % SAMPLE_CHUNK_SPAN_MS for ts in ticks}
+            if task_key in stale:
+                # 写入后重新聚合，无需计算增量
+                continue
+            for column, points in cells.items():
+                metric_id = int(column[1:])
+                values = [value for _, value in points]
+                metric_params.append(
+                    (task_key, metric_id, len(values), min(values), max(values), sum(values)))
+                rollup_params.setdefault(schema, []).extend(
+                    (task_key, metric_id) + agg for agg in Database._bucket_points(points))
+
+        cursor.executemany('''
+            INSERT INTO task_summary (task_key, sample_count, first_ts_ms, last_ts_ms)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(task_key) DO UPDATE SET
+                sample_count = sample_count + excluded.sample_count,
+                first_ts_ms = MIN(first_ts_ms, excluded.first_ts_ms),
+                last_ts_ms = MAX(last_ts_ms, excluded.last_ts_ms)
+        ''', task_params)
+        cursor.executemany('''
+            INSERT INTO task_metric_summary
+                (task_key, metric_id, point_count, min_value, max_value, sum_value)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(task_key, metric_id) DO UPDATE SET
+                point_count = point_count + excluded.point_count,
+                min_value = MIN(min_value, excluded.min_value),
+                max_value = MAX(max_value, excluded.max_value),
+                sum_value = sum_value + excluded.sum_value
+        ''', metric_params)
+        # 右侧表达式均取更新前的旧值（SQLite UPDATE 语义），时间与值按旧值比较后成对替换
+        for schema, params in rollup_params.items():
+            cursor.executemany(f'''
+                INSERT INTO {schema}.rollups (task_key, metric_id, resolution_ms, bucket_ms,
+                                              point_count, sum_value, min_value, min_ts_ms,
+                                              max_value, max_ts_ms, first_ts_ms, first_value,
+                                              last_ts_ms, last_value)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(task_key, metric_id, resolution_ms, bucket_ms) DO UPDATE SET
+                    point_count = point_count + excluded.point_count,
+                    sum_value = sum_value + excluded.sum_value,
+                    min_value = CASE WHEN excluded.min_value < min_value OR (excluded.min_value = min_value
+                                          AND excluded.min_ts_ms < min_ts_ms)
+                                     THEN excluded.min_value ELSE min_value END,
+                    min_ts_ms = CASE WHEN excluded.min_value < min_value OR (excluded.min_value = min_value
+                                          AND excluded.min_ts_ms < min_ts_ms)
+                                     THEN excluded.min_ts_ms ELSE min_ts_ms END,
+                    max_value = CASE WHEN excluded.max_value > max_value OR (excluded.max_value = max_value
+                                          AND excluded.max_ts_ms < max_ts_ms)
+                                     THEN excluded.max_value ELSE max_value END,
+                    max_ts_ms = CASE WHEN excluded.max_value > max_value OR (excluded.max_value = max_value
+                                          AND excluded.max_ts_ms < max_ts_ms)
+                                     THEN excluded.max_ts_ms ELSE max_ts_ms END,
+                    first_value = CASE WHEN excluded.first_ts_ms < first_ts_ms
+                                       THEN excluded.first_value ELSE first_value END,
+                    first_ts_ms = MIN(first_ts_ms, excluded.first_ts_ms),
+                    last_value = CASE WHEN excluded.last_ts_ms > last_ts_ms
+                                      THEN excluded.last_value ELSE last_value END,
+                    last_ts_ms = MAX(last_ts_ms, excluded.last_ts_ms)
+            ''', params)
+        return stale
+
+    @staticmethod
+    def _bucket_points(points: List[Tuple[int, float]]) -> List[tuple]:
+        """
+        把单个指标的一批新数据点按 ROLLUP_RESOLUTIONS_MS 各粒度分桶聚合：先按最细粒度分组，
+        更粗的粒度再由细一级的桶合并（粒度逐级整除）
+
+        Args:
+            points: [(epoch 毫秒, 值)]
+
+        Returns:
+            List[tuple]: 每桶一项 (粒度, 桶起点, 点数, 求和, 最小值, 其时间, 最大值, 其时间,
+                         首时间, 首值, 末时间, 末值)，极值并列时取最早
+        """
+        finest = ROLLUP_RESOLUTIONS_MS[0]
+        groups: Dict[int, List[Tuple[int, float]]] = {}
+        for point in sorted(points):
+            groups.setdefault(point[0] - point[0] % finest, []).append(point)
+        buckets = []
+        for bucket_ms, group in groups.items():
+            # 组内按时间升序，min/max 遇并列返回首个即最早
+            low = min(group, key=itemgetter(1))
+            high = max(group, key=itemgetter(1))
+            buckets.append((finest, bucket_ms, len(group), sum(v for _, v in group),
+                            low[1], low[0], high[1], high[0], *group[0], *group[-1]))
+        level = buckets
+        for resolution in ROLLUP_RESOLUTIONS_MS[1:]:
+            merged: Dict[int, list] = {}
+            for _, bucket_ms, count, total, lo, lo_ts, hi, hi_ts, f_ts, f, l_ts, l in level:
+                key = bucket_ms - bucket_ms % resolution
+                agg = merged.get(key)
+                if agg is None:
+                    merged[key] = [resolution, key, count, total, lo, lo_ts, hi, hi_ts,
+                                   f_ts, f, l_ts, l]
+                    continue
+                # 细一级的桶按时间升序到达：首值保留、末值替换，极值只在严格更优时替换
+                agg[2] += count
+                agg[3] += total
+                if lo < agg[4]:
+                    agg[4], agg[5] = lo, lo_ts
+                if hi > agg[6]:
+                    agg[6], agg[7] = hi, hi_ts
+                agg[10], agg[11] = l_ts, l
+            level = [tuple(agg) for agg in merged.values()]
+            buckets.extend(level)
+        return buckets
+
+    def _point_source(self, schema: str, task_id: str, metric_type: Optional[str],
+                      since: Optional[datetime] = None) -> Tuple[str, list]:
+        """
+        构造"逐数据点"子查询（列 ts_ms/value/metric_id）：把 samples 的指标列展开为
+        数据点，供按单个指标或全部指标的查询共用。同一时间戳内按指标 id 排列
+
+        Args:
+            schema: 任务采样数据所在的库（_task_storage）
+            task_id: 任务ID
+            metric_type: 指标类型，None 表示全部指标
+            since: 起始时间（可选），只含该时刻及之后的行
+
+        Returns:
+            Tuple[str, list]: (子查询 SQL, 参数)；指标不存在时 SQL 为空串
+        """
+        metrics = self._sample_columns if metric_type is None else [metric_type]
+        parts, params = [], []
+        for metric in metrics:
+            column = self._sample_columns.get(metric)
+            if column is None:
+                continue
+            where = f'task_key = (SELECT id FROM tasks WHERE task_id = ?) AND {column} IS NOT NULL'
+            params.append(task_id)
+            if since is not None:
+                where += ' AND ts_ms >= ?'
+                params.append(to_epoch_ms(since))
+            parts.append(f'''
+                SELECT ts_ms, {column} AS value, {column[1:]} AS metric_id
+                FROM {schema}.samples WHERE {where}
+            ''')
+        return ' UNION ALL '.join(parts), params
+
+    def _chunk_points(self, cursor: sqlite3.Cursor, schema: str, task_id: str,
+                      metric_type: Optional[str], since: Optional[datetime] = None,
+                      newest: Optional[int] = None) -> List[Tuple[int, float, int]]:
+        """
+        解码任务压缩块中的数据点，与 _point_source 的行同形 (ts_ms, value, metric_id)，
+        按时间升序（同一时间戳内按指标 id）。任务没有压缩块时只是一次索引查找
+
+        Args:
+            cursor: 游标
+            schema: 任务采样数据所在的库（_task_storage）
+            task_id: 任务ID
+            metric_type: 指标类型，None 表示全部指标
+            since: 起始时间（可选），只含该时刻及之后的点
+            newest: 只需要最新的若干个点时传该数量：按窗口从新到旧解码，够数即停
+                    （返回的点可能多于该数量，由调用方截取）
+
+        Returns:
+            List[Tuple[int, float, int]]: 数据点
+        """
+        where = 'task_key = (SELECT id FROM tasks WHERE task_id = ?)'
+        params: list = [task_id]
+        if metric_type is not None:
+            column = self._sample_columns.get(metric_type)
+            if column is None:
+                return []
+            where += ' AND metric_id = ?'
+            params.append(int(column[1:]))
+        since_ms = None
+        if since is not None:
+            since_ms = to_epoch_ms(since)
+            where += ' AND chunk_ms > ?'
+            params.append(since_ms - SAMPLE_CHUNK_SPAN_MS)
+        cursor.execute(f'''
+            SELECT chunk_ms, metric_id, data FROM {schema}.sample_chunks WHERE {where}
+            ORDER BY chunk_ms {'DESC' if newest else 'ASC'}, metric_id
+        ''', params)
+
+        windows, total = [], 0
+        for chunk_ms, group in groupby(cursor.fetchall(), key=itemgetter(0)):
+            points = []
+            for _, metric_id, data in group:
+                timestamps, values = decode_chunk(chunk_ms, data)
+                points.extend(zip(timestamps, values, repeat(metric_id)))
+            if since_ms is not None and chunk_ms < since_ms:
+                points = [p for p in points if p[0] >= since_ms]
+            if metric_type is None:
+                points.sort(key=itemgetter(0, 2))
+            windows.append(points)
+            total += len(points)
+            if newest and total >= newest:
+                break
+        if newest:
+            windows.reverse()
+        return list(chain.from_iterable(windows))
+
+    def _held_points(self, cursor: sqlite3.Cursor, schema: str, task_id: str,
+                     metric_type: Optional[str], since: Optional[datetime] = None,
+                     limit: Optional[int] = None,
+                     until: Optional[datetime] = None) -> List[Tuple[int, float, int]]:
+        """
+        只记变化的任务从 samples 还原数据点，与 _point_source 的行同形 (ts_ms, value, metric_id)，
+        按时间升序（同一时间戳内按指标 id）。从 since 所在窗口的起点读起（held 单元格只沿用
+        同一窗口内的值）；指定 limit 时先沿主键倒序找到最近 limit 个含该指标的周期，只从
+        那里所在的窗口读起（返回的点可能多于 limit，由调用方截取）
+
+        Args:
+            cursor: 游标
+            schema: 任务采样数据所在的库（_task_storage）
+            task_id: 任务ID
+            metric_type: 指标类型，None 表示全部指标
+            since: 起始时间（可选），只含该时刻及之后的点
+            limit: 只需要最新的若干个点时传该数量
+            until: 截止时间（可选），只含该时刻之前的点
+
+        Returns:
+            List[Tuple[int, float, int]]: 数据点
+        """
+        if metric_type is None:
+            columns = list(self._sample_columns.values())
+        elif metric_type in self._sample_columns:
+            columns = [self._sample_columns[metric_type]]
+        else:
+            return []
+        metric_ids = [int(c[1:]) for c in columns]
+        task_key = '(SELECT id FROM tasks WHERE task_id = ?)'
+        start_ms = to_epoch_ms(since) if since is not None else None
+        if limit:
+            where, params = f'task_key = {task_key}', [task_id]
+            if metric_type is not None:
+                where += f' AND ({columns[0]} IS NOT NULL OR held >> {metric_ids[0]} & 1)'
+            if start_ms is not None:
+                where += ' AND ts_ms >= ?'
+                params.append(start_ms)
+            cursor.execute(f'''
+                SELECT ts_ms FROM {schema}.samples WHERE {where}
+                ORDER BY ts_ms DESC LIMIT 1 OFFSET ?
+            ''', (*params, limit - 1))
+            row = cursor.fetchone()
+            if row is not None:
+                start_ms = row[0]
+
+        where, params = f'task_key = {task_key}', [task_id]
+        if start_ms is not None:
+            where += ' AND ts_ms >= ?'
+            params.append(start_ms - start_ms % SAMPLE_CHUNK_SPAN_MS)
+        if until is not None:
+            where += ' AND ts_ms < ?'
+            params.append(to_epoch_ms(until))
+        cursor.execute(f'''
+            SELECT ts_ms, held, {', '.join(columns)} FROM {schema}.samples WHERE {where}
+            ORDER BY ts_ms
+        ''', params)
+        points = []
+        for ts_ms, values in iter_held_rows(cursor.fetchall(), metric_ids):
+            if start_ms is not None and ts_ms < start_ms:
+                continue
+            points.extend((ts_ms, value, metric_id)
+                          for value, metric_id in zip(values, metric_ids) if value is not None)
+        return points
+
+    @staticmethod
+    def _point_order(metric_type: Optional[str]) -> Tuple[str, str]:
+        """
+        _point_source 结果的 (升序, 倒序) 排序子句。单个指标每个时间戳至多一个点，只按
+        ts_ms 排序——与主键顺序一致，SQLite 直接沿主键正/逆序读取，不建临时排序 B 树；
+        全部指标时同一时间戳内再按指标 id 排列
+        """
+        if metric_type is not None:
+            return 'ts_ms ASC', 'ts_ms DESC'
+        return 'ts_ms ASC, metric_id ASC', 'ts_ms DESC, metric_id DESC'
+
     def get_task_data_points(self, task_id: str, metric_type: Optional[str] = None,
                              limit: Optional[int] = None,
-                             since_iso: Optional[str] = None) -> List[DataPoint]:
+                             since: Optional[datetime] = None) -> List[DataPoint]:
         """
         获取任务的数据点
 
         Args:
             task_id: 任务ID
-            metric_type: 指标类型（可选），None 返回全部指标的数据点；
-                         查询任务首指标时自动包含 metric_type 为 NULL 的旧数据
+            metric_type: 指标类型（可选），None 返回全部指标的数据点（同一时间戳内
+                         按指标 id 顺序排列）
             limit: 限制返回数量（可选）。指定时语义为"最近 limit 条，按时间升序返回"
                    （子查询先按时间倒序取最近 N 条，再包一层按时间升序排列输出，
                    v1.2.0 批3 变更——调用方按 limit 拿到的仍是时间升序序列，
                    无需再自行 reversed()）；不指定则返回全部数据，按时间升序。
-                   与 since_iso 组合时语义 = "范围内最近 limit 条，升序"
-            since_iso: ISO 格式字符串（可选，datetime.isoformat() 产出的形态），
-                       只返回 timestamp >= since_iso 的点；None 表示不做时间过滤。
-                       【评审修订 B1】data_points.timestamp 在库中是 TEXT，SQLite
-                       类型亲和性下若传入 epoch float 会被转成 TEXT 参与字典序比较、
-                       恒小于任意 ISO 串，导致过滤静默失效——此参数只接受 ISO 字符串，
-                       绘图用的 epoch float（dp.timestamp.timestamp()）严禁传入这里
+                   与 since 组合时语义 = "范围内最近 limit 条，升序"
+            since: 起始时间（可选，本地时间 datetime），只返回该时刻及之后的点；
+                   None 表示不做时间过滤。库内时间戳为 epoch 毫秒整数，比较前统一换算
 
         Returns:
             List[DataPoint]: 数据点列表
         """
         try:
+            asc, desc = self._point_order(metric_type)
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-
-                where = 'task_id = ?'
-                params: list = [task_id]
-                if metric_type is not None:
-                    # 查询任务首指标时，NULL 数据点兜底归为首指标（兼容旧库回填遗漏）
-                    cursor.execute('SELECT metric_type FROM tasks WHERE task_id = ?', (task_id,))
-                    task_row = cursor.fetchone()
-                    first_metric = self._parse_metric_types(task_row['metric_type'])[0] if task_row else None
-                    if metric_type == first_metric:
-                        where += ' AND (metric_type = ? OR metric_type IS NULL)'
-                    else:
-                        where += ' AND metric_type = ?'
-                    params.append(metric_type)
-
-                if since_iso is not None:
-                    where += ' AND timestamp >= ?'
-                    params.append(since_iso)
-
-                if limit:
+                schema, held = self._task_storage(cursor, task_id)
+                source, params = self._point_source(schema, task_id, metric_type, since)
+                if not source:
+                    return []
+                if held:
+                    rows = self._held_points(cursor, schema, task_id, metric_type, since, limit)
+                elif limit:
                     cursor.execute(f'''
                         SELECT * FROM (
-                            SELECT * FROM data_points
-                            WHERE {where}
-                            ORDER BY timestamp DESC
+                            SELECT * FROM ({source})
+                            ORDER BY {desc}
                             LIMIT ?
                         )
-                        ORDER BY timestamp ASC
+                        ORDER BY {asc}
                     ''', (*params, limit))
+                    rows = [tuple(row) for row in cursor.fetchall()]
                 else:
                     cursor.execute(f'''
-                        SELECT * FROM data_points
-                        WHERE {where}
-                        ORDER BY timestamp ASC
+                        SELECT * FROM ({source})
+                        ORDER BY {asc}
                     ''', params)
+                    rows = [tuple(row) for row in cursor.fetchall()]
 
-                rows = cursor.fetchall()
-                data_points = []
-                for row in rows:
-                    data_points.append(DataPoint(
-                        task_id=row['task_id'],
-                        timestamp=datetime.fromisoformat(row['timestamp']),
-                        value=row['value'],
-                        metric_type=row['metric_type'] or '',
-                    ))
-                return data_points
+                # 压缩块中的点与 samples 行按时间合并（块的窗口与行不重叠）
+                chunked = self._chunk_points(cursor, schema, task_id, metric_type, since,
+                                             newest=limit)
+                if chunked:
+                    rows = sorted(chunked + rows, key=itemgetter(0, 2))
+                if limit:
+                    rows = rows[-limit:]
+
+                return [
+                    DataPoint(task_id=task_id, timestamp=from_epoch_ms(ts_ms), value=value,
+                              metric_type=self._metric_names[metric_id])
+                    for ts_ms, value, metric_id in rows
+                ]
         except Exception:
             logger.error("获取数据点失败: task_id=%s", task_id, exc_info=True)
             return []
 
     def get_data_point_count(self, task_id: str, metric_type: Optional[str] = None) -> int:
         """
-        获取任务的数据点数量
+        获取任务的数据点数量（读任务汇总 task_metric_summary，不扫描 samples）
 
         Args:
             task_id: 任务ID
@@ -620,28 +2454,53 @@ class Database:
         Returns:
             int: 数据点数量
         """
+        where = 'task_key = (SELECT id FROM tasks WHERE task_id = ?)'
+        params: list = [task_id]
+        if metric_type is not None:
+            column = self._sample_columns.get(metric_type)
+            if column is None:
+                return 0
+            where += ' AND metric_id = ?'
+            params.append(int(column[1:]))
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                if metric_type is not None:
-                    cursor.execute('''
-                        SELECT COUNT(*) as count FROM data_points
-                        WHERE task_id = ? AND metric_type = ?
-                    ''', (task_id, metric_type))
-                else:
-                    cursor.execute(
-                        'SELECT COUNT(*) as count FROM data_points WHERE task_id = ?',
-                        (task_id,)
-                    )
+                cursor.execute(f'''
+                    SELECT COALESCE(SUM(point_count), 0) AS count FROM task_metric_summary
+                    WHERE {where}
+                ''', params)
                 row = cursor.fetchone()
                 return row['count'] if row else 0
         except Exception:
             logger.error("获取数据点数量失败: task_id=%s", task_id, exc_info=True)
             return 0
 
+    def get_data_point_counts(self) -> Dict[str, int]:
+        """
+        一次查询取得全部任务的数据点数量（供历史页/导出页任务列表按"有数据即显示"过滤，
+        避免逐任务调用 get_data_point_count）
+
+        Returns:
+            Dict[str, int]: {任务ID: 数据点数量}，没有任何数据点的任务不在其中
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT t.task_id, SUM(s.point_count) AS count
+                    FROM task_metric_summary s JOIN tasks t ON t.id = s.task_key
+                    WHERE t.deleting = 0
+                    GROUP BY s.task_key
+                    HAVING count > 0
+                ''')
+                return {row['task_id']: row['count'] for row in cursor.fetchall()}
+        except Exception:
+            logger.error("获取任务数据点数量失败", exc_info=True)
+            return {}
+
     def get_sample_count(self, task_id: str) -> int:
         """
-        获取任务的采集次数（同一时间戳的多指标数据点算一次采集）
+        获取任务的采集次数（samples 每个采集周期一行；读任务汇总 task_summary）
 
         Args:
             task_id: 任务ID
@@ -652,28 +2511,34 @@ class Database:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT COUNT(DISTINCT timestamp) as count FROM data_points WHERE task_id = ?',
-                    (task_id,)
-                )
+                cursor.execute('''
+                    SELECT sample_count FROM task_summary
+                    WHERE task_key = (SELECT id FROM tasks WHERE task_id = ?)
+                ''', (task_id,))
                 row = cursor.fetchone()
-                return row['count'] if row else 0
+                return row['sample_count'] if row else 0
         except Exception:
             logger.error("获取采集次数失败: task_id=%s", task_id, exc_info=True)
             return 0
 
     def get_task_data_points_bucketed(self, task_id: str, metric_type: Optional[str] = None,
                                        max_buckets: int = 2000,
-                                       since_iso: Optional[str] = None) -> List[DataPoint]:
+                                       since: Optional[datetime] = None) -> List[DataPoint]:
         """
         按行号分桶查询任务数据点，供历史页图表降采样用（禁止使用行号取模抽稀，
         取模是等间隔跳采样，会规律性漏掉尖峰）。
 
-        做法：按 timestamp 升序给每行编号（ROW_NUMBER），用行号与总行数换算所属桶
+        做法：按时间升序给每行编号（ROW_NUMBER），用行号与总行数换算所属桶
         （bucket = (行号 * max_buckets) // 总行数，与"先 COUNT 再整除"等价，只是
         用窗口函数一次查询内完成，避免往返两次）；每个桶内分别取 value 最小与最大
-        的那一行（各自保留真实 timestamp），两者按 timestamp 合并去重、升序输出。
+        的那一行（各自保留真实时间戳），两者按时间合并去重、升序输出。
         因此单桶恒定返回 <=2 个点，总点数 <= 2*max_buckets，且不会平滑掉尖峰。
+        范围内有压缩块或任务只记变化时，块中的点与 samples 行（按阶梯序列还原）合并后
+        按同样的规则在 Python 中分桶（_bucket_min_max）。
+        指定指标且范围内 1 分钟降采样汇总的桶数不少于 max_buckets 时，每个输出桶至少覆盖
+        一整分钟、原始分辨率已不可见，改读该粒度的汇总（get_task_data_points_rollup，起点
+        所在的不完整分钟同样略去）：汇总随写入维护、已含 held 单元格与压缩块中的点，长范围
+        不必逐行读取、解码或还原原始数据；只有不足 max_buckets 分钟的范围才按原始数据分桶。
 
         Args:
             task_id: 任务ID
@@ -681,67 +2546,84 @@ class Database:
                          传 None 时按 task_id 下全部指标数据分桶（调用方需自行确保
                          该场景下语义合理，历史页图表始终应传具体指标）
             max_buckets: 最大分桶数，默认 2000（故最多返回 4000 个点）
-            since_iso: ISO 格式字符串（可选），语义同 get_task_data_points——只对
-                       timestamp >= since_iso 的数据分桶（总行数/桶归属均按过滤后的
-                       子集重新计算）；None 表示不做时间过滤。同样只接受 ISO 字符串，
-                       严禁传入 epoch float（评审修订 B1）
+            since: 起始时间（可选），语义同 get_task_data_points——只对该时刻及之后的
+                   数据分桶（总行数/桶归属均按过滤后的子集重新计算）；None 表示不做时间过滤
 
         Returns:
-            List[DataPoint]: 按 timestamp 升序排列的降采样数据点
+            List[DataPoint]: 按时间升序排列的降采样数据点
         """
         try:
+            asc, _desc = self._point_order(metric_type)
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-
-                where = 'task_id = ?'
-                params: list = [task_id]
+                schema, held = self._task_storage(cursor, task_id)
+                source, params = self._point_source(schema, task_id, metric_type, since)
+                if not source:
+                    return []
                 if metric_type is not None:
-                    cursor.execute('SELECT metric_type FROM tasks WHERE task_id = ?', (task_id,))
-                    task_row = cursor.fetchone()
-                    first_metric = self._parse_metric_types(task_row['metric_type'])[0] if task_row else None
-                    if metric_type == first_metric:
-                        where += ' AND (metric_type = ? OR metric_type IS NULL)'
+                    resolution = ROLLUP_RESOLUTIONS_MS[0]
+                    where = ('task_key = (SELECT id FROM tasks WHERE task_id = ?) '
+                             'AND metric_id = ? AND resolution_ms = ?')
+                    rollup_params: list = [task_id, int(self._sample_columns[metric_type][1:]),
+                                           resolution]
+                    if since is not None:
+                        where += ' AND bucket_ms >= ?'
+                        rollup_params.append(to_epoch_ms(since))
+                    # 只需知道桶数是否够 max_buckets，够数即停
+                    cursor.execute(f'''
+                        SELECT COUNT(*) FROM (
+                            SELECT 1 FROM {schema}.rollups WHERE {where} LIMIT ?
+                        )
+                    ''', (*rollup_params, max_buckets))
+                    if cursor.fetchone()[0] >= max_buckets:
+                        return self.get_task_data_points_rollup(task_id, metric_type, resolution,
+                                                                max_buckets, since)
+                chunked = self._chunk_points(cursor, schema, task_id, metric_type, since)
+                if chunked or held:
+                    if held:
+                        raw = self._held_points(cursor, schema, task_id, metric_type, since)
                     else:
-                        where += ' AND metric_type = ?'
-                    params.append(metric_type)
-
-                if since_iso is not None:
-                    where += ' AND timestamp >= ?'
-                    params.append(since_iso)
+                        cursor.execute(f'SELECT * FROM ({source}) ORDER BY {asc}', params)
+                        raw = [tuple(row) for row in cursor.fetchall()]
+                    points = sorted(chunked + raw, key=itemgetter(0, 2))
+                    return [
+                        DataPoint(task_id=task_id, timestamp=from_epoch_ms(ts_ms), value=value,
+                                  metric_type=metric_type or '')
+                        for ts_ms, value in self._bucket_min_max(points, max_buckets)
+                    ]
 
                 cursor.execute(f'''
                     WITH numbered AS (
-                        SELECT id, timestamp, value,
-                               ROW_NUMBER() OVER (ORDER BY timestamp ASC, id ASC) - 1 AS rn,
+                        SELECT ts_ms, value,
+                               ROW_NUMBER() OVER (ORDER BY {asc}) - 1 AS rn,
                                COUNT(*) OVER () AS total
-                        FROM data_points
-                        WHERE {where}
+                        FROM ({source})
                     ),
                     bucketed AS (
-                        SELECT id, timestamp, value,
+                        SELECT ts_ms, value,
                                CASE WHEN total <= ? THEN rn
                                     ELSE MIN((rn * ?) / total, ? - 1)
                                END AS bucket
                         FROM numbered
                     ),
                     mins AS (
-                        SELECT bucket, timestamp, value,
+                        SELECT bucket, ts_ms, value,
                                ROW_NUMBER() OVER (
-                                   PARTITION BY bucket ORDER BY value ASC, timestamp ASC
+                                   PARTITION BY bucket ORDER BY value ASC, ts_ms ASC
                                ) AS rk
                         FROM bucketed
                     ),
                     maxs AS (
-                        SELECT bucket, timestamp, value,
+                        SELECT bucket, ts_ms, value,
                                ROW_NUMBER() OVER (
-                                   PARTITION BY bucket ORDER BY value DESC, timestamp ASC
+                                   PARTITION BY bucket ORDER BY value DESC, ts_ms ASC
                                ) AS rk
                         FROM bucketed
                     )
-                    SELECT timestamp, value FROM mins WHERE rk = 1
+                    SELECT ts_ms, value FROM mins WHERE rk = 1
                     UNION
-                    SELECT timestamp, value FROM maxs WHERE rk = 1
-                    ORDER BY timestamp ASC
+                    SELECT ts_ms, value FROM maxs WHERE rk = 1
+                    ORDER BY ts_ms ASC
                 ''', (*params, max_buckets, max_buckets, max_buckets))
 
                 rows = cursor.fetchall()
@@ -749,7 +2631,7 @@ class Database:
                 for row in rows:
                     data_points.append(DataPoint(
                         task_id=task_id,
-                        timestamp=datetime.fromisoformat(row['timestamp']),
+                        timestamp=from_epoch_ms(row['ts_ms']),
                         value=row['value'],
                         metric_type=metric_type or '',
                     ))
@@ -758,54 +2640,194 @@ class Database:
             logger.error("获取分桶数据点失败: task_id=%s", task_id, exc_info=True)
             return []
 
+    @staticmethod
+    def _bucket_min_max(points: List[tuple], max_buckets: int) -> List[Tuple[int, float]]:
+        """
+        get_task_data_points_bucketed 分桶规则的 Python 实现（用于合并了压缩块的数据）：
+        按行号分桶，每桶取值最小与最大的点（并列取最早），合并去重后按时间升序
+
+        Args:
+            points: 按时间升序的 (ts_ms, value, ...) 元组
+            max_buckets: 最大分桶数
+
+        Returns:
+            List[Tuple[int, float]]: (ts_ms, value) 列表
+        """
+        total = len(points)
+        if total <= max_buckets:
+            return sorted({(p[0], p[1]) for p in points})
+        picked = set()
+        groups = groupby(enumerate(points),
+                         key=lambda item: min(item[0] * max_buckets // total, max_buckets - 1))
+        for _bucket, group in groups:
+            group = [p for _, p in group]
+            # 组内按时间升序，min/max 遇并列返回首个即最早
+            low = min(group, key=itemgetter(1))
+            high = max(group, key=itemgetter(1))
+            picked.add((low[0], low[1]))
+            picked.add((high[0], high[1]))
+        return sorted(picked)
+
+    def choose_rollup_resolution(self, task_id: str, min_buckets: int,
+                                 since: Optional[datetime] = None) -> Optional[int]:
+        """
+        为图表选择降采样汇总的分桶粒度：所选范围（since 至该任务最新数据点）内桶数仍不少于
+        min_buckets 的最粗粒度；范围太短、连最细粒度的桶数都不够时返回 None（调用方改用
+        get_task_data_points_bucketed 对原始数据分桶）。范围起点早于分级保留的裁剪时刻时
+        只考虑仍保留的粒度，原始采样已裁剪则即使桶数不够也返回最细的保留粒度
+
+        Args:
+            task_id: 任务ID
+            min_buckets: 最少桶数（历史页传图表绘图区的像素宽度，每像素至少一个桶）
+            since: 起始时间（可选），None 表示该任务的全部数据
+
+        Returns:
+            Optional[int]: ROLLUP_RESOLUTIONS_MS 之一；不宜使用汇总或查询失败时返回 None
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT s.first_ts_ms, s.last_ts_ms, t.raw_kept_from_ms, t.minute_kept_from_ms
+                    FROM task_summary s JOIN tasks t ON t.id = s.task_key
+                    WHERE t.task_id = ?
+                ''', (task_id,))
+                row = cursor.fetchone()
+        except Exception:
+            logger.error("获取任务时间跨度失败: task_id=%s", task_id, exc_info=True)
+            return None
+        if row is None:
+            return None
+        start_ms = row['first_ts_ms']
+        if since is not None:
+            start_ms = max(start_ms, to_epoch_ms(since))
+        span_ms = row['last_ts_ms'] - start_ms
+        minute_from = row['minute_kept_from_ms']
+        resolutions = [resolution for resolution in ROLLUP_RESOLUTIONS_MS
+                       if resolution != ROLLUP_RESOLUTIONS_MS[0]
+                       or minute_from is None or start_ms >= minute_from]
+        for resolution in sorted(resolutions, reverse=True):
+            if span_ms // resolution >= min_buckets:
+                return resolution
+        raw_from = row['raw_kept_from_ms']
+        if raw_from is not None and start_ms < raw_from:
+            return min(resolutions)
+        return None
+
+    def get_task_data_points_rollup(self, task_id: str, metric_type: str, resolution_ms: int,
+                                    max_buckets: int = 2000,
+                                    since: Optional[datetime] = None) -> List[DataPoint]:
+        """
+        从降采样汇总读取图表数据点：每个汇总桶取最小值与最大值两点（各自保留真实时间戳），
+        与 get_task_data_points_bucketed 的返回形态一致、同样不会平滑掉尖峰，但只读取
+        范围内的汇总行而非全部原始行。汇总桶数超过 max_buckets 时，按行号把相邻汇总桶再
+        合并为 max_buckets 组（做法同 get_task_data_points_bucketed）
+
+        Args:
+            task_id: 任务ID
+            metric_type: 指标类型
+            resolution_ms: 分桶粒度（ROLLUP_RESOLUTIONS_MS 之一，通常由
+                           choose_rollup_resolution 选出）
+            max_buckets: 最大分桶数，默认 2000（故最多返回 4000 个点）
+            since: 起始时间（可选）。只取完全落在该时刻之后的汇总桶：起点所在的那个不完整
+                   的桶被略去（至多一个粒度的数据，粒度按图表宽度选出，不影响曲线形态）
+
+        Returns:
+            List[DataPoint]: 按时间升序排列的降采样数据点
+        """
+        column = self._sample_columns.get(metric_type)
+        if column is None:
+            return []
+        try:
+            where = ('task_key = (SELECT id FROM tasks WHERE task_id = ?) '
+                     'AND metric_id = ? AND resolution_ms = ?')
+            params: list = [task_id, int(column[1:]), resolution_ms]
+            if since is not None:
+                where += ' AND bucket_ms >= ?'
+                params.append(to_epoch_ms(since))
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                schema, _held = self._task_storage(cursor, task_id)
+                cursor.execute(f'''
+                    WITH numbered AS (
+                        SELECT min_value, min_ts_ms, max_value, max_ts_ms,
+                               ROW_NUMBER() OVER (ORDER BY bucket_ms) - 1 AS rn,
+                               COUNT(*) OVER () AS total
+                        FROM {schema}.rollups WHERE {where}
+                    ),
+                    bucketed AS (
+                        SELECT min_value, min_ts_ms, max_value, max_ts_ms,
+                               CASE WHEN total <= ? THEN rn
+                                    ELSE MIN((rn * ?) / total, ? - 1)
+                               END AS bucket
+                        FROM numbered
+                    ),
+                    mins AS (
+                        SELECT min_ts_ms AS ts_ms, min_value AS value,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY bucket ORDER BY min_value ASC, min_ts_ms ASC
+                               ) AS rk
+                        FROM bucketed
+                    ),
+                    maxs AS (
+                        SELECT max_ts_ms AS ts_ms, max_value AS value,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY bucket ORDER BY max_value DESC, max_ts_ms ASC
+                               ) AS rk
+                        FROM bucketed
+                    )
+                    SELECT ts_ms, value FROM mins WHERE rk = 1
+                    UNION
+                    SELECT ts_ms, value FROM maxs WHERE rk = 1
+                    ORDER BY ts_ms ASC
+                ''', (*params, max_buckets, max_buckets, max_buckets))
+                return [
+                    DataPoint(task_id=task_id, timestamp=from_epoch_ms(row['ts_ms']),
+                              value=row['value'], metric_type=metric_type)
+                    for row in cursor.fetchall()
+                ]
+        except Exception:
+            logger.error("获取降采样汇总数据点失败: task_id=%s", task_id, exc_info=True)
+            return []
+
     def get_metric_stats(self, task_id: str, metric_type: str,
-                          since_iso: Optional[str] = None) -> Optional[dict]:
+                          since: Optional[datetime] = None) -> Optional[dict]:
         """
-        获取任务指定指标的统计信息（单条 SQL 聚合查询：count/min/max/avg）。
+        获取任务指定指标的统计信息（count/min/max/avg，未采集的 NULL 不计入）。
+        不限时间范围时直接读任务汇总 task_metric_summary 的一行（avg = 求和 / 点数）；
+        指定 since 时按主键范围对该指标列做单条 SQL 聚合（只记变化的任务按阶梯序列还原后
+        聚合），范围内的压缩块合并块上记录的点数/极值/求和，只有 since 所在的那个块需要解码。
 
         【评审修订 M3】刻意不含 last、不做 ORDER BY DESC 取最新值：范围内最新值
         由调用方（历史页）复用表格查询结果的末元素（内层 DESC LIMIT 契约保证
-        末点即范围内最新），省一次无索引排序。
+        末点即范围内最新），省一次排序。
 
         Args:
             task_id: 任务ID
-            metric_type: 指标类型（查询任务首指标时自动包含 metric_type 为 NULL
-                         的旧数据，语义同 get_task_data_points）
-            since_iso: ISO 格式字符串（可选），只统计 timestamp >= since_iso 的
-                       数据点；None 表示统计全部。同样只接受 ISO 字符串，严禁传入
-                       epoch float（评审修订 B1）
+            metric_type: 指标类型
+            since: 起始时间（可选），只统计该时刻及之后的数据点；None 表示统计全部
 
         Returns:
             Optional[dict]: {'count': int, 'min': float, 'max': float, 'avg': float}；
                             范围内无数据或查询失败时返回 None
         """
+        column = self._sample_columns.get(metric_type)
+        if column is None:
+            return None
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
 
-                where = 'task_id = ?'
-                params: list = [task_id]
-
-                # 查询任务首指标时，NULL 数据点兜底归为首指标（兼容旧库回填遗漏），
-                # 语义与 get_task_data_points/get_task_data_points_bucketed 一致
-                cursor.execute('SELECT metric_type FROM tasks WHERE task_id = ?', (task_id,))
-                task_row = cursor.fetchone()
-                first_metric = self._parse_metric_types(task_row['metric_type'])[0] if task_row else None
-                if metric_type == first_metric:
-                    where += ' AND (metric_type = ? OR metric_type IS NULL)'
+                if since is None:
+                    cursor.execute('''
+                        SELECT point_count AS cnt, min_value AS min_v, max_value AS max_v,
+                               sum_value / point_count AS avg_v
+                        FROM task_metric_summary
+                        WHERE task_key = (SELECT id FROM tasks WHERE task_id = ?)
+                          AND metric_id = ?
+                    ''', (task_id, int(column[1:])))
                 else:
-                    where += ' AND metric_type = ?'
-                params.append(metric_type)
-
-                if since_iso is not None:
-                    where += ' AND timestamp >= ?'
-                    params.append(since_iso)
-
-                cursor.execute(f'''
-                    SELECT COUNT(*) AS cnt, MIN(value) AS min_v, MAX(value) AS max_v, AVG(value) AS avg_v
-                    FROM data_points
-                    WHERE {where}
-                ''', params)
+                    return self._range_stats(cursor, task_id, metric_type, since)
                 row = cursor.fetchone()
                 if not row or not row['cnt']:
                     return None
@@ -819,14 +2841,97 @@ class Database:
             logger.error("获取指标统计失败: task_id=%s", task_id, exc_info=True)
             return None
 
+    def _range_stats(self, cursor: sqlite3.Cursor, task_id: str, metric_type: str,
+                     since: datetime) -> Optional[dict]:
+        """
+        get_metric_stats 指定时间范围的部分：samples 行与压缩块分别聚合后合并。范围起点早于
+        分级保留的裁剪时刻时，裁剪掉的那一段改由仍保留的最细粒度降采样汇总聚合（只计完全
+        落在 since 之后的桶，同 get_task_data_points_rollup）。只记变化的任务不在 Python 中
+        还原整段范围：起点之后的整分钟由 1 分钟降采样汇总聚合，只还原起点所在的那一分钟
+        """
+        task_key = '(SELECT id FROM tasks WHERE task_id = ?)'
+        column = self._sample_columns[metric_type]
+        metric_id = int(column[1:])
+        since_ms = to_epoch_ms(since)
+        schema, held = self._task_storage(cursor, task_id)
+        parts = []
+        cursor.execute('SELECT raw_kept_from_ms, minute_kept_from_ms FROM tasks WHERE task_id = ?',
+                       (task_id,))
+        row = cursor.fetchone()
+        raw_from, minute_from = (row[0], row[1]) if row is not None else (None, None)
+        if raw_from is not None and since_ms < raw_from:
+            resolution = (ROLLUP_RESOLUTIONS_MS[0] if minute_from is None or since_ms >= minute_from
+                          else ROLLUP_RESOLUTIONS_MS[-1])
+            cursor.execute(f'''
+                SELECT SUM(point_count), MIN(min_value), MAX(max_value), SUM(sum_value)
+                FROM {schema}.rollups
+                WHERE task_key = {task_key} AND metric_id = ? AND resolution_ms = ?
+                  AND bucket_ms >= ? AND bucket_ms < ?
+            ''', (task_id, metric_id, resolution, since_ms, raw_from))
+            parts.append(tuple(cursor.fetchone()))
+            since_ms = raw_from
+            since = from_epoch_ms(raw_from)
+        window = since_ms - since_ms % SAMPLE_CHUNK_SPAN_MS
+        until_ms = None
+        if held:
+            # 整分钟部分读 1 分钟降采样汇总（已含 held 单元格与压缩块中的点），只有 since
+            # 所在的那个不完整分钟按阶梯序列还原
+            until_ms = since_ms + -since_ms % ROLLUP_RESOLUTIONS_MS[0]
+            cursor.execute(f'''
+                SELECT SUM(point_count), MIN(min_value), MAX(max_value), SUM(sum_value)
+                FROM {schema}.rollups
+                WHERE task_key = {task_key} AND metric_id = ? AND resolution_ms = ?
+                  AND bucket_ms >= ?
+            ''', (task_id, metric_id, ROLLUP_RESOLUTIONS_MS[0], until_ms))
+            parts.append(tuple(cursor.fetchone()))
+            if since_ms < until_ms:
+                values = [p[1] for p in self._held_points(cursor, schema, task_id, metric_type,
+                                                          since, until=from_epoch_ms(until_ms))]
+                parts.append((len(values), min(values, default=None), max(values, default=None),
+                              sum(values)))
+        else:
+            cursor.execute(f'''
+                SELECT COUNT({column}), MIN({column}), MAX({column}), SUM({column})
+                FROM {schema}.samples WHERE task_key = {task_key} AND ts_ms >= ?
+            ''', (task_id, since_ms))
+            parts.append(tuple(cursor.fetchone()))
+            cursor.execute(f'''
+                SELECT SUM(point_count), MIN(min_value), MAX(max_value), SUM(sum_value)
+                FROM {schema}.sample_chunks
+                WHERE task_key = {task_key} AND chunk_ms >= ? AND metric_id = ?
+            ''', (task_id, since_ms, metric_id))
+            parts.append(tuple(cursor.fetchone()))
+        if window < since_ms and (until_ms is None or since_ms < until_ms):
+            cursor.execute(f'''
+                SELECT data FROM {schema}.sample_chunks
+                WHERE task_key = {task_key} AND chunk_ms = ? AND metric_id = ?
+            ''', (task_id, window, metric_id))
+            row = cursor.fetchone()
+            if row is not None:
+                timestamps, values = decode_chunk(window, row[0])
+                values = [v for ts, v in zip(timestamps, values)
+                          if ts >= since_ms and (until_ms is None or ts < until_ms)]
+                if values:
+                    parts.append((len(values), min(values), max(values), sum(values)))
+
+        parts = [part for part in parts if part[0]]
+        if not parts:
+            return None
+        count = sum(part[0] for part in parts)
+        return {
+            'count': count,
+            'min': min(part[1] for part in parts),
+            'max': max(part[2] for part in parts),
+            'avg': sum(part[3] for part in parts) / count,
+        }
+
     def get_last_point_timestamp(self, task_id: str) -> Optional[datetime]:
         """
-        获取任务全部指标里最新一条数据点的时间戳（MAX(timestamp)）。
+        获取任务全部指标里最新一条数据点的时间戳（任务汇总 task_summary 的 last_ts_ms）。
 
         用于历史页"时间范围"筛选的锚点计算：锚定该任务最后一个数据点的时间，
         而非当前时刻——停止已久的任务选"最近1小时"仍应能看到其最后一小时的数据。
-        现有索引 (task_id, metric_type) 不含 timestamp，本查询走全表 filter，由
-        调用方按任务缓存结果，避免切范围/切指标时重复触发（评审修订 M3）。
+        只按主键读汇总表一行，与数据量无关；调用方仍按任务缓存结果（评审修订 M3）。
 
         Args:
             task_id: 任务ID
@@ -837,21 +2942,21 @@ class Database:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    'SELECT MAX(timestamp) AS latest FROM data_points WHERE task_id = ?',
-                    (task_id,)
-                )
+                cursor.execute('''
+                    SELECT last_ts_ms AS latest FROM task_summary
+                    WHERE task_key = (SELECT id FROM tasks WHERE task_id = ?)
+                ''', (task_id,))
                 row = cursor.fetchone()
                 if not row or row['latest'] is None:
                     return None
-                return datetime.fromisoformat(row['latest'])
+                return from_epoch_ms(row['latest'])
         except Exception:
             logger.error("获取任务最新数据点时间戳失败: task_id=%s", task_id, exc_info=True)
             return None
 
     # ========== 数据清理 ==========
 
-    def cleanup_old_tasks(self, retention_days: int) -> int:
+    def cleanup_old_tasks(self, retention_days: int, purge: bool = True) -> int:
         """
         启动自动清理：删除已停止且早于保留期限的历史任务及其全部数据点。
 
@@ -862,12 +2967,15 @@ class Database:
 
         判断口径：WHERE status='stopped' AND COALESCE(end_time, start_time) < cutoff，
         COALESCE 用于兜底 end_time 为 NULL 的老数据（迁移遗留/异常退出未回填的场景）。
+        过期任务先一并标记为排队删除（mark_tasks_deleting），再逐个分批删除；
+        purge=False 时只标记，数据交给后台删除线程（core/deleter.py）删除，不阻塞启动。
 
         Args:
             retention_days: 保留天数，<=0 表示禁用清理
+            purge: 是否在本线程内删完数据（False 时只标记）
 
         Returns:
-            int: 被删除的任务数
+            int: 被删除（或标记删除）的任务数
         """
         if retention_days <= 0:
             return 0
@@ -876,35 +2984,193 @@ class Database:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    SELECT task_id FROM tasks
-                    WHERE status = 'stopped' AND COALESCE(end_time, start_time) < ?
+                    SELECT t.task_id, s.sample_count FROM tasks t
+                    LEFT JOIN task_summary s ON s.task_key = t.id
+                    WHERE t.status = 'stopped' AND COALESCE(t.end_time, t.start_time) < ?
+                      AND t.deleting = 0
                 ''', (cutoff,))
-                task_ids = [row['task_id'] for row in cursor.fetchall()]
+                expired = cursor.fetchall()
+        except Exception:
+            logger.error("启动自动清理失败", exc_info=True)
+            return 0
+
+        if not expired:
+            return 0
+        for row in expired:
+            logger.info("启动自动清理: 删除过期任务 task_id=%s 采集周期=%d 个",
+                        row['task_id'], row['sample_count'] or 0)
+        task_ids = [row['task_id'] for row in expired]
+        if not self.mark_tasks_deleting(task_ids):
+            return 0
+        if purge:
+            for task_id in task_ids:
+                self._purge_task(task_id)
+        return len(task_ids)
+
+    def get_downsample_candidates(self, raw_before_ms: Optional[int],
+                                  minute_before_ms: Optional[int]) -> List[str]:
+        """
+        分级保留：获取有数据早于裁剪时刻、尚未裁剪到该时刻的任务（交给 downsample_task_batch）
+
+        Args:
+            raw_before_ms: 原始采样裁剪时刻（retention_cutoffs），None 表示永久保留
+            minute_before_ms: 1 分钟汇总裁剪时刻，None 表示永久保留
 
-                if not task_ids:
+        Returns:
+            List[str]: 任务ID列表，按任务整数键升序
+        """
+        conditions, params = [], []
+        for column, before_ms in (('raw_kept_from_ms', raw_before_ms),
+                                  ('minute_kept_from_ms', minute_before_ms)):
+            if before_ms is not None:
+                conditions.append(f's.first_ts_ms < ? AND (t.{column} IS NULL OR t.{column} < ?)')
+                params.extend((before_ms, before_ms))
+        if not conditions:
+            return []
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT t.task_id FROM tasks t JOIN task_summary s ON s.task_key = t.id
+                    WHERE t.deleting = 0 AND (({') OR ('.join(conditions)}))
+                    ORDER BY t.id
+                ''', params)
+                return [row['task_id'] for row in cursor.fetchall()]
+        except Exception:
+            logger.error("获取待降采样任务失败", exc_info=True)
+            return []
+
+    def downsample_task_batch(self, task_id: str, raw_before_ms: Optional[int],
+                              minute_before_ms: Optional[int], max_rows: int) -> Optional[int]:
+        """
+        分级保留的一批裁剪：早于 raw_before_ms 的原始采样（samples 行与压缩块）只留降采样
+        汇总，早于 minute_before_ms 的 1 分钟汇总只留 1 小时汇总。汇总随采样写入增量维护，
+        裁剪前已覆盖被裁剪的数据，这里只删除、不重算；1 小时汇总与任务汇总永久保留（任务
+        汇总的重算即由 1 小时汇总合并而来）。
+
+        同一个短事务内先把任务的保留起点推进到裁剪时刻（只前移），此后的读取随即改走
+        汇总，再按主键删除起点之前至多 max_rows 行。中途失败或退出后再次调用从剩余数据继续
+
+        Args:
+            task_id: 任务ID（已排队删除的任务不做任何事）
+            raw_before_ms: 原始采样裁剪时刻（retention_cutoffs），None 表示不裁剪
+            minute_before_ms: 1 分钟汇总裁剪时刻，None 表示不裁剪
+            max_rows: 本批最多删除的行数
+
+        Returns:
+            Optional[int]: 本批删除的行数，0 表示已裁剪完毕；失败返回 None
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, raw_kept_from_ms, minute_kept_from_ms FROM tasks
+                    WHERE task_id = ? AND deleting = 0
+                ''', (task_id,))
+                row = cursor.fetchone()
+                if row is None:
                     return 0
+                task_key = row['id']
+                kept = []
+                for current, before_ms in ((row['raw_kept_from_ms'], raw_before_ms),
+                                           (row['minute_kept_from_ms'], minute_before_ms)):
+                    kept.append(current if before_ms is None or (current or 0) >= before_ms
+                                else before_ms)
+                raw_from, minute_from = kept
+                if kept != [row['raw_kept_from_ms'], row['minute_kept_from_ms']]:
+                    cursor.execute('''
+                        UPDATE tasks SET raw_kept_from_ms = ?, minute_kept_from_ms = ?
+                        WHERE id = ?
+                    ''', (raw_from, minute_from, task_key))
+                schema, _held = self._task_storage(cursor, task_id)
+
+                # (表, 主键列, 主键前缀之后的条件, 条件参数)：每项都是一段主键区间
+                steps = []
+                if raw_from is not None:
+                    steps.append(('samples', 'task_key, ts_ms', 'ts_ms < ?', (raw_from,)))
+                    steps.append(('sample_chunks', 'task_key, chunk_ms, metric_id',
+                                  'chunk_ms < ?', (raw_from,)))
+                if minute_from is not None:
+                    cursor.execute('SELECT metric_id FROM task_metric_summary WHERE task_key = ?',
+                                   (task_key,))
+                    for (metric_id,) in cursor.fetchall():
+                        steps.append(('rollups', 'task_key, metric_id, resolution_ms, bucket_ms',
+                                      'metric_id = ? AND resolution_ms = ? AND bucket_ms < ?',
+                                      (metric_id, ROLLUP_RESOLUTIONS_MS[0], minute_from)))
+                deleted = 0
+                for table, key, condition, params in steps:
+                    if deleted >= max_rows:
+                        break
+                    cursor.execute(f'''
+                        DELETE FROM {schema}.{table} WHERE ({key}) IN (
+                            SELECT {key} FROM {schema}.{table}
+                            WHERE task_key = ? AND {condition} LIMIT ?)
+                    ''', (task_key, *params, max_rows - deleted))
+                    deleted += cursor.rowcount
+                if deleted or schema == 'main':
+                    return deleted
+                # 分区库的空闲页不归回收线程管（它只回收主库）：裁剪完毕后在这里一次截掉
+                # （事务已提交；旧分区库未启用增量回收时不做任何事）
+                conn.executescript(f'PRAGMA {schema}.incremental_vacuum')
+                return 0
+        except Exception:
+            logger.error("降采样裁剪失败: task_id=%s", task_id, exc_info=True)
+            return None
+
+    # ========== 数据库维护（v1.3.0 批4） ==========
 
-                for task_id in task_ids:
-                    cursor.execute(
-                        'SELECT COUNT(*) as cnt FROM data_points WHERE task_id = ?', (task_id,))
-                    point_count = cursor.fetchone()['cnt']
-                    logger.info("启动自动清理: 删除过期任务 task_id=%s 数据点=%d 条",
-                                task_id, point_count)
-                    cursor.execute('DELETE FROM data_points WHERE task_id = ?', (task_id,))
-                    cursor.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+    def compact_samples(self) -> int:
+        """
+        把各任务已关闭窗口内的 samples 行封为压缩块（仅 sample_storage='chunks' 时）：
+        运行中的任务封到最新数据点所在窗口之前（与写入时的封块一致），已停止的任务连同
+        最后一个不完整的窗口全部封块。每个任务一个事务，不长时间占用写锁。
+
+        写入时只会封住仍在采集的任务，切换为压缩块存储之前的历史任务由本方法转换；
+        设置页"清理并压缩数据库"在 VACUUM 之前调用，释放出的页随之回收。分区任务逐个
+        附加其分区库后封块
 
-                return len(task_ids)
+        Returns:
+            int: 封块的任务数
+        """
+        if not self.chunked:
+            return 0
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT s.task_key, s.last_ts_ms, t.status, t.task_id, t.partitioned
+                    FROM task_summary s JOIN tasks t ON t.id = s.task_key
+                    WHERE t.partitioned = 1
+                       OR EXISTS (SELECT 1 FROM samples WHERE task_key = s.task_key)
+                ''')
+                targets = cursor.fetchall()
         except Exception:
-            logger.error("启动自动清理失败", exc_info=True)
+            logger.error("读取待封块任务失败", exc_info=True)
             return 0
 
-    # ========== 数据库维护（v1.3.0 批4） ==========
+        compacted = 0
+        for task_key, last_ts_ms, status, task_id, partitioned in targets:
+            if status == 'stopped':
+                before_ms = last_ts_ms + 1
+            else:
+                before_ms = last_ts_ms - last_ts_ms % SAMPLE_CHUNK_SPAN_MS
+            try:
+                with self._get_connection() as conn:
+                    cursor = conn.cursor()
+                    if partitioned:
+                        self._attach_partition(cursor, task_key, task_id)
+                    if self._seal_chunks(cursor, task_key, before_ms):
+                        compacted += 1
+            except Exception:
+                logger.error("采样封块失败: task_key=%d", task_key, exc_info=True)
+        return compacted
 
     def get_db_size_bytes(self) -> int:
         """
         获取数据库占用磁盘的总字节数：主库文件 + WAL 模式下的 -wal/-shm 边车
         文件（三者中实际存在的部分求和）。WAL checkpoint 之前，最近写入的数据
         实际存在 -wal 文件里，只统计主库文件会低估真实占用，故必须三者相加。
+        分区库目录下的全部文件（含各自的边车文件）一并计入。
 
         供设置页"清理并压缩数据库"卡片展示当前占用；单个文件缺失或权限异常
         时该部分记 0，不整体失败（与本类其余方法的静默失败语义一致）。
@@ -912,9 +3178,15 @@ class Database:
         Returns:
             int: 总字节数
         """
+        paths = [self.db_path + suffix for suffix in ('', '-wal', '-shm')]
+        directory = self.db_path + '.parts'
+        try:
+            if os.path.isdir(directory):
+                paths.extend(os.path.join(directory, name) for name in os.listdir(directory))
+        except OSError:
+            logger.error("读取分区库目录失败: %s", directory, exc_info=True)
         total = 0
-        for suffix in ('', '-wal', '-shm'):
-            path = self.db_path + suffix
+        for path in paths:
             try:
                 if os.path.exists(path):
                     total += os.path.getsize(path)
@@ -928,7 +3200,11 @@ class Database:
         数据合并进主文件并尽量清空 -wal，再执行 VACUUM 重建主文件、回收已删除
         数据占用的空间（已用临时脚本实测：同连接内 checkpoint 后紧跟 VACUUM
         不受 sqlite3 模块隐式事务影响，不会抛 "cannot VACUUM from within a
-        transaction"）。
+        transaction"）。已有文件的分区库逐个附加后同样 checkpoint + VACUUM（封块
+        删除的行在分区库内留下空闲页；删除任务直接删除文件，不需要 VACUUM）。
+        重建时把尚未启用增量回收的旧库转换为 auto_vacuum=INCREMENTAL，此后删除
+        释放的空间由 reclaim_free_pages 在后台逐步回收；释放的字节数计入
+        reclaimed_bytes。
 
         VACUUM 期间需要对数据库有较独占的访问，调用方（设置页"立即清理"）应
         只在确认当前无运行中监控任务时才提供入口；本方法自身不做任务运行状态
@@ -937,12 +3213,276 @@ class Database:
         静默失败语义：与本类其余方法一致，异常只记日志不向上抛出——调用方
         （后台 QThread）无需再 try/except 包裹一层。
         """
+        size_before = self.get_db_size_bytes()
         try:
             with self._get_connection() as conn:
                 conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
                 conn.execute('VACUUM')
+                cursor = conn.cursor()
+                cursor.execute('SELECT id, task_id FROM tasks WHERE partitioned = 1')
+                for task_key, task_id in cursor.fetchall():
+                    if not os.path.exists(partition_path(self.db_path, task_id)):
+                        continue
+                    alias = self._attach_partition(cursor, task_key, task_id)
+                    conn.execute(f'PRAGMA {alias}.wal_checkpoint(TRUNCATE)')
+                    conn.execute(f'PRAGMA {alias}.auto_vacuum=INCREMENTAL')
+                    conn.execute(f'VACUUM {alias}')
         except Exception:
             logger.error("压缩数据库失败", exc_info=True)
+        self.reclaimed_bytes += max(0, size_before - self.get_db_size_bytes())
+
+    def get_space_stats(self) -> Dict[str, int]:
+        """
+        读取主库的空闲页统计（只读文件头，开销可忽略；供设置页与后台回收线程使用）
+
+        Returns:
+            Dict[str, int]: page_size（页大小）、freelist_pages（空闲页数）、
+            free_bytes（空闲页占用的字节数）、incremental（1 表示已启用
+            auto_vacuum=INCREMENTAL，空闲页可由 reclaim_free_pages 回收）、
+            reclaimed_bytes（本次运行已回收的字节数）；读取失败时各项为 0
+        """
+        stats = {'page_size': 0, 'freelist_pages': 0, 'free_bytes': 0, 'incremental': 0,
+                 'reclaimed_bytes': self.reclaimed_bytes}
+        try:
+            with self._get_connection() as conn:
+                stats['page_size'] = conn.execute('PRAGMA page_size').fetchone()[0]
+                stats['freelist_pages'] = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                stats['incremental'] = int(conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2)
+        except Exception:
+            logger.error("读取数据库空闲页统计失败", exc_info=True)
+        stats['free_bytes'] = stats['page_size'] * stats['freelist_pages']
+        return stats
+
+    def checkpoint_wal(self, mode: str = 'PASSIVE',
+                       busy_timeout_ms: Optional[int] = None) -> Dict[str, int]:
+        """
+        对主库与 -wal 非空的分区库各执行一次 WAL checkpoint（后台检查点线程使用）。
+        历史页、导出线程的长读事务期间 SQLite 的自动 checkpoint 只能回写到最老的读快照
+        为止，持续写入时 -wal 会一直增长；由后台线程定期补做 checkpoint
+
+        Args:
+            mode: 'PASSIVE'（不等待任何连接，能回写多少回写多少）或 'RESTART'（等待读
+                事务结束后回写全部，下一次写入从头重用 -wal）
+            busy_timeout_ms: 本次等待锁的上限（毫秒），None 沿用连接的 busy_timeout。
+                RESTART 等待期间持有写锁、挡住采样写入，调用方应传较短的值
+
+        Returns:
+            Dict[str, int]: busy（未能完成的库数）、log_frames（-wal 中的帧数合计）、
+            checkpointed_frames（其中已回写的帧数）、wal_bytes（checkpoint 后各 -wal 文件的
+            字节数合计）、page_size（主库页大小）；失败的库不计入
+        """
+        result = {'busy': 0, 'log_frames': 0, 'checkpointed_frames': 0, 'wal_bytes': 0,
+                  'page_size': 0}
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                result['page_size'] = cursor.execute('PRAGMA page_size').fetchone()[0]
+                schemas = ['main']
+                cursor.execute('SELECT id, task_id FROM tasks WHERE partitioned = 1 AND deleting = 0')
+                for task_key, task_id in cursor.fetchall():
+                    path = partition_path(self.db_path, task_id)
+                    if os.path.exists(path) and os.path.exists(path + '-wal') \
+                            and os.path.getsize(path + '-wal') > 0:
+                        schemas.append(self._attach_partition(cursor, task_key, task_id))
+                if busy_timeout_ms is not None:
+                    cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+                try:
+                    for schema in schemas:
+                        busy, log_frames, checkpointed = cursor.execute(
+                            f'PRAGMA {schema}.wal_checkpoint({mode})').fetchone()
+                        result['busy'] += busy
+                        # 不是 WAL 模式的库（如迁移失败以空库运行时）返回 -1
+                        result['log_frames'] += max(0, log_frames)
+                        result['checkpointed_frames'] += max(0, checkpointed)
+                finally:
+                    if busy_timeout_ms is not None:
+                        cursor.execute('PRAGMA busy_timeout=5000')
+        except Exception:
+            logger.error("WAL checkpoint(%s) 失败", mode, exc_info=True)
+        result['wal_bytes'] = self.get_wal_size_bytes()
+        return result
+
+    def get_wal_size_bytes(self) -> int:
+        """
+        主库与各分区库的 -wal 文件字节数合计（文件不存在或读取失败的记 0）
+
+        Returns:
+            int: 字节数
+        """
+        paths = [self.db_path + '-wal']
+        directory = self.db_path + '.parts'
+        try:
+            if os.path.isdir(directory):
+                paths.extend(os.path.join(directory, name) for name in os.listdir(directory)
+                             if name.endswith('-wal'))
+        except OSError:
+            logger.error("读取分区库目录失败: %s", directory, exc_info=True)
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def get_task_space_usage(self) -> Dict[str, Dict[str, int]]:
+        """
+        各任务占用的字节数（供数据库大小上限的治理线程挑选释放对象）：各表的字节数取自
+        dbstat 虚表（SQLite 编译时未启用 dbstat 时改为估算，见 _bytes_per_row），按各任务在
+        表中的行数分摊；分区任务读取其分区库自己的 dbstat，只有这一个任务。需要遍历各表的
+        全部页与主键，由后台线程低频调用
+
+        Returns:
+            Dict[str, Dict[str, int]]: {任务ID: 占用}，不含已排队删除的任务。占用各项：
+            raw（采样行与压缩块）、minute（1 分钟汇总）、total（含 1 小时汇总）的字节数，
+            以及 sample_count、first_ts_ms、last_ts_ms（任务汇总，无数据时为 0）、
+            interval（采集周期，秒）、running（1 表示运行中）、trimmed（1 表示原始采样
+            已按分级保留裁剪过）；读取失败时返回空字典
+        """
+        usage = {}
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT t.id, t.task_id, t.interval, t.status, t.partitioned,
+                           t.raw_kept_from_ms, s.sample_count, s.first_ts_ms, s.last_ts_ms
+                    FROM tasks t LEFT JOIN task_summary s ON s.task_key = t.id
+                    WHERE t.deleting = 0
+                ''')
+                tasks = cursor.fetchall()
+                main_rows = self._task_row_counts(cursor, 'main')
+                main_per_row = self._bytes_per_row(cursor, 'main', main_rows)
+                for task in tasks:
+                    rows, per_row = main_rows, main_per_row
+                    if task['partitioned']:
+                        if not os.path.exists(partition_path(self.db_path, task['task_id'])):
+                            continue
+                        schema = self._attach_partition(cursor, task['id'], task['task_id'])
+                        rows = self._task_row_counts(cursor, schema)
+                        per_row = self._bytes_per_row(cursor, schema, rows)
+                    counts = rows.get(task['id'], {})
+                    size = {kind: int(counts.get(kind, 0) * rate) for kind, rate in per_row.items()}
+                    raw = size['samples'] + size['sample_chunks']
+                    usage[task['task_id']] = {
+                        'raw': raw,
+                        'minute': size['minute'],
+                        'total': raw + size['minute'] + size['hour'],
+                        'sample_count': task['sample_count'] or 0,
+                        'first_ts_ms': task['first_ts_ms'] or 0,
+                        'last_ts_ms': task['last_ts_ms'] or 0,
+                        'interval': task['interval'],
+                        'running': int(task['status'] == 'running'),
+                        'trimmed': int(task['raw_kept_from_ms'] is not None),
+                    }
+        except Exception:
+            logger.error("统计各任务占用空间失败", exc_info=True)
+            return {}
+        return usage
+
+    @staticmethod
+    def _task_row_counts(cursor: sqlite3.Cursor, schema: str) -> Dict[int, Dict[str, int]]:
+        """按任务统计采样行、压缩块与 1 分钟 / 1 小时汇总的行数（各走一遍主键）"""
+        rows: Dict[int, Dict[str, int]] = {}
+        for table in ('samples', 'sample_chunks'):
+            cursor.execute(f'SELECT task_key, COUNT(*) FROM {schema}.{table} GROUP BY task_key')
+            for task_key, count in cursor.fetchall():
+                rows.setdefault(task_key, {})[table] = count
+        cursor.execute(f'''
+            SELECT task_key, resolution_ms = {ROLLUP_RESOLUTIONS_MS[0]}, COUNT(*)
+            FROM {schema}.rollups GROUP BY 1, 2
+        ''')
+        for task_key, is_minute, count in cursor.fetchall():
+            kind = 'minute' if is_minute else 'hour'
+            task_rows = rows.setdefault(task_key, {})
+            task_rows[kind] = task_rows.get(kind, 0) + count
+        return rows
+
+    @staticmethod
+    def _bytes_per_row(cursor: sqlite3.Cursor, schema: str,
+                       rows: Dict[int, Dict[str, int]]) -> Dict[str, float]:
+        """
+        各种行的平均字节数：采样行、压缩块（含其主键索引）与降采样汇总三张表各占的字节数
+        读 dbstat 的逐表汇总，再除以表中的总行数（汇总表的 1 分钟 / 1 小时行同一均值）。
+        dbstat 是编译选项，不可用时改为估算——压缩块按数据长度计，其余已用页按行数分摊给
+        采样行与汇总行
+
+        Args:
+            cursor: 游标
+            schema: 库名（主库或分区库的附加名）
+            rows: 该库中各任务的行数（_task_row_counts）
+
+        Returns:
+            Dict[str, float]: {'samples'|'sample_chunks'|'minute'|'hour': 每行字节数}
+        """
+        totals = dict.fromkeys(('samples', 'sample_chunks', 'minute', 'hour'), 0)
+        for counts in rows.values():
+            for kind, count in counts.items():
+                totals[kind] += count
+        rollup_rows = totals['minute'] + totals['hour']
+        try:
+            cursor.execute('SELECT name, pgsize FROM dbstat(?, 1)', (schema,))
+            sizes = dict(cursor.fetchall())
+            table_bytes = {
+                'samples': sizes.get('samples', 0),
+                'sample_chunks': (sizes.get('sample_chunks', 0)
+                                  + sizes.get('sqlite_autoindex_sample_chunks_1', 0)),
+                'rollups': sizes.get('rollups', 0),
+            }
+        except sqlite3.OperationalError:
+            cursor.execute(f'PRAGMA {schema}.page_size')
+            page_size = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {schema}.page_count')
+            used = cursor.fetchone()[0]
+            cursor.execute(f'PRAGMA {schema}.freelist_count')
+            used = (used - cursor.fetchone()[0]) * page_size
+            cursor.execute(f'SELECT COALESCE(SUM(LENGTH(data)), 0) FROM {schema}.sample_chunks')
+            chunk_bytes = cursor.fetchone()[0]
+            rest = max(0, used - chunk_bytes)
+            other_rows = totals['samples'] + rollup_rows
+            table_bytes = {
+                'samples': rest * totals['samples'] / other_rows if other_rows else 0,
+                'sample_chunks': chunk_bytes,
+                'rollups': rest * rollup_rows / other_rows if other_rows else 0,
+            }
+        rollup_rate = table_bytes['rollups'] / rollup_rows if rollup_rows else 0.0
+        return {
+            'samples': table_bytes['samples'] / totals['samples'] if totals['samples'] else 0.0,
+            'sample_chunks': (table_bytes['sample_chunks'] / totals['sample_chunks']
+                              if totals['sample_chunks'] else 0.0),
+            'minute': rollup_rate,
+            'hour': rollup_rate,
+        }
+
+    def reclaim_free_pages(self, max_pages: int) -> int:
+        """
+        增量回收一步：PRAGMA incremental_vacuum 把至多 max_pages 个空闲页从主库文件末尾
+        截掉（自成一个短事务，只在这一步内持有写锁，不像 VACUUM 那样重写整个文件）。
+        未启用 auto_vacuum=INCREMENTAL 的旧库不做任何事（转换见 vacuum）。
+
+        PRAGMA incremental_vacuum 每执行一步只回收一页，须用 executescript 执行到结束；
+        executescript 会先提交未完成的事务，故只在连接空闲（不在外层事务中）时调用。
+
+        Args:
+            max_pages: 本步最多回收的页数
+
+        Returns:
+            int: 实际回收的页数（已计入 reclaimed_bytes）；失败时为 0
+        """
+        try:
+            with self._get_connection() as conn:
+                if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    return 0
+                before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if before == 0:
+                    return 0
+                conn.executescript(f'PRAGMA incremental_vacuum({int(max_pages)})')
+                freed = before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+                self.reclaimed_bytes += freed * conn.execute('PRAGMA page_size').fetchone()[0]
+                return freed
+        except Exception:
+            logger.error("增量回收空闲页失败", exc_info=True)
+            return 0
 
 
 # 单元测试
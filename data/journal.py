@@ -0,0 +1,310 @@
+"""
+采样追加日志
+monitor.db 旁的只追加二进制日志文件：采样数据在进入任务缓冲区之前先以定长记录
+追加写入，落库确认后按任务计数抵消。应用崩溃或被强制结束时尚未落库的数据仍在日志
+中，下次启动由 Database.replay_journal 补回 SQLite，因此数据库可以按组提交窗口
+大批量写入，而不放弃"停止或崩溃时数据不丢"。
+
+日志按段存放（monitor.db.journal.000001、.000002 …）：当前段写满 JOURNAL_SEGMENT_MB
+后换新段，每段按任务记录尚未确认的条数。多个任务持续采集时总有记录在组提交途中
+追加、全部条数几乎不会同时归零，所以不靠整体归零截断：全部记录都已确认的旧段即
+删除，日志大小只与未落库数据量加一段相关；当前段的记录全部确认时截断为只剩文件头。
+
+文件格式：8 字节文件头（魔数、格式版本、记录长度）+ 若干 88 字节定长记录：
+    task_id(36B ASCII) | metric_type(32B ASCII) | 时间戳(int64 微秒) | 值(double) | CRC32
+写入在进程崩溃时可能只写了半条，回放时遇到长度不足或 CRC 不符的记录即停止。
+"""
+import logging
+import os
+import struct
+import threading
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from data.models import DataPoint
+import config
+
+logger = logging.getLogger(__name__)
+
+# 日志文件名后缀（与数据库文件同目录同名）；各段再加 .<6 位序号>
+JOURNAL_SUFFIX = '.journal'
+
+_MAGIC = b'PMSJ'
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHH')        # 魔数, 格式版本, 记录长度
+_BODY = struct.Struct('<36s32sqd')      # task_id, metric_type, 时间戳微秒, 值
+_CRC = struct.Struct('<I')
+RECORD_SIZE = _BODY.size + _CRC.size
+
+# 时间戳按本地时间（naive datetime，与 DataPoint.timestamp 一致）相对该起点的整数
+# 微秒存储：往返精确，回放补写的 ISO 文本与原本落库的完全相同
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def journal_path_for(db_path: str) -> str:
+    """数据库文件对应的采样日志路径"""
+    return db_path + JOURNAL_SUFFIX
+
+
+def _segment_path(path: str, seq: int) -> str:
+    """第 seq 段的文件路径"""
+    return f'{path}.{seq:06d}'
+
+
+def _encode(point: DataPoint) -> bytes:
+    """编码一条定长记录（含 CRC）"""
+    body = _BODY.pack(point.task_id.encode('ascii'), point.metric_type.encode('ascii'),
+                      (point.timestamp - _EPOCH) // _MICROSECOND, point.value)
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def _decode(record: bytes) -> DataPoint:
+    """解码一条已通过 CRC 校验的记录"""
+    task_id, metric_type, micros, value = _BODY.unpack_from(record)
+    return DataPoint(
+        task_id=task_id.rstrip(b'\0').decode('ascii'),
+        timestamp=_EPOCH + timedelta(microseconds=micros),
+        value=value,
+        metric_type=metric_type.rstrip(b'\0').decode('ascii'),
+    )
+
+
+class _Segment:
+    """日志的一段：文件路径与各任务尚未确认的记录数"""
+
+    __slots__ = ('path', 'pending')
+
+    def __init__(self, path: str):
+        self.path = path
+        # {任务ID: 本段中该任务已追加但尚未确认的记录数}，归零的任务即移除
+        self.pending: Dict[str, int] = {}
+
+
+class SampleJournal:
+    """
+    采样追加日志（由 MonitorManager 持有，进程内一个实例，多个任务共用）
+
+    追加（采集线程）与落库确认（写入线程）可并发调用。日志读写失败只记日志并停用
+    日志，不影响采集与落库本身。
+
+    每个任务的记录按追加顺序落库或丢弃（缓冲先进先出），确认 count 条即从最旧的段起
+    抵消该任务的 count 条。段删除与否只看本段的记录，不必按顺序：已删除的段中的记录都已
+    落库或已丢弃，回放只补写晚于任务已落库最新周期的记录（见 Database.replay_journal）。上次运行遗留的段（尚未回放）不计入，回放后由 reset() 删除。
+    """
+
+    def __init__(self, path: str, segment_mb: Optional[float] = None):
+        """
+        Args:
+            path: 日志文件路径（通常为 journal_path_for(db_path)），各段为其加序号后缀
+            segment_mb: 每段的大小上限（MB），默认取 config.JOURNAL_SEGMENT_MB
+        """
+        self.path = path
+        self.segment_bytes = int((config.JOURNAL_SEGMENT_MB if segment_mb is None
+                                  else segment_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._fd = None
+        # 本次运行写入的段（最旧在前，最后一段为当前段）
+        self._segments: List[_Segment] = []
+        # 当前段的文件大小（字节）
+        self._size = 0
+        # 下一段的序号：接在上次运行遗留的段之后，回放前不覆盖它们
+        existing = self._existing_segments()
+        self._next_seq = existing[-1][0] + 1 if existing else 1
+        self._open()
+
+    def _existing_segments(self) -> List[tuple]:
+        """
+        磁盘上已有的段（上次运行遗留的与本次运行写入的）
+
+        Returns:
+            List[tuple]: [(序号, 文件路径)]，按序号排列
+        """
+        directory, prefix = os.path.split(self.path)
+        prefix += '.'
+        try:
+            names = os.listdir(directory or '.')
+        except OSError:
+            return []
+        segments = []
+        for name in names:
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+                segments.append((int(suffix), os.path.join(directory, name)))
+        return sorted(segments)
+
+    def _open(self):
+        """打开新的一段作为当前段并写文件头（调用方持锁或处于初始化阶段）"""
+        path = _segment_path(self.path, self._next_seq)
+        self._next_seq += 1
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+        try:
+            self._fd = os.open(path, flags, 0o644)
+            os.write(self._fd, _HEADER.pack(_MAGIC, _FORMAT_VERSION, RECORD_SIZE))
+        except OSError:
+            logger.error("打开采样日志失败，本次运行不记录采样日志: %s", path, exc_info=True)
+            self._close_fd()
+            return
+        self._segments.append(_Segment(path))
+        self._size = _HEADER.size
+
+    def _close_fd(self):
+        """关闭文件描述符（调用方持锁或处于初始化阶段）"""
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    @property
+    def enabled(self) -> bool:
+        """日志是否可用"""
+        return self._fd is not None
+
+    def append(self, points: Iterable[DataPoint]):
+        """
+        追加一批采样记录（一次 write 调用，不 fsync：与 WAL synchronous=NORMAL 的权衡
+        一致，防应用崩溃而非操作系统崩溃/掉电）。必须在数据进入任务缓冲区之前调用；
+        当前段写满后换新段，一批记录总在同一段内
+
+        Args:
+            points: 数据点
+        """
+        points = list(points)
+        data = b''.join(_encode(point) for point in points)
+        if not data:
+            return
+        with self._lock:
+            if self._fd is None:
+                return
+            try:
+                os.write(self._fd, data)
+            except (OSError, UnicodeEncodeError, struct.error):
+                logger.error("写入采样日志失败，停用采样日志", exc_info=True)
+                self._close_fd()
+                return
+            pending = self._segments[-1].pending
+            for point in points:
+                pending[point.task_id] = pending.get(point.task_id, 0) + 1
+            self._size += len(data)
+            if self._size >= self.segment_bytes:
+                self._close_fd()
+                self._open()
+
+    def resolve(self, task_id: str, count: int):
+        """
+        确认任务最旧的 count 条记录已不再需要日志保护（已落库，或按缓冲上限被丢弃）。
+        删除全部记录都已确认的旧段，当前段的记录全部确认时截断为只剩文件头
+
+        Args:
+            task_id: 任务ID
+            count: 确认的记录数
+        """
+        if count <= 0:
+            return
+        with self._lock:
+            if self._fd is None:
+                return
+            for segment in self._segments:
+                pending = segment.pending.get(task_id, 0)
+                if not pending:
+                    continue
+                taken = min(pending, count)
+                if taken == pending:
+                    del segment.pending[task_id]
+                else:
+                    segment.pending[task_id] = pending - taken
+                count -= taken
+                if not count:
+                    break
+            for segment in self._segments[:-1]:
+                if not segment.pending:
+                    self._segments.remove(segment)
+                    self._remove(segment.path)
+            if not self._segments[-1].pending and self._size > _HEADER.size:
+                self._truncate()
+
+    @staticmethod
+    def _remove(path: str):
+        """删除一个已不再需要的段（失败只记日志，残留的段回放时按已落库跳过）"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.error("删除采样日志段失败: %s", path, exc_info=True)
+
+    def _truncate(self):
+        """当前段截断到只剩文件头（调用方持锁）"""
+        try:
+            os.ftruncate(self._fd, _HEADER.size)
+            self._size = _HEADER.size
+        except OSError:
+            logger.error("截断采样日志失败，停用采样日志", exc_info=True)
+            self._close_fd()
+
+    def iter_records(self) -> Iterator[DataPoint]:
+        """
+        按追加顺序逐条读出全部段中完好的记录（启动回放用，逐段读入，不一次读入整个
+        日志）。某段遇到长度不足或 CRC 不符的记录即停止读该段，其后的内容视为崩溃时
+        写了一半的尾部而忽略
+
+        Yields:
+            DataPoint: 数据点；文件头无效的段整段忽略
+        """
+        for _seq, path in self._existing_segments():
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            except OSError:
+                logger.error("读取采样日志失败: %s", path, exc_info=True)
+                continue
+
+            if len(data) < _HEADER.size:
+                continue
+            magic, version, record_size = _HEADER.unpack_from(data)
+            if (magic, version, record_size) != (_MAGIC, _FORMAT_VERSION, RECORD_SIZE):
+                logger.warning("采样日志文件头无效，忽略其内容: %s", path)
+                continue
+
+            offset = _HEADER.size
+            while offset + RECORD_SIZE <= len(data):
+                body = data[offset:offset + _BODY.size]
+                (crc,) = _CRC.unpack_from(data, offset + _BODY.size)
+                if zlib.crc32(body) != crc:
+                    break
+                yield _decode(body)
+                offset += RECORD_SIZE
+            if offset != len(data):
+                logger.warning("采样日志 %s 尾部 %d 字节不完整或已损坏，已忽略",
+                               path, len(data) - offset)
+
+    def read_records(self) -> List[DataPoint]:
+        """
+        读取全部段中完好的记录（见 iter_records）
+
+        Returns:
+            List[DataPoint]: 按追加顺序排列的数据点；没有日志时返回空列表
+        """
+        return list(self.iter_records())
+
+    def reset(self):
+        """清空日志（回放补写完成后调用；此时不应有任务在追加）：删除当前段以外的全部段"""
+        with self._lock:
+            current = self._segments[-1].path if self._fd is not None else None
+            for _seq, path in self._existing_segments():
+                if path != current:
+                    self._remove(path)
+            if current is not None:
+                self._segments = self._segments[-1:]
+                self._segments[0].pending.clear()
+                self._truncate()
+
+    def close(self):
+        """关闭日志文件（幂等）"""
+        with self._lock:
+            self._close_fd()
@@ -2,9 +2,9 @@
 数据模型
 定义监控任务和数据点的数据结构
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 @dataclass
@@ -18,6 +18,8 @@ class MonitorTask:
     start_time: datetime            # 开始时间
     end_time: Optional[datetime]    # 结束时间（None表示正在运行）
     status: str                     # 状态：running/stopped
+    # 指标采集周期倍数 {指标类型: 每 N 个采集周期采一次}，未列出的指标每周期采集
+    metric_periods: Dict[str, int] = field(default_factory=dict)
 
     def is_running(self) -> bool:
         """判断任务是否正在运行"""
@@ -34,8 +36,13 @@ class MonitorTask:
             'start_time': self.start_time.isoformat() if self.start_time else None,
             'end_time': self.end_time.isoformat() if self.end_time else None,
             'status': self.status,
+            'metric_periods': self.metric_periods,
         }
 
+    def metric_interval(self, metric_type: str) -> float:
+        """指标的实际采集间隔（秒）= 任务采集周期 * 该指标的周期倍数"""
+        return self.interval * self.metric_periods.get(metric_type, 1)
+
     @staticmethod
     def from_dict(data: dict) -> 'MonitorTask':
         """从字典创建（兼容旧版单指标 metric_type 字段）"""
@@ -48,6 +55,7 @@ class MonitorTask:
             start_time=datetime.fromisoformat(data['start_time']) if data['start_time'] else None,
             end_time=datetime.fromisoformat(data['end_time']) if data['end_time'] else None,
             status=data['status'],
+            metric_periods=data.get('metric_periods') or {},
         )
 
 
@@ -57,7 +65,7 @@ class DataPoint:
     task_id: str                # 所属任务ID
     timestamp: datetime         # 时间戳
     value: float                # 指标值
-    metric_type: str = ""       # 指标类型（空串兼容旧数据）
+    metric_type: str = ""       # 指标类型
 
     def to_dict(self) -> dict:
         """转换为字典"""
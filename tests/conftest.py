@@ -40,8 +40,10 @@ def db_path(tmp_path):
 
 @pytest.fixture
 def db(db_path):
-    """注入临时库路径的 Database 实例（新库，直接建 v1 结构）"""
-    return Database(db_path)
+    """注入临时库路径的 Database 实例（新库，直接建当前版本结构），用例结束关闭持久连接"""
+    database = Database(db_path)
+    yield database
+    database.close()
 
 
 @pytest.fixture(autouse=True)
@@ -73,7 +75,7 @@ def _reset_app_config():
     """
     重置 app_config 模块级单例 cfg 的状态（v1.3.0 批1，评审修订 M2）。
 
-    cfg 的三个自定义配置项（default_interval/retention_days/close_to_tray）以及
+    cfg 的自定义配置项（default_interval/retention_days/close_to_tray 等）以及
     继承自 QConfig 基类的 themeMode，都是类级 ConfigItem 对象：进程内所有
     AppConfig 实例（含用例中临时构造用于持久化 roundtrip 测试的实例）都引用
     同一批对象；qconfig.load() 还会把 qfluentwidgets 模块级单例 qconfig 的
@@ -92,6 +94,9 @@ def _reset_app_config():
         item_cfg = app_config.cfg
         item_cfg.default_interval.value = item_cfg.default_interval.defaultValue
         item_cfg.retention_days.value = item_cfg.retention_days.defaultValue
+        item_cfg.raw_retention_days.value = item_cfg.raw_retention_days.defaultValue
+        item_cfg.minute_retention_days.value = item_cfg.minute_retention_days.defaultValue
+        item_cfg.size_budget_mb.value = item_cfg.size_budget_mb.defaultValue
         item_cfg.close_to_tray.value = item_cfg.close_to_tray.defaultValue
         # 主题复位为本应用语义上的默认值 AUTO（跟随系统），而非 qfluentwidgets
         # 库自带的类默认值 Theme.LIGHT——与 load_app_config() 首启行为保持一致
@@ -25,7 +25,8 @@ def _reset_monitor_manager_singleton():
     污染。_initialized 是实例级属性，随旧实例一起被丢弃，无需单独重置。
 
     teardown 顺序固定：先对旧实例调用 stop_all_tasks() 收尾残留 QThread（避免残留
-    线程跨用例干扰或收尾中的数据未落库就被强行丢弃），再置 _instance = None。
+    线程跨用例干扰或收尾中的数据未落库就被强行丢弃）并停止删除与空闲页回收线程，
+    再置 _instance = None。
     setup 侧也重置一次作防御：若未来有其他测试在 e2e 之前构造了单例（当前没有），
     保证本用例仍从干净单例开始。
     """
@@ -34,4 +35,11 @@ def _reset_monitor_manager_singleton():
     old_instance = MonitorManager._instance
     if old_instance is not None:
         old_instance.stop_all_tasks()
+        # MainWindow 启动的空闲页回收、WAL 检查点、降采样与大小上限治理线程常驻到退出、
+        # 后台删除线程可能仍在删除，未经真退出路径的用例在此停止并 join
+        for thread in (old_instance.get_governor(), old_instance.get_deleter(),
+                       old_instance.get_downsampler(), old_instance.get_reclaimer(),
+                       old_instance.get_checkpointer()):
+            thread.stop()
+            thread.wait(2000)
     MonitorManager._instance = None
@@ -14,9 +14,12 @@ from app_config import AppConfig, cfg
 
 
 def test_defaults():
-    """未加载任何配置文件时，cfg 三项应为 config.py 常量对应的默认值"""
+    """未加载任何配置文件时，cfg 各项应为 config.py 常量对应的默认值"""
     assert cfg.get(cfg.default_interval) == int(config.DEFAULT_INTERVAL)
     assert cfg.get(cfg.retention_days) == config.DATA_RETENTION_DAYS
+    assert cfg.get(cfg.raw_retention_days) == config.RAW_RETENTION_DAYS
+    assert cfg.get(cfg.minute_retention_days) == config.MINUTE_ROLLUP_RETENTION_DAYS
+    assert cfg.get(cfg.size_budget_mb) == config.DB_SIZE_BUDGET_MB
     assert cfg.get(cfg.close_to_tray) is False
 
 
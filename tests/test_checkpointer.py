@@ -0,0 +1,94 @@
+"""
+WAL 检查点线程（core/checkpointer.py）用例
+长读事务期间 PASSIVE checkpoint 追不上时诊断数据报告滞后；读事务结束后升级为 RESTART
+追上；写入线程有待写数据时不升级
+"""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from core.checkpointer import WalCheckpointer
+from data.database import Database
+from data.models import MonitorTask, DataPoint
+
+
+class _FakeWriter:
+    """只提供 is_idle 的假写入线程"""
+
+    def __init__(self, idle=True):
+        self.idle = idle
+
+    def is_idle(self):
+        return self.idle
+
+
+def _write(db: Database, hours: int = 6):
+    """每秒一个周期的任务，写出数 MB 的 -wal"""
+    task = MonitorTask(task_id="t", pid=1, process_name="a.exe", metric_types=["memory_rss"],
+                       interval=1.0, start_time=datetime(2026, 1, 1), end_time=None,
+                       status="running")
+    db.save_task(task)
+    points = [DataPoint(task_id="t", timestamp=datetime(2026, 1, 1) + timedelta(seconds=i),
+                        value=float(i % 100), metric_type="memory_rss")
+              for i in range(hours * 3600)]
+    for i in range(0, len(points), 1000):
+        db.save_data_points(points[i:i + 1000])
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _open_reader(db: Database) -> sqlite3.Connection:
+    """持有读快照的长读事务（模拟历史页查询或导出线程）"""
+    reader = sqlite3.connect(db.db_path)
+    reader.execute('BEGIN')
+    reader.execute('SELECT COUNT(*) FROM tasks').fetchone()
+    return reader
+
+
+def test_lag_reported_during_long_read_then_restart_catches_up(db):
+    reader = _open_reader(db)
+    _write(db)
+    checkpointer = WalCheckpointer(db, _FakeWriter(), interval_ms=20, limit_mb=0.5,
+                                   busy_timeout_ms=10)
+    checkpointer.start()
+    try:
+        assert _wait_until(lambda: checkpointer.diagnostics()['restart_busy_count'] > 0)
+        diagnostics = checkpointer.diagnostics()
+        assert diagnostics['lag_frames'] > 0
+        assert diagnostics['wal_bytes'] > 512 * 1024
+
+        reader.rollback()
+        assert _wait_until(lambda: checkpointer.diagnostics()['lag_frames'] == 0)
+        diagnostics = checkpointer.diagnostics()
+        assert diagnostics['lag_seconds'] == 0
+        assert diagnostics['restart_count'] > diagnostics['restart_busy_count']
+    finally:
+        reader.close()
+        checkpointer.stop()
+        assert checkpointer.wait(2000)
+
+
+def test_no_restart_while_writer_busy(db):
+    reader = _open_reader(db)
+    _write(db, hours=2)
+    writer = _FakeWriter(idle=False)
+    checkpointer = WalCheckpointer(db, writer, limit_mb=0.1, busy_timeout_ms=10)
+    try:
+        checkpointer.checkpoint_once()
+        assert checkpointer.diagnostics()['passive_count'] == 1
+        assert checkpointer.diagnostics()['restart_count'] == 0
+
+        reader.rollback()
+        writer.idle = True
+        result = checkpointer.checkpoint_once()
+        assert checkpointer.diagnostics()['restart_count'] == 1
+        assert result['busy'] == 0 and result['checkpointed_frames'] == result['log_frames']
+    finally:
+        reader.close()
@@ -0,0 +1,56 @@
+"""
+采样压缩块编解码（data/chunks.py）用例
+时间戳与值往返精确（含抖动、NaN、-0.0 与大间隔），固定周期、不变值的块压缩到
+每点远小于一个字节，格式版本不符时报错
+"""
+import math
+import random
+import struct
+
+import pytest
+
+from data.chunks import decode_chunk, encode_chunk
+
+BASE_MS = 1_767_225_600_000
+
+
+def _bits(values):
+    return [struct.pack('<d', v) for v in values]
+
+
+def test_roundtrip_exact_with_jitter_and_special_values():
+    rng = random.Random(17)
+    timestamps, ts = [], BASE_MS + 123
+    for _ in range(500):
+        timestamps.append(ts)
+        ts += 1000 + rng.randint(-40, 40)
+    timestamps.append(ts + 86_400_000)      # 暂停后恢复采集的大间隔
+    values = [rng.uniform(-1e6, 1e6) for _ in range(len(timestamps))]
+    values[3:6] = [math.nan, -0.0, math.inf]
+
+    decoded_ts, decoded_values = decode_chunk(BASE_MS, encode_chunk(BASE_MS, timestamps, values))
+
+    assert decoded_ts == timestamps
+    assert _bits(decoded_values) == _bits(values)
+
+
+def test_single_point_and_empty_chunk():
+    assert decode_chunk(BASE_MS, encode_chunk(BASE_MS, [BASE_MS], [1.5])) == ([BASE_MS], pytest.approx([1.5]))
+    timestamps, values = decode_chunk(BASE_MS, encode_chunk(BASE_MS, [], []))
+    assert timestamps == [] and len(values) == 0
+
+
+def test_regular_constant_series_compresses_well():
+    """固定周期的二阶差分与不变值的异或全为 0，一小时 3600 点压缩到几十字节"""
+    timestamps = [BASE_MS + i * 1000 for i in range(3600)]
+    data = encode_chunk(BASE_MS, timestamps, [42.0] * 3600)
+    assert len(data) < 3600 * 0.1
+
+
+def test_length_mismatch_and_unknown_version_rejected():
+    with pytest.raises(ValueError):
+        encode_chunk(BASE_MS, [BASE_MS], [1.0, 2.0])
+    data = bytearray(encode_chunk(BASE_MS, [BASE_MS], [1.0]))
+    data[0] = 99
+    with pytest.raises(ValueError):
+        decode_chunk(BASE_MS, bytes(data))
@@ -37,6 +37,13 @@ def _reset_monitor_manager_singleton():
     old_instance = MonitorManager._instance
     if old_instance is not None:
         old_instance.stop_all_tasks()
+        # MainWindow 启动的空闲页回收、WAL 检查点、降采样与大小上限治理线程常驻到退出、
+        # 后台删除线程可能仍在删除，未经真退出路径的用例在此停止并 join
+        for thread in (old_instance.get_governor(), old_instance.get_deleter(),
+                       old_instance.get_downsampler(), old_instance.get_reclaimer(),
+                       old_instance.get_checkpointer()):
+            thread.stop()
+            thread.wait(2000)
     MonitorManager._instance = None
 
 
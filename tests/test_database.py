@@ -2,9 +2,15 @@
 Database 基础存取用例
 平移自 data/database.py 原 `__main__` 冒烟块，改为 tmp_path 临时库注入
 """
+import os
+import sqlite3
 import uuid
 from datetime import datetime, timedelta
 
+import config
+
+from data.database import (PARTITION_ATTACH_LIMIT, Database, iter_chunk_ticks, partition_path,
+                           retention_cutoffs, to_epoch_ms)
 from data.models import MonitorTask, DataPoint
 
 
@@ -63,7 +69,7 @@ def test_save_and_filter_multi_metric_data_points(db):
 
 
 def test_sample_count_counts_distinct_timestamps(db):
-    """采集次数口径：COUNT DISTINCT timestamp，同一时间戳多指标算一次采集"""
+    """采集次数口径：samples 每个采集周期一行，同一时间戳多指标算一次采集"""
     task = _make_task()
     db.save_task(task)
 
@@ -84,6 +90,66 @@ def test_sample_count_counts_distinct_timestamps(db):
     assert point_count == 4
 
 
+def test_same_tick_saved_twice_merges_into_one_row(db):
+    """同一周期的指标分批写入合并为一行；重复写入按列覆盖，不产生重复数据点"""
+    task = _make_task()
+    db.save_task(task)
+    ts = datetime.now()
+
+    assert db.save_data_points([
+        DataPoint(task_id=task.task_id, timestamp=ts, value=100.0, metric_type="memory_rss")])
+    assert db.save_data_points([
+        DataPoint(task_id=task.task_id, timestamp=ts, value=12.0, metric_type="cpu_percent"),
+        DataPoint(task_id=task.task_id, timestamp=ts, value=101.0, metric_type="memory_rss"),
+    ])
+
+    assert db.get_sample_count(task.task_id) == 1
+    assert [(dp.metric_type, dp.value) for dp in db.get_task_data_points(task.task_id)] == [
+        ("memory_rss", 101.0), ("cpu_percent", 12.0)]
+
+
+def test_task_summary_tracks_writes_and_overwrites(db):
+    """任务汇总随写入增量维护：新周期/新单元格计数，重复写入不重复计，改写极值后与全量聚合一致"""
+    task = _make_task()
+    db.save_task(task)
+    ts = datetime(2026, 1, 1)
+    db.save_data_points([
+        DataPoint(task.task_id, ts + timedelta(seconds=i), float(i), "memory_rss") for i in range(5)])
+    db.save_data_points([
+        DataPoint(task.task_id, ts + timedelta(seconds=i), 10.0 + i, "cpu_percent") for i in range(3)]
+        + [DataPoint(task.task_id, ts + timedelta(seconds=1), 1.0, "memory_rss")])
+    # 改写当前最大值：极值无法增量回退，须重新聚合
+    db.save_data_points([DataPoint(task.task_id, ts + timedelta(seconds=4), 0.5, "memory_rss")])
+
+    assert db.get_sample_count(task.task_id) == 5
+    assert db.get_data_point_count(task.task_id) == 8
+    assert db.get_data_point_count(task.task_id, "cpu_percent") == 3
+    assert db.get_last_point_timestamp(task.task_id) == ts + timedelta(seconds=4)
+    for metric in task.metric_types:
+        # since 早于全部数据时走 samples 聚合，与汇总结果应完全一致
+        assert db.get_metric_stats(task.task_id, metric) == db.get_metric_stats(
+            task.task_id, metric, since=ts - timedelta(days=1))
+    assert db.get_metric_stats(task.task_id, "memory_rss")["max"] == 3.0
+
+
+def test_data_point_counts_for_all_tasks_in_one_call(db):
+    """get_data_point_counts 一次返回各任务数据点数；无数据与已删除的任务不在其中"""
+    with_data, empty, deleted = _make_task(), _make_task(), _make_task()
+    ts = datetime.now()
+    for task in (with_data, empty, deleted):
+        db.save_task(task)
+    for task in (with_data, deleted):
+        db.save_data_points([
+            DataPoint(task.task_id, ts, 1.0, "memory_rss"),
+            DataPoint(task.task_id, ts, 2.0, "cpu_percent"),
+        ])
+    db.delete_task(deleted.task_id)
+
+    assert db.get_data_point_counts() == {with_data.task_id: 2}
+    assert db.get_sample_count(deleted.task_id) == 0
+    assert db.get_last_point_timestamp(deleted.task_id) is None
+
+
 def test_update_task_status(db):
     """更新任务状态与结束时间后可回读"""
     task = _make_task()
@@ -255,6 +321,52 @@ def test_get_task_data_points_bucketed_small_dataset_returns_all_points(db):
     assert [p.value for p in bucketed] == [float(i) for i in range(10)]
 
 
+def test_rollups_maintained_at_ingest_match_full_rebuild(db):
+    """降采样汇总随写入增量维护：分批写入、改写单元格后与从 samples 全量聚合一致"""
+    task = _make_task()
+    db.save_task(task)
+    base = datetime(2026, 1, 1)
+    points = [DataPoint(task.task_id, base + timedelta(seconds=7 * i), float(i % 13), "memory_rss")
+              for i in range(2000)]
+    for i in range(0, len(points), 300):
+        db.save_data_points(points[i:i + 300])
+    db.save_data_points([DataPoint(task.task_id, base + timedelta(seconds=70), 99.0, "memory_rss")])
+
+    with db._get_connection() as conn:
+        cursor = conn.cursor()
+        query = 'SELECT * FROM rollups ORDER BY 1, 2, 3, 4'
+        incremental = [tuple(row) for row in cursor.execute(query)]
+        db._rebuild_rollups(cursor)
+        rebuilt = [tuple(row) for row in cursor.execute(query)]
+    assert incremental == rebuilt
+
+
+def test_chart_reads_coarsest_rollup_with_enough_buckets(db):
+    """按像素宽度选最粗且桶数足够的粒度；汇总读出的每桶 MIN/MAX 保留尖峰及其真实时间"""
+    task = _make_task()
+    db.save_task(task)
+    base = datetime(2026, 1, 1)
+    spike = base + timedelta(hours=5, seconds=17)
+    points = [DataPoint(task.task_id, base + timedelta(seconds=10 * i), float(i % 10), "memory_rss")
+              for i in range(6 * 360)]
+    points.append(DataPoint(task.task_id, spike, 99999.0, "memory_rss"))
+    for i in range(0, len(points), 2000):
+        db.save_data_points(points[i:i + 2000])
+
+    assert db.choose_rollup_resolution(task.task_id, 5) == 3_600_000
+    assert db.choose_rollup_resolution(task.task_id, 300) == 60_000
+    assert db.choose_rollup_resolution(task.task_id, 1000) is None  # 范围太短，改读原始数据
+    assert db.choose_rollup_resolution(task.task_id, 300, since=base + timedelta(hours=4)) is None
+
+    chart = db.get_task_data_points_rollup(task.task_id, "memory_rss", 60_000)
+    assert len(chart) <= 2 * 360
+    assert (spike, 99999.0) in [(p.timestamp, p.value) for p in chart]
+    assert min(p.value for p in chart) == 0.0
+    assert [p.timestamp for p in chart] == sorted(p.timestamp for p in chart)
+    merged = db.get_task_data_points_rollup(task.task_id, "memory_rss", 60_000, max_buckets=50)
+    assert len(merged) <= 100
+
+
 def test_cleanup_old_tasks_disabled_when_retention_zero(db):
     """retention_days<=0 视为禁用，不做任何删除"""
     task = _make_task(status="stopped", end_time=datetime(2000, 1, 1))
@@ -300,13 +412,161 @@ def test_cleanup_old_tasks_uses_start_time_when_end_time_null(db):
     assert db.get_task(task.task_id) is None
 
 
-# ========== v1.3.0 批2：since_iso 时间过滤 / 统计 / 最新时间戳 ==========
-# 评审修订 B1 是本批最高优先级事实：data_points.timestamp 在库里是 ISO TEXT，
-# SQL 过滤参数必须用 ISO 字符串。以下用例均显式断言"过滤后行数 < 全量行数"，
-# 防止重犯"float 过滤恒真、时间过滤静默失效"的回归（opus 评审已实测过该缺陷）。
+def test_cleanup_old_tasks_without_purge_only_marks(db):
+    """purge=False 只把过期任务标记为排队删除（列表中消失），数据留给后台删除线程"""
+    task = _make_task(status="stopped", end_time=datetime.now() - timedelta(days=40))
+    _write_hours([db], task, datetime(2026, 1, 1), 1)
+
+    assert db.cleanup_old_tasks(retention_days=30, purge=False) == 1
+    assert db.get_task(task.task_id) is None
+    assert db.get_deleting_task_ids() == [task.task_id]
+    assert db.count_task_rows(task.task_id) > 0
+    # 已标记的任务不重复计入
+    assert db.cleanup_old_tasks(retention_days=30, purge=False) == 0
+
+
+def test_marked_task_hidden_and_deleted_in_bounded_batches(db):
+    """标记删除的任务立即从列表与计数中消失；每批至多删除 max_rows 行，删空后最后一步
+    删除汇总与任务行"""
+    task, other = _make_task(), _make_task()
+    _write_hours([db], task, datetime(2026, 1, 1), 1)
+    _write_hours([db], other, datetime(2026, 1, 1), 1)
+    total = db.count_task_rows(task.task_id)
+    assert total > 0
+
+    assert db.mark_tasks_deleting([task.task_id]) is True
+    assert db.get_task(task.task_id) is None
+    assert [t.task_id for t in db.get_all_tasks()] == [other.task_id]
+    assert set(db.get_data_point_counts()) == {other.task_id}
+
+    batches = []
+    while True:
+        deleted = db.delete_task_batch(task.task_id, 100)
+        if not deleted:
+            break
+        batches.append(deleted)
+    assert deleted == 0
+    assert sum(batches) == total
+    assert max(batches) == 100
+    assert db.get_deleting_task_ids() == []
+    with db._get_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM task_summary').fetchone()[0] == 1
+    assert len(db.get_task_data_points(other.task_id)) == 540
+    # 未标记的任务不会被分批删除
+    assert db.delete_task_batch(other.task_id, 100) == 0
+    assert db.get_task(other.task_id) is not None
+
+
+def test_pending_deletion_resumes_after_restart(db_path):
+    """删到一半退出：标记留在库中，重新打开后继续删完；删除期间新建的任务不复用其整数键"""
+    db = Database(db_path)
+    task = _make_task()
+    _write_hours([db], task, datetime(2026, 1, 1), 1)
+    db.mark_tasks_deleting([task.task_id])
+    assert db.delete_task_batch(task.task_id, 50) == 50
+    newer = _make_task()
+    _write_hours([db], newer, datetime(2026, 1, 1), 1)
+    db.close()
+
+    reopened = Database(db_path)
+    try:
+        assert reopened.get_deleting_task_ids() == [task.task_id]
+        assert reopened.delete_task(task.task_id) is True
+        assert reopened.get_deleting_task_ids() == []
+        assert len(reopened.get_task_data_points(newer.task_id)) == 540
+    finally:
+        reopened.close()
+
+
+def test_retention_cutoffs_align_to_whole_windows():
+    """裁剪时刻为"当前 - 天数"向下对齐到整小时窗口；0 天为永久保留"""
+    now_ms = to_epoch_ms(datetime(2026, 3, 10, 5, 30))
+    raw, minute = retention_cutoffs(7, 0, now_ms=now_ms)
+    assert minute is None
+    assert raw % 3_600_000 == 0
+    assert now_ms - 7 * 86_400_000 - 3_600_000 < raw <= now_ms - 7 * 86_400_000
+    assert retention_cutoffs(0, 0, now_ms=now_ms) == (None, None)
+
+
+def test_tiered_retention_keeps_stats_and_charts_from_rollups(db):
+    """裁剪后原始采样与 1 分钟汇总只剩保留期内的部分；任务汇总与 1 小时汇总不变，
+    图表与范围统计改读汇总，结果与裁剪前一致"""
+    task = _make_task()
+    base = datetime(2026, 1, 1)
+    _write_hours([db], task, base, 6)
+    stats_before = {hours: db.get_metric_stats(task.task_id, "memory_rss",
+                                               since=base + timedelta(hours=hours))
+                    for hours in (1, 3)}
+    total_before = db.get_metric_stats(task.task_id, "memory_rss")
+    hourly = 'SELECT * FROM rollups WHERE resolution_ms = 3600000 ORDER BY 1, 2, 3, 4'
+    with db._get_connection() as conn:
+        hourly_before = [tuple(row) for row in conn.execute(hourly)]
+
+    raw_before = to_epoch_ms(base + timedelta(hours=4))
+    minute_before = to_epoch_ms(base + timedelta(hours=2))
+    assert db.get_downsample_candidates(raw_before, minute_before) == [task.task_id]
+    batches = 0
+    while db.downsample_task_batch(task.task_id, raw_before, minute_before, 100):
+        batches += 1
+    assert batches > 10
+    assert db.get_downsample_candidates(raw_before, minute_before) == []
+
+    points = db.get_task_data_points(task.task_id, metric_type="memory_rss")
+    assert min(p.timestamp for p in points) >= base + timedelta(hours=4)
+    with db._get_connection() as conn:
+        assert [tuple(row) for row in conn.execute(hourly)] == hourly_before
+        oldest_minute = conn.execute(
+            'SELECT MIN(bucket_ms) FROM rollups WHERE resolution_ms = 60000').fetchone()[0]
+    assert oldest_minute == minute_before
+    assert db.get_metric_stats(task.task_id, "memory_rss") == total_before
+    for hours, expected in stats_before.items():
+        stats = db.get_metric_stats(task.task_id, "memory_rss", since=base + timedelta(hours=hours))
+        assert (stats['count'], stats['min'], stats['max']) == \
+            (expected['count'], expected['min'], expected['max'])
+        assert abs(stats['avg'] - expected['avg']) < 1e-9
+
+    # 范围起点早于裁剪时刻：即使桶数不够也读仍保留的汇总，不再对（已裁剪的）原始数据分桶
+    assert db.choose_rollup_resolution(task.task_id, 1000, since=base + timedelta(hours=1)) \
+        == 3_600_000
+    assert db.choose_rollup_resolution(task.task_id, 1000, since=base + timedelta(hours=3)) \
+        == 60_000
+    assert db.choose_rollup_resolution(task.task_id, 1000, since=base + timedelta(hours=5)) is None
+    chart = db.get_task_data_points_rollup(task.task_id, "memory_rss", 60_000,
+                                           since=base + timedelta(hours=3))
+    assert min(p.timestamp for p in chart) < base + timedelta(hours=4)
+
+
+def test_writes_before_raw_retention_start_are_skipped(db):
+    """原始采样已裁剪的范围只剩汇总：再写入其中的数据点（迟到的写入、日志回放）跳过，
+    汇总不重复计入；保留起点之后的照常写入"""
+    task = _make_task()
+    base = datetime(2026, 1, 1)
+    _write_hours([db], task, base, 3)
+    while db.downsample_task_batch(task.task_id, to_epoch_ms(base + timedelta(hours=2)), None, 100):
+        pass
+    stats_before = db.get_metric_stats(task.task_id, "memory_rss")
+
+    old = DataPoint(task_id=task.task_id, timestamp=base + timedelta(minutes=30),
+                    value=1e9, metric_type="memory_rss")
+    assert db.save_data_points([old]) is True
+    assert db.get_metric_stats(task.task_id, "memory_rss") == stats_before
+    assert min(p.timestamp for p in db.get_task_data_points(task.task_id)) \
+        >= base + timedelta(hours=2)
+
+    late = DataPoint(task_id=task.task_id, timestamp=base + timedelta(hours=3),
+                     value=1e9, metric_type="memory_rss")
+    assert db.save_data_points([old, late]) is True
+    stats = db.get_metric_stats(task.task_id, "memory_rss")
+    assert (stats['count'], stats['max']) == (stats_before['count'] + 1, 1e9)
+
+
+# ========== v1.3.0 批2：since 时间过滤 / 统计 / 最新时间戳 ==========
+# 库内时间戳为 epoch 毫秒整数，since 参数为 datetime、由 Database 统一换算。以下用例
+# 均显式断言"过滤后行数 < 全量行数"，防止时间过滤静默失效的回归（评审修订 B1）。
 
 def test_data_points_since_filter(db):
-    """since_iso 只返回该时间及之后的点（取第6个点的 ISO 字符串），且行数必须收窄"""
+    """since 只返回该时间及之后的点（取第6个点的时间戳），且行数必须收窄"""
     task = _make_task()
     db.save_task(task)
 
@@ -318,8 +578,8 @@ def test_data_points_since_filter(db):
     ]
     db.save_data_points(points)
 
-    since_iso = points[5].timestamp.isoformat()  # 第6个点（i=5）
-    result = db.get_task_data_points(task.task_id, metric_type="memory_rss", since_iso=since_iso)
+    since = points[5].timestamp  # 第6个点（i=5）
+    result = db.get_task_data_points(task.task_id, metric_type="memory_rss", since=since)
 
     assert len(result) == 5  # i=5..9
     assert len(result) < len(points), "过滤后行数必须收窄，否则时间过滤静默失效（B1 回归）"
@@ -340,9 +600,9 @@ def test_data_points_since_with_limit(db):
     ]
     db.save_data_points(points)
 
-    since_iso = points[5].timestamp.isoformat()
+    since = points[5].timestamp
     result = db.get_task_data_points(
-        task.task_id, metric_type="memory_rss", limit=3, since_iso=since_iso)
+        task.task_id, metric_type="memory_rss", limit=3, since=since)
 
     assert len(result) == 3
     assert [p.value for p in result] == [7.0, 8.0, 9.0]
@@ -363,9 +623,9 @@ def test_bucketed_since_filter(db):
     db.save_data_points(points)
 
     full = db.get_task_data_points_bucketed(task.task_id, metric_type="memory_rss", max_buckets=2000)
-    since_iso = points[15].timestamp.isoformat()
+    since = points[15].timestamp
     filtered = db.get_task_data_points_bucketed(
-        task.task_id, metric_type="memory_rss", max_buckets=2000, since_iso=since_iso)
+        task.task_id, metric_type="memory_rss", max_buckets=2000, since=since)
 
     assert len(full) == 20
     assert len(filtered) == 5  # i=15..19，未超过 max_buckets，逐行成桶等价于全量返回
@@ -401,7 +661,7 @@ def test_metric_stats_basic(db):
 
 
 def test_metric_stats_since_filter_narrows_range(db):
-    """stats 的 since_iso 过滤同样必须收窄，覆盖 get_metric_stats 自身的 B1 回归风险"""
+    """stats 的 since 过滤同样必须收窄，覆盖 get_metric_stats 自身的 B1 回归风险"""
     task = _make_task()
     db.save_task(task)
 
@@ -414,8 +674,8 @@ def test_metric_stats_since_filter_narrows_range(db):
     db.save_data_points(points)
 
     full_stats = db.get_metric_stats(task.task_id, "memory_rss")
-    since_iso = points[5].timestamp.isoformat()
-    filtered_stats = db.get_metric_stats(task.task_id, "memory_rss", since_iso=since_iso)
+    since = points[5].timestamp
+    filtered_stats = db.get_metric_stats(task.task_id, "memory_rss", since=since)
 
     assert full_stats['count'] == 10
     assert filtered_stats['count'] == 5
@@ -431,13 +691,13 @@ def test_metric_stats_empty_returns_none(db):
 
     assert db.get_metric_stats(task.task_id, "memory_rss") is None
 
-    # 有数据但 since_iso 晚于全部数据点时，范围内同样无数据
+    # 有数据但 since 晚于全部数据点时，范围内同样无数据
     db.save_data_points([
         DataPoint(task_id=task.task_id, timestamp=datetime(2026, 1, 1),
                   value=1.0, metric_type="memory_rss"),
     ])
-    future_iso = datetime(2099, 1, 1).isoformat()
-    assert db.get_metric_stats(task.task_id, "memory_rss", since_iso=future_iso) is None
+    future = datetime(2099, 1, 1)
+    assert db.get_metric_stats(task.task_id, "memory_rss", since=future) is None
 
 
 def test_last_point_timestamp(db):
@@ -505,3 +765,523 @@ def test_vacuum_runs_and_shrinks_or_noop(db):
     size_after = db.get_db_size_bytes()
 
     assert size_after <= size_before
+
+
+def _fill_and_delete(db, n=20000):
+    """写入 n 个周期的数据后删除任务，留下一批空闲页"""
+    task = _make_task()
+    db.save_task(task)
+    base = datetime(2026, 1, 1)
+    db.save_data_points([
+        DataPoint(task_id=task.task_id, timestamp=base + timedelta(seconds=i),
+                  value=float(i), metric_type=metric)
+        for i in range(n) for metric in ("memory_rss", "cpu_percent")
+    ])
+    db.delete_task(task.task_id)
+
+
+def test_incremental_reclaim_returns_free_pages_in_steps(db):
+    """新库启用 auto_vacuum=INCREMENTAL：删除释放的页按每步上限逐步回收，回收量计入
+    reclaimed_bytes，checkpoint 后库文件随之变小"""
+    _fill_and_delete(db)
+    stats = db.get_space_stats()
+    assert stats['incremental'] == 1
+    free_pages = stats['freelist_pages']
+    assert free_pages > 32
+
+    assert db.reclaim_free_pages(32) == 32
+    assert db.get_space_stats()['freelist_pages'] == free_pages - 32
+    while db.reclaim_free_pages(32):
+        pass
+
+    stats = db.get_space_stats()
+    assert stats['freelist_pages'] == 0
+    assert stats['reclaimed_bytes'] == free_pages * stats['page_size']
+    with db._get_connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    assert os.path.getsize(db.db_path) == page_count * stats['page_size']
+
+
+def test_legacy_database_converted_to_incremental_by_vacuum(db_path):
+    """已建过表的旧库（auto_vacuum=NONE）不会被增量回收；vacuum() 重建时转换，之后可回收"""
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE legacy (x)')
+    conn.execute('DROP TABLE legacy')
+    conn.close()
+
+    db = Database(db_path)
+    try:
+        _fill_and_delete(db)
+        assert db.get_space_stats()['incremental'] == 0
+        assert db.reclaim_free_pages(1000) == 0
+
+        db.vacuum()
+        assert db.get_space_stats()['incremental'] == 1
+        assert db.reclaimed_bytes > 0
+
+        _fill_and_delete(db)
+        assert db.reclaim_free_pages(1000) > 0
+    finally:
+        db.close()
+
+
+# ========== 每线程持久连接 ==========
+
+def test_connection_reused_within_thread_and_separate_across_threads(db):
+    """同一线程多次调用复用同一持久连接；不同线程各自持有独立连接"""
+    import threading
+
+    with db._get_connection() as first:
+        pass
+    with db._get_connection() as second:
+        pass
+    assert first is second
+
+    other = []
+
+    def _worker():
+        with db._get_connection() as conn:
+            other.append(conn)
+        assert db.save_task(_make_task()) is True
+
+    thread = threading.Thread(target=_worker)
+    thread.start()
+    thread.join()
+    assert other and other[0] is not first
+
+
+def test_nested_connection_shares_outer_transaction(db):
+    """嵌套使用共享外层事务：内层异常使外层整体回滚，内层写入不会单独提交"""
+    task = _make_task()
+    try:
+        with db._get_connection() as outer:
+            outer.execute(
+                "INSERT INTO tasks (task_id, pid, process_name, metric_type, interval, "
+                "start_time, status) VALUES (?, 1, 'a.exe', '[\"memory_rss\"]', 1.0, ?, 'stopped')",
+                (task.task_id, datetime.now().isoformat()))
+            with db._get_connection() as inner:
+                assert inner is outer
+            raise RuntimeError("外层失败")
+    except RuntimeError:
+        pass
+
+    assert db.get_task(task.task_id) is None
+
+
+def test_close_releases_connections_and_reopens_on_demand(db):
+    """close() 关闭全部持久连接，之后再次使用时自动重新打开"""
+    task = _make_task()
+    db.save_task(task)
+    with db._get_connection() as before:
+        pass
+
+    db.close()
+
+    assert db.get_task(task.task_id) is not None
+    with db._get_connection() as after:
+        pass
+    assert after is not before
+
+
+def _chunked_pair(tmp_path):
+    """同样写入的按行存储库与压缩块存储库"""
+    return (Database(str(tmp_path / "rows.db")),
+            Database(str(tmp_path / "chunks.db"), sample_storage="chunks"))
+
+
+def _write_hours(databases, task, base, hours, step_s=10):
+    """每 step_s 秒一个采集周期，两个指标，分批写入（cpu_percent 每隔一个周期缺失）"""
+    points = []
+    for i in range(hours * 3600 // step_s):
+        ts = base + timedelta(seconds=step_s * i, milliseconds=i % 7)
+        points.append(DataPoint(task.task_id, ts, float((i * 37) % 101), "memory_rss"))
+        if i % 2:
+            points.append(DataPoint(task.task_id, ts, i / 3, "cpu_percent"))
+    for database in databases:
+        database.save_task(task)
+        for i in range(0, len(points), 500):
+            database.save_data_points(points[i:i + 500])
+    return points
+
+
+def _snapshot(database, task_id, since):
+    def pairs(rows):
+        return [(p.timestamp, p.metric_type, p.value) for p in rows]
+    with database._get_connection() as conn:
+        cursor = conn.cursor()
+        schema, _held = database._task_storage(cursor, task_id)
+        rollups = [tuple(row) for row in cursor.execute(
+            f'SELECT * FROM {schema}.rollups ORDER BY 1, 2, 3, 4')]
+        summary = [tuple(row) for row in cursor.execute('SELECT * FROM task_summary')]
+        counts = [tuple(row)[:3] for row in cursor.execute(
+            'SELECT task_key, metric_id, point_count, min_value, max_value FROM task_metric_summary '
+            'ORDER BY 1, 2')]
+    stats = database.get_metric_stats(task_id, "cpu_percent", since=since)
+    return dict(
+        all=pairs(database.get_task_data_points(task_id)),
+        limited=pairs(database.get_task_data_points(task_id, "memory_rss", limit=50)),
+        since=pairs(database.get_task_data_points(task_id, "cpu_percent", since=since, limit=900)),
+        bucketed=pairs(database.get_task_data_points_bucketed(task_id, "memory_rss", max_buckets=40)),
+        stats=(stats["count"], stats["min"], stats["max"], round(stats["avg"], 6)),
+        full_stats=database.get_metric_stats(task_id, "memory_rss")["count"],
+        rollups=rollups, summary=summary, counts=counts,
+    )
+
+
+def test_chunk_storage_reads_match_row_storage(tmp_path):
+    """压缩块存储下各读取接口、汇总与降采样汇总与按行存储完全一致，已关闭窗口不再占 samples 行"""
+    rows_db, chunks_db = _chunked_pair(tmp_path)
+    task = _make_task()
+    base = datetime(2026, 1, 1, 0, 20)
+    _write_hours([rows_db, chunks_db], task, base, 4)
+    since = base + timedelta(hours=1, minutes=7, seconds=3)
+
+    try:
+        assert _snapshot(chunks_db, task.task_id, since) == _snapshot(rows_db, task.task_id, since)
+        with chunks_db._get_connection() as conn:
+            cursor = conn.cursor()
+            first_raw = cursor.execute('SELECT MIN(ts_ms) FROM samples').fetchone()[0]
+            chunk_count = cursor.execute('SELECT COUNT(*) FROM sample_chunks').fetchone()[0]
+        assert chunk_count == 2 * 4                      # 前 4 个整点窗口，每窗口两个指标
+        assert first_raw >= int(datetime(2026, 1, 1, 4).timestamp() * 1000)
+    finally:
+        rows_db.close()
+        chunks_db.close()
+
+
+def test_late_write_into_sealed_window_reopens_it(tmp_path):
+    """写入已封块窗口（补写、改写已有周期）时先解封再写，结果与按行存储一致"""
+    rows_db, chunks_db = _chunked_pair(tmp_path)
+    task = _make_task()
+    base = datetime(2026, 1, 1)
+    _write_hours([rows_db, chunks_db], task, base, 3)
+    late = [DataPoint(task.task_id, base + timedelta(minutes=5, seconds=10, milliseconds=1), -5.0, "memory_rss"),
+            DataPoint(task.task_id, base + timedelta(minutes=5, seconds=3), 7.5, "cpu_percent")]
+    since = base + timedelta(minutes=4)
+
+    try:
+        for database in (rows_db, chunks_db):
+            database.save_data_points(late)
+        assert _snapshot(chunks_db, task.task_id, since) == _snapshot(rows_db, task.task_id, since)
+        assert (base + timedelta(minutes=5, seconds=3), "cpu_percent", 7.5) in _snapshot(
+            chunks_db, task.task_id, since)["all"]
+    finally:
+        rows_db.close()
+        chunks_db.close()
+
+
+def test_compact_samples_seals_stopped_task_and_delete_removes_chunks(tmp_path):
+    """已停止任务连同最后不完整的窗口整体封块；按行存储库不做转换；删除任务一并删除压缩块"""
+    rows_db, chunks_db = _chunked_pair(tmp_path)
+    task = _make_task()
+    _write_hours([rows_db, chunks_db], task, datetime(2026, 1, 1, 0, 30), 2)
+    expected = rows_db.get_task_data_points(task.task_id)
+
+    try:
+        assert rows_db.compact_samples() == 0
+        chunks_db.update_task_status(task.task_id, "stopped", datetime(2026, 1, 1, 3))
+        assert chunks_db.compact_samples() == 1
+        with chunks_db._get_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM samples').fetchone()[0] == 0
+        assert chunks_db.get_task_data_points(task.task_id) == expected
+
+        assert chunks_db.delete_task(task.task_id) is True
+        with chunks_db._get_connection() as conn:
+            assert conn.execute('SELECT COUNT(*) FROM sample_chunks').fetchone()[0] == 0
+    finally:
+        rows_db.close()
+        chunks_db.close()
+
+
+def test_iter_chunk_ticks_yields_sealed_ticks_in_time_order(tmp_path):
+    """流式读取按采集周期合并各指标，时间升序，只含有值的指标"""
+    rows_db, chunks_db = _chunked_pair(tmp_path)
+    task = _make_task()
+    points = _write_hours([chunks_db], task, datetime(2026, 1, 1), 2)
+    rows_db.close()
+
+    try:
+        with chunks_db._get_connection() as conn:
+            metric_ids = dict(conn.execute('SELECT name, id FROM metrics').fetchall())
+            ticks = list(iter_chunk_ticks(conn.cursor(), task.task_id,
+                                          [metric_ids["memory_rss"], metric_ids["cpu_percent"]]))
+        sealed = [p for p in points if p.timestamp < datetime(2026, 1, 1, 1)]
+        assert [ts for ts, _ in ticks] == sorted({int(p.timestamp.timestamp() * 1000) for p in sealed})
+        assert sum(len(values) for _, values in ticks) == len(sealed)
+        assert ticks[1][1] == {metric_ids["memory_rss"]: sealed[1].value, metric_ids["cpu_percent"]: sealed[2].value}
+    finally:
+        chunks_db.close()
+
+
+def _write_flat(databases, task, base, hours, step_s=10):
+    """阶梯状的两个指标：memory_rss 每 97 个周期变一次，cpu_percent 每隔一个周期采集、常连续相同"""
+    points = []
+    for i in range(hours * 3600 // step_s):
+        ts = base + timedelta(seconds=step_s * i)
+        points.append(DataPoint(task.task_id, ts, float(i // 97 % 5 * 1024), "memory_rss"))
+        if i % 2:
+            points.append(DataPoint(task.task_id, ts, float(i // 13 % 3), "cpu_percent"))
+    for database in databases:
+        database.save_task(task)
+        for i in range(0, len(points), 500):
+            database.save_data_points(points[i:i + 500])
+    return points
+
+
+def test_change_only_storage_reads_match_row_storage(tmp_path):
+    """只记变化：重复值只记 held 位，各读取接口、汇总与降采样汇总与逐周期写值完全一致"""
+    rows_db = Database(str(tmp_path / "rows.db"))
+    held_db = Database(str(tmp_path / "held.db"), change_only=True)
+    both_db = Database(str(tmp_path / "both.db"), sample_storage="chunks", change_only=True)
+    task = _make_task()
+    base = datetime(2026, 1, 1, 0, 20)
+    _write_flat([rows_db, held_db, both_db], task, base, 3)
+    since = base + timedelta(hours=1, minutes=7, seconds=3)
+
+    try:
+        expected = _snapshot(rows_db, task.task_id, since)
+        assert _snapshot(held_db, task.task_id, since) == expected
+        assert _snapshot(both_db, task.task_id, since) == expected
+        with held_db._get_connection() as conn:
+            metric_ids = dict(conn.execute('SELECT name, id FROM metrics').fetchall())
+            stored = conn.execute(
+                f'SELECT COUNT(m{metric_ids["memory_rss"]}) + COUNT(m{metric_ids["cpu_percent"]}) '
+                'FROM samples').fetchone()[0]
+            flag = conn.execute('SELECT change_only FROM tasks').fetchone()[0]
+        assert flag == 1
+        assert stored < len(expected["all"]) // 5
+    finally:
+        for database in (rows_db, held_db, both_db):
+            database.close()
+
+
+def test_change_only_rewrite_does_not_shift_held_ticks(tmp_path):
+    """改写某个周期的值（补写已有范围）时，其后沿用该值的周期保持原值"""
+    rows_db = Database(str(tmp_path / "rows.db"))
+    held_db = Database(str(tmp_path / "held.db"), change_only=True)
+    task = _make_task()
+    base = datetime(2026, 1, 1)
+    _write_flat([rows_db, held_db], task, base, 1)
+    rewrite = [DataPoint(task.task_id, base + timedelta(seconds=10), 777.0, "memory_rss")]
+    later = [DataPoint(task.task_id, base + timedelta(hours=1, seconds=i), 5.0, "memory_rss")
+             for i in range(3)]
+
+    try:
+        for database in (rows_db, held_db):
+            database.save_data_points(rewrite)
+            database.save_data_points(later)
+        assert _snapshot(held_db, task.task_id, base) == _snapshot(rows_db, task.task_id, base)
+    finally:
+        rows_db.close()
+        held_db.close()
+
+
+def test_change_only_long_range_reads_rollups_not_raw(tmp_path, monkeypatch):
+    """只记变化：长范围的图表分桶与范围统计读降采样汇总，只还原统计起点所在的那一分钟"""
+    rows_db = Database(str(tmp_path / "rows.db"))
+    held_db = Database(str(tmp_path / "held.db"), change_only=True)
+    task = _make_task()
+    base = datetime(2026, 1, 1, 0, 20)
+    _write_flat([rows_db, held_db], task, base, 3)
+    since = base + timedelta(minutes=7, seconds=3)
+    reads = []
+    held_points = Database._held_points
+
+    def spy(self, cursor, schema, task_id, metric_type, since=None, limit=None, until=None):
+        reads.append((since, until))
+        return held_points(self, cursor, schema, task_id, metric_type, since, limit, until)
+
+    monkeypatch.setattr(Database, "_held_points", spy)
+    try:
+        bucketed = held_db.get_task_data_points_bucketed(task.task_id, "memory_rss",
+                                                         max_buckets=100, since=since)
+        assert bucketed == held_db.get_task_data_points_rollup(task.task_id, "memory_rss", 60_000,
+                                                               max_buckets=100, since=since)
+        stats = held_db.get_metric_stats(task.task_id, "cpu_percent", since=since)
+        assert reads == [(since, since + timedelta(seconds=57))]
+
+        expected = rows_db.get_metric_stats(task.task_id, "cpu_percent", since=since)
+        assert (stats["count"], stats["min"], stats["max"]) == (
+            expected["count"], expected["min"], expected["max"])
+        assert abs(stats["avg"] - expected["avg"]) < 1e-9
+    finally:
+        rows_db.close()
+        held_db.close()
+
+
+def test_deadband_reads_back_last_stored_value(tmp_path):
+    """死区内的抖动按上次写入的值记录，超出容差才写新值；数据点数不变"""
+    db = Database(str(tmp_path / "held.db"), change_only=True, deadband={"memory_rss": 10.0})
+    task = _make_task(metric_types=["memory_rss"])
+    db.save_task(task)
+    base = datetime(2026, 1, 1)
+    values = [100.0, 104.0, 96.0, 111.0, 105.0, 130.0]
+    db.save_data_points([DataPoint(task.task_id, base + timedelta(seconds=i), v, "memory_rss")
+                         for i, v in enumerate(values)])
+
+    try:
+        assert [p.value for p in db.get_task_data_points(task.task_id)] == [
+            100.0, 100.0, 100.0, 111.0, 111.0, 130.0]
+        stats = db.get_metric_stats(task.task_id, "memory_rss")
+        assert stats["count"] == 6 and stats["max"] == 130.0
+    finally:
+        db.close()
+
+
+def test_partitioned_storage_reads_match_main_storage(tmp_path):
+    """分区任务的采样、压缩块与降采样汇总只写入其分区库，各读取接口与汇总和主库存储一致"""
+    rows_db = Database(str(tmp_path / "rows.db"))
+    part_db = Database(str(tmp_path / "part.db"), partitioned=True)
+    both_db = Database(str(tmp_path / "both.db"), sample_storage="chunks", change_only=True,
+                       partitioned=True)
+    task = _make_task()
+    base = datetime(2026, 1, 1, 0, 20)
+    _write_hours([rows_db, part_db, both_db], task, base, 3)
+    since = base + timedelta(hours=1, minutes=7, seconds=3)
+
+    try:
+        expected = _snapshot(rows_db, task.task_id, since)
+        assert _snapshot(part_db, task.task_id, since) == expected
+        assert _snapshot(both_db, task.task_id, since) == expected
+        for database in (part_db, both_db):
+            with database._get_connection() as conn:
+                assert conn.execute('SELECT COUNT(*) FROM main.samples').fetchone()[0] == 0
+                assert conn.execute('SELECT COUNT(*) FROM main.rollups').fetchone()[0] == 0
+            assert os.path.exists(partition_path(database.db_path, task.task_id))
+    finally:
+        for database in (rows_db, part_db, both_db):
+            database.close()
+
+
+def test_deleting_partitioned_task_removes_its_file(tmp_path):
+    """删除分区任务（手动删除与过期清理）即删除其分区库文件，其他任务不受影响"""
+    db = Database(str(tmp_path / "part.db"), partitioned=True)
+    kept, deleted = _make_task(), _make_task()
+    expired = _make_task(status="stopped", end_time=datetime.now() - timedelta(days=40))
+    _write_hours([db], kept, datetime(2026, 1, 1), 1, step_s=60)
+    for task in (deleted, expired):
+        _write_hours([db], task, datetime(2026, 1, 1), 1, step_s=60)
+    paths = {task.task_id: partition_path(db.db_path, task.task_id)
+             for task in (kept, deleted, expired)}
+
+    try:
+        assert db.delete_task(deleted.task_id) is True
+        assert db.cleanup_old_tasks(retention_days=30) == 1
+        assert not os.path.exists(paths[deleted.task_id])
+        assert not os.path.exists(paths[expired.task_id])
+        assert os.path.exists(paths[kept.task_id])
+        assert len(db.get_task_data_points(kept.task_id)) == 90
+        assert set(db.get_data_point_counts()) == {kept.task_id}
+    finally:
+        db.close()
+
+
+def test_batch_spanning_more_partitions_than_attach_limit(tmp_path):
+    """一批写入涉及的分区任务多于附加上限时拆为多个事务，全部写入；连接上的附加数不超过上限"""
+    db = Database(str(tmp_path / "part.db"), partitioned=True)
+    tasks = [_make_task() for _ in range(PARTITION_ATTACH_LIMIT * 2 + 3)]
+    for task in tasks:
+        db.save_task(task)
+    ts = datetime(2026, 1, 1)
+
+    try:
+        assert db.save_data_points([
+            DataPoint(task.task_id, ts + timedelta(seconds=i), float(n), "memory_rss")
+            for i in range(3) for n, task in enumerate(tasks)
+        ]) is True
+        assert db.get_data_point_counts() == {task.task_id: 3 for task in tasks}
+        assert [p.value for p in db.get_task_data_points(tasks[-1].task_id)] == [len(tasks) - 1.0] * 3
+        with db._get_connection() as conn:
+            assert len(conn.execute('PRAGMA database_list').fetchall()) <= PARTITION_ATTACH_LIMIT + 1
+    finally:
+        db.close()
+
+
+def test_orphan_partition_files_purged_on_startup(tmp_path):
+    """启动时删除任务已不存在的分区库文件（删除失败或中途崩溃遗留的），保留现有任务的分区"""
+    db_path = str(tmp_path / "part.db")
+    db = Database(db_path, partitioned=True)
+    task = _make_task()
+    _write_hours([db], task, datetime(2026, 1, 1), 1, step_s=60)
+    db.close()
+    orphan = partition_path(db_path, str(uuid.uuid4()))
+    for suffix in ('', '-wal'):
+        with open(orphan + suffix, 'wb') as f:
+            f.write(b'stale')
+
+    reopened = Database(db_path)
+    try:
+        assert not os.path.exists(orphan) and not os.path.exists(orphan + '-wal')
+        assert len(reopened.get_task_data_points(task.task_id)) == 90
+    finally:
+        reopened.close()
+
+
+def test_task_space_usage_apportions_table_bytes(tmp_path):
+    """各任务占用按行数分摊各表字节数：数据量三倍的任务占用约三倍，合计不超过已用空间；
+    分区任务读取其分区库；裁剪过原始采样的任务标记为 trimmed"""
+    db = Database(str(tmp_path / "main.db"))
+    part_db = Database(str(tmp_path / "part.db"), partitioned=True)
+    small, large = _make_task(status="stopped"), _make_task()
+    base = datetime(2026, 1, 1)
+    _write_hours([db], small, base, 1)
+    _write_hours([db], large, base, 3)
+    _write_hours([part_db], small, base, 1)
+    try:
+        usage = db.get_task_space_usage()
+        assert set(usage) == {small.task_id, large.task_id}
+        assert 2.5 < usage[large.task_id]['raw'] / usage[small.task_id]['raw'] < 3.5
+        assert usage[large.task_id]['total'] > usage[large.task_id]['raw'] \
+            + usage[large.task_id]['minute']
+        used = db.get_db_size_bytes() - db.get_space_stats()['free_bytes']
+        assert sum(item['total'] for item in usage.values()) <= used
+        assert (usage[small.task_id]['running'], usage[large.task_id]['running']) == (0, 1)
+        assert usage[small.task_id]['sample_count'] == 360
+        assert usage[small.task_id]['first_ts_ms'] == to_epoch_ms(base)
+
+        part_usage = part_db.get_task_space_usage()
+        assert part_usage[small.task_id]['raw'] > 0
+
+        cutoff = to_epoch_ms(base + timedelta(hours=1))
+        while db.downsample_task_batch(large.task_id, cutoff, None, 500):
+            pass
+        trimmed = db.get_task_space_usage()[large.task_id]
+        assert trimmed['trimmed'] == 1
+        assert trimmed['raw'] < usage[large.task_id]['raw']
+    finally:
+        db.close()
+        part_db.close()
+
+
+def test_checkpoint_wal_catches_up_after_long_reader(tmp_path, monkeypatch):
+    """长读事务期间 PASSIVE checkpoint 只能回写到读快照为止；读事务结束后 RESTART 回写
+    全部，下一次写入从头重用 -wal 并把文件截回 journal_size_limit"""
+    monkeypatch.setattr(config, 'WAL_SIZE_LIMIT_MB', 1)
+    db = Database(str(tmp_path / "wal.db"))
+    task = _make_task()
+    db.save_task(task)
+    reader = sqlite3.connect(db.db_path)
+    try:
+        reader.execute('BEGIN')
+        reader.execute('SELECT COUNT(*) FROM tasks').fetchone()
+        _write_hours([db], task, datetime(2026, 1, 1), 12, step_s=1)
+        assert db.get_wal_size_bytes() > 2 * 1024 * 1024
+
+        passive = db.checkpoint_wal('PASSIVE')
+        assert passive['busy'] == 0
+        assert passive['checkpointed_frames'] < passive['log_frames']
+        restart = db.checkpoint_wal('RESTART', busy_timeout_ms=50)
+        assert restart['busy'] == 1
+
+        reader.rollback()
+        restart = db.checkpoint_wal('RESTART', busy_timeout_ms=50)
+        assert restart['busy'] == 0
+        assert restart['checkpointed_frames'] == restart['log_frames'] > 0
+        db.save_data_points([DataPoint(task.task_id, datetime(2026, 1, 2), 1.0, "memory_rss")])
+        assert db.get_wal_size_bytes() <= 1024 * 1024
+        assert db.get_metric_stats(task.task_id, "memory_rss")['count'] == 12 * 3600 + 1
+    finally:
+        reader.close()
+        db.close()
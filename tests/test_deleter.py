@@ -0,0 +1,76 @@
+"""
+后台任务删除线程（core/deleter.py）用例
+排队删除的任务立即从列表中消失、由线程分批删完；写入线程有待写数据时让出；退出后
+未删完的任务由下次启动的 resume() 继续删除
+"""
+import time
+from datetime import datetime, timedelta
+
+from core.deleter import TaskDeleter
+from data.database import Database
+from data.models import MonitorTask, DataPoint
+
+
+class _FakeWriter:
+    """只提供 is_idle 的假写入线程"""
+
+    def __init__(self, idle=True):
+        self.idle = idle
+
+    def is_idle(self):
+        return self.idle
+
+
+def _make_task(db: Database, name: str, ticks: int = 3000) -> str:
+    task = MonitorTask(task_id=name, pid=1, process_name=f"{name}.exe", metric_types=["memory_rss"],
+                       interval=1.0, start_time=datetime(2026, 1, 1), end_time=None, status="stopped")
+    db.save_task(task)
+    db.save_data_points([
+        DataPoint(task_id=name, timestamp=datetime(2026, 1, 1) + timedelta(seconds=i),
+                  value=float(i), metric_type="memory_rss")
+        for i in range(ticks)
+    ])
+    return name
+
+
+def test_queued_tasks_deleted_in_batches(db):
+    kept = _make_task(db, "kept")
+    doomed = [_make_task(db, "a"), _make_task(db, "b")]
+    deleter = TaskDeleter(db, _FakeWriter(), batch_rows=200, pause_ms=0)
+
+    assert deleter.delete_tasks(doomed) is True
+    assert [task.task_id for task in db.get_all_tasks()] == [kept]
+    deleter.wait_done()
+    assert deleter.wait(2000)
+
+    assert deleter.pending_task_ids() == []
+    assert db.get_deleting_task_ids() == []
+    assert len(db.get_task_data_points(kept)) == 3000
+
+
+def test_yields_while_writer_busy_and_resumes_after_restart(db_path):
+    db = Database(db_path)
+    task_id = _make_task(db, "slow")
+    writer = _FakeWriter(idle=False)
+    deleter = TaskDeleter(db, writer, batch_rows=200, pause_ms=5)
+    deleter.delete_tasks([task_id])
+    time.sleep(0.2)
+    rows = db.count_task_rows(task_id)
+    assert rows > 0
+
+    # 应用退出：当前批完成后停下，标记留在库中
+    deleter.stop()
+    assert deleter.wait(2000)
+    assert db.count_task_rows(task_id) == rows
+    db.close()
+
+    reopened = Database(db_path)
+    try:
+        resumed = TaskDeleter(reopened, _FakeWriter(), batch_rows=200, pause_ms=0)
+        assert resumed.resume() == 1
+        resumed.wait_done()
+        assert resumed.wait(2000)
+        assert reopened.get_deleting_task_ids() == []
+        assert reopened.count_task_rows(task_id) == 0
+    finally:
+        reopened.close()
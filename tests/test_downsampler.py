@@ -0,0 +1,81 @@
+"""
+分级保留降采样线程（core/downsampler.py）用例
+超期的原始采样与 1 分钟汇总分批裁剪，统计与图表改读仍保留的汇总；写入线程有待写数据时
+让出，不裁剪
+"""
+import time
+from datetime import datetime, timedelta
+
+from core.downsampler import RetentionDownsampler
+from data.database import Database
+from data.models import MonitorTask, DataPoint
+
+
+class _FakeWriter:
+    """只提供 is_idle 的假写入线程"""
+
+    def __init__(self, idle=True):
+        self.idle = idle
+
+    def is_idle(self):
+        return self.idle
+
+
+def _old_task(db: Database) -> str:
+    """一个早已停止的任务：3 小时、每秒一个周期"""
+    task = MonitorTask(task_id="old", pid=1, process_name="a.exe", metric_types=["memory_rss"],
+                       interval=1.0, start_time=datetime(2026, 1, 1), end_time=None, status="stopped")
+    db.save_task(task)
+    db.save_data_points([
+        DataPoint(task_id=task.task_id, timestamp=datetime(2026, 1, 1) + timedelta(seconds=i),
+                  value=float(i % 100), metric_type="memory_rss")
+        for i in range(3 * 3600)
+    ])
+    return task.task_id
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_expired_raw_samples_replaced_by_rollups(db):
+    task_id = _old_task(db)
+    stats = db.get_metric_stats(task_id, "memory_rss")
+    downsampler = RetentionDownsampler(db, _FakeWriter(), interval_ms=60000, batch_rows=500,
+                                       pause_ms=0)
+    downsampler.set_policy(1, 30)
+    downsampler.start()
+    try:
+        assert _wait_until(lambda: not db.get_task_data_points(task_id))
+        assert _wait_until(lambda: downsampler.downsampled_rows == 3 * 3600 + 3 * 60)
+    finally:
+        downsampler.stop()
+        assert downsampler.wait(2000)
+
+    assert db.get_metric_stats(task_id, "memory_rss") == stats
+    assert db.choose_rollup_resolution(task_id, 1000) == 3_600_000
+    chart = db.get_task_data_points_rollup(task_id, "memory_rss", 3_600_000)
+    assert {p.value for p in chart} == {0.0, 99.0}
+
+
+def test_yields_while_writer_busy(db):
+    task_id = _old_task(db)
+    writer = _FakeWriter(idle=False)
+    downsampler = RetentionDownsampler(db, writer, interval_ms=60000, batch_rows=500, pause_ms=5)
+    downsampler.set_policy(1, 0)
+    downsampler.start()
+    try:
+        time.sleep(0.2)
+        assert downsampler.downsampled_rows == 0
+        assert len(db.get_task_data_points(task_id)) == 3 * 3600
+
+        writer.idle = True
+        assert _wait_until(lambda: not db.get_task_data_points(task_id))
+    finally:
+        downsampler.stop()
+        assert downsampler.wait(2000)
@@ -79,27 +79,17 @@ def test_pivot_rows_value_format_four_decimals():
     assert rows == [["2026-01-01 00:00:00", "test.exe", 1234, "100.0000"]]
 
 
-def test_pivot_rows_null_and_empty_metric_type_fallback_to_first_metric():
-    """NULL/空串 metric_type 兜底归入 metric_types[0]（旧数据兼容）"""
+def test_pivot_rows_ignores_points_outside_task_metrics():
+    """不属于 task.metric_types 的数据点（含空串/None 指标）不占列，也不顶替首指标"""
     task = _make_task(["memory_rss", "cpu_percent"])
     ts1 = datetime(2026, 1, 1, 0, 0, 0)
     data_points = [
         DataPoint(task_id="task-1", timestamp=ts1, value=100.0, metric_type=""),
+        DataPoint(task_id="task-1", timestamp=ts1, value=99.0, metric_type=None),
         DataPoint(task_id="task-1", timestamp=ts1, value=12.0, metric_type="cpu_percent"),
     ]
     rows = list(pivot_rows(task, data_points))
-    assert rows == [["2026-01-01 00:00:00", "test.exe", 1234, "100.0000", "12.0000"]]
-
-
-def test_pivot_rows_none_metric_type_fallback_to_first_metric():
-    """metric_type 显式为 None（旧库回读场景）同样兜底归入首指标"""
-    task = _make_task(["memory_rss"])
-    ts1 = datetime(2026, 1, 1, 0, 0, 0)
-    data_points = [
-        DataPoint(task_id="task-1", timestamp=ts1, value=100.0, metric_type=None),
-    ]
-    rows = list(pivot_rows(task, data_points))
-    assert rows == [["2026-01-01 00:00:00", "test.exe", 1234, "100.0000"]]
+    assert rows == [["2026-01-01 00:00:00", "test.exe", 1234, "", "12.0000"]]
 
 
 def test_pivot_rows_multi_timestamp_grouping_and_last_group_flush():
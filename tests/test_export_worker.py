@@ -1,10 +1,11 @@
 """
 ExportWorker 用例（offscreen）
 覆盖：大数据量（>=5万行）流式导出与一次性 list(pivot_rows(...)) 输出逐字节一致；
-取消后写了一半的CSV文件被删除、线程正常退出（不挂起）。
+取消后写了一半的CSV文件被删除、线程正常退出（不挂起）；分页读取不钉住 WAL 快照。
 """
 import csv
 import os
+import sqlite3
 import uuid
 from datetime import datetime, timedelta
 
@@ -105,3 +106,31 @@ def test_export_worker_cancel_deletes_file_and_thread_exits(qapp, db, db_path, t
 
     assert ok, "取消后线程未能在超时前退出"
     assert not os.path.exists(save_path), "取消后应删除写了一半的CSV文件"
+
+
+def test_export_pages_do_not_pin_wal_snapshot(db, db_path):
+    """分页导出在页与页之间不持有读快照：导出进行中 checkpoint 能回写全部，
+    运行中任务在导出期间继续追加的数据点也按时间导出，不重复不遗漏"""
+    task = _make_task(status="running")
+    db.save_task(task)
+    n = 20000
+    base = datetime(2026, 1, 1)
+    _seed_points(db, task, n, base)
+
+    worker = ExportWorker(db_path, task, "unused.csv")
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        points = worker._iter_data_points(conn)
+        exported = [next(points)]
+        _seed_points(db, task, 100, base + timedelta(seconds=n))
+        result = db.checkpoint_wal('PASSIVE')
+        assert result['busy'] == 0
+        assert result['checkpointed_frames'] == result['log_frames']
+        exported.extend(points)
+    finally:
+        conn.close()
+
+    timestamps = [p.timestamp for p in exported]
+    assert timestamps == sorted(set(timestamps))
+    assert len(exported) == n + 100
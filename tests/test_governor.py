@@ -0,0 +1,134 @@
+"""
+数据库大小上限治理线程（core/governor.py）用例
+预计超出上限时按时间从旧到新释放：先降采样最旧任务的原始采样，仍不够才删除最旧的
+已停止任务；运行中的任务只裁剪到当前窗口之前，不会被删除
+"""
+import time
+from datetime import datetime, timedelta
+
+from core.governor import SizeBudgetGovernor, ingest_rate, plan_reclaim
+from data.database import Database
+from data.models import MonitorTask, DataPoint
+
+HOUR_MS = 3_600_000
+
+
+class _FakeReclaimer:
+    """只记录 wake 次数的假回收线程"""
+
+    def __init__(self):
+        self.wakes = 0
+
+    def wake(self):
+        self.wakes += 1
+
+
+def _usage(first_ms, last_ms, raw=1000, minute=100, hour=10, running=0, interval=1.0,
+           sample_count=100, trimmed=0):
+    return {'raw': raw, 'minute': minute, 'total': raw + minute + hour,
+            'sample_count': sample_count, 'first_ts_ms': first_ms, 'last_ts_ms': last_ms,
+            'interval': interval, 'running': running, 'trimmed': trimmed}
+
+
+def _task(db: Database, task_id: str, start: datetime, hours: int, status: str) -> str:
+    """每秒一个周期的任务"""
+    task = MonitorTask(task_id=task_id, pid=1, process_name="a.exe", metric_types=["memory_rss"],
+                       interval=1.0, start_time=start, end_time=None, status=status)
+    db.save_task(task)
+    db.save_data_points([
+        DataPoint(task_id=task_id, timestamp=start + timedelta(seconds=i),
+                  value=float(i % 100), metric_type="memory_rss")
+        for i in range(hours * 3600)
+    ])
+    return task_id
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_plan_downsamples_oldest_first_and_deletes_last():
+    usage = {
+        'new': _usage(5 * HOUR_MS, 6 * HOUR_MS - 1),
+        'old': _usage(0, 2 * HOUR_MS - 1),
+        'live': _usage(HOUR_MS, 3 * HOUR_MS + 5, running=1),
+    }
+    assert plan_reclaim(usage, 900) == [('raw', 'old', 2 * HOUR_MS, 1000)]
+    # 运行中的任务只裁剪到当前窗口之前，按时间比例折算
+    assert plan_reclaim(usage, 1500)[1] == ('raw', 'live', 3 * HOUR_MS, 999)
+
+    plan = plan_reclaim(usage, 10 ** 9)
+    assert [(kind, task_id) for kind, task_id, _, _ in plan] == [
+        ('raw', 'old'), ('raw', 'live'), ('raw', 'new'),
+        ('minute', 'old'), ('minute', 'live'), ('minute', 'new'),
+        ('delete', 'old'), ('delete', 'new'),
+    ]
+    # 删除的预计释放量扣除已裁剪的部分
+    assert plan[-1] == ('delete', 'new', None, 10)
+
+
+def test_ingest_rate_covers_running_tasks_only():
+    usage = {
+        'stopped': _usage(0, 1, raw=2000, minute=0, hour=0, sample_count=100),
+        'live': _usage(0, 1, raw=1000, minute=0, hour=0, sample_count=100, running=1,
+                       interval=2.0),
+        # 刚开始尚无数据、或原始采样已裁剪过的任务取未裁剪任务的均值（15 字节/周期）
+        'fresh': _usage(0, 0, raw=0, minute=0, hour=0, sample_count=0, running=1),
+        'trimmed': _usage(0, 1, raw=1, minute=0, hour=0, running=1, interval=0.5, trimmed=1),
+    }
+    assert ingest_rate(usage) == 10 / 2.0 + 15 / 1.0 + 15 / 0.5
+
+
+def test_over_budget_trims_oldest_raw_before_deleting(db):
+    old = _task(db, "old", datetime(2026, 1, 1), 3, "stopped")
+    new = _task(db, "new", datetime(2026, 1, 2), 3, "stopped")
+    usage = db.get_task_space_usage()
+    used = db.get_db_size_bytes() - db.get_space_stats()['free_bytes']
+    reclaimer = _FakeReclaimer()
+    governor = SizeBudgetGovernor(db, reclaimer=reclaimer, batch_rows=2000, pause_ms=0)
+
+    # 上限略低于当前占用：裁剪最旧任务的原始采样即可，不动较新的任务
+    governor.set_budget((used - usage[old]['raw'] // 2) / 1024 / 1024)
+    assert governor.enforce() >= usage[old]['raw']
+    assert reclaimer.wakes == 1
+    assert not db.get_task_data_points(old)
+    assert len(db.get_task_data_points(new)) == 3 * 3600
+    assert db.get_metric_stats(old, "memory_rss")['count'] == 3 * 3600
+
+    # 未超出上限时不做任何事
+    governor.set_budget(1024)
+    assert governor.enforce() == 0
+    assert reclaimer.wakes == 1
+
+    # 上限低到只剩删除任务可以满足：降采样全部做完后才删除最旧的任务
+    governor.set_budget(0.001)
+    governor.enforce()
+    assert db.get_task(old) is None
+    assert db.get_task(new) is None
+
+
+def test_running_task_trimmed_but_never_deleted(db):
+    stopped = _task(db, "stopped", datetime(2026, 1, 1), 2, "stopped")
+    live_start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+    live = _task(db, "live", live_start, 2, "running")
+    governor = SizeBudgetGovernor(db, interval_ms=60000, horizon_s=60, batch_rows=2000,
+                                  pause_ms=0)
+    governor.set_budget(0.001)
+    governor.start()
+    try:
+        assert _wait_until(lambda: db.get_task(stopped) is None)
+    finally:
+        governor.stop()
+        assert governor.wait(2000)
+
+    assert db.get_task(live) is not None
+    assert governor.projected_bytes > governor.used_bytes > 0
+    assert db.get_metric_stats(live, "memory_rss")['count'] == 2 * 3600
+    # 当前窗口之前的原始采样已裁剪，当前窗口（最后一小时）保留
+    points = db.get_task_data_points(live)
+    assert points and min(p.timestamp for p in points) >= live_start + timedelta(hours=1)
@@ -0,0 +1,179 @@
+"""
+采样追加日志（data/journal.py）用例
+定长记录往返精确、崩溃写了一半的尾部被忽略、全部确认后截断、组提交途中持续追加时
+按段删除，以及启动回放补写未落库的数据（已落库的行按 upsert 覆盖，不产生重复行）
+"""
+import glob
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+from core.monitor_task import MonitorTask
+from data.database import to_epoch_ms
+from data.journal import RECORD_SIZE, SampleJournal, journal_path_for
+from data.models import DataPoint, MonitorTask as TaskModel
+
+
+@pytest.fixture
+def journal(db_path):
+    j = SampleJournal(journal_path_for(db_path))
+    yield j
+    j.close()
+
+
+def _points(task_id, start, ticks, metrics=("memory_rss", "cpu_percent")):
+    """时间戳与采样时间表一致取整到毫秒（库内时间戳精度），落库读回与原值相等"""
+    return [
+        DataPoint(task_id, start + timedelta(seconds=i, milliseconds=123), float(i), m)
+        for i in range(ticks) for m in metrics
+    ]
+
+
+def _segments(journal):
+    return sorted(glob.glob(glob.escape(journal.path) + '.*'))
+
+
+def _journal_bytes(journal):
+    return sum(os.path.getsize(path) for path in _segments(journal))
+
+
+def _sorted(points):
+    return sorted(points, key=lambda p: (p.timestamp, p.metric_type))
+
+
+def _save_task(db, task_id):
+    db.save_task(TaskModel(task_id=task_id, pid=1, process_name="a.exe", metric_types=["memory_rss"],
+                           interval=1.0, start_time=datetime(2026, 1, 1), end_time=None,
+                           status='running'))
+
+
+def test_records_roundtrip_exactly(journal):
+    """时间戳（微秒）、值、指标名往返后与原数据完全一致"""
+    points = _points("6f1c2d3e-0000-4000-8000-000000000001", datetime(2026, 3, 1, 12), 3)
+    journal.append(points)
+
+    assert journal.read_records() == points
+    assert _journal_bytes(journal) == 8 + RECORD_SIZE * len(points)
+
+
+def test_torn_tail_and_corrupt_record_stop_replay(journal):
+    """崩溃写了一半的尾部、CRC 不符的记录及其后内容被忽略，之前的记录完整保留"""
+    points = _points("task-a", datetime(2026, 3, 1), 4, metrics=("memory_rss",))
+    journal.append(points)
+    segment, = _segments(journal)
+    with open(segment, 'ab') as f:
+        f.write(b'\x01' * (RECORD_SIZE // 2))
+    assert journal.read_records() == points
+
+    with open(segment, 'r+b') as f:
+        f.seek(8 + RECORD_SIZE * 2 + 40)
+        f.write(b'\xff')
+    assert journal.read_records() == points[:2]
+
+
+def test_truncated_once_every_record_resolved(journal):
+    """已追加的记录全部确认前日志保留，全部确认后截断为只剩文件头"""
+    journal.append(_points("task-a", datetime(2026, 3, 1), 2))
+    journal.append(_points("task-b", datetime(2026, 3, 1), 1))
+
+    journal.resolve("task-a", 4)
+    assert len(journal.read_records()) == 6
+    journal.resolve("task-b", 2)
+    assert journal.read_records() == []
+    assert _journal_bytes(journal) == 8
+
+
+def test_segments_removed_while_appends_continue_during_commits(db_path):
+    """
+    组提交途中各任务持续追加（确认总落后一个周期，未确认条数从不归零）：全部记录都已
+    确认的旧段即删除，日志只剩未确认的记录加一段，不随运行时长增长
+    """
+    journal = SampleJournal(journal_path_for(db_path), segment_mb=RECORD_SIZE * 16 / 1024 / 1024)
+    tasks = ("task-a", "task-b", "task-c")
+    start = datetime(2026, 3, 1)
+    try:
+        for tick in range(200):
+            for task_id in tasks:
+                journal.append(_points(task_id, start + timedelta(seconds=tick), 1))
+            if tick:
+                # 提交上一周期时本周期的数据已追加：只确认上一周期的 2 条
+                for task_id in tasks:
+                    journal.resolve(task_id, 2)
+            assert _journal_bytes(journal) <= 8 * 3 + RECORD_SIZE * (16 + 6)
+        assert len(_segments(journal)) <= 2
+        assert 6 <= len(journal.read_records()) <= 16 + 6
+
+        for task_id in tasks:
+            journal.resolve(task_id, 2)
+        assert journal.read_records() == []
+    finally:
+        journal.close()
+
+
+def test_replay_skips_saved_points(db, journal):
+    """回放只补写晚于任务已落库最新周期的记录，已落库的周期不重写，随后清空日志"""
+    _save_task(db, "task-a")
+    _save_task(db, "task-b")
+    a_points = _points("task-a", datetime(2026, 3, 1), 5)
+    b_points = _points("task-b", datetime(2026, 3, 1), 3)
+    journal.append(a_points)
+    journal.append(b_points)
+    db.save_data_points(a_points[:6])   # task-a 前 3 个周期已落库，崩溃前未来得及确认
+
+    assert db.replay_journal(journal) == 4 + 6
+    assert db.get_sample_count("task-a") == 5
+    assert _sorted(db.get_task_data_points("task-a")) == _sorted(a_points)
+    assert _sorted(db.get_task_data_points("task-b")) == _sorted(b_points)
+    assert journal.read_records() == []
+    assert db.replay_journal(journal) == 0
+
+
+def test_replay_after_trim_in_bounded_batches(monkeypatch, db, journal):
+    """
+    原始采样已按分级保留裁剪的任务：日志中已落库的记录不写回、汇总不重复计入；未落库
+    的记录按 JOURNAL_REPLAY_BATCH 分批补写，同一周期的记录不拆到两批
+    """
+    _save_task(db, "task-a")
+    start = datetime(2026, 3, 1)
+    points = [DataPoint("task-a", start + timedelta(minutes=i), float(i), m)
+              for i in range(130) for m in ("memory_rss", "cpu_percent")]
+    journal.append(points)
+    db.save_data_points(points[:240])   # 前 2 小时已落库，最后 10 个周期未落库
+    while db.downsample_task_batch("task-a", to_epoch_ms(start + timedelta(hours=1)), None, 100):
+        pass
+    stats = db.get_metric_stats("task-a", "memory_rss")
+
+    batches = []
+    save = db.save_data_points
+    monkeypatch.setattr(config, 'JOURNAL_REPLAY_BATCH', 3)
+    monkeypatch.setattr(db, 'save_data_points', lambda batch: batches.append(batch) or save(batch))
+    assert db.replay_journal(journal) == 20
+
+    assert [len(batch) for batch in batches] == [4] * 5
+    assert db.get_sample_count("task-a") == 130
+    assert db.get_metric_stats("task-a", "memory_rss")['count'] == stats['count'] + 10
+    assert min(p.timestamp for p in db.get_task_data_points("task-a")) == start + timedelta(hours=1)
+
+
+def test_unsaved_task_data_survives_restart(tmp_path, monkeypatch, qapp, db, db_path):
+    """写库持续失败期间"崩溃"：缓冲中的数据在日志中，下次启动回放后全部入库"""
+    monkeypatch.setattr(config, 'DB_PATH', db_path)
+    journal = SampleJournal(journal_path_for(db_path))
+    task = MonitorTask(pid=os.getpid(), process_name="pytest-target", metric_types=["memory_rss"],
+                       interval=1.0, db=db, journal=journal)
+    task.begin()
+    monkeypatch.setattr(db, 'save_data_points', lambda _points: False)
+    for _ in range(3):
+        assert task.sample_once()
+        task.advance_schedule()
+    unsaved = list(task._data_buffer)
+    task.collector.close()
+    journal.close()  # 模拟进程崩溃：缓冲丢失，不走 teardown
+    monkeypatch.undo()
+
+    restarted = SampleJournal(journal_path_for(db_path))
+    assert db.replay_journal(restarted) == 3
+    assert db.get_task_data_points(task.task_id) == unsaved
+    restarted.close()
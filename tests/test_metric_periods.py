@@ -0,0 +1,95 @@
+"""
+指标采集周期倍数用例
+验证降频指标只在到期周期采集、跳过周期后补采一次、时间表重新锚定后全部指标
+立即采集，以及任务记录与导出透视对稀疏列的处理
+"""
+from datetime import datetime
+
+import pytest
+
+import config
+from core.export import pivot_rows
+from core.monitor_task import MonitorTask
+from data.models import MonitorTask as TaskModel, DataPoint
+
+
+class _RecordingCollector:
+    """记录每周期实际采集了哪些指标的假采集器"""
+
+    def __init__(self):
+        self.calls = []
+
+    def collect_metrics(self, metric_types):
+        self.calls.append(list(metric_types))
+        return {m: 1.0 for m in metric_types}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def task(tmp_path, monkeypatch, qapp):
+    monkeypatch.setattr(config, 'DB_PATH', str(tmp_path / "metric_periods.db"))
+    t = MonitorTask(pid=999999, process_name="fake.exe",
+                    metric_types=["cpu_percent", "memory_uss"], interval=1.0,
+                    metric_periods={"memory_uss": 3, "not_selected": 5})
+    t.collector = _RecordingCollector()
+    t._flush_buffer = lambda is_teardown=False: t._data_buffer.clear()
+    return t
+
+
+def _run_ticks(task, ticks, now_step=1.0):
+    """驱动 ticks 个周期（注入单调时钟，不真正等待）"""
+    base = task.schedule.deadline
+    for i in range(ticks):
+        task.sample_once()
+        task.schedule.advance(now=base + i * now_step)
+
+
+def test_slow_metric_sampled_only_on_due_ticks(task):
+    """每 3 周期采一次的指标只在第 0/3/6 周期出现，未选中指标的倍数被忽略"""
+    assert task.metric_periods == {"memory_uss": 3}
+    _run_ticks(task, 7)
+
+    uss_ticks = [i for i, call in enumerate(task.collector.calls) if "memory_uss" in call]
+    assert uss_ticks == [0, 3, 6]
+    assert all("cpu_percent" in call for call in task.collector.calls)
+
+
+def test_skipped_ticks_do_not_starve_slow_metric(task):
+    """落后跳过了到期周期时，降频指标在之后第一个周期补采，之后回到整数倍节奏"""
+    task.sample_once()                          # 第 0 周期：全部采集
+    task.schedule.advance(now=task.schedule.deadline + 4.5)   # 错过第 1~3 周期，跳到第 4 周期
+    assert task.schedule.tick == 4
+    task.sample_once()
+    assert task.collector.calls[-1] == ["cpu_percent", "memory_uss"]
+    assert task._next_due["memory_uss"] == 6
+
+
+def test_rebase_samples_every_metric_immediately(task):
+    """暂停恢复后时间表重新锚定，降频指标与其他指标一起立即采集"""
+    _run_ticks(task, 2)
+    task._rebase = True
+    task.sample_once()
+    assert task.collector.calls[-1] == ["cpu_percent", "memory_uss"]
+
+
+def test_task_model_and_export_handle_sparse_columns():
+    """任务记录保留周期倍数，透视导出时未到期指标所在单元格为空"""
+    model = TaskModel(task_id="t", pid=1, process_name="p.exe",
+                      metric_types=["cpu_percent", "memory_uss"], interval=2.0,
+                      start_time=datetime.now(), end_time=None, status="stopped",
+                      metric_periods={"memory_uss": 30})
+    assert model.metric_interval("memory_uss") == 60.0
+    assert model.metric_interval("cpu_percent") == 2.0
+    assert TaskModel.from_dict(model.to_dict()).metric_periods == {"memory_uss": 30}
+
+    ts1, ts2 = datetime(2026, 1, 1, 0, 0, 0), datetime(2026, 1, 1, 0, 0, 2)
+    points = [
+        DataPoint("t", ts1, 5.0, "cpu_percent"),
+        DataPoint("t", ts1, 1024.0, "memory_uss"),
+        DataPoint("t", ts2, 6.0, "cpu_percent"),
+    ]
+    rows = list(pivot_rows(model, points))
+    assert rows[0][3:] == ["5.0000", "1024.0000"]
+    assert rows[1][3:] == ["6.0000", ""]
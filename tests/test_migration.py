@@ -1,5 +1,5 @@
 """
-v0 -> v1 数据库迁移用例
+数据库迁移用例（v0 -> v1 -> v2 -> v3 -> v4 -> v5 迁移链）
 用裸 sqlite3 构造旧库（tasks.metric_type 单值文本、data_points 无 metric_type 列、
 user_version=0），再实例化 Database 触发迁移，断言回填/幂等/备份等行为
 """
@@ -8,8 +8,10 @@ import json
 import os
 import shutil
 import sqlite3
+from datetime import datetime
 
 import data.database as database_module
+from core.export import pivot_rows
 from data.database import Database, SCHEMA_VERSION
 
 
@@ -289,3 +291,254 @@ def test_restore_from_backup_also_fails_resets_to_empty_db(db_path, monkeypatch)
 
     broken_files = glob.glob(db_path + '.broken_*')
     assert len(broken_files) >= 1, "应至少留下一个 .broken_* 改名痕迹"
+
+
+# ========== v1 -> v2：迁移链 ==========
+
+def _create_v1_db(path: str):
+    """构造一个 v1 版本的库：tasks 无 metric_periods 列"""
+    _create_v0_db(path)
+    conn = sqlite3.connect(path)
+    try:
+        Database._migrate_v0_to_v1(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_v1_db_migrates_through_chain_with_versioned_backup(db_path):
+    """v1 库从 v1->v2 起执行：新增 metric_periods 列（旧任务为空），备份名为 .bak_v1"""
+    _create_v1_db(db_path)
+    assert _get_user_version(db_path) == 1
+
+    db = Database(db_path)
+
+    assert _get_user_version(db_path) == SCHEMA_VERSION == 12
+    assert os.path.exists(db_path + '.bak_v1')
+    assert not os.path.exists(db_path + '.bak_v0')
+    task = db.get_task('task-1')
+    assert task.metric_types == ['memory_rss']
+    assert task.metric_periods == {}
+
+
+def test_v0_db_runs_whole_migration_chain(db_path):
+    """v0 库在同一事务内依次执行 v0->v1、v1->v2、v2->v3，metric_periods 可正常读写"""
+    _create_v0_db(db_path)
+
+    db = Database(db_path)
+    task = db.get_task('task-1')
+    task.metric_periods = {'memory_rss': 10}
+    assert db.save_task(task)
+
+    assert _get_user_version(db_path) == SCHEMA_VERSION
+    assert db.get_task('task-1').metric_periods == {'memory_rss': 10}
+
+
+
+# ========== v2 -> v3：data_points 透视为 samples ==========
+
+def _create_v2_db(path: str):
+    """构造一个 v2 版本的库：task-1 有两个指标，含一条 metric_type 为 NULL 的旧数据"""
+    _create_v1_db(path)
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        Database._migrate_v1_to_v2(cursor)
+        cursor.execute('''UPDATE tasks SET metric_type = '["memory_rss", "cpu_percent"]'
+                          WHERE task_id = 'task-1' ''')
+        cursor.executemany('''
+            INSERT INTO data_points (task_id, timestamp, value, metric_type) VALUES (?, ?, ?, ?)
+        ''', [
+            ('task-1', '2026-01-01T00:00:01', 5.0, 'cpu_percent'),
+            ('task-1', '2026-01-01T00:00:03', 102.0, None),
+            ('task-1', '2026-01-01T00:00:03', 7.0, 'cpu_percent'),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_v2_db_pivots_data_points_into_samples(db_path):
+    """每个时间戳合并为一行，NULL 指标归入首指标，data_points 表被删除"""
+    _create_v2_db(db_path)
+
+    db = Database(db_path)
+
+    assert _get_user_version(db_path) == SCHEMA_VERSION == 12
+    assert os.path.exists(db_path + '.bak_v2')
+    assert db.get_sample_count('task-1') == 3
+    assert [(dp.timestamp.second, dp.value, dp.metric_type)
+            for dp in db.get_task_data_points('task-1')] == [
+        (1, 100.0, 'memory_rss'), (1, 5.0, 'cpu_percent'),
+        (2, 101.0, 'memory_rss'),
+        (3, 102.0, 'memory_rss'), (3, 7.0, 'cpu_percent'),
+    ]
+    assert db.get_metric_stats('task-1', 'cpu_percent')['count'] == 2
+
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+    assert 'data_points' not in tables
+
+
+def test_backfill_null_metric_types_commits_batches_and_resumes(db_path, monkeypatch):
+    """NULL/空串指标在迁移事务之外按批回填、每批提交；中途失败时已提交的批次保留、
+    库仍为 v2，下次启动只补齐其余行后完成迁移"""
+    _create_v2_db(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany(
+            'INSERT INTO data_points (task_id, timestamp, value, metric_type) VALUES (?, ?, ?, ?)',
+            [('task-1', f'2026-01-01T00:01:0{i}', float(i), '' if i % 2 else None) for i in range(5)]
+            + [('ghost', '2026-01-01T00:00:01', 1.0, None)])
+        conn.commit()
+    finally:
+        conn.close()
+
+    monkeypatch.setattr(database_module, 'MIGRATION_BATCH_SIZE', 2)
+    batch = Database._backfill_metric_type_batch
+    calls = []
+
+    def fail_second_batch(cursor, task_id, first_metric, batch_size):
+        calls.append(task_id)
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("disk I/O error")
+        return batch(cursor, task_id, first_metric, batch_size)
+
+    monkeypatch.setattr(Database, '_backfill_metric_type_batch', staticmethod(fail_second_batch))
+    db = Database(db_path)
+    assert db.migration_failed
+    db.close()
+    assert _get_user_version(db_path) == 2
+    conn = sqlite3.connect(db_path)
+    try:
+        remaining = conn.execute("SELECT COUNT(*) FROM data_points WHERE task_id = 'task-1' "
+                                 "AND (metric_type IS NULL OR metric_type = '')").fetchone()[0]
+    finally:
+        conn.close()
+    assert remaining == 1 + 5 - 2
+
+    monkeypatch.setattr(Database, '_backfill_metric_type_batch', staticmethod(batch))
+    Database._migration_attempted = False
+    db = Database(db_path)
+    try:
+        assert _get_user_version(db_path) == SCHEMA_VERSION
+        assert db.get_metric_stats('task-1', 'memory_rss')['count'] == 3 + 5
+        assert db.get_task('ghost') is None
+    finally:
+        db.close()
+
+
+def test_legacy_null_metric_rows_export_under_first_metric(db_path):
+    """端到端：v2 库中 metric_type 为 NULL 的旧数据迁移后归入首指标，导出 CSV 时落在首指标列"""
+    _create_v2_db(db_path)
+    db = Database(db_path)
+    try:
+        task = db.get_task('task-1')
+        rows = list(pivot_rows(task, db.get_task_data_points('task-1')))
+    finally:
+        db.close()
+
+    assert [row[3:] for row in rows] == [
+        ['100.0000', '5.0000'],
+        ['101.0000', ''],
+        ['102.0000', '7.0000'],
+    ]
+
+
+# ========== v3 -> v4：整数任务键、指标 id、epoch 毫秒时间戳 ==========
+
+def test_v3_db_converts_to_integer_keys_and_epoch_ms(db_path):
+    """任务获得整数键、指标列改为 m<id>、ISO 时间戳换算为毫秒整数；孤儿行被丢弃"""
+    _create_v2_db(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        Database._migrate_v2_to_v3(conn.cursor())
+        conn.execute("INSERT INTO samples (task_id, timestamp, memory_rss) "
+                     "VALUES ('ghost', '2026-01-01T00:00:01', 1.0)")
+        conn.commit()
+    finally:
+        conn.close()
+
+    db = Database(db_path)
+
+    assert _get_user_version(db_path) == SCHEMA_VERSION == 12
+    assert os.path.exists(db_path + '.bak_v3')
+    assert [(dp.timestamp, dp.value) for dp in db.get_task_data_points('task-1', 'cpu_percent')] == [
+        (datetime(2026, 1, 1, 0, 0, 1), 5.0), (datetime(2026, 1, 1, 0, 0, 3), 7.0)]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute('SELECT typeof(task_key), typeof(ts_ms), COUNT(*) FROM samples '
+                            'GROUP BY 1, 2').fetchall() == [('integer', 'integer', 3)]
+        metric_id = conn.execute("SELECT id FROM metrics WHERE name = 'memory_rss'").fetchone()[0]
+        assert f'm{metric_id}' in [row[1] for row in conn.execute('PRAGMA table_info(samples)')]
+        task_key = conn.execute("SELECT id FROM tasks WHERE task_id = 'task-1'").fetchone()[0]
+    finally:
+        conn.close()
+
+    # 再次保存任务（更新状态等）不改变整数键，已有采样仍归属该任务
+    assert db.save_task(db.get_task('task-1'))
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT id FROM tasks WHERE task_id = 'task-1'").fetchone()[0] == task_key
+    finally:
+        conn.close()
+    assert db.get_sample_count('task-1') == 3
+
+
+# ========== v4 -> v5：samples 改为 WITHOUT ROWID 主键表 ==========
+
+def test_v4_db_rebuilds_samples_as_clustered_primary_key(db_path):
+    """v4 的 rowid 表 + 唯一索引重建为 (task_key, ts_ms) 主键的 WITHOUT ROWID 表，数据不变"""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        Database._create_tasks_table(cursor, 'tasks')
+        cursor.execute("CREATE TABLE metrics (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+        cursor.execute("INSERT INTO metrics (id, name) VALUES (1, 'memory_rss'), (2, 'cpu_percent')")
+        cursor.execute('CREATE TABLE samples (task_key INTEGER NOT NULL, ts_ms INTEGER NOT NULL, '
+                       'm1 REAL, m2 REAL)')
+        cursor.execute('CREATE UNIQUE INDEX idx_samples_task_ts ON samples(task_key, ts_ms)')
+        cursor.execute('''
+            INSERT INTO tasks (task_id, pid, process_name, metric_type, interval, start_time, status)
+            VALUES ('task-1', 1, 'a.exe', '["memory_rss", "cpu_percent"]', 1.0,
+                    '2026-01-01T00:00:00', 'stopped')
+        ''')
+        cursor.executemany('INSERT INTO samples VALUES (1, ?, ?, ?)',
+                           [(2000, 2.0, None), (1000, 1.0, 10.0)])
+        cursor.execute('PRAGMA user_version = 4')
+        conn.commit()
+    finally:
+        conn.close()
+
+    db = Database(db_path)
+
+    assert _get_user_version(db_path) == SCHEMA_VERSION == 12
+    assert os.path.exists(db_path + '.bak_v4')
+    assert [(dp.value, dp.metric_type) for dp in db.get_task_data_points('task-1')] == [
+        (1.0, 'memory_rss'), (10.0, 'cpu_percent'), (2.0, 'memory_rss')]
+    # v5 -> v6：任务汇总按已有采样聚合初值
+    assert db.get_sample_count('task-1') == 2
+    assert db.get_data_point_count('task-1') == 3
+    assert db.get_metric_stats('task-1', 'memory_rss') == {'count': 2, 'min': 1.0, 'max': 2.0,
+                                                         'avg': 1.5}
+    assert db.get_last_point_timestamp('task-1') == datetime.fromtimestamp(2)
+    # v6 -> v7：降采样汇总按已有采样聚合（两点落在同一分钟桶）
+    assert [(dp.timestamp, dp.value) for dp in db.get_task_data_points_rollup(
+        'task-1', 'memory_rss', 60_000)] == [
+        (datetime.fromtimestamp(1), 1.0), (datetime.fromtimestamp(2), 2.0)]
+
+    conn = sqlite3.connect(db_path)
+    try:
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'samples'").fetchone()[0]
+        indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                               "AND tbl_name = 'samples' AND sql IS NOT NULL").fetchall()
+    finally:
+        conn.close()
+    assert 'WITHOUT ROWID' in sql.upper()
+    assert indexes == []
@@ -1,11 +1,17 @@
 """实时监控页 Fluent 布局契约。"""
 
+from core.monitor_manager import MonitorManager
+from data.database import Database
 from ui.pages.monitor_page import MonitorPage
 
 
-def test_interval_spinbox_keeps_maximum_value_visible(qapp, monkeypatch):
+def test_interval_spinbox_keeps_maximum_value_visible(qapp, monkeypatch, tmp_path):
     """周期输入框必须为范围最大值保留完整的文本编辑区域。"""
     monkeypatch.setattr(MonitorPage, "_refresh_process_list", lambda self: None)
+    # MonitorManager 是进程级单例：先以 tmp 库构造，页面取到的即是它，不落项目 data 目录
+    monkeypatch.setattr(MonitorManager, "_instance", None)
+    db = Database(str(tmp_path / "monitor_ui.db"))
+    manager = MonitorManager(db=db)
     page = MonitorPage()
     page.resize(800, 600)
     page.show()
@@ -18,3 +24,5 @@ def test_interval_spinbox_keeps_maximum_value_visible(qapp, monkeypatch):
     assert spinbox.lineEdit().width() >= value_width
 
     page.close()
+    manager.get_journal().close()
+    db.close()
@@ -0,0 +1,93 @@
+"""
+ProcessCollector 采集计划用例
+验证指标列表编译为按访问器分组的计划、每个访问器每周期只调用一次、
+未知指标被剔除，以及对当前测试进程的真实采集结果完整
+"""
+import os
+
+from core import process_collector
+from core.process_collector import ProcessCollector, compile_plan
+from utils import metrics
+from utils.metrics import AVAILABLE_METRICS, MetricType, is_metric_supported
+
+ALL_METRICS = [m for group in AVAILABLE_METRICS.values() for m in group]
+
+
+def test_compile_plan_groups_metrics_by_accessor():
+    """同一访问器的指标归为一组，分组顺序按首次出现顺序，未知指标剔除"""
+    plan = compile_plan([
+        MetricType.MEMORY_RSS,
+        MetricType.IO_READ_BYTES,
+        MetricType.MEMORY_VMS,
+        "unknown_metric",
+        MetricType.IO_WRITE_BYTES,
+    ])
+
+    assert [accessor for accessor, _ in plan] == ['memory_info', 'io_counters']
+    assert [m for m, _ in plan[0][1]] == [MetricType.MEMORY_RSS, MetricType.MEMORY_VMS]
+    assert [m for m, _ in plan[1][1]] == [MetricType.IO_READ_BYTES, MetricType.IO_WRITE_BYTES]
+
+
+def test_collect_metrics_calls_each_accessor_once(monkeypatch):
+    """多个 memory_info 指标一个周期内只触发一次 memory_info() 调用"""
+    calls = []
+    original = process_collector._ACCESSORS['memory_info']
+
+    def _counting_memory_info(process):
+        calls.append(1)
+        return original(process)
+
+    monkeypatch.setitem(process_collector._ACCESSORS, 'memory_info', _counting_memory_info)
+
+    collector = ProcessCollector(os.getpid())
+    values = collector.collect_metrics([
+        MetricType.MEMORY_RSS, MetricType.MEMORY_VMS, MetricType.MEMORY_PEAK_WSET])
+
+    assert len(calls) == 1
+    expected = {MetricType.MEMORY_RSS, MetricType.MEMORY_VMS, MetricType.MEMORY_PEAK_WSET}
+    assert set(values) == {m for m in expected if is_metric_supported(m)}
+    assert values[MetricType.MEMORY_RSS] > 0
+
+
+def test_collect_metrics_returns_every_supported_metric():
+    """本平台支持的指标一次采集均有值，不支持的指标不出现在结果中（不写假0），计划按指标列表缓存"""
+    collector = ProcessCollector(os.getpid())
+    values = collector.collect_metrics(ALL_METRICS + ["unknown_metric"])
+
+    supported = {m for m in ALL_METRICS if is_metric_supported(m)}
+    assert set(values) == supported
+    assert collector.unsupported_metrics == set(ALL_METRICS) - supported
+    assert len(collector._plans) == 1
+
+
+def test_probe_drops_fields_missing_at_runtime(monkeypatch):
+    """平台支持表未排除、但运行时字段不存在的指标：首周期探测后剔除并登记，此后不再采集"""
+    monkeypatch.setattr(metrics, '_probed_unsupported', set())
+    monkeypatch.setitem(process_collector._METRIC_SOURCES, MetricType.MEMORY_RSS,
+                        ('memory_info', lambda r: r.no_such_field))
+    collector = ProcessCollector(os.getpid())
+
+    first = collector.collect_metrics([MetricType.MEMORY_RSS, MetricType.MEMORY_VMS])
+    second = collector.collect_metrics([MetricType.MEMORY_RSS, MetricType.MEMORY_VMS])
+
+    assert set(first) == set(second) == {MetricType.MEMORY_VMS}
+    assert collector.unsupported_metrics == {MetricType.MEMORY_RSS}
+    assert not is_metric_supported(MetricType.MEMORY_RSS)
+    assert process_collector.compile_plan([MetricType.MEMORY_RSS])  # 静态编译不受影响
+
+
+def test_available_metrics_follow_platform_table():
+    """指标选择器数据源按平台过滤：Windows 专有内存计数只在 Windows 提供，Linux 独有指标只在 Linux 提供"""
+    linux = [m for group in metrics.get_available_metrics('linux').values() for m in group]
+    windows = [m for group in metrics.get_available_metrics('win32').values() for m in group]
+    darwin = metrics.get_available_metrics('darwin')
+
+    assert MetricType.MEMORY_PSS in linux and MetricType.MEMORY_PSS not in windows
+    assert MetricType.MEMORY_PEAK_WSET in windows and MetricType.MEMORY_PEAK_WSET not in linux
+    assert "IO操作" not in darwin
+    assert MetricType.MEMORY_RSS in linux and MetricType.MEMORY_RSS in windows
+
+
+def test_collect_metrics_returns_none_for_dead_process():
+    """进程不存在时整体返回None（调用方据此停止任务）"""
+    assert ProcessCollector(999999).collect_metrics([MetricType.MEMORY_RSS]) is None
@@ -0,0 +1,138 @@
+"""
+ProcFsCollector（Linux /proc 直读后端）用例
+验证与 psutil 后端取值口径一致、文件描述符跨周期复用、进程退出后返回 None，
+以及采集器工厂按配置选择后端
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from core import procfs_collector
+from core.process_collector import ProcessCollector, create_collector
+from core.procfs_collector import HAS_SMAPS_ROLLUP, ProcFsCollector
+from utils import metrics
+from utils.metrics import AVAILABLE_METRICS, MetricType, is_metric_supported
+
+pytestmark = pytest.mark.skipif(not ProcFsCollector.is_available(), reason="需要 Linux /proc")
+
+ALL_METRICS = [m for group in AVAILABLE_METRICS.values() for m in group]
+
+
+def test_values_match_psutil_backend():
+    """全部指标与 psutil 后端同口径（计数类精确相等，随时间变化的量允许小幅偏差）"""
+    procfs = ProcFsCollector(os.getpid())
+    values = procfs.collect_metrics(ALL_METRICS)
+    reference = ProcessCollector(os.getpid()).collect_metrics(ALL_METRICS)
+    procfs.close()
+
+    assert set(values) == set(reference)
+    assert MetricType.MEMORY_PEAK_WSET not in values
+    for metric in (MetricType.MEMORY_VMS, MetricType.MEMORY_TEXT, MetricType.NUM_THREADS,
+                   MetricType.CPU_PRIORITY):
+        assert values[metric] == reference[metric], metric
+    assert values[MetricType.MEMORY_RSS] == pytest.approx(reference[MetricType.MEMORY_RSS], rel=0.05)
+    assert values[MetricType.CPU_USER_TIME] == pytest.approx(reference[MetricType.CPU_USER_TIME], abs=0.1)
+    assert values[MetricType.IO_READ_COUNT] <= reference[MetricType.IO_READ_COUNT]
+
+
+def test_reuses_descriptors_and_parses_only_needed_files():
+    """只打开任务指标需要的文件，后续周期复用同一个文件描述符"""
+    collector = ProcFsCollector(os.getpid())
+    collector.collect_metrics([MetricType.MEMORY_RSS, MetricType.NUM_THREADS])
+    fds = dict(collector._fds)
+    collector.collect_metrics([MetricType.MEMORY_RSS, MetricType.NUM_THREADS])
+
+    assert set(fds) == {'statm', 'stat'}
+    assert collector._fds == fds
+    collector.close()
+    assert collector._fds == {}
+
+
+def test_cpu_percent_measures_busy_loop():
+    """cpu_percent 基于 utime+stime 增量：忙循环期间接近 100%"""
+    collector = ProcFsCollector(os.getpid())
+    collector.prime_cpu()
+    end = os.times().elapsed + 0.3
+    while os.times().elapsed < end:
+        pass
+    value = collector.collect_metrics([MetricType.CPU_PERCENT])[MetricType.CPU_PERCENT]
+    collector.close()
+
+    assert value > 50.0
+
+
+def test_returns_none_after_process_exits():
+    """已打开的 /proc 文件在进程退出并回收后读取失败，整体返回 None"""
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    collector = ProcFsCollector(child.pid)
+    assert collector.collect_metrics([MetricType.MEMORY_RSS]) is not None
+
+    child.kill()
+    child.wait()
+    assert collector.collect_metrics([MetricType.MEMORY_RSS]) is None
+    collector.close()
+
+
+@pytest.mark.skipif(not HAS_SMAPS_ROLLUP, reason="内核不提供 smaps_rollup")
+def test_uss_pss_swap_read_from_smaps_rollup():
+    """USS/PSS/Swap 由常驻打开的 smaps_rollup 取得，与 psutil 后端同口径"""
+    metrics = [MetricType.MEMORY_USS, MetricType.MEMORY_PSS, MetricType.MEMORY_SWAP]
+    collector = ProcFsCollector(os.getpid())
+    values = collector.collect_metrics(metrics)
+    reference = ProcessCollector(os.getpid()).collect_metrics(metrics)
+
+    assert set(collector._fds) == {'smaps_rollup'}
+    assert values[MetricType.MEMORY_USS] == pytest.approx(reference[MetricType.MEMORY_USS], rel=0.05)
+    assert values[MetricType.MEMORY_PSS] == pytest.approx(reference[MetricType.MEMORY_PSS], rel=0.05)
+    collector.close()
+
+
+@pytest.mark.skipif(not HAS_SMAPS_ROLLUP, reason="内核不提供 smaps_rollup")
+def test_smaps_rollup_failure_falls_back_to_psutil(monkeypatch):
+    """存活进程读取 smaps_rollup 失败时改走 psutil，且此后不再尝试 smaps_rollup"""
+    collector = ProcFsCollector(os.getpid())
+    original = collector._read
+    attempts = []
+
+    def _failing_read(name):
+        if name == 'smaps_rollup':
+            attempts.append(name)
+            raise FileNotFoundError(name)
+        return original(name)
+
+    monkeypatch.setattr(collector, '_read', _failing_read)
+    first = collector.collect_metrics([MetricType.MEMORY_USS, MetricType.MEMORY_RSS])
+    second = collector.collect_metrics([MetricType.MEMORY_USS, MetricType.MEMORY_RSS])
+    collector.close()
+
+    assert first[MetricType.MEMORY_USS] > 0 and second[MetricType.MEMORY_USS] > 0
+    assert attempts == ['smaps_rollup']
+
+
+def test_missing_labeled_field_dropped_not_zeroed(monkeypatch):
+    """内核未提供的标签字段（旧内核、smaps_rollup 缺少标签）：首周期探测后剔除并登记，
+    不写假0，此后的计划不再包含该指标"""
+    monkeypatch.setattr(metrics, '_probed_unsupported', set())
+    monkeypatch.setitem(procfs_collector._PROC_SOURCES, MetricType.NUM_CTX_SWITCHES_VOL,
+                        ('status', b'\nno_such_field:', float))
+    collector = ProcFsCollector(os.getpid())
+    wanted = [MetricType.NUM_CTX_SWITCHES_VOL, MetricType.NUM_CTX_SWITCHES_INVOL]
+
+    first = collector.collect_metrics(wanted)
+    second = collector.collect_metrics(wanted)
+    collector.close()
+
+    assert set(first) == set(second) == {MetricType.NUM_CTX_SWITCHES_INVOL}
+    assert collector.unsupported_metrics == {MetricType.NUM_CTX_SWITCHES_VOL}
+    assert not is_metric_supported(MetricType.NUM_CTX_SWITCHES_VOL)
+    files, _derived, _fallback = collector._proc_plans[tuple(wanted)]
+    assert [metric for metric, _, _ in files['status']] == [MetricType.NUM_CTX_SWITCHES_INVOL]
+
+
+def test_create_collector_selects_backend():
+    """auto/procfs 在 Linux 上选择 /proc 后端，psutil 强制使用 psutil 后端"""
+    assert type(create_collector(os.getpid(), 'auto')) is ProcFsCollector
+    assert type(create_collector(os.getpid(), 'procfs')) is ProcFsCollector
+    assert type(create_collector(os.getpid(), 'psutil')) is ProcessCollector
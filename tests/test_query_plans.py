@@ -0,0 +1,219 @@
+"""
+查询计划用例
+对历史页/导出用到的查询执行 EXPLAIN QUERY PLAN，断言按任务 + 时间范围的读取走
+samples 主键 B 树（WITHOUT ROWID，聚簇即覆盖）、任务 UUID 换整数键走唯一索引、
+单指标"最近 N 条"不在内层建临时排序 B 树，且 samples 上没有额外的二级索引；
+计数、最新时间戳与全范围统计只读任务汇总表，图表的降采样汇总按主键区间读取；
+压缩块 sample_chunks 同样按 (任务, 窗口) 索引区间读取；分区任务读取其分区库中的同一主键
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from data.models import MonitorTask, DataPoint
+
+RANGE_SEARCH = 'SEARCH samples USING PRIMARY KEY (task_key=? AND ts_ms>?)'
+SUMMARY_SEARCH = ('SEARCH task_summary USING INTEGER PRIMARY KEY',
+                  'SEARCH task_metric_summary USING PRIMARY KEY')
+TASK_LOOKUP = 'SEARCH tasks USING COVERING INDEX'
+TASK_FLAG_LOOKUP = 'SEARCH tasks USING INDEX sqlite_autoindex_tasks_1 (task_id=?)'
+CHUNK_SEARCH = 'SEARCH sample_chunks USING INDEX sqlite_autoindex_sample_chunks_1 (task_key=?'
+
+
+@pytest.fixture
+def task(db):
+    task = MonitorTask(task_id=str(uuid.uuid4()), pid=1, process_name="a.exe",
+                       metric_types=["memory_rss", "cpu_percent"], interval=1.0,
+                       start_time=datetime(2026, 1, 1), end_time=None, status="running")
+    db.save_task(task)
+    db.save_data_points([
+        DataPoint(task.task_id, datetime(2026, 1, 1) + timedelta(seconds=i), float(i), m)
+        for i in range(50) for m in task.metric_types
+    ])
+    return task
+
+
+def _query_plans(db, call):
+    """
+    执行 call，返回其间每条查询语句的计划明细列表（每条语句一个 list[str]）。表名上的
+    main. 限定（采样相关的表按任务所在的库限定）去掉，与未限定的写法同形
+    """
+    statements = []
+    with db._get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            call()
+        finally:
+            conn.set_trace_callback(None)
+        queries = [sql for sql in statements
+                   if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+        return [[row['detail'].replace(' main.', ' ')
+                 for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+                for sql in queries]
+
+
+def _assert_no_full_scan(plan):
+    assert not any(detail.startswith(('SCAN samples', 'SCAN tasks', 'SCAN sample_chunks'))
+                   for detail in plan), plan
+
+
+def _split_chunk_plans(plans):
+    """
+    把只读 sample_chunks 的语句计划分出来：(其余计划, 压缩块计划)；后者须走索引区间。
+    按任务 UUID 取存储位置与只记变化标记的单表查找（走唯一索引）一并去掉
+    """
+    plans = [plan for plan in plans if plan != [TASK_FLAG_LOOKUP]]
+    chunk_plans = [plan for plan in plans
+                   if any('sample_chunks' in detail for detail in plan)
+                   and not any('samples' in detail.split() for detail in plan)]
+    for plan in chunk_plans:
+        assert any(detail.startswith(CHUNK_SEARCH) for detail in plan), plan
+        _assert_no_full_scan(plan)
+    return [plan for plan in plans if plan not in chunk_plans], chunk_plans
+
+
+def _split_rollup_plans(plans):
+    """把只读 rollups 的语句计划分出来：(其余计划, 降采样汇总计划)；后者须走主键区间"""
+    rollup_plans = [plan for plan in plans
+                    if any('rollups' in detail.split() for detail in plan)
+                    and not any('samples' in detail.split() for detail in plan)]
+    for plan in rollup_plans:
+        assert any(detail.startswith('SEARCH rollups USING PRIMARY KEY') for detail in plan), plan
+        assert not any(detail.startswith('SCAN rollups') for detail in plan), plan
+    return [plan for plan in plans if plan not in rollup_plans], rollup_plans
+
+
+def test_samples_has_no_secondary_indexes(db):
+    """samples 只有主键：不为任何查询路径单独维护二级索引（写入只更新一棵 B 树）"""
+    with db._get_connection() as conn:
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'samples'").fetchone()[0]
+        indexes = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'samples' "
+            "AND sql IS NOT NULL").fetchall()
+    assert 'WITHOUT ROWID' in sql.upper()
+    assert indexes == []
+
+
+def test_recent_points_in_range_read_primary_key_backwards(db, task):
+    """单指标"范围内最近 N 条"：主键范围查找，内层倒序 LIMIT 不建临时排序 B 树"""
+    since = datetime(2026, 1, 1, 0, 0, 10)
+    (plan,), _chunk_plans = _split_chunk_plans(_query_plans(db, lambda: db.get_task_data_points(
+        task.task_id, metric_type="memory_rss", limit=5, since=since)))
+
+    assert RANGE_SEARCH in plan
+    assert any(detail.startswith(TASK_LOOKUP) for detail in plan)
+    # 只有外层对 <= limit 行的升序重排用到临时 B 树
+    assert sum('TEMP B-TREE' in detail for detail in plan) == 1
+    _assert_no_full_scan(plan)
+
+
+def test_bucketed_and_stats_use_primary_key_range(db, task):
+    """图表分桶与统计摘要按时间范围只读取范围内的主键区间（分桶先按主键区间数汇总桶）"""
+    since = datetime(2026, 1, 1, 0, 0, 10)
+    plans, _chunk_plans = _split_chunk_plans(_query_plans(db, lambda: (
+        db.get_task_data_points_bucketed(task.task_id, metric_type="memory_rss", since=since),
+        db.get_metric_stats(task.task_id, "memory_rss", since=since),
+    )))
+    plans, rollup_plans = _split_rollup_plans(plans)
+
+    assert len(rollup_plans) == 1
+    assert len(plans) == 2
+    for plan in plans:
+        assert RANGE_SEARCH in plan
+        _assert_no_full_scan(plan)
+
+
+def test_latest_point_counts_and_full_stats_read_one_summary_row(db, task):
+    """最新时间戳、采集次数、数据点数与全范围统计只按主键读任务汇总，不触碰 samples"""
+    plans = _query_plans(db, lambda: (
+        db.get_last_point_timestamp(task.task_id),
+        db.get_sample_count(task.task_id),
+        db.get_data_point_count(task.task_id, "memory_rss"),
+        db.get_metric_stats(task.task_id, "memory_rss"),
+    ))
+
+    assert len(plans) == 4
+    for plan in plans:
+        assert any(detail.startswith(SUMMARY_SEARCH) for detail in plan), plan
+        assert not any('samples' in detail.split() for detail in plan), plan
+        assert not any('TEMP B-TREE' in detail for detail in plan)
+        _assert_no_full_scan(plan)
+
+
+def test_rollup_chart_reads_rollup_primary_key_range(db, task):
+    """降采样汇总图表只按 (任务, 指标, 粒度, 桶) 主键区间读 rollups，不触碰 samples"""
+    since = datetime(2026, 1, 1, 0, 0, 10)
+    plans = _query_plans(db, lambda: db.get_task_data_points_rollup(
+        task.task_id, "memory_rss", 60_000, since=since))
+    (plan,) = [plan for plan in plans if plan != [TASK_FLAG_LOOKUP]]
+
+    assert any(detail.startswith('SEARCH rollups USING PRIMARY KEY') for detail in plan), plan
+    assert not any('samples' in detail.split() for detail in plan), plan
+
+
+def test_change_only_reads_walk_primary_key_from_window_start(db_path):
+    """
+    只记变化的任务：最近 N 条先沿主键倒序定位起点，再从所在窗口起点按主键正序读取；
+    范围统计的整分钟部分读降采样汇总，只有起点所在的那一分钟按主键区间还原
+    """
+    from data.database import Database
+    held_db = Database(db_path, change_only=True)
+    task = MonitorTask(task_id=str(uuid.uuid4()), pid=1, process_name="a.exe",
+                       metric_types=["memory_rss"], interval=1.0,
+                       start_time=datetime(2026, 1, 1), end_time=None, status="running")
+    held_db.save_task(task)
+    held_db.save_data_points([
+        DataPoint(task.task_id, datetime(2026, 1, 1) + timedelta(seconds=i), float(i // 10), "memory_rss")
+        for i in range(50)
+    ])
+    since = datetime(2026, 1, 1, 0, 0, 10)
+
+    try:
+        plans, _chunk_plans = _split_chunk_plans(_query_plans(held_db, lambda: (
+            held_db.get_task_data_points(task.task_id, metric_type="memory_rss", limit=5, since=since),
+            held_db.get_metric_stats(task.task_id, "memory_rss", since=since),
+        )))
+        plans, rollup_plans = _split_rollup_plans(plans)
+        assert len(rollup_plans) == 1
+        assert len(plans) == 3
+        assert RANGE_SEARCH.replace(')', ' AND ts_ms<?)') in plans[-1]
+        for plan in plans:
+            assert any(detail.startswith(RANGE_SEARCH[:-1]) for detail in plan), plan
+            assert not any('TEMP B-TREE' in detail for detail in plan), plan
+            _assert_no_full_scan(plan)
+    finally:
+        held_db.close()
+
+
+def test_partitioned_task_reads_walk_partition_primary_key(db_path):
+    """分区任务：范围读取与降采样汇总走其分区库中的同一主键区间，不触碰主库的采样表"""
+    from data.database import Database
+    part_db = Database(db_path, partitioned=True)
+    task = MonitorTask(task_id=str(uuid.uuid4()), pid=1, process_name="a.exe",
+                       metric_types=["memory_rss"], interval=1.0,
+                       start_time=datetime(2026, 1, 1), end_time=None, status="running")
+    part_db.save_task(task)
+    part_db.save_data_points([
+        DataPoint(task.task_id, datetime(2026, 1, 1) + timedelta(seconds=i), float(i), "memory_rss")
+        for i in range(50)
+    ])
+    since = datetime(2026, 1, 1, 0, 0, 10)
+
+    try:
+        plans = _query_plans(part_db, lambda: (
+            part_db.get_task_data_points(task.task_id, metric_type="memory_rss", limit=5, since=since),
+            part_db.get_task_data_points_rollup(task.task_id, "memory_rss", 60_000, since=since),
+        ))
+        with part_db._get_connection() as conn:
+            alias = f"p{conn.execute('SELECT id FROM tasks').fetchone()[0]}"
+        samples_plan, chunk_plan, rollup_plan = [plan for plan in plans if plan != [TASK_FLAG_LOOKUP]]
+        assert RANGE_SEARCH.replace('samples', f'{alias}.samples') in samples_plan
+        assert chunk_plan[0].startswith(CHUNK_SEARCH.replace('SEARCH ', f'SEARCH {alias}.', 1))
+        assert any(detail.startswith(f'SEARCH {alias}.rollups USING PRIMARY KEY')
+                   for detail in rollup_plan), rollup_plan
+        for plan in plans:
+            assert not any(detail.startswith(('SCAN samples', 'SCAN rollups')) for detail in plan)
+    finally:
+        part_db.close()
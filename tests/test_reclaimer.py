@@ -0,0 +1,73 @@
+"""
+空闲页后台回收线程（core/reclaimer.py）用例
+写入线程空闲时按每步上限逐步回收到没有空闲页；写入线程有待写数据时让出，不回收
+"""
+import time
+from datetime import datetime, timedelta
+
+from core.reclaimer import SpaceReclaimer
+from data.database import Database
+from data.models import MonitorTask, DataPoint
+
+
+class _FakeWriter:
+    """只提供 is_idle 的假写入线程"""
+
+    def __init__(self, idle=True):
+        self.idle = idle
+
+    def is_idle(self):
+        return self.idle
+
+
+def _free_pages(db: Database) -> int:
+    task = MonitorTask(task_id="reclaim", pid=1, process_name="a.exe", metric_types=["memory_rss"],
+                       interval=1.0, start_time=datetime(2026, 1, 1), end_time=None, status="stopped")
+    db.save_task(task)
+    db.save_data_points([
+        DataPoint(task_id=task.task_id, timestamp=datetime(2026, 1, 1) + timedelta(seconds=i),
+                  value=float(i), metric_type="memory_rss")
+        for i in range(20000)
+    ])
+    db.delete_task(task.task_id)
+    return db.get_space_stats()['freelist_pages']
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_reclaims_all_free_pages_in_small_steps(db):
+    free_pages = _free_pages(db)
+    reclaimer = SpaceReclaimer(db, _FakeWriter(), interval_ms=10, step_pages=16, pause_ms=0)
+    reclaimer.start()
+    try:
+        assert _wait_until(lambda: db.get_space_stats()['freelist_pages'] == 0)
+    finally:
+        reclaimer.stop()
+        assert reclaimer.wait(2000)
+
+    assert reclaimer.reclaimed_pages == free_pages
+    assert reclaimer.step_count >= free_pages // 16
+
+
+def test_yields_while_writer_busy(db):
+    free_pages = _free_pages(db)
+    writer = _FakeWriter(idle=False)
+    reclaimer = SpaceReclaimer(db, writer, interval_ms=10, step_pages=16, pause_ms=5)
+    reclaimer.start()
+    try:
+        time.sleep(0.2)
+        assert reclaimer.step_count == 0
+        assert db.get_space_stats()['freelist_pages'] == free_pages
+
+        writer.idle = True
+        assert _wait_until(lambda: db.get_space_stats()['freelist_pages'] == 0)
+    finally:
+        reclaimer.stop()
+        assert reclaimer.wait(2000)
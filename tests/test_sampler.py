@@ -0,0 +1,131 @@
+"""
+共享采样引擎（core/sampler.py）用例
+真实驱动监控当前测试进程的多个 MonitorTask，验证：全部任务只占用一个引擎线程、
+stop_task 返回时收尾已完成、暂停的任务被搁置不再采集、恢复后继续采集、
+最后一个任务收尾后引擎线程自行退出。
+"""
+import os
+import threading
+import time
+
+import pytest
+from PyQt5.QtCore import Qt
+
+import config
+from core.monitor_task import MonitorTask
+from core.sampler import SamplerEngine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch, qapp):
+    """构造引擎（tmp 库），用例结束后兜底停止全部任务并等待线程退出"""
+    monkeypatch.setattr(config, 'DB_PATH', str(tmp_path / "sampler.db"))
+    eng = SamplerEngine()
+    created = []
+
+    def _factory(interval=0.05, metric_types=None):
+        t = MonitorTask(
+            pid=os.getpid(),
+            process_name="pytest-target",
+            metric_types=metric_types or ["memory_rss"],
+            interval=interval,
+        )
+        created.append(t)
+        return t
+
+    eng.make_task = _factory
+    yield eng
+
+    for t in created:
+        eng.stop_task(t)
+    eng.wait(3000)
+
+
+def test_many_tasks_share_one_thread(engine):
+    """20 个任务全部由引擎线程采集，线程数不随任务数增长"""
+    threads_before = threading.active_count()
+    updates = {}
+    sampling_threads = set()
+
+    def _on_data(task_id, _values):
+        updates[task_id] = updates.get(task_id, 0) + 1
+        sampling_threads.add(threading.get_ident())
+
+    tasks = [engine.make_task() for _ in range(20)]
+    for t in tasks:
+        t.data_updated.connect(_on_data, Qt.DirectConnection)
+        engine.add_task(t)
+
+    time.sleep(0.4)
+
+    assert len(updates) == 20
+    assert all(count >= 2 for count in updates.values())
+    assert len(sampling_threads) == 1
+    assert threading.active_count() <= threads_before + 1
+
+
+def test_stop_task_returns_after_teardown(engine):
+    """stop_task 阻塞到收尾完成：task_stopped 已 emit、库内状态已为 stopped"""
+    task = engine.make_task()
+    stopped = []
+    task.task_stopped.connect(lambda tid, reason: stopped.append(reason), Qt.DirectConnection)
+
+    engine.add_task(task)
+    time.sleep(0.15)
+    assert engine.stop_task(task) is True
+
+    assert stopped == ["用户停止"]
+    assert task.is_running() is False
+    assert task.db.get_task(task.task_id).status == 'stopped'
+    assert task.db.get_data_point_count(task.task_id) > 0
+
+
+def test_paused_task_is_parked_and_resumes(engine):
+    """暂停期间不再采集；恢复后重新入堆继续采集"""
+    task = engine.make_task()
+    updates = []
+    task.data_updated.connect(lambda tid, values: updates.append(values), Qt.DirectConnection)
+
+    engine.add_task(task)
+    time.sleep(0.15)
+    engine.pause_task(task)
+    time.sleep(0.1)  # 留出暂停前最后一个周期收尾的时间窗口
+    count_paused = len(updates)
+    time.sleep(0.2)
+    assert len(updates) == count_paused
+
+    engine.resume_task(task)
+    time.sleep(0.2)
+    assert len(updates) > count_paused
+
+
+def test_engine_thread_exits_when_idle_and_restarts(engine):
+    """最后一个任务收尾后引擎线程退出；再加入任务时重新启动"""
+    first = engine.make_task()
+    engine.add_task(first)
+    time.sleep(0.1)
+    engine.stop_task(first)
+    assert engine.wait_idle(3000) is True
+    assert engine.isRunning() is False
+
+    second = engine.make_task()
+    updates = []
+    second.data_updated.connect(lambda tid, values: updates.append(values), Qt.DirectConnection)
+    engine.add_task(second)
+    time.sleep(0.15)
+    assert updates
+    assert engine.isRunning() is True
+
+
+def test_sub_second_task_timestamps_are_evenly_spaced(engine):
+    """0.1 秒周期：落库时间戳严格等距（绝对截止时间调度，采集耗时不累积为漂移）"""
+    task = engine.make_task(interval=0.1)
+    engine.add_task(task)
+    time.sleep(0.65)
+    engine.stop_task(task)
+
+    points = task.db.get_task_data_points(task.task_id)
+    assert len(points) >= 4
+    gaps = [(b.timestamp - a.timestamp).total_seconds() for a, b in zip(points, points[1:])]
+    # 允许 datetime 微秒取整带来的 1us 误差
+    assert all(abs(gap - 0.1) <= 2e-6 for gap in gaps), gaps
@@ -0,0 +1,58 @@
+"""
+TickSchedule 绝对截止时间采样时间表用例
+注入单调时钟读数验证：截止时间/时间戳严格按锚点 + k * interval 推进、采集耗时
+不累积为漂移、落后一个完整周期以上时跳过并计数、restart 重新锚定
+"""
+from datetime import timedelta
+
+from core.schedule import TickSchedule
+
+
+def test_deadlines_do_not_accumulate_collection_time():
+    """每个周期都"晚到"一点（采集耗时），截止时间仍严格按 interval 等距推进"""
+    schedule = TickSchedule(0.1)
+    anchor = schedule.deadline
+    first_ts = schedule.timestamp()
+
+    for k in range(1, 101):
+        # 模拟每次采集耗时 30ms 后才推进
+        skipped = schedule.advance(now=schedule.deadline + 0.03)
+        assert skipped == 0
+        assert abs(schedule.deadline - (anchor + k * 0.1)) < 1e-9
+
+    assert schedule.timestamp() - first_ts == timedelta(seconds=10)
+    assert schedule.skipped_ticks == 0
+
+
+def test_falling_behind_skips_missed_ticks():
+    """落后 3.5 个周期：跳到最近一个已到期周期，跳过数计入 skipped_ticks"""
+    schedule = TickSchedule(1.0)
+    anchor = schedule.deadline
+
+    skipped = schedule.advance(now=anchor + 4.5)
+
+    assert skipped == 3
+    assert schedule.skipped_ticks == 3
+    assert schedule.deadline == anchor + 4.0
+
+
+def test_late_by_less_than_one_interval_runs_immediately_without_skip():
+    """落后不足一个周期不算跳过：下一截止时间已到期，调用方立即采集"""
+    schedule = TickSchedule(1.0)
+    anchor = schedule.deadline
+
+    assert schedule.advance(now=anchor + 1.5) == 0
+    assert schedule.deadline == anchor + 1.0
+
+
+def test_restart_reanchors_schedule():
+    """restart 以当前时刻为新锚点，周期序号归零（暂停恢复后调用）"""
+    schedule = TickSchedule(0.5)
+    schedule.advance(now=schedule.deadline)
+    schedule.advance(now=schedule.deadline)
+    old_deadline = schedule.deadline
+
+    schedule.restart()
+
+    assert schedule.deadline < old_deadline
+    assert schedule.skipped_ticks == 0
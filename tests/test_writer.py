@@ -0,0 +1,163 @@
+"""
+组提交写入线程（core/writer.py）用例
+多个任务的待写数据在同一延迟窗口内合并为一个事务；提交失败时沿用任务原有的
+重试/缓冲上限/连续失败通知语义；收尾提交阻塞到落库完成并解除挂接
+"""
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import config
+from core.monitor_task import MonitorTask, MAX_BUFFER_SIZE, CONSECUTIVE_FAILURE_NOTIFY_THRESHOLD
+from core.sampler import SamplerEngine
+from core.writer import GroupCommitWriter
+from data.models import DataPoint
+
+
+class _FakeDB:
+    """记录每次 save_data_points 调用的假数据库，fail_times 控制接下来失败几次"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail_times = 0
+        self.saved_points = []
+
+    def save_data_points(self, points):
+        self.calls.append(list(points))
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            return False
+        self.saved_points.extend(points)
+        return True
+
+
+@pytest.fixture
+def fake_db():
+    return _FakeDB()
+
+
+@pytest.fixture
+def make_task(tmp_path, monkeypatch, qapp, fake_db):
+    """构造注入写入线程、不会真正启动采集的 MonitorTask"""
+    monkeypatch.setattr(config, 'DB_PATH', str(tmp_path / "writer.db"))
+
+    def _make(writer):
+        t = MonitorTask(pid=999999, process_name="fake.exe", metric_types=["memory_rss"],
+                        interval=1.0, db=fake_db, writer=writer)
+        writer.attach(t)
+        return t
+    return _make
+
+
+def _buffer(task, n=1, value=1.0):
+    ts = datetime.now()
+    task._data_buffer.extend(
+        DataPoint(task_id=task.task_id, timestamp=ts, value=value + i, metric_type="memory_rss")
+        for i in range(n)
+    )
+
+
+def _wait_for(predicate, timeout=3.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "等待写入线程超时"
+        time.sleep(0.01)
+
+
+def test_tasks_in_same_window_share_one_transaction(make_task, fake_db):
+    """同一延迟窗口内多个任务的数据只产生一次 save_data_points 调用"""
+    writer = GroupCommitWriter(fake_db, latency_ms=100)
+    tasks = [make_task(writer) for _ in range(3)]
+    for task in tasks:
+        _buffer(task, n=2)
+        task._flush_buffer()
+
+    _wait_for(lambda: writer.commit_count == 1)
+    assert len(fake_db.calls) == 1
+    assert {p.task_id for p in fake_db.calls[0]} == {t.task_id for t in tasks}
+    assert all(t._data_buffer == [] for t in tasks)
+
+    for task in tasks:
+        task._flush_buffer(is_teardown=True)
+    assert writer.wait_idle(3000) is True
+
+
+def test_failed_commit_keeps_buffers_and_notifies_once(make_task, fake_db):
+    """提交失败：缓冲保留待下一轮重试，连续失败达到阈值通知一次，成功后复位"""
+    writer = GroupCommitWriter(fake_db, latency_ms=0)
+    task = make_task(writer)
+    fake_db.fail_times = CONSECUTIVE_FAILURE_NOTIFY_THRESHOLD
+
+    for i in range(CONSECUTIVE_FAILURE_NOTIFY_THRESHOLD):
+        _buffer(task, n=1)
+        task._flush_buffer()
+        _wait_for(lambda: task._flush_fail_count == i + 1)
+    assert len(task._data_buffer) == CONSECUTIVE_FAILURE_NOTIFY_THRESHOLD
+    assert task._notified is True
+
+    _buffer(task, n=1)
+    task._flush_buffer()
+    _wait_for(lambda: task._flush_fail_count == 0)
+    assert task._notified is False
+    assert task._data_buffer == []
+    assert len(fake_db.saved_points) == CONSECUTIVE_FAILURE_NOTIFY_THRESHOLD + 1
+
+    task._flush_buffer(is_teardown=True)
+    assert writer.wait_idle(3000) is True
+
+
+def test_failed_commit_applies_buffer_cap(make_task, fake_db):
+    """写入线程模式下缓冲上限不变：失败后超出 MAX_BUFFER_SIZE 的最旧数据被丢弃"""
+    writer = GroupCommitWriter(fake_db, latency_ms=0)
+    task = make_task(writer)
+    fake_db.fail_times = 1
+    _buffer(task, n=MAX_BUFFER_SIZE + 50, value=0.0)
+    task._flush_buffer()
+
+    _wait_for(lambda: task._flush_fail_count == 1)
+    assert len(task._data_buffer) == MAX_BUFFER_SIZE
+    assert task._data_buffer[0].value == 50.0
+
+    task._flush_buffer(is_teardown=True)
+    assert writer.wait_idle(3000) is True
+
+
+def test_final_flush_skips_window_and_detaches(make_task, fake_db):
+    """收尾提交不等待延迟窗口，返回时数据已落库且任务已解除挂接"""
+    writer = GroupCommitWriter(fake_db, latency_ms=60_000)
+    task = make_task(writer)
+    _buffer(task, n=3)
+
+    start = time.monotonic()
+    task._flush_buffer(is_teardown=True)
+
+    assert time.monotonic() - start < 5
+    assert len(fake_db.saved_points) == 3
+    assert task._data_buffer == []
+    assert writer.is_attached(task) is False
+    assert writer.wait_idle(3000) is True
+
+
+def test_sampler_tasks_commit_through_writer(tmp_path, monkeypatch, qapp, db):
+    """真实采样：多个任务经共享引擎采集、写入线程合并落库，停止返回时数据已全部入库"""
+    monkeypatch.setattr(config, 'DB_PATH', str(tmp_path / "writer_e2e.db"))
+    engine = SamplerEngine()
+    writer = GroupCommitWriter(db, latency_ms=50)
+    tasks = [MonitorTask(pid=os.getpid(), process_name="pytest-target", metric_types=["memory_rss"],
+                         interval=0.02, db=db, writer=writer) for _ in range(5)]
+    for task in tasks:
+        engine.add_task(task)
+    time.sleep(0.3)
+    for task in tasks:
+        engine.stop_task(task)
+
+    assert engine.wait_idle(3000) is True
+    assert writer.wait_idle(3000) is True
+    for task in tasks:
+        assert task._data_buffer == []
+        assert db.get_task(task.task_id).status == 'stopped'
+        assert len(db.get_task_data_points(task.task_id)) >= 5
+    # 5 个任务各采集十余个周期，提交次数远少于"每任务每周期一次"
+    assert writer.commit_count < sum(len(db.get_task_data_points(t.task_id)) for t in tasks) / 2
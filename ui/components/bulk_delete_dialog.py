@@ -0,0 +1,101 @@
+"""
+批量删除任务对话框
+列出可删除（未在运行）的任务复选框，支持全选；确认后由调用方交给后台删除线程
+"""
+from typing import Dict, List
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QScrollArea
+from qfluentwidgets import MessageBoxBase, SubtitleLabel, CaptionLabel, CheckBox
+
+from data.models import MonitorTask
+
+
+class BulkDeleteDialog(MessageBoxBase):
+    """批量删除任务对话框"""
+
+    def __init__(self, tasks: List[MonitorTask], data_counts: Dict[str, int], parent=None):
+        """
+        初始化对话框
+
+        Args:
+            tasks: 可删除的任务（调用方已排除运行中的任务）
+            data_counts: 各任务数据点数量 {任务ID: 数量}，没有数据的任务可缺省
+            parent: 父窗口
+        """
+        super().__init__(parent)
+        # 任务复选框字典 {任务ID: CheckBox}
+        self.task_checkboxes: Dict[str, CheckBox] = {}
+        self._init_ui(tasks, data_counts)
+
+    def _init_ui(self, tasks: List[MonitorTask], data_counts: Dict[str, int]):
+        """初始化UI"""
+        self.viewLayout.addWidget(SubtitleLabel("批量删除任务", self))
+        self.viewLayout.addWidget(CaptionLabel(
+            "所选任务的全部历史数据将在后台删除，删除期间可继续使用，此操作不可恢复。", self))
+
+        self.select_all_checkbox = CheckBox("全选")
+        self.select_all_checkbox.setTristate(True)
+        self.select_all_checkbox.clicked.connect(self._on_select_all_clicked)
+        self.viewLayout.addWidget(self.select_all_checkbox)
+
+        scroll_area = QScrollArea(self)
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setFixedHeight(320)
+        scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        scroll_area.setStyleSheet("QScrollArea{background: transparent; border: none}")
+        scroll_area.viewport().setStyleSheet("background: transparent")
+
+        container = QWidget()
+        container.setStyleSheet("background: transparent")
+        container_layout = QVBoxLayout(container)
+        container_layout.setContentsMargins(0, 0, 10, 0)
+        container_layout.setSpacing(8)
+
+        for task in tasks:
+            checkbox = CheckBox(
+                f"{task.process_name}  ·  PID {task.pid}  ·  "
+                f"{task.start_time.strftime('%m-%d %H:%M')}  ·  "
+                f"{data_counts.get(task.task_id, 0)} 个数据点")
+            checkbox.stateChanged.connect(self._update_state)
+            container_layout.addWidget(checkbox)
+            self.task_checkboxes[task.task_id] = checkbox
+        container_layout.addStretch()
+
+        scroll_area.setWidget(container)
+        self.viewLayout.addWidget(scroll_area)
+
+        self.yesButton.setText("删除所选")
+        self.cancelButton.setText("取消")
+        self.widget.setMinimumWidth(520)
+        self._update_state()
+
+    def _on_select_all_clicked(self):
+        """全选复选框点击：部分选中或全不选时全选，全选时全部取消"""
+        check = self.select_all_checkbox.checkState() != Qt.Unchecked
+        for checkbox in self.task_checkboxes.values():
+            checkbox.setChecked(check)
+
+    def _update_state(self, *_):
+        """同步全选复选框的三态与确认按钮可用状态"""
+        selected = len(self.selected_task_ids())
+        if selected == 0:
+            state = Qt.Unchecked
+        elif selected == len(self.task_checkboxes):
+            state = Qt.Checked
+        else:
+            state = Qt.PartiallyChecked
+        self.select_all_checkbox.blockSignals(True)
+        self.select_all_checkbox.setCheckState(state)
+        self.select_all_checkbox.blockSignals(False)
+        self.yesButton.setEnabled(selected > 0)
+
+    def selected_task_ids(self) -> List[str]:
+        """
+        获取选中的任务
+
+        Returns:
+            List[str]: 任务ID列表（按列表顺序）
+        """
+        return [task_id for task_id, checkbox in self.task_checkboxes.items()
+                if checkbox.isChecked()]
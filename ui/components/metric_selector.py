@@ -1,45 +1,56 @@
 """
 监控指标多选对话框
-按类别分组展示指标复选框，支持分类三态全选/取消
+按类别分组展示指标复选框，支持分类三态全选/取消；每个指标可单独设置采集
+周期倍数（每 N 个采集周期采一次），开销大的指标可降频采集
 """
 from typing import Dict, List
 
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QScrollArea
-from qfluentwidgets import MessageBoxBase, SubtitleLabel, CheckBox
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QHBoxLayout, QScrollArea
+from qfluentwidgets import MessageBoxBase, SubtitleLabel, CheckBox, ComboBox
 
-from utils.metrics import AVAILABLE_METRICS, get_metric_display_name
+from utils.metrics import get_available_metrics, get_metric_display_name
 
 
 class MetricSelectorDialog(MessageBoxBase):
     """监控指标多选对话框"""
 
-    # 指标网格每行列数
-    GRID_COLUMNS = 3
+    # 指标网格每行列数（每格为复选框 + 周期倍数下拉框）
+    GRID_COLUMNS = 2
 
-    def __init__(self, selected_metrics: List[str] = None, parent=None):
+    # 可选的采集周期倍数
+    PERIOD_CHOICES = (1, 5, 10, 30, 60)
+
+    def __init__(self, selected_metrics: List[str] = None, parent=None,
+                 metric_periods: Dict[str, int] = None):
         """
         初始化对话框
 
         Args:
             selected_metrics: 预选中的指标类型列表
             parent: 父窗口
+            metric_periods: 预设的指标采集周期倍数 {指标类型: N}，未列出的为每周期采集
         """
         super().__init__(parent)
 
+        # 本平台可采集的指标（按类别分组），不支持的指标不展示
+        self.available_metrics = get_available_metrics()
         # 分类复选框字典 {分类名: CheckBox}
         self.category_checkboxes: Dict[str, CheckBox] = {}
         # 指标复选框字典 {指标类型: CheckBox}
         self.metric_checkboxes: Dict[str, CheckBox] = {}
+        # 指标周期倍数下拉框字典 {指标类型: ComboBox}
+        self.period_combos: Dict[str, ComboBox] = {}
 
-        self._init_ui(set(selected_metrics or []))
+        self._init_ui(set(selected_metrics or []), metric_periods or {})
 
-    def _init_ui(self, selected: set):
+    def _init_ui(self, selected: set, metric_periods: Dict[str, int]):
         """
         初始化UI
 
         Args:
             selected: 预选中的指标类型集合
+            metric_periods: 预设的指标采集周期倍数
         """
         # 标题
         title_label = SubtitleLabel("选择监控指标", self)
@@ -61,7 +72,7 @@ class MetricSelectorDialog(MessageBoxBase):
         container_layout.setSpacing(12)
 
         # 按分类构建复选框
-        for category, metrics in AVAILABLE_METRICS.items():
+        for category, metrics in self.available_metrics.items():
             # 分类复选框（三态：全选/部分选中/全不选）
             category_checkbox = CheckBox(category)
             category_checkbox.setTristate(True)
@@ -79,10 +90,26 @@ class MetricSelectorDialog(MessageBoxBase):
                 metric_checkbox = CheckBox(get_metric_display_name(metric))
                 metric_checkbox.setChecked(metric in selected)
                 metric_checkbox.stateChanged.connect(
-                    lambda state, c=category: self._on_metric_changed(c))
+                    lambda state, c=category, m=metric: self._on_metric_changed(c, m))
                 self.metric_checkboxes[metric] = metric_checkbox
-                grid_layout.addWidget(
-                    metric_checkbox, i // self.GRID_COLUMNS, i % self.GRID_COLUMNS)
+
+                period_combo = ComboBox()
+                for period in self.PERIOD_CHOICES:
+                    period_combo.addItem("每周期" if period == 1 else f"每 {period} 周期",
+                                         userData=period)
+                period = metric_periods.get(metric, 1)
+                if period in self.PERIOD_CHOICES:
+                    period_combo.setCurrentIndex(self.PERIOD_CHOICES.index(period))
+                period_combo.setToolTip("采集周期倍数：开销大的指标可降频采集")
+                period_combo.setEnabled(metric in selected)
+                self.period_combos[metric] = period_combo
+
+                cell_layout = QHBoxLayout()
+                cell_layout.setSpacing(8)
+                cell_layout.addWidget(metric_checkbox, 1)
+                cell_layout.addWidget(period_combo)
+                grid_layout.addLayout(
+                    cell_layout, i // self.GRID_COLUMNS, i % self.GRID_COLUMNS)
             container_layout.addLayout(grid_layout)
 
         container_layout.addStretch()
@@ -93,11 +120,11 @@ class MetricSelectorDialog(MessageBoxBase):
         self.yesButton.setText("确定")
         self.cancelButton.setText("取消")
 
-        # 对话框最小宽度
-        self.widget.setMinimumWidth(600)
+        # 对话框最小宽度（两列"复选框 + 周期下拉框"）
+        self.widget.setMinimumWidth(640)
 
         # 初始化分类三态和确认按钮可用性
-        for category in AVAILABLE_METRICS:
+        for category in self.available_metrics:
             self._update_category_state(category)
         self._update_yes_button()
 
@@ -116,21 +143,24 @@ class MetricSelectorDialog(MessageBoxBase):
         category_checkbox.blockSignals(False)
 
         # 批量设置子项（阻断信号防止回环）
-        for metric in AVAILABLE_METRICS[category]:
+        for metric in self.available_metrics[category]:
             metric_checkbox = self.metric_checkboxes[metric]
             metric_checkbox.blockSignals(True)
             metric_checkbox.setChecked(checked)
             metric_checkbox.blockSignals(False)
+            self.period_combos[metric].setEnabled(checked)
 
         self._update_yes_button()
 
-    def _on_metric_changed(self, category: str):
+    def _on_metric_changed(self, category: str, metric: str):
         """
-        指标复选框状态变化事件：联动分类三态和确认按钮
+        指标复选框状态变化事件：联动周期下拉框可用性、分类三态和确认按钮
 
         Args:
             category: 该指标所属分类名称
+            metric: 指标类型
         """
+        self.period_combos[metric].setEnabled(self.metric_checkboxes[metric].isChecked())
         self._update_category_state(category)
         self._update_yes_button()
 
@@ -141,7 +171,7 @@ class MetricSelectorDialog(MessageBoxBase):
         Args:
             category: 分类名称
         """
-        metrics = AVAILABLE_METRICS[category]
+        metrics = self.available_metrics[category]
         checked_count = sum(
             1 for metric in metrics if self.metric_checkboxes[metric].isChecked())
 
@@ -166,11 +196,25 @@ class MetricSelectorDialog(MessageBoxBase):
         获取选中的指标类型列表
 
         Returns:
-            List[str]: 选中的指标类型，按AVAILABLE_METRICS定义顺序排列
+            List[str]: 选中的指标类型，按AVAILABLE_METRICS定义顺序排列（仅本平台可采集的指标）
         """
         return [
             metric
-            for metrics in AVAILABLE_METRICS.values()
+            for metrics in self.available_metrics.values()
             for metric in metrics
             if self.metric_checkboxes[metric].isChecked()
         ]
+
+    def get_metric_periods(self) -> Dict[str, int]:
+        """
+        获取选中指标的采集周期倍数
+
+        Returns:
+            Dict[str, int]: {指标类型: N}，只含选中且 N > 1 的指标
+        """
+        periods = {}
+        for metric in self.get_selected():
+            period = self.period_combos[metric].currentData()
+            if period and period > 1:
+                periods[metric] = period
+        return periods
@@ -59,6 +59,10 @@ class MainWindow(FluentWindow):
         self.tray_icon: Optional[QSystemTrayIcon] = None
         self._tray_tip_shown = False
 
+        # 采样日志回放：上次运行崩溃/被强制结束时尚未落库的采样数据补写回数据库。
+        # 与孤儿任务校正一样必须在任何任务启动前、每进程只调用一次
+        self.db.replay_journal(self.monitor_manager.get_journal())
+
         # 孤儿任务校正：上次运行未正常退出遗留的 running 状态任务本次启动时统一校正为
         # stopped。必须在任何任务启动前、每进程只调用一次；不能放进 Database.__init__。
         self.db.reconcile_orphan_tasks()
@@ -66,8 +70,30 @@ class MainWindow(FluentWindow):
         # 启动自动清理：保留天数取自设置页（app_config.cfg），默认禁用
         # （0=永久保留，config.DATA_RETENTION_DAYS 缺省值同此）。执行顺序固定在
         # 孤儿校正之后，避免把本次启动才校正为 stopped 的"刚崩溃"任务当作过期
-        # 任务误删。
-        self.db.cleanup_old_tasks(cfg.get(cfg.retention_days))
+        # 任务误删。过期任务在这里只标记为排队删除（任务列表中随即消失），数据连同上次
+        # 运行中途未删完的任务交给后台删除线程分批删除，不阻塞启动
+        self.db.cleanup_old_tasks(cfg.get(cfg.retention_days), purge=False)
+        self.monitor_manager.get_deleter().resume()
+
+        # 空闲页后台回收：清理释放的页以及此后删除任务、封块释放的页，在写入线程空闲时
+        # 分小步归还文件系统（不整库 VACUUM、不阻塞采样写入），退出时停止并 join
+        self.monitor_manager.get_reclaimer().start()
+
+        # WAL 检查点：历史页、导出的长读事务期间自动 checkpoint 追不上持续写入，
+        # 由后台线程定期补做，-wal 超过上限时升级为 RESTART
+        self.monitor_manager.get_checkpointer().start()
+
+        # 分级保留：超期的原始采样与 1 分钟汇总由后台线程分批裁剪为更粗的汇总，
+        # 保留天数取自设置页（默认均为永久保留，线程只检查、不裁剪）
+        downsampler = self.monitor_manager.get_downsampler()
+        downsampler.set_policy(cfg.get(cfg.raw_retention_days), cfg.get(cfg.minute_retention_days))
+        downsampler.start()
+
+        # 数据库大小上限：预计超出时由后台线程先降采样、再删除最旧的已停止任务，
+        # 上限取自设置页（默认不限，线程只等待）
+        governor = self.monitor_manager.get_governor()
+        governor.set_budget(cfg.get(cfg.size_budget_mb))
+        governor.start()
 
         # 初始化界面
         self._init_window()
@@ -152,7 +178,8 @@ class MainWindow(FluentWindow):
 
         # 创建页面实例（注入统一数据库实例；about_page 不涉及数据库，不传）
         self.monitor_page = MonitorPage(self, db=self.db)
-        self.history_page = HistoryPage(self, db=self.db)
+        self.history_page = HistoryPage(
+            self, db=self.db, deleter=self.monitor_manager.get_deleter())
         self.export_page = ExportPage(self, db=self.db)
         # 设置页数据管理卡片需要 db（查询占用/清理压缩）与 manager（只读查询
         # 是否有运行中任务，决定清理按钮是否可用）两个依赖，均为可选注入
@@ -335,15 +362,28 @@ class MainWindow(FluentWindow):
             #    决定是否 stop()+wait()）
             self.monitor_manager.stop_all_tasks()
 
-            # 1.1 兜底 join：进程自然消亡的任务在 run() 主循环退出后、_teardown() 完成前存在一个
-            #     窗口——此时 _running（is_running()）已为 False，但对应 QThread 的 isRunning()
-            #     仍为 True（收尾中的 flush/写状态/emit 还没跑完）。stop_all_tasks 内部按
-            #     is_running() 判断是否 wait，会跳过这类任务，不会等待其收尾完成。main.py 退出
-            #     时用 os._exit() 直接终止进程（规避下载线程残留导致的 0xC0000409），若不在此
+            # 1.1 兜底 join：stop_all_tasks 已等待每个任务（含进程自然消亡、收尾尚在进行的
+            #     任务）完成收尾；这里再对共享采样引擎线程本身做一次 join。main.py 退出时用
+            #     os._exit() 直接终止进程（规避下载线程残留导致的 0xC0000409），若不在此
             #     兜底等待，可能在收尾写库的中途就被掐死，丢失最后一批数据。
-            for task in self.monitor_manager.get_all_tasks():
-                if task.isRunning():
-                    shutdown_thread(task, timeout_ms=3000)
+            shutdown_thread(self.monitor_manager.get_sampler(), timeout_ms=3000)
+            # 写入线程在最后一个任务收尾提交完成后自行退出，同样兜底 join
+            shutdown_thread(self.monitor_manager.get_writer(), timeout_ms=3000)
+            # 大小上限治理线程先于删除线程停止（它会向删除线程排队任务）
+            governor = self.monitor_manager.get_governor()
+            shutdown_thread(governor, cancel_fn=governor.stop, timeout_ms=3000)
+            # 后台删除线程：置退出标志后等待当前一批删除完成，未删完的任务下次启动继续
+            deleter = self.monitor_manager.get_deleter()
+            shutdown_thread(deleter, cancel_fn=deleter.stop, timeout_ms=3000)
+            # 降采样线程：同样等待当前一批裁剪完成，未裁剪完的部分下次检查继续
+            downsampler = self.monitor_manager.get_downsampler()
+            shutdown_thread(downsampler, cancel_fn=downsampler.stop, timeout_ms=3000)
+            # 空闲页回收线程：置退出标志后等待当前一步回收完成
+            reclaimer = self.monitor_manager.get_reclaimer()
+            shutdown_thread(reclaimer, cancel_fn=reclaimer.stop, timeout_ms=2000)
+            # WAL 检查点线程：等待当前一次检查点完成（最后一个连接关闭时 -wal 合并回主文件）
+            checkpointer = self.monitor_manager.get_checkpointer()
+            shutdown_thread(checkpointer, cancel_fn=checkpointer.stop, timeout_ms=2000)
 
             # 2. 关于页的下载线程：先置取消标志，再等待结束（超时只记日志，不阻塞更久）
             downloader = getattr(self.about_page, '_downloader', None)
@@ -364,6 +404,11 @@ class MainWindow(FluentWindow):
             cleanup_worker = getattr(self.setting_page, '_cleanup_worker', None)
             shutdown_thread(cleanup_worker, timeout_ms=5000)
 
+            # 6. 全部后台线程已结束，关闭数据库持久连接（最后一个连接关闭时
+            #    SQLite 把 -wal 合并回主文件）与采样日志（正常退出时已为空）
+            self.db.close()
+            self.monitor_manager.get_journal().close()
+
             # 接受关闭事件（放 try 尾部：清理全部成功才显式 accept；异常路径下
             # QCloseEvent 默认已 accepted，且 finally 的 quit() 与 main.py 的
             # os._exit() 双重兜底退出，不依赖这一行）
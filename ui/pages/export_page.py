@@ -231,14 +231,10 @@ class ExportPage(QScrollArea):
         # 获取所有任务
         all_tasks = self.db.get_all_tasks()
 
-        # 过滤掉数据点太少的任务
-        tasks = []
-        for task in all_tasks:
-            # 获取数据点数量
-            data_count = self.db.get_data_point_count(task.task_id)
-            # 至少要有1个数据点才能导出
-            if data_count > 0:
-                tasks.append(task)
+        # 过滤掉没有数据的任务（至少要有1个数据点才能导出）；各任务数据点数
+        # 一次查询取回（读任务汇总表），不逐任务查库
+        data_counts = self.db.get_data_point_counts()
+        tasks = [task for task in all_tasks if data_counts.get(task.task_id, 0) > 0]
 
         if not tasks:
             # 清空显示
@@ -422,7 +418,7 @@ class ExportPage(QScrollArea):
             if not save_path:
                 return
 
-        # 轻量存在性检查（COUNT 查询，不拉取全部数据，避免为了校验而重复加载大数据集）
+        # 轻量存在性检查（读任务汇总的数据点数，不拉取全部数据，避免为了校验而重复加载大数据集）
         if self.db.get_data_point_count(self.current_task_id) == 0:
             InfoBar.warning(
                 title="暂无可导出数据",
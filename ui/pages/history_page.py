@@ -27,6 +27,7 @@ from pyqtgraph import exporters
 
 from data.database import Database
 from ui.chart_theme import chart_colors
+from ui.components.bulk_delete_dialog import BulkDeleteDialog
 from ui.typography import (
     DataCaptionLabel, PageTitleLabel, StatValueLabel, TypeScale,
     data_font, ui_font
@@ -41,9 +42,11 @@ logger = logging.getLogger(__name__)
 TABLE_POINT_LIMIT = 2000
 # 图表分桶上限：按行号分桶后每桶取 MIN/MAX 两点，故图表最多 2*CHART_MAX_BUCKETS 个点
 CHART_MAX_BUCKETS = 2000
+# 绘图区尚未布局（宽度未知）时按此像素宽度选择降采样汇总粒度
+CHART_FALLBACK_PIXEL_WIDTH = 800
 
 # 时间范围选项（A2）：(SegmentedWidget routeKey, 显示文本, 范围秒数)；
-# 秒数为 None 表示"全部"（不做时间过滤）。语义锚点见 _compute_since_iso：
+# 秒数为 None 表示"全部"（不做时间过滤）。语义锚点见 _compute_since：
 # 锚定该任务最后一个数据点的时间，而非当前时刻——停止已久的任务选"最近1小时"
 # 仍应能看到其最后一小时的数据。
 TIME_RANGE_OPTIONS = [
@@ -137,13 +140,16 @@ class HistoryPage(QScrollArea):
     # 统计摘要行占位文案（未选任务/所选范围内无数据时展示）
     _EMPTY_STATS_TEXT = "当前 -- ｜ 最小 -- ｜ 最大 -- ｜ 平均 --"
 
-    def __init__(self, parent=None, db=None):
+    def __init__(self, parent=None, db=None, deleter=None):
         """初始化页面
 
         Args:
             parent: 父窗口
             db: 数据库实例（可选，默认回退新建 Database()；生产路径必须由
                 MainWindow 注入，回退仅为兼容兜底）
+            deleter: 后台删除线程 TaskDeleter（可选；生产路径由 MainWindow 注入，
+                删除交给它分批执行并在标题栏显示进度。为 None 时在界面线程内
+                同步删除——保持独立构造的可测性）
         """
         super().__init__(parent)
 
@@ -151,6 +157,7 @@ class HistoryPage(QScrollArea):
         self.setObjectName("historyPage")
 
         self.db = db if db is not None else Database()
+        self.deleter = deleter
 
         # 当前选中的任务ID、指标类型与任务状态（用于删除按钮的运行中保护）
         self.current_task_id = None
@@ -167,8 +174,7 @@ class HistoryPage(QScrollArea):
         self._last_dt_cache_value = None
 
         # 当前图表缓存的 x（epoch float）/y 数组，供悬停吸附（A1）与主题切换重绘
-        # （A6）复用，避免重新查库；仅用于绘图相关计算，严禁回流作为 SQL 查询参数
-        # （评审修订 B1：SQL 过滤参数全链路走 ISO 字符串）
+        # （A6）复用，避免重新查库；仅用于绘图相关计算（SQL 过滤参数统一传 datetime）
         self._chart_x = []
         self._chart_y = []
         self._chart_metric_type = None
@@ -177,6 +183,10 @@ class HistoryPage(QScrollArea):
         # 初始化UI
         self._init_ui()
 
+        if self.deleter is not None:
+            self.deleter.progress.connect(self._on_delete_progress)
+            self.deleter.queue_finished.connect(self._on_delete_queue_finished)
+
         # 加载任务列表
         self._load_tasks()
 
@@ -206,6 +216,11 @@ class HistoryPage(QScrollArea):
         title_layout.addWidget(PageTitleLabel("历史数据"))
         title_layout.addStretch()
 
+        # 后台删除进度：有任务正在删除时显示，删完隐藏
+        self.delete_progress_label = CaptionLabel("")
+        self.delete_progress_label.hide()
+        title_layout.addWidget(self.delete_progress_label)
+
         self.refresh_button = PushButton("刷新", self, FluentIcon.SYNC)
         self.refresh_button.clicked.connect(self._load_tasks)
         title_layout.addWidget(self.refresh_button)
@@ -231,6 +246,9 @@ class HistoryPage(QScrollArea):
         self.delete_action.setEnabled(False)
         self.delete_action.triggered.connect(self.delete_button.click)
         self.more_menu.addAction(self.delete_action)
+        self.bulk_delete_action = Action(FluentIcon.DELETE, "批量删除任务…", self)
+        self.bulk_delete_action.triggered.connect(self._on_bulk_delete_clicked)
+        self.more_menu.addAction(self.bulk_delete_action)
         self.more_button.setMenu(self.more_menu)
         title_layout.addWidget(self.more_button)
         main_layout.addLayout(title_layout)
@@ -282,8 +300,7 @@ class HistoryPage(QScrollArea):
         self.crosshair_line.setVisible(False)
 
         # 真实时间轴（A4）：x 轴改用 DateAxisItem 显示实际日期时间刻度；绘图 x 数据
-        # 统一用 epoch float（dp.timestamp.timestamp()），仅用于绘图，严禁回流到
-        # SQL 查询参数（评审修订 B1，SQL 过滤参数全链路走 ISO 字符串）
+        # 统一用 epoch float（dp.timestamp.timestamp()），仅用于绘图
         self._value_axis = _MetricAxisItem(orientation='left')
         self._value_axis.enableAutoSIPrefix(False)
         self._time_axis = _ContextDateAxisItem(orientation='bottom')
@@ -532,12 +549,10 @@ class HistoryPage(QScrollArea):
         # 获取所有任务（包括正在运行的和历史的）
         all_tasks = self.db.get_all_tasks()
 
-        # 任务可见性与导出页统一为"有数据即显示"（不再按进程名过滤）
-        tasks = []
-        for task in all_tasks:
-            data_count = self.db.get_data_point_count(task.task_id)
-            if data_count > 0:
-                tasks.append(task)
+        # 任务可见性与导出页统一为"有数据即显示"（不再按进程名过滤）；
+        # 各任务数据点数一次查询取回（读任务汇总表），不逐任务查库
+        data_counts = self.db.get_data_point_counts()
+        tasks = [task for task in all_tasks if data_counts.get(task.task_id, 0) > 0]
 
         if not tasks:
             # 清空显示和当前任务ID、指标
@@ -697,25 +712,23 @@ class HistoryPage(QScrollArea):
 
     def _get_cached_last_dt(self, task_id: str) -> Optional[datetime]:
         """
-        按任务缓存 last_dt（评审修订 M3）：仅切任务时重新查询 MAX(timestamp)，
-        切范围/切指标复用缓存值，避免在现有 (task_id, metric_type) 索引不含
-        timestamp 的前提下重复触发一次全表 filter。
+        按任务缓存 last_dt（评审修订 M3）：仅切任务时重新查询 MAX(ts_ms)，
+        切范围/切指标复用缓存值。
         """
         if self._last_dt_cache_task_id != task_id:
             self._last_dt_cache_value = self.db.get_last_point_timestamp(task_id)
             self._last_dt_cache_task_id = task_id
         return self._last_dt_cache_value
 
-    def _compute_since_iso(self, task_id: str) -> Optional[str]:
+    def _compute_since(self, task_id: str) -> Optional[datetime]:
         """
-        把当前选中的时间范围换算成 SQL 过滤用的 ISO 字符串。
+        把当前选中的时间范围换算成 SQL 过滤用的起始时间。
 
-        【评审修订 B1】SQL 过滤参数全链路用 ISO 字符串，与绘图用的 epoch float
-        严禁混用。锚点为该任务最后一个数据点的时间（get_last_point_timestamp），
-        而非当前时刻——停止已久的任务选"最近1小时"仍应能看到其最后一小时的数据。
+        锚点为该任务最后一个数据点的时间（get_last_point_timestamp），而非当前
+        时刻——停止已久的任务选"最近1小时"仍应能看到其最后一小时的数据。
 
         Returns:
-            Optional[str]: 选中"全部"或该任务尚无数据点时返回 None（不过滤）
+            Optional[datetime]: 选中"全部"或该任务尚无数据点时返回 None（不过滤）
         """
         range_seconds = TIME_RANGE_SECONDS.get(self.current_range_key)
         if range_seconds is None:
@@ -723,8 +736,7 @@ class HistoryPage(QScrollArea):
         last_dt = self._get_cached_last_dt(task_id)
         if last_dt is None:
             return None
-        since_dt = last_dt - timedelta(seconds=range_seconds)
-        return since_dt.isoformat()
+        return last_dt - timedelta(seconds=range_seconds)
 
     def _load_task_data(self, task_id: str, metric_type: str = None):
         """
@@ -734,7 +746,7 @@ class HistoryPage(QScrollArea):
 
         Args:
             task_id: 任务ID
-            metric_type: 指标类型（首指标查询自动包含metric_type为NULL的旧数据）
+            metric_type: 指标类型
         """
         # 获取任务信息
         task_info = self.db.get_task(task_id)
@@ -747,12 +759,28 @@ class HistoryPage(QScrollArea):
             )
             return
 
-        since_iso = self._compute_since_iso(task_id)
+        since = self._compute_since(task_id)
 
         # 表格：所选范围内最近 TABLE_POINT_LIMIT 条，新语义下子查询已按时间升序返回，
         # 无需再翻转
         table_points = self.db.get_task_data_points(
-            task_id, metric_type=metric_type, limit=TABLE_POINT_LIMIT, since_iso=since_iso)
+            task_id, metric_type=metric_type, limit=TABLE_POINT_LIMIT, since=since)
+
+        # 图表：每桶 MIN/MAX 两点（保留尖峰），按时间升序返回，同样按当前范围过滤。
+        # 范围足够长时读降采样汇总（最粗且桶数仍不少于绘图区像素宽度的粒度），
+        # 否则对原始数据做 SQL 分桶；原始采样已按分级保留裁剪的范围总是读汇总
+        resolution = self.db.choose_rollup_resolution(
+            task_id, self._chart_pixel_width(), since=since)
+        if resolution is not None:
+            chart_points = self.db.get_task_data_points_rollup(
+                task_id, metric_type, resolution, max_buckets=CHART_MAX_BUCKETS, since=since)
+        else:
+            chart_points = self.db.get_task_data_points_bucketed(
+                task_id, metric_type=metric_type, max_buckets=CHART_MAX_BUCKETS, since=since)
+
+        if not table_points and resolution is not None:
+            # 范围内的原始采样已裁剪：表格改列降采样汇总的极值点
+            table_points = chart_points[-TABLE_POINT_LIMIT:]
 
         if not table_points:
             if self.current_range_key != DEFAULT_TIME_RANGE_KEY:
@@ -765,11 +793,6 @@ class HistoryPage(QScrollArea):
                     "产生新的采样数据后此处会自动更新")
             return
 
-        # 图表：SQL 分桶降采样（每桶 MIN/MAX 两点，保留尖峰），按时间升序返回，
-        # 同样按当前范围过滤
-        chart_points = self.db.get_task_data_points_bucketed(
-            task_id, metric_type=metric_type, max_buckets=CHART_MAX_BUCKETS, since_iso=since_iso)
-
         # 更新图表
         self._update_chart(chart_points, metric_type)
 
@@ -777,9 +800,14 @@ class HistoryPage(QScrollArea):
         self._update_table(table_points, metric_type)
 
         # 更新统计摘要行（A3）
-        self._update_stats(table_points, metric_type, since_iso)
+        self._update_stats(table_points, metric_type, since)
         self.content_stack.setCurrentWidget(self.analysis_page)
 
+    def _chart_pixel_width(self) -> int:
+        """图表绘图区的像素宽度（选择降采样汇总粒度用；尚未布局时取默认宽度）"""
+        width = int(self.chart_widget.getPlotItem().vb.width())
+        return width if width > 1 else CHART_FALLBACK_PIXEL_WIDTH
+
     def _update_chart(self, data_points, metric_type):
         """
         更新图表（A4 真实时间轴）：缓存 x（epoch float）/y 数组供悬停吸附与主题
@@ -791,8 +819,7 @@ class HistoryPage(QScrollArea):
         """
         self._chart_metric_type = metric_type
         if data_points:
-            # 绘图 x 数据统一用 epoch float，仅用于绘图，严禁回流到 SQL 查询参数
-            # （评审修订 B1）
+            # 绘图 x 数据统一用 epoch float，仅用于绘图
             self._chart_x = [dp.timestamp.timestamp() for dp in data_points]
             self._chart_y = [dp.value for dp in data_points]
         else:
@@ -893,7 +920,7 @@ class HistoryPage(QScrollArea):
             self.hover_label.setText("")
         return super().eventFilter(obj, event)
 
-    def _update_stats(self, table_points, metric_type, since_iso):
+    def _update_stats(self, table_points, metric_type, since):
         """
         更新统计摘要行（A3）：当前 {last} ｜ 最小 {min} ｜ 最大 {max} ｜ 平均 {avg}
 
@@ -901,7 +928,7 @@ class HistoryPage(QScrollArea):
             table_points: 表格查询结果（按 timestamp 升序），末元素即"当前"
                           （评审修订 M3：范围内最新值直接复用该结果，不单独查询）
             metric_type: 指标类型
-            since_iso: 当前范围过滤参数，透传给 get_metric_stats 保持与图表/表格
+            since: 当前范围过滤参数，透传给 get_metric_stats 保持与图表/表格
                        口径一致
         """
         if not table_points or not self.current_task_id or not metric_type:
@@ -912,7 +939,7 @@ class HistoryPage(QScrollArea):
         current_text = format_metric_value(
             metric_type, table_points[-1].value,
             display_unit=self._chart_display_unit)
-        stats = self.db.get_metric_stats(self.current_task_id, metric_type, since_iso=since_iso)
+        stats = self.db.get_metric_stats(self.current_task_id, metric_type, since=since)
         if stats:
             min_text = format_metric_value(
                 metric_type, stats['min'], display_unit=self._chart_display_unit)
@@ -1018,7 +1045,7 @@ class HistoryPage(QScrollArea):
             self.delete_action.setToolTip("")
 
     def _on_delete_task_clicked(self):
-        """删除此任务数据按钮点击事件：确认对话框 -> delete_task -> 本页刷新"""
+        """删除此任务数据按钮点击事件：确认对话框 -> 排队删除（_delete_tasks）-> 本页刷新"""
         if not self.current_task_id:
             return
 
@@ -1043,10 +1070,45 @@ class HistoryPage(QScrollArea):
         if not dialog.exec():
             return
 
-        if self.db.delete_task(self.current_task_id):
+        self._delete_tasks([self.current_task_id])
+
+    def _on_bulk_delete_clicked(self):
+        """批量删除菜单点击事件：列出未在运行的任务供勾选，确认后排队删除"""
+        tasks = [task for task in self.db.get_all_tasks() if task.status != 'running']
+        if not tasks:
+            InfoBar.info(
+                title="提示",
+                content="没有可删除的任务（运行中的任务需先停止）",
+                parent=self,
+                position=InfoBarPosition.TOP,
+                duration=2000
+            )
+            return
+
+        dialog = BulkDeleteDialog(tasks, self.db.get_data_point_counts(), self.window())
+        if not dialog.exec():
+            return
+        self._delete_tasks(dialog.selected_task_ids())
+
+    def _delete_tasks(self, task_ids):
+        """
+        删除任务：有后台删除线程时标记为排队删除后交给它分批删除（任务立即从列表中
+        消失，进度显示在标题栏），否则在界面线程内同步删除；随后刷新本页
+
+        Args:
+            task_ids: 任务ID列表
+        """
+        if self.deleter is not None:
+            ok = self.deleter.delete_tasks(task_ids)
+            content = f"正在后台删除 {len(task_ids)} 个任务的历史数据，可继续使用"
+        else:
+            ok = all([self.db.delete_task(task_id) for task_id in task_ids])
+            content = f"已删除 {len(task_ids)} 个任务的历史数据"
+
+        if ok:
             InfoBar.success(
                 title="删除成功",
-                content="该任务的历史数据已删除",
+                content=content,
                 parent=self,
                 position=InfoBarPosition.TOP,
                 duration=2000
@@ -1061,6 +1123,17 @@ class HistoryPage(QScrollArea):
                 duration=3000
             )
 
+    def _on_delete_progress(self, task_id: str, done: int, total: int):
+        """后台删除进度：标题栏显示排队任务数与当前任务的完成比例"""
+        pending = len(self.deleter.pending_task_ids())
+        percent = done * 100 // total if total else 0
+        self.delete_progress_label.setText(f"正在删除 {pending} 个任务的数据（当前 {percent}%）")
+        self.delete_progress_label.show()
+
+    def _on_delete_queue_finished(self):
+        """后台删除队列处理完毕：隐藏进度"""
+        self.delete_progress_label.hide()
+
     def _save_chart_as_png(self):
         """保存当前图表为 PNG 图片（A5）"""
         if not self.current_task_id or not self._chart_x:
@@ -9,7 +9,7 @@ from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QGridLayout, QScrollArea, QSizePolicy, QCompleter)
 from qfluentwidgets import (
-    LineEdit, EditableComboBox, PushButton, PrimaryPushButton, SpinBox,
+    LineEdit, EditableComboBox, PushButton, PrimaryPushButton, DoubleSpinBox,
     CardWidget, FluentIcon, InfoBar, InfoBarPosition,
     BodyLabel, CaptionLabel, StrongBodyLabel
 )
@@ -291,6 +291,8 @@ class MonitorPage(QScrollArea):
 
         # 已选监控指标列表（默认预选工作集内存）
         self.selected_metrics: List[str] = [MetricType.MEMORY_RSS]
+        # 已选指标的采集周期倍数 {指标类型: 每 N 个周期采一次}，未列出的每周期采集
+        self.selected_metric_periods: Dict[str, int] = {}
 
         # 同步标志，防止循环触发
         self._syncing = False
@@ -390,8 +392,10 @@ class MonitorPage(QScrollArea):
         interval_label = CaptionLabel("周期（秒）")
         select_layout.addWidget(interval_label, 2, 2, Qt.AlignRight)
 
-        self.interval_spinbox = SpinBox()
-        self.interval_spinbox.setRange(1, 3600)  # 1-3600秒
+        self.interval_spinbox = DoubleSpinBox()
+        self.interval_spinbox.setDecimals(1)
+        self.interval_spinbox.setSingleStep(0.1)
+        self.interval_spinbox.setRange(config.MIN_INTERVAL, config.MAX_INTERVAL)  # 0.1-3600秒
         self.interval_spinbox.setValue(cfg.get(cfg.default_interval))  # 默认值取自设置页
         # 普通 Fluent SpinBox 横排两个步进按钮，宽度交由其尺寸提示计算，
         # 避免紧凑布局把内部数值编辑区压缩为 0。
@@ -441,7 +445,7 @@ class MonitorPage(QScrollArea):
         # 初始化配额标题文案与空状态可见性（此时 task_cards 尚为空字典）
         self._update_tasks_label()
 
-    def set_default_interval(self, seconds: int) -> None:
+    def set_default_interval(self, seconds: float) -> None:
         """更新采集周期输入框的默认显示值（供 MainWindow 联动调用：设置页
         "默认采集周期"变更时同步过来）
 
@@ -456,14 +460,20 @@ class MonitorPage(QScrollArea):
 
     def _on_select_metric_clicked(self):
         """选择指标按钮点击事件：弹出多选对话框"""
-        dialog = MetricSelectorDialog(self.selected_metrics, self.window())
+        dialog = MetricSelectorDialog(
+            self.selected_metrics, self.window(), metric_periods=self.selected_metric_periods)
         if dialog.exec():
             self.selected_metrics = dialog.get_selected()
+            self.selected_metric_periods = dialog.get_metric_periods()
             self._update_metric_summary()
 
     def _update_metric_summary(self):
         """更新已选指标摘要文案"""
-        names = [get_metric_display_name(m) for m in self.selected_metrics]
+        names = []
+        for metric in self.selected_metrics:
+            name = get_metric_display_name(metric)
+            period = self.selected_metric_periods.get(metric)
+            names.append(f"{name}（每 {period} 周期）" if period else name)
         summary = f"已选 {len(names)} 项" if names else "未选择指标"
         details = "、".join(names) if names else "请选择至少一项监控指标"
         self.metric_summary_label.setText(summary)
@@ -637,7 +647,8 @@ class MonitorPage(QScrollArea):
 
         # 创建并启动任务
         task_id = self.manager.create_task(
-            pid, process_name, list(self.selected_metrics), interval)
+            pid, process_name, list(self.selected_metrics), interval,
+            metric_periods=dict(self.selected_metric_periods))
         if task_id:
             self.manager.start_task(task_id)
 
@@ -33,7 +33,10 @@ def _format_bytes(num_bytes: int) -> str:
 
 class _CleanupWorker(QThread):
     """"清理并压缩数据库"后台线程（v1.3.0 批4）：按保留天数删除过期任务
-    （retention_days>0 时）再执行 VACUUM，避免大库操作阻塞 UI 线程。
+    （retention_days>0 时；有后台删除线程时标记后交给它分批删除并等待删完，进度由
+    设置页经其信号展示），把已关闭窗口的采样封为压缩块（sample_storage='chunks'
+    时），再执行 VACUUM，避免大库操作阻塞 UI 线程。VACUUM 同时把旧库转换为增量
+    回收（auto_vacuum=INCREMENTAL），此后删除释放的空间由后台回收线程逐步归还。
 
     异常处理沿用 Database 层"静默失败"约定（cleanup_old_tasks/vacuum 内部已
     自行捕获异常并记日志，不向上抛出）；这里的 try/except/finally 是额外一层
@@ -43,16 +46,22 @@ class _CleanupWorker(QThread):
 
     finished_ok = pyqtSignal(int)  # 参数：被删除的任务数（未执行清理时为0）
 
-    def __init__(self, db, retention_days: int, parent=None):
+    def __init__(self, db, retention_days: int, deleter=None, parent=None):
         super().__init__(parent)
         self.db = db
         self.retention_days = retention_days
+        self.deleter = deleter
 
     def run(self):
         deleted = 0
         try:
-            if self.retention_days > 0:
+            if self.retention_days > 0 and self.deleter is not None:
+                deleted = self.db.cleanup_old_tasks(self.retention_days, purge=False)
+                self.deleter.resume()
+                self.deleter.wait_done()
+            elif self.retention_days > 0:
                 deleted = self.db.cleanup_old_tasks(self.retention_days)
+            self.db.compact_samples()
             self.db.vacuum()
         except Exception:
             logger.error("清理并压缩数据库失败", exc_info=True)
@@ -79,8 +88,18 @@ class SettingPage(ScrollArea):
         self.setObjectName("settingPage")
         self.db = db
         self.manager = manager
+        # 后台删除线程（随 manager 注入）：清理时的过期任务交给它删除，进度显示在提示框
+        self.deleter = manager.get_deleter() if manager is not None else None
+        # 分级保留降采样线程（随 manager 注入）：保留策略修改后交给它立即生效
+        self.downsampler = manager.get_downsampler() if manager is not None else None
+        # 大小上限治理线程（随 manager 注入）：上限修改后交给它立即检查
+        self.governor = manager.get_governor() if manager is not None else None
+        # WAL 检查点线程（随 manager 注入）：卡片显示其 -wal 大小与检查点滞后
+        self.checkpointer = manager.get_checkpointer() if manager is not None else None
         self._cleanup_worker: _CleanupWorker = None
         self._state_tooltip: StateToolTip = None
+        # 本次清理开始前的累计回收字节数，完成时据差值提示本次释放的空间
+        self._reclaimed_before_cleanup = 0
 
         # 承载各设置分组的滚动内容容器
         self.scroll_widget = QWidget()
@@ -113,7 +132,7 @@ class SettingPage(ScrollArea):
         self.default_interval_card = SpinBoxSettingCard(
             cfg.default_interval, FIF.STOP_WATCH, "默认采集周期",
             "用于新建任务，创建时仍可调整",
-            parent=self.general_group, suffix=" 秒")
+            parent=self.general_group, suffix=" 秒", decimals=1)
         self.general_group.addSettingCard(self.default_interval_card)
 
     def _init_data_group(self):
@@ -127,6 +146,28 @@ class SettingPage(ScrollArea):
             parent=self.data_group)
         self.data_group.addSettingCard(self.retention_card)
 
+        # 分级保留：超期的原始采样只留 1 分钟/1 小时汇总，1 分钟汇总超期只留 1 小时汇总
+        self.raw_retention_card = OptionsSettingCard(
+            cfg.raw_retention_days, FIF.HISTORY, "原始采样保留",
+            "超过期限的原始采样只保留 1 分钟与 1 小时汇总，图表与统计仍可查看",
+            texts=["永久保留", "1 天", "7 天", "30 天"],
+            parent=self.data_group)
+        self.data_group.addSettingCard(self.raw_retention_card)
+        self.minute_retention_card = OptionsSettingCard(
+            cfg.minute_retention_days, FIF.HISTORY, "1 分钟汇总保留",
+            "超过期限的 1 分钟汇总只保留 1 小时汇总",
+            texts=["永久保留", "30 天", "90 天", "365 天"],
+            parent=self.data_group)
+        self.data_group.addSettingCard(self.minute_retention_card)
+
+        # 数据库大小上限：预计超出时先降采样、再删除最旧的已停止任务
+        self.size_budget_card = OptionsSettingCard(
+            cfg.size_budget_mb, FIF.SAVE, "数据库大小上限",
+            "预计超出时先把最旧的原始采样降为汇总，仍不够再删除最旧的已停止任务",
+            texts=["不限", "256 MB", "512 MB", "1 GB", "2 GB", "5 GB"],
+            parent=self.data_group)
+        self.data_group.addSettingCard(self.size_budget_card)
+
         # 清理并压缩数据库：content 显示当前占用，随 showEvent 刷新
         # （见 _refresh_data_management_state）；运行中有任务时按钮禁用
         self.cleanup_card = PushSettingCard(
@@ -198,6 +239,12 @@ class SettingPage(ScrollArea):
         """
         qconfig.themeChanged.connect(self._on_theme_changed_apply)
         self.cleanup_card.clicked.connect(self._on_cleanup_clicked)
+        cfg.raw_retention_days.valueChanged.connect(self._on_tier_retention_changed)
+        cfg.minute_retention_days.valueChanged.connect(self._on_tier_retention_changed)
+        cfg.size_budget_mb.valueChanged.connect(self._on_size_budget_changed)
+        if self.deleter is not None:
+            self.deleter.progress.connect(self._on_delete_progress)
+            self.deleter.queue_finished.connect(self._refresh_data_management_state)
         self.open_dir_card.clicked.connect(self._on_open_data_dir_clicked)
 
     def _on_theme_changed_apply(self, theme: Theme) -> None:
@@ -212,6 +259,17 @@ class SettingPage(ScrollArea):
         super().showEvent(event)
         self._refresh_data_management_state()
 
+    def _on_tier_retention_changed(self, _value) -> None:
+        """分级保留天数修改：交给降采样线程立即按新策略检查（缩短期限时随即开始裁剪）"""
+        if self.downsampler is not None:
+            self.downsampler.set_policy(
+                cfg.get(cfg.raw_retention_days), cfg.get(cfg.minute_retention_days))
+
+    def _on_size_budget_changed(self, value) -> None:
+        """大小上限修改：交给治理线程立即按新上限检查"""
+        if self.governor is not None:
+            self.governor.set_budget(value)
+
     # ========== 数据管理（v1.3.0 批4） ==========
 
     def _refresh_data_management_state(self) -> None:
@@ -222,7 +280,27 @@ class SettingPage(ScrollArea):
             return
 
         size_text = _format_bytes(self.db.get_db_size_bytes())
-        self.cleanup_card.contentLabel.setText(f"当前占用 {size_text}")
+        stats = self.db.get_space_stats()
+        parts = [f"当前占用 {size_text}"]
+        if stats['freelist_pages']:
+            # 空闲页：已启用增量回收时由后台回收线程逐步归还；旧库需先完整压缩一次
+            hint = "" if stats['incremental'] else "，立即清理后转为后台自动回收"
+            parts.append(f"空闲页 {stats['freelist_pages']} 个"
+                         f"（{_format_bytes(stats['free_bytes'])}）{hint}")
+        if stats['reclaimed_bytes']:
+            parts.append(f"本次运行已回收 {_format_bytes(stats['reclaimed_bytes'])}")
+        pending = len(self.deleter.pending_task_ids()) if self.deleter is not None else 0
+        if pending:
+            parts.append(f"后台删除中 {pending} 个任务")
+        if self.governor is not None and self.governor.budget_bytes and self.governor.projected_bytes:
+            parts.append(f"按当前采集预计将达 {_format_bytes(self.governor.projected_bytes)}"
+                         f"（上限 {_format_bytes(self.governor.budget_bytes)}）")
+        if self.checkpointer is not None:
+            wal = self.checkpointer.diagnostics()
+            if wal['lag_frames']:
+                parts.append(f"WAL {_format_bytes(wal['wal_bytes'])}，"
+                             f"{wal['lag_frames']} 页待回写（滞后 {wal['lag_seconds']:.0f} 秒）")
+        self.cleanup_card.contentLabel.setText("，".join(parts))
 
         has_running = bool(self.manager and self.manager.get_running_tasks())
         self.cleanup_card.button.setEnabled(not has_running)
@@ -256,15 +334,27 @@ class SettingPage(ScrollArea):
         self._state_tooltip.move(self._state_tooltip.getSuitablePos())
         self._state_tooltip.show()
 
-        self._cleanup_worker = _CleanupWorker(self.db, days, self)
+        self._reclaimed_before_cleanup = self.db.reclaimed_bytes
+        self._cleanup_worker = _CleanupWorker(self.db, days, self.deleter, self)
         self._cleanup_worker.finished_ok.connect(self._on_cleanup_finished)
         self._cleanup_worker.start()
 
+    def _on_delete_progress(self, task_id: str, done: int, total: int) -> None:
+        """后台删除进度：清理进行中时显示在提示框（卡片上的删除中任务数随显示页面与
+        队列处理完毕时刷新，不逐批查询占用）"""
+        if self._state_tooltip is None:
+            return
+        pending = len(self.deleter.pending_task_ids())
+        percent = done * 100 // total if total else 0
+        self._state_tooltip.setContent(
+            f"正在删除过期任务数据，剩余 {pending} 个任务（当前 {percent}%）…")
+
     def _on_cleanup_finished(self, deleted: int) -> None:
         """清理线程完成：StateToolTip 收尾，刷新占用显示与按钮可用状态，并
         释放线程引用"""
         if self._state_tooltip is not None:
-            self._state_tooltip.setContent("数据库清理完成")
+            freed = self.db.reclaimed_bytes - self._reclaimed_before_cleanup
+            self._state_tooltip.setContent(f"数据库清理完成，释放 {_format_bytes(max(0, freed))}")
             self._state_tooltip.setState(True)
             self._state_tooltip = None
         self._refresh_data_management_state()
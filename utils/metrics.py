@@ -2,6 +2,9 @@
 指标定义和映射
 将psutil的指标映射到任务管理器可见的指标
 """
+import sys
+from typing import Dict, Iterable, List
+
 
 class MetricType:
     """监控指标类型"""
@@ -20,6 +23,11 @@ class MetricType:
     MEMORY_PEAK_NONPAGED_POOL = "memory_peak_nonpaged_pool"  # 非分页池峰值
     MEMORY_NUM_PAGE_FAULTS = "memory_num_page_faults"   # 页面错误
     MEMORY_USS = "memory_uss"                   # 唯一集大小
+    MEMORY_SHARED = "memory_shared"             # 共享内存 (Linux)
+    MEMORY_TEXT = "memory_text"                 # 代码段 (Linux)
+    MEMORY_DATA = "memory_data"                 # 数据段 (Linux)
+    MEMORY_SWAP = "memory_swap"                 # 已换出内存 (Linux)
+    MEMORY_PSS = "memory_pss"                   # 比例集大小 (Linux)
 
     # CPU相关
     CPU_PERCENT = "cpu_percent"         # CPU使用率
@@ -58,6 +66,11 @@ METRIC_DISPLAY_NAMES = {
     MetricType.MEMORY_PEAK_NONPAGED_POOL: "非分页池峰值",
     MetricType.MEMORY_NUM_PAGE_FAULTS: "页面错误",
     MetricType.MEMORY_USS: "唯一集大小",
+    MetricType.MEMORY_SHARED: "共享内存",
+    MetricType.MEMORY_TEXT: "代码段",
+    MetricType.MEMORY_DATA: "数据段",
+    MetricType.MEMORY_SWAP: "交换区",
+    MetricType.MEMORY_PSS: "比例集大小",
     # CPU类
     MetricType.CPU_PERCENT: "CPU使用率",
     MetricType.CPU_USER_TIME: "CPU用户时间",
@@ -93,6 +106,11 @@ METRIC_UNITS = {
     MetricType.MEMORY_PEAK_NONPAGED_POOL: "KB",
     MetricType.MEMORY_NUM_PAGE_FAULTS: "次",
     MetricType.MEMORY_USS: "KB",
+    MetricType.MEMORY_SHARED: "KB",
+    MetricType.MEMORY_TEXT: "KB",
+    MetricType.MEMORY_DATA: "KB",
+    MetricType.MEMORY_SWAP: "KB",
+    MetricType.MEMORY_PSS: "KB",
     # CPU类
     MetricType.CPU_PERCENT: "%",
     MetricType.CPU_USER_TIME: "秒",
@@ -127,6 +145,11 @@ _KB_VALUE_METRICS = {
     MetricType.MEMORY_NONPAGED_POOL,
     MetricType.MEMORY_PEAK_NONPAGED_POOL,
     MetricType.MEMORY_USS,
+    MetricType.MEMORY_SHARED,
+    MetricType.MEMORY_TEXT,
+    MetricType.MEMORY_DATA,
+    MetricType.MEMORY_SWAP,
+    MetricType.MEMORY_PSS,
     MetricType.IO_READ_BYTES,
     MetricType.IO_WRITE_BYTES,
     MetricType.IO_OTHER_BYTES,
@@ -155,6 +178,11 @@ AVAILABLE_METRICS = {
         MetricType.MEMORY_PEAK_NONPAGED_POOL,
         MetricType.MEMORY_NUM_PAGE_FAULTS,
         MetricType.MEMORY_USS,
+        MetricType.MEMORY_SHARED,
+        MetricType.MEMORY_TEXT,
+        MetricType.MEMORY_DATA,
+        MetricType.MEMORY_SWAP,
+        MetricType.MEMORY_PSS,
     ],
     "CPU": [
         MetricType.CPU_PERCENT,
@@ -178,6 +206,82 @@ AVAILABLE_METRICS = {
     ]
 }
 
+# 平台支持表：指标 -> 可采集该指标的平台（sys.platform 归一化后的 'win32'/'linux'/'darwin'）
+# 未列出的指标各平台均可采集。依据 psutil 各平台 memory_info()/memory_full_info()/
+# io_counters() 实际提供的字段：Windows 专有的内存计数在其他系统上不存在，
+# macOS 不提供 io_counters()；句柄数在非 Windows 系统以文件描述符数代替，不受限
+_WINDOWS_ONLY = frozenset({'win32'})
+_LINUX_ONLY = frozenset({'linux'})
+METRIC_PLATFORMS: Dict[str, frozenset] = {
+    MetricType.MEMORY_PEAK_WSET: _WINDOWS_ONLY,
+    MetricType.MEMORY_PRIVATE: _WINDOWS_ONLY,
+    MetricType.MEMORY_PAGEFILE: _WINDOWS_ONLY,
+    MetricType.MEMORY_PEAK_PAGEFILE: _WINDOWS_ONLY,
+    MetricType.MEMORY_PAGED_POOL: _WINDOWS_ONLY,
+    MetricType.MEMORY_PEAK_PAGED_POOL: _WINDOWS_ONLY,
+    MetricType.MEMORY_NONPAGED_POOL: _WINDOWS_ONLY,
+    MetricType.MEMORY_PEAK_NONPAGED_POOL: _WINDOWS_ONLY,
+    MetricType.MEMORY_NUM_PAGE_FAULTS: _WINDOWS_ONLY,
+    MetricType.MEMORY_SHARED: _LINUX_ONLY,
+    MetricType.MEMORY_TEXT: _LINUX_ONLY,
+    MetricType.MEMORY_DATA: _LINUX_ONLY,
+    MetricType.MEMORY_SWAP: _LINUX_ONLY,
+    MetricType.MEMORY_PSS: _LINUX_ONLY,
+    MetricType.IO_READ_COUNT: frozenset({'win32', 'linux'}),
+    MetricType.IO_WRITE_COUNT: frozenset({'win32', 'linux'}),
+    MetricType.IO_READ_BYTES: frozenset({'win32', 'linux'}),
+    MetricType.IO_WRITE_BYTES: frozenset({'win32', 'linux'}),
+    MetricType.IO_OTHER_COUNT: _WINDOWS_ONLY,
+    MetricType.IO_OTHER_BYTES: _WINDOWS_ONLY,
+}
+
+# 运行时能力探测发现的不支持指标（如 psutil 版本缺少某字段），由采集器探测后登记，
+# 与平台支持表共同决定指标选择器展示哪些指标
+_probed_unsupported = set()
+
+
+def current_platform() -> str:
+    """当前平台的归一化名称：'win32' / 'linux' / 'darwin' / 其他原样返回"""
+    if sys.platform.startswith('linux'):
+        return 'linux'
+    return sys.platform
+
+
+def is_metric_supported(metric_type: str, platform: str = None) -> bool:
+    """
+    指标在指定平台上是否可采集
+
+    Args:
+        metric_type: 指标类型
+        platform: 归一化平台名，默认当前平台（此时同时考虑运行时探测结果）
+    """
+    if platform is None:
+        if metric_type in _probed_unsupported:
+            return False
+        platform = current_platform()
+    platforms = METRIC_PLATFORMS.get(metric_type)
+    return platforms is None or platform in platforms
+
+
+def mark_unsupported(metric_types: Iterable[str]):
+    """登记运行时探测发现的不支持指标（采集器能力探测调用）"""
+    _probed_unsupported.update(metric_types)
+
+
+def get_available_metrics(platform: str = None) -> Dict[str, List[str]]:
+    """
+    当前平台可采集的指标（按类别分组，顺序同 AVAILABLE_METRICS，无可用指标的类别省略）
+
+    Args:
+        platform: 归一化平台名，默认当前平台
+    """
+    available = {}
+    for category, metrics in AVAILABLE_METRICS.items():
+        supported = [m for m in metrics if is_metric_supported(m, platform)]
+        if supported:
+            available[category] = supported
+    return available
+
 
 def get_metric_display_name(metric_type: str) -> str:
     """获取指标的显示名称"""